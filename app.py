@@ -3,6 +3,12 @@
 """
 Flask Web Application - 主启动文件
 使用模块化结构组织代码
+
+快速启动模式（FAST_START=1）下启动时不建表、不写示例数据，改由命令完成：
+    flask --app app init-db
+导入本文件不会创建应用；flask 命令行通过 create_app 工厂函数创建
+直接运行本文件启动的是开发服务器；生产环境使用多进程服务：
+    python -m backend.route_planning.route_planning_server --workers 4
 """
 
 from flask import Flask
@@ -10,48 +16,79 @@ import os
 from config import Config
 from backend.models import db
 from backend.routes import init_routes
-from backend.database import init_database, create_sample_data
+from backend.route_planning.route_planning_sqlite import setup_database
+from backend.route_planning.route_planning_warmup import start_warmup, WARMUP_BACKGROUND
+
+# 应用运行需要的目录
+APP_DIRECTORIES = ('static/css', 'static/js', 'static/images', 'templates', 'database')
+
+
+def initialize_database():
+    """创建目录、数据库表和示例数据（需要应用上下文）"""
+    # 建表和示例数据只在这里用到，快速启动时不导入
+    from backend.database import create_sample_data
+    from backend.route_planning.route_planning_database import RoutePlanningDatabase
+
+    for directory in APP_DIRECTORIES:
+        os.makedirs(directory, exist_ok=True)
+
+    db.create_all()
+    RoutePlanningDatabase.ensure_route_history_schema()
+    print("✅ 数据库表创建完成！")
+
+    # 创建示例数据（仅在首次运行时）
+    create_sample_data()
+
+
+def register_commands(app):
+    """注册应用命令行"""
+
+    @app.cli.command('init-db')
+    def init_db_command():
+        """创建数据库表并写入示例数据（快速启动模式下在部署时执行一次）"""
+        initialize_database()
+
 
-def create_app():
-    """应用工厂函数"""
+def create_app(config=None):
+    """应用工厂函数
+
+    config: 覆盖 Config 的配置项（如测试或基准测试使用的数据库）
+    """
     app = Flask(__name__)
-    
+
     # 加载配置
     app.config.from_object(Config)
-    
-    # 确保必要的目录存在
-    os.makedirs('static/css', exist_ok=True)
-    os.makedirs('static/js', exist_ok=True)
-    os.makedirs('static/images', exist_ok=True)
-    os.makedirs('templates', exist_ok=True)
-    os.makedirs('database', exist_ok=True)
-    
-    # 初始化数据库
-    db.init_app(app)
-    
-    # 创建数据库表
-    with app.app_context():
-        db.create_all()
-        print("✅ 数据库表创建完成！")
-        
-        # 创建示例数据（仅在首次运行时）
-        create_sample_data()
-    
-    # 初始化路由
+    if config:
+        app.config.update(config)
+    fast_start = app.config.get('FAST_START', os.environ.get('FAST_START') == '1')
+
+    # 初始化数据库（SQLite文件数据库启用WAL、连接池和只读连接）
+    setup_database(app)
+
+    # 非快速启动时每次启动都建表并检查示例数据
+    if not fast_start:
+        with app.app_context():
+            initialize_database()
+
+    # 初始化路由与命令行
     init_routes(app)
-    
-    return app
+    register_commands(app)
+
+    # 预热目录快照、序列化响应、模板和优化器，完成后 /ready 返回200
+    start_warmup(app, app.config.get('WARMUP_MODE', os.environ.get('WARMUP_MODE', WARMUP_BACKGROUND)))
 
-# 创建应用实例
-app = create_app()
+    return app
 
 if __name__ == '__main__':
+    # 创建应用实例
+    app = create_app()
+
     print("🚀 启动Flask应用...")
     print("📍 访问地址: http://127.0.0.1:8080")
     print("📊 数据库: SQLite")
     print("🔧 模式: 开发模式")
     print("-" * 50)
-    
+
     # 启动应用 - 使用端口8080避免与AirPlay冲突
     # 只监听本地地址以提高响应速度
     app.run(host='127.0.0.1', port=8080, debug=True, threaded=True)
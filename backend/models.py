@@ -188,6 +188,10 @@ class UserProfile(db.Model):
 class RouteHistory(db.Model):
     """路线历史表 - 存储用户生成的路线记录"""
     __tablename__ = 'route_histories'
+    __table_args__ = (
+        # 历史列表按用户筛选、按创建时间倒序
+        db.Index('ix_route_histories_user_created', 'user_id', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'))
@@ -200,6 +204,7 @@ class RouteHistory(db.Model):
     feedback = db.Column(db.Text)  # 用户反馈
     visit_date = db.Column(db.DateTime)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    route_hash = db.Column(db.String(64), index=True)  # 路线内容哈希（route_blobs.hash），有值时route_data为空
     
     # 关系
     user = db.relationship('User', backref='route_histories')
@@ -217,5 +222,70 @@ class RouteHistory(db.Model):
             'user_rating': self.user_rating,
             'feedback': self.feedback,
             'visit_date': self.visit_date.isoformat() if self.visit_date else None,
-            'created_at': self.created_at.isoformat()
+            'created_at': self.created_at.isoformat(),
+            'route_hash': self.route_hash
         }
+
+class RouteBlob(db.Model):
+    """路线内容表 - 按规范化JSON的哈希去重存储路线（内容不可变）"""
+    __tablename__ = 'route_blobs'
+    
+    hash = db.Column(db.String(64), primary_key=True)  # 规范化JSON的SHA-256
+    encoding = db.Column(db.String(16), nullable=False)  # json 或 zlib
+    data = db.Column(db.LargeBinary, nullable=False)
+    size = db.Column(db.Integer)  # 未压缩字节数
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class RouteStop(db.Model):
+    """路线站点表 - 路线历史中按顺序参观的展品（列表查询不必解析整条路线JSON）"""
+    __tablename__ = 'route_stops'
+    
+    route_id = db.Column(db.Integer, db.ForeignKey('route_histories.id', ondelete='CASCADE'), primary_key=True)
+    seq = db.Column(db.Integer, primary_key=True)  # 参观顺序，从0开始
+    exhibit_id = db.Column(db.String(50), nullable=False, index=True)
+    
+    def to_dict(self):
+        return {
+            'route_id': self.route_id,
+            'seq': self.seq,
+            'exhibit_id': self.exhibit_id
+        }
+
+class ExhibitPopularity(db.Model):
+    """展品热度累计表 - 保存路线和提交反馈时增量更新（热门展品直接取前K条）"""
+    __tablename__ = 'exhibit_popularity'
+    
+    exhibit_id = db.Column(db.String(50), primary_key=True)
+    visits = db.Column(db.Integer, nullable=False, default=0, index=True)  # 出现在已保存路线中的次数
+    rating_sum = db.Column(db.Integer, nullable=False, default=0)  # 所在路线评分之和
+    rating_count = db.Column(db.Integer, nullable=False, default=0)
+    dwell_sum = db.Column(db.Float, nullable=False, default=0.0)  # 按建议时长分摊的实际停留分钟数之和
+    dwell_count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class ExhibitDailyStat(db.Model):
+    """展品每日热度表 - 与累计表同时更新，今日/本周热门只读取最近几天的行"""
+    __tablename__ = 'exhibit_daily_stats'
+    __table_args__ = (
+        # 按日期筛选后按访问次数排序
+        db.Index('ix_exhibit_daily_stats_day_visits', 'day', 'visits'),
+    )
+    
+    exhibit_id = db.Column(db.String(50), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)  # UTC日期
+    visits = db.Column(db.Integer, nullable=False, default=0)
+    rating_sum = db.Column(db.Integer, nullable=False, default=0)
+    rating_count = db.Column(db.Integer, nullable=False, default=0)
+    dwell_sum = db.Column(db.Float, nullable=False, default=0.0)
+    dwell_count = db.Column(db.Integer, nullable=False, default=0)
+
+class ExhibitDwellStat(db.Model):
+    """展品停留时间统计表 - 由反馈增量更新的在线均值/方差（Welford），按受众（年龄组）分行，all为全部受众"""
+    __tablename__ = 'exhibit_dwell_stats'
+    
+    exhibit_id = db.Column(db.String(50), primary_key=True)
+    audience = db.Column(db.String(20), primary_key=True)  # child, youth, adult, senior 或 all
+    count = db.Column(db.Integer, nullable=False, default=0)  # 观测次数
+    mean = db.Column(db.Float, nullable=False, default=0.0)  # 平均停留分钟数
+    m2 = db.Column(db.Float, nullable=False, default=0.0)  # 与均值之差的平方和（方差 = m2 / (count - 1)）
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -18,6 +18,53 @@ from .route_planning_core import (
     create_sample_route
 )
 
+from .route_planning_arrays import ExhibitTable
+
+from .route_planning_graph import (
+    WalkwayGraph,
+    WalkwayDistanceMatrix,
+    OnDemandDistanceMatrix,
+    get_distance_matrix
+)
+
+from .route_planning_tour import TourOrderingEngine, ORDERING_ENGINES
+
+from .route_planning_selection import OrienteeringSelector
+
+from .route_planning_catalog import CatalogSnapshot, catalog_store
+
+from .route_planning_cache import CoalescingLRUCache, route_cache
+from .route_planning_service import (
+    plan_route,
+    generate_route_cached,
+    generate_route_admitted,
+    generate_route_with_guides,
+    template_route,
+    replan_visitor_route
+)
+
+from .route_planning_llm import LLMEnrichmentClient, EnrichmentCache, llm_client
+from .route_planning_stream import stream_route_events
+
+from .route_planning_batch import generate_routes_batch
+
+from .route_planning_synthetic import SyntheticVenueGenerator
+
+from .route_planning_metrics import metrics_registry, stage_timer, render_metrics
+
+from .route_planning_history import RouteHistoryWriter, route_history_writer
+from .route_planning_blobs import RouteBlobStore, route_blob_store, route_content_hash
+from .route_planning_sqlite import setup_database, read_session
+from .route_planning_popularity import top_exhibit_counters
+from .route_planning_dwell import DwellModel, dwell_model
+from .route_planning_import import import_catalog, import_catalog_file
+from .route_planning_responses import catalog_json_response, catalog_response_cache
+from .route_planning_bundle import VenueBundleStore, venue_bundle_store
+from .route_planning_warmup import start_warmup, warmup_state
+from .route_planning_server import PreforkServer
+from .route_planning_admission import (
+    AdmissionController, RateLimitStore, MemoryRateLimitStore, Overloaded, RateLimited, admission_controller
+)
 from .route_planning_database import RoutePlanningDatabase
 from .route_planning_utils import RoutePlanningUtils
 from .route_planning_routes import register_route_planning_routes
@@ -30,8 +77,88 @@ __all__ = [
     'RoutePlannerUserProfile',
     'create_sample_route',
     
+    # 数组化展品表
+    'ExhibitTable',
+    
+    # 通道网络
+    'WalkwayGraph',
+    'WalkwayDistanceMatrix',
+    'OnDemandDistanceMatrix',
+    'get_distance_matrix',
+    
+    # 访问顺序引擎
+    'TourOrderingEngine',
+    'ORDERING_ENGINES',
+    
+    # 展品选择
+    'OrienteeringSelector',
+    
+    # 展品目录快照
+    'CatalogSnapshot',
+    'catalog_store',
+    
+    # 路线缓存与生成服务
+    'CoalescingLRUCache',
+    'route_cache',
+    'plan_route',
+    'generate_route_cached',
+    'generate_route_admitted',
+    'generate_route_with_guides',
+    'template_route',
+    'replan_visitor_route',
+    'generate_routes_batch',
+    
+    # 大模型讲解词
+    'LLMEnrichmentClient',
+    'EnrichmentCache',
+    'llm_client',
+    
+    # 流式路线响应
+    'stream_route_events',
+    
+    # 合成场馆
+    'SyntheticVenueGenerator',
+    
+    # 目录类接口预序列化响应
+    'catalog_json_response',
+    'catalog_response_cache',
+    'VenueBundleStore',
+    'venue_bundle_store',
+    
+    # 启动预热
+    'start_warmup',
+    'warmup_state',
+    
+    # 多进程服务
+    'PreforkServer',
+    
+    # 生成接口准入控制
+    'AdmissionController',
+    'RateLimitStore',
+    'MemoryRateLimitStore',
+    'Overloaded',
+    'RateLimited',
+    'admission_controller',
+    
+    # 运行指标
+    'metrics_registry',
+    'stage_timer',
+    'render_metrics',
+    
     # 数据库操作
     'RoutePlanningDatabase',
+    'RouteHistoryWriter',
+    'route_history_writer',
+    'RouteBlobStore',
+    'route_blob_store',
+    'route_content_hash',
+    'setup_database',
+    'read_session',
+    'top_exhibit_counters',
+    'DwellModel',
+    'dwell_model',
+    'import_catalog',
+    'import_catalog_file',
     
     # 工具函数
     'RoutePlanningUtils',
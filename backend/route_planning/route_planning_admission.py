@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+"""
+路线生成的准入控制
+Admission Control for Route Generation
+高峰时大量生成请求同时进入CPU密集的优化器，所有请求的延迟一起变长。本模块在优化器前：
+- 限制同时进行的优化数（每个进程），超出的请求进入有界的等待队列，按到达顺序获得名额
+- 等待超过截止时间或队列已满时立即拒绝（由调用方返回503 + Retry-After，或降级为模板路线）
+- 按客户端（登录用户或IP）的令牌桶限流，超出时返回429 + Retry-After；令牌桶存储可替换
+只有路线缓存未命中、需要实际计算的请求占用优化名额，缓存命中和合并等待的请求不受并发限制；
+请求的最长耗时约为 队列等待上限 + 单次优化时间（可用 ROUTE_DEADLINE_DEFAULT_MS 约束）
+"""
+
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from flask import request, session
+
+from .route_planning_metrics import Counter, Gauge, Histogram, LATENCY_BUCKETS, metrics_registry
+
+# 过载时的处理方式：拒绝（503）或降级为模板路线
+OVERLOAD_REJECT = 'reject'
+OVERLOAD_DEGRADE = 'degrade'
+OVERLOAD_ACTIONS = (OVERLOAD_REJECT, OVERLOAD_DEGRADE)
+
+# 每个进程同时进行的优化数（优化器受GIL限制，多进程部署时每个工作进程保持较小的值）
+DEFAULT_MAX_CONCURRENT = 2
+
+# 等待队列长度
+DEFAULT_QUEUE_SIZE = 8
+
+# 在队列中等待的最长时间（毫秒）
+DEFAULT_QUEUE_TIMEOUT_MS = 500
+
+# 过载拒绝时建议客户端重试的间隔（秒）
+DEFAULT_RETRY_AFTER = 1
+
+# 每个客户端的令牌桶：每秒补充的令牌数（None表示不限流）和桶容量
+DEFAULT_RATE = None
+DEFAULT_BURST = 10
+
+# 内存令牌桶最多保留的客户端数（超出时淘汰最久未访问的）
+DEFAULT_RATE_LIMIT_MAX_CLIENTS = 10000
+
+ADMISSION_RESULTS = metrics_registry.register(Counter(
+    'route_admission_total', '生成请求的准入结果', ('result',)
+))
+ADMISSION_WAIT_SECONDS = metrics_registry.register(Histogram(
+    'route_admission_wait_seconds', '在准入队列中等待的时间（秒）', LATENCY_BUCKETS, ('result',)
+))
+
+
+class Overloaded(Exception):
+    """优化名额已满且无法在截止时间内排上"""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__('当前生成路线的请求较多，请稍后重试')
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class RateLimited(Exception):
+    """客户端超过了限流速率"""
+
+    def __init__(self, retry_after: float):
+        super().__init__('请求过于频繁，请稍后重试')
+        self.retry_after = retry_after
+
+
+def retry_after_header(seconds: float) -> Dict[str, str]:
+    """Retry-After 响应头（整秒，至少1秒）"""
+    return {'Retry-After': str(max(1, math.ceil(seconds)))}
+
+
+class RateLimitStore(ABC):
+    """令牌桶存储接口：多进程部署时可替换为共享存储（如Redis）的实现，缺少方法的实现无法实例化"""
+
+    @abstractmethod
+    def consume(self, key: str, rate: float, burst: float) -> float:
+        """从 key 的令牌桶中取一个令牌，成功返回0，否则返回需要等待的秒数"""
+
+    @abstractmethod
+    def reset(self) -> None:
+        """清空全部令牌桶"""
+
+
+class MemoryRateLimitStore(RateLimitStore):
+    """进程内令牌桶（每个工作进程各自限流，按最久未访问淘汰）"""
+
+    def __init__(self, max_clients: int = DEFAULT_RATE_LIMIT_MAX_CLIENTS):
+        self.max_clients = max_clients
+        self._buckets: 'OrderedDict[str, Tuple[float, float]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key: str, rate: float, burst: float) -> float:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+            else:
+                wait = (1 - tokens) / rate
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def reset(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+    def __len__(self) -> int:
+        """当前跟踪的客户端令牌桶数"""
+        return len(self._buckets)
+
+
+class AdmissionController:
+    """优化名额 + 有界等待队列 + 按客户端限流"""
+
+    def __init__(self, max_concurrent: int = DEFAULT_MAX_CONCURRENT, queue_size: int = DEFAULT_QUEUE_SIZE,
+                 queue_timeout_ms: float = DEFAULT_QUEUE_TIMEOUT_MS, overload_action: str = OVERLOAD_DEGRADE,
+                 retry_after: float = DEFAULT_RETRY_AFTER, rate: Optional[float] = DEFAULT_RATE,
+                 burst: float = DEFAULT_BURST, store: RateLimitStore = None):
+        self.max_concurrent = max_concurrent
+        self.queue_size = queue_size
+        self.queue_timeout_ms = queue_timeout_ms
+        self.overload_action = overload_action
+        self.retry_after = retry_after
+        self.rate = rate
+        self.burst = burst
+        self.store = store or MemoryRateLimitStore()
+        self._active = 0
+        # 排队中的请求（按到达顺序），释放名额时直接交给队首
+        self._waiters: 'deque[threading.Event]' = deque()
+        self._lock = threading.Lock()
+
+    def configure(self, max_concurrent: int = None, queue_size: int = None, queue_timeout_ms: float = None,
+                  overload_action: str = None, retry_after: float = None, rate: float = None,
+                  burst: float = None, store: RateLimitStore = None) -> None:
+        """按部署配置调整；rate 为0时不限流"""
+        if overload_action is not None and overload_action not in OVERLOAD_ACTIONS:
+            raise ValueError(f"ADMISSION_OVERLOAD必须是{', '.join(OVERLOAD_ACTIONS)}之一")
+        if max_concurrent is not None:
+            if max_concurrent < 1:
+                raise ValueError('ADMISSION_MAX_CONCURRENT必须至少为1')
+            self.max_concurrent = max_concurrent
+        if queue_size is not None:
+            self.queue_size = queue_size
+        if queue_timeout_ms is not None:
+            self.queue_timeout_ms = queue_timeout_ms
+        if overload_action is not None:
+            self.overload_action = overload_action
+        if retry_after is not None:
+            self.retry_after = retry_after
+        if rate is not None:
+            self.rate = rate or None
+        if burst is not None:
+            self.burst = burst
+        if store is not None:
+            self.store = store
+
+    @property
+    def degrade(self) -> bool:
+        """过载时是否降级为模板路线"""
+        return self.overload_action == OVERLOAD_DEGRADE
+
+    # ==================== 限流 ====================
+
+    def check_rate(self, client: str) -> None:
+        """按客户端令牌桶限流，超出时抛出RateLimited"""
+        if not self.rate:
+            return
+        wait = self.store.consume(client, self.rate, max(1.0, self.burst))
+        if wait > 0:
+            ADMISSION_RESULTS.inc(1, 'rate_limited')
+            raise RateLimited(wait)
+
+    # ==================== 并发名额 ====================
+
+    def acquire(self) -> None:
+        """取得一个优化名额：有空闲名额时立即返回，否则排队等待，队列已满或等待超时时抛出Overloaded"""
+        with self._lock:
+            if self._active < self.max_concurrent and not self._waiters:
+                self._active += 1
+                ADMISSION_RESULTS.inc(1, 'admitted')
+                return
+            if len(self._waiters) >= self.queue_size:
+                ADMISSION_RESULTS.inc(1, 'queue_full')
+                raise Overloaded('queue_full', self.retry_after)
+            waiter = threading.Event()
+            self._waiters.append(waiter)
+
+        started = time.perf_counter()
+        admitted = waiter.wait(self.queue_timeout_ms / 1000.0)
+        if not admitted:
+            with self._lock:
+                # 超时与释放名额同时发生时，名额已交给本请求
+                admitted = waiter.is_set()
+                if not admitted:
+                    self._waiters.remove(waiter)
+        result = 'queued' if admitted else 'queue_timeout'
+        ADMISSION_WAIT_SECONDS.observe(time.perf_counter() - started, result)
+        ADMISSION_RESULTS.inc(1, result)
+        if not admitted:
+            raise Overloaded('queue_timeout', self.retry_after)
+
+    def release(self) -> None:
+        """归还名额：有排队的请求时直接交给队首"""
+        with self._lock:
+            if self._waiters:
+                self._waiters.popleft().set()
+            else:
+                self._active -= 1
+
+    def solve(self, compute: Callable[[], Any]) -> Any:
+        """取得名额后执行 compute（路线优化）"""
+        self.acquire()
+        try:
+            return compute()
+        finally:
+            self.release()
+
+    def stats(self) -> Dict[str, Any]:
+        """当前占用的名额和排队数"""
+        return {
+            'active': self._active,
+            'waiting': len(self._waiters),
+            'max_concurrent': self.max_concurrent,
+            'queue_size': self.queue_size,
+            'queue_timeout_ms': self.queue_timeout_ms,
+            'overload_action': self.overload_action,
+            'rate': self.rate,
+            'burst': self.burst
+        }
+
+
+def client_key() -> str:
+    """限流使用的客户端标识：登录用户按用户ID，否则按IP（反向代理后需配置 ProxyFix）"""
+    user_id = session.get('user_id')
+    if user_id:
+        return f'user:{user_id}'
+    return f'ip:{request.remote_addr}'
+
+
+# 进程级准入控制
+admission_controller = AdmissionController()
+
+metrics_registry.register(Gauge(
+    'route_admission_active', '正在进行的路线优化数', lambda: admission_controller.stats()['active']
+))
+metrics_registry.register(Gauge(
+    'route_admission_waiting', '在准入队列中等待的请求数', lambda: admission_controller.stats()['waiting']
+))
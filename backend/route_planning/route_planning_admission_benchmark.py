@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+准入控制过载基准测试
+Admission Control Overload Benchmark
+以远超优化能力的并发请求 /api/route-planning/generate（关闭路线缓存），比较：
+- unlimited：不限制并发优化数（所有请求同时进入优化器，按GIL轮流执行）
+- reject：限制并发优化数和等待队列，过载时返回503 + Retry-After
+- degrade：同样的限制，过载时返回模板路线
+服务端线程数不少于客户端数，请求不会在socket队列中排队，排队只发生在准入控制中；
+记录完整路线的吞吐、503和降级的数量，以及全部响应和完整路线的延迟分位数
+
+用法：
+    python -m backend.route_planning.route_planning_admission_benchmark --clients 32 --duration 10
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Dict, Any, List
+
+from .route_planning_admission import OVERLOAD_DEGRADE, OVERLOAD_REJECT
+from .route_planning_server_benchmark import WARMUP_SECONDS, _request, build_payloads, running_server
+from .route_planning_startup_benchmark import DEFAULT_EXHIBITS, DEFAULT_SEED, prepare_database
+
+# 并发客户端数（远超优化名额）
+DEFAULT_CLIENTS = 32
+
+# 压测时长（秒）
+DEFAULT_DURATION = 10.0
+
+# 受控场景的准入配置
+ADMISSION_CONFIG = {
+    'ADMISSION_MAX_CONCURRENT': 2,
+    'ADMISSION_QUEUE_SIZE': 4,
+    'ADMISSION_QUEUE_TIMEOUT_MS': 200
+}
+
+# 各场景的准入配置
+ADMISSION_SCENARIOS = {
+    'unlimited': {'ADMISSION_MAX_CONCURRENT': 1000000},
+    'reject': dict(ADMISSION_CONFIG, ADMISSION_OVERLOAD=OVERLOAD_REJECT),
+    'degrade': dict(ADMISSION_CONFIG, ADMISSION_OVERLOAD=OVERLOAD_DEGRADE)
+}
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    values = sorted(values)
+
+    def percentile(fraction: float) -> float:
+        return round(values[min(len(values) - 1, int(len(values) * fraction))], 2) if values else 0.0
+
+    return {'p50_ms': percentile(0.50), 'p95_ms': percentile(0.95), 'p99_ms': percentile(0.99),
+            'max_ms': round(values[-1], 2) if values else 0.0}
+
+
+def run_overload(port: int, clients: int, duration: float, payloads: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """clients 个线程持续发送生成请求，按结果（完整路线 / 降级 / 503 / 其他）分别统计"""
+    samples: List[tuple] = []
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def client(index: int) -> None:
+        own = []
+        position = index
+        while time.monotonic() < deadline:
+            payload = payloads[position % len(payloads)]
+            position += clients
+            started = time.perf_counter()
+            try:
+                status, body = _request(port, 'POST', '/api/route-planning/generate', payload)
+            except OSError:
+                status, body = None, b''
+            elapsed = (time.perf_counter() - started) * 1000
+            if status == 200:
+                outcome = 'degraded' if 'degraded' in json.loads(body)['data'] else 'full'
+            elif status == 503:
+                outcome = 'rejected'
+            else:
+                outcome = 'error'
+            own.append((outcome, elapsed))
+        with lock:
+            samples.extend(own)
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=client, args=(index,)) for index in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    counts = {outcome: sum(1 for sample in samples if sample[0] == outcome)
+              for outcome in ('full', 'degraded', 'rejected', 'error')}
+    return {
+        'counts': counts,
+        'full_throughput': round(counts['full'] / elapsed, 2),
+        'responses_per_second': round(len(samples) / elapsed, 2),
+        'all': _percentiles([latency for _, latency in samples]),
+        'full': _percentiles([latency for outcome, latency in samples if outcome == 'full'])
+    }
+
+
+def run_benchmark(clients: int = DEFAULT_CLIENTS, duration: float = DEFAULT_DURATION,
+                  exhibits: int = DEFAULT_EXHIBITS, seed: int = DEFAULT_SEED) -> Dict[str, Any]:
+    """单个工作进程、线程数等于客户端数，依次测量各准入配置"""
+    results = {'clients': clients, 'duration': duration, 'exhibits': exhibits, 'scenarios': {}}
+    payloads = build_payloads(seed)
+    with tempfile.TemporaryDirectory() as directory:
+        uri = f"sqlite:///{os.path.join(directory, 'admission.db')}"
+        prepare_database(uri, exhibits, seed)
+        for name, config in ADMISSION_SCENARIOS.items():
+            with running_server(uri, 1, clients, config) as port:
+                run_overload(port, clients, WARMUP_SECONDS, payloads)
+                results['scenarios'][name] = run_overload(port, clients, duration, payloads)
+    return results
+
+
+def main(argv=None) -> None:
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description='准入控制过载基准测试')
+    parser.add_argument('--clients', type=int, default=DEFAULT_CLIENTS)
+    parser.add_argument('--duration', type=float, default=DEFAULT_DURATION)
+    parser.add_argument('--exhibits', type=int, default=DEFAULT_EXHIBITS, help='数据库中的合成展品数')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--output', help='结果JSON文件路径')
+    args = parser.parse_args(argv)
+
+    results = run_benchmark(args.clients, args.duration, args.exhibits, args.seed)
+    print(f"{args.clients} 个并发客户端，{args.exhibits} 个展品")
+    for name, summary in results['scenarios'].items():
+        counts = summary['counts']
+        print(f"{name:>10}: 完整路线 {summary['full_throughput']:>7}/秒  降级 {counts['degraded']:>5}  "
+              f"503 {counts['rejected']:>5}  全部响应 p50 {summary['all']['p50_ms']:>8}ms "
+              f"p99 {summary['all']['p99_ms']:>8}ms  完整路线 p99 {summary['full']['p99_ms']:>8}ms")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
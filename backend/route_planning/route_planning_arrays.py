@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+路线规划数组化展品表
+Array-backed Exhibit Table for Route Planning
+把展品的坐标、重要程度、参观时间、类别编码存为NumPy列，
+兴趣匹配、距离计算、路线汇总都以批量向量运算完成
+"""
+
+from typing import List, Dict, Sequence
+
+import numpy as np
+
+# 每个展品表缓存的兴趣标签匹配结果上限
+INTEREST_CACHE_SIZE = 256
+
+
+class ExhibitTable:
+    """列式展品表 - 行号与传入展品列表的顺序一致"""
+
+    def __init__(self, exhibits: Sequence):
+        self.exhibits = list(exhibits)
+        self.ids = [exhibit.id for exhibit in self.exhibits]
+        self.row = {exhibit_id: i for i, exhibit_id in enumerate(self.ids)}
+
+        size = len(self.exhibits)
+        self.xy = np.array([exhibit.location for exhibit in self.exhibits],
+                           dtype=np.float64).reshape(size, 2)
+        self.importance = np.array([exhibit.importance for exhibit in self.exhibits], dtype=np.int64)
+        self.duration = np.array([exhibit.visit_duration for exhibit in self.exhibits], dtype=np.float64)
+
+        # 类别编码：categories[category_codes[i]] 为第i个展品的类别
+        self.categories = sorted({exhibit.category for exhibit in self.exhibits})
+        category_index = {category: code for code, category in enumerate(self.categories)}
+        self.category_codes = np.array(
+            [category_index[exhibit.category] for exhibit in self.exhibits], dtype=np.int32
+        )
+
+        # 兴趣匹配在小写的"类别 + 描述"文本上进行
+        self._search_text = np.array(
+            [f"{exhibit.category.lower()}\n{exhibit.description.lower()}" for exhibit in self.exhibits],
+            dtype=np.str_
+        )
+        self._interest_cache: Dict[str, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        """展品数"""
+        return len(self.exhibits)
+
+    def interest_mask(self, interest: str) -> np.ndarray:
+        """单个兴趣标签命中的展品布尔列（按标签缓存）"""
+        mask = self._interest_cache.get(interest)
+        if mask is None:
+            if len(self._interest_cache) >= INTEREST_CACHE_SIZE:
+                self._interest_cache.pop(next(iter(self._interest_cache)))
+            mask = np.char.find(self._search_text, interest) >= 0 if len(self) else np.zeros(0, bool)
+            self._interest_cache[interest] = mask
+        return mask
+
+    def interest_scores(self, interests: List[str]) -> np.ndarray:
+        """每个展品命中的兴趣标签数"""
+        scores = np.zeros(len(self), dtype=np.int64)
+        for interest in interests:
+            scores += self.interest_mask(interest)
+        return scores
+
+    def pairwise_distances(self, rows: np.ndarray = None) -> np.ndarray:
+        """指定行（默认全部）之间的直线距离矩阵"""
+        xy = self.xy if rows is None else self.xy[rows]
+        return euclidean_matrix(xy, xy)
+
+
+def euclidean_matrix(points_a: np.ndarray, points_b: np.ndarray) -> np.ndarray:
+    """两组点之间的欧几里得距离矩阵"""
+    diff = points_a[:, None, :] - points_b[None, :, :]
+    return np.sqrt(np.einsum('ijk,ijk->ij', diff, diff))
+
+
+def manhattan_matrix(points_a: np.ndarray, points_b: np.ndarray) -> np.ndarray:
+    """两组点之间的曼哈顿距离矩阵"""
+    return np.abs(points_a[:, None, :] - points_b[None, :, :]).sum(axis=2)
+
+
+def path_length(matrix: np.ndarray, nodes: Sequence[int]) -> float:
+    """按节点顺序累加距离矩阵中的相邻边长"""
+    nodes = np.asarray(nodes, dtype=np.intp)
+    if len(nodes) < 2:
+        return 0.0
+    return float(matrix[nodes[:-1], nodes[1:]].sum())
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""
+路线规划批量生成模块
+Batch Route Generation for Route Planning
+为旅行团、自助终端一次生成多份画像的路线：
+- 标准化后相同的画像只计算一次
+- 已缓存的画像直接复用
+- 其余画像分发到共享同一目录快照（含距离矩阵）的进程池并行计算，或在当前线程中逐个计算；
+  两种方式都经过准入控制，过载时抛出Overloaded（已算出的画像仍写入缓存）
+- 缓存键（含截止时间档位）、路线副本和讲解词与单条生成相同，结果按输入顺序返回
+"""
+
+import atexit
+import os
+import threading
+import time
+from typing import List, Dict, Any, Optional, Tuple, TYPE_CHECKING
+
+from .route_planning_admission import admission_controller
+from .route_planning_catalog import CatalogSnapshot, catalog_store
+from .route_planning_cache import route_cache
+from .route_planning_service import fresh_route, plan_route, route_request, with_guides
+from .route_planning_dwell import DwellEstimates, dwell_model
+
+if TYPE_CHECKING:
+    # 进程池只在批量计算首次分发时导入，启动时不加载 multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+# 单次批量请求允许的最大画像数
+DEFAULT_BATCH_MAX_SIZE = 100
+
+# 需要计算的画像少于该数量时直接在当前线程计算，避免进程间通信开销
+DEFAULT_POOL_THRESHOLD = 4
+
+
+# ==================== 工作进程 ====================
+
+_worker_snapshot: Optional[CatalogSnapshot] = None
+_worker_dwell: Optional[DwellEstimates] = None
+
+
+def _init_worker(snapshot: CatalogSnapshot, dwell: DwellEstimates) -> None:
+    """工作进程初始化：每个进程只接收一次目录快照、距离矩阵和停留时间估计"""
+    global _worker_snapshot, _worker_dwell
+    _worker_snapshot = snapshot
+    _worker_dwell = dwell
+
+
+def _plan_in_worker(preferences: Dict[str, Any], ordering_engine: str,
+                    ordering_budget_ms: Optional[float], deadline_ms: Optional[float]) -> Dict[str, Any]:
+    """在工作进程中生成单条路线"""
+    return plan_route(_worker_snapshot, preferences, ordering_engine, ordering_budget_ms,
+                      deadline_ms=deadline_ms, dwell=_worker_dwell)
+
+
+# ==================== 进程池管理 ====================
+
+class BatchPlannerPool:
+    """与目录版本和停留时间估计版本绑定的进程池，任一变化后在下次使用时重建"""
+
+    def __init__(self):
+        self._executor: Optional['ProcessPoolExecutor'] = None
+        self._version = None
+        self._lock = threading.Lock()
+        # 每个进程的计算进程数上限（多进程服务的工作进程中设置，None表示不限制）
+        self.max_workers: Optional[int] = None
+
+    def limit_workers(self, max_workers: Optional[int]) -> None:
+        """限制本进程的计算进程数（多个工作进程各自建池时避免超出CPU核数）"""
+        self.max_workers = max_workers
+
+    def executor(self, snapshot: CatalogSnapshot, dwell: DwellEstimates, workers: int) -> 'ProcessPoolExecutor':
+        """获取加载了指定快照和估计的进程池"""
+        from concurrent.futures import ProcessPoolExecutor
+        version = (snapshot.version, dwell.version)
+        with self._lock:
+            if self._executor is None or self._version != version:
+                if self._executor is not None:
+                    # 不取消已提交的任务：并发中的批量请求仍在等待旧进程池的结果，旧池在任务完成后自行退出
+                    self._executor.shutdown(wait=False)
+                self._executor = ProcessPoolExecutor(
+                    max_workers=workers, initializer=_init_worker, initargs=(snapshot, dwell)
+                )
+                self._version = version
+            return self._executor
+
+    def shutdown(self) -> None:
+        """关闭进程池"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+                self._version = None
+
+
+batch_pool = BatchPlannerPool()
+atexit.register(batch_pool.shutdown)
+
+
+# ==================== 批量生成 ====================
+
+def generate_routes_batch(profiles: List[Dict[str, Any]], config: Dict[str, Any]) -> Dict[str, Any]:
+    """批量生成路线，返回与输入顺序一致的路线列表和统计信息"""
+    started = time.perf_counter()
+    snapshot = catalog_store.get()
+    dwell = dwell_model.get(snapshot)
+    ordering_engine = config.get('ROUTE_ORDERING_ENGINE', 'auto')
+    ordering_budget_ms = config.get('ROUTE_ORDERING_BUDGET_MS')
+
+    # 1. 标准化并去重（缓存键与单条生成相同，含截止时间档位）
+    keys = []
+    unique: Dict[str, Tuple[Dict[str, Any], Optional[float]]] = {}
+    for index, profile in enumerate(profiles):
+        if profile is not None and not isinstance(profile, dict):
+            raise ValueError(f'profiles[{index}]必须是对象')
+        preferences, deadline_ms, key = route_request(profile or {}, config, snapshot, dwell)
+        keys.append(key)
+        unique.setdefault(key, (preferences, deadline_ms))
+
+    # 2. 复用已缓存的路线
+    results: Dict[str, Dict[str, Any]] = {}
+    pending = []
+    for key in unique:
+        cached = route_cache.get(key)
+        if cached is not None:
+            results[key] = cached
+        else:
+            pending.append(key)
+
+    # 3. 计算剩余画像（数量足够时分发到进程池）
+    workers = config.get('ROUTE_BATCH_WORKERS') or os.cpu_count() or 1
+    if batch_pool.max_workers is not None:
+        workers = min(workers, batch_pool.max_workers)
+    threshold = config.get('ROUTE_BATCH_POOL_THRESHOLD', DEFAULT_POOL_THRESHOLD)
+    used_pool = False
+    try:
+        if len(pending) >= threshold and workers > 1:
+            from concurrent.futures import CancelledError
+            from concurrent.futures.process import BrokenProcessPool
+            # 进程池中的计算不占用本进程的CPU，整批分发只占一个优化名额（限制同时分发的批量请求数）
+            admission_controller.acquire()
+            try:
+                executor = batch_pool.executor(snapshot, dwell, workers)
+                futures = {}
+                for key in pending:
+                    preferences, deadline_ms = unique[key]
+                    futures[key] = executor.submit(_plan_in_worker, preferences, ordering_engine,
+                                                   ordering_budget_ms, deadline_ms)
+                for key, future in futures.items():
+                    results[key] = future.result()
+                used_pool = True
+            except BrokenProcessPool:
+                # 工作进程异常退出时重建进程池，本次退回当前线程计算
+                batch_pool.shutdown()
+            except CancelledError:
+                # 进程池在本次等待期间被关闭（进程退出），未完成的画像退回当前线程计算
+                pass
+            finally:
+                admission_controller.release()
+
+        # 在当前线程计算的画像逐个取得优化名额，过载时抛出Overloaded
+        for key in pending:
+            if key not in results:
+                preferences, deadline_ms = unique[key]
+                results[key] = admission_controller.solve(
+                    lambda: plan_route(snapshot, preferences, ordering_engine, ordering_budget_ms,
+                                       deadline_ms=deadline_ms, dwell=dwell)
+                )
+    finally:
+        # 过载中断时已算出的画像同样写入缓存，客户端重试时直接复用
+        for key in pending:
+            if key in results:
+                route_cache.put(key, results[key])
+
+    # 4. 与单条生成一样复制共享路线、写入生成时间并按各画像的受众和语言附上讲解词
+    return {
+        'routes': [with_guides(fresh_route(results[key]), profile or {}, snapshot)
+                   for key, profile in zip(keys, profiles)],
+        'stats': {
+            'requested': len(profiles),
+            'unique': len(unique),
+            'cached': len(unique) - len(pending),
+            'computed': len(pending),
+            'process_pool': used_pool,
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 2)
+        }
+    }
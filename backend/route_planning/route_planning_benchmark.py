@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+"""
+路线规划性能基准测试
+Optimizer Benchmark Suite for Route Planning
+在不同规模的合成场馆上逐阶段测量路线优化器：
+- 延迟（多次运行取中位数）
+- 峰值内存（tracemalloc 单独运行测量，避免影响计时）
+- 路线质量（总步行距离、收集的重要程度、时间预算利用率）
+结果输出为JSON；给定基线文件时，任一阶段超出容差即以非零状态退出
+
+用法：
+    python -m backend.route_planning.route_planning_benchmark --sizes 100 1000 10000 --output bench.json
+    python -m backend.route_planning.route_planning_benchmark --update-baseline
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from typing import List, Dict, Any, Callable
+
+import numpy as np
+
+from .route_planning_core import RouteOptimizer, UserProfile
+from .route_planning_graph import WalkwayGraph, collect_points
+from .route_planning_synthetic import SyntheticVenueGenerator
+
+# 优化器各阶段（与 RouteOptimizer.optimize_route 的步骤对应）
+BENCHMARK_STAGES = ('compile', 'select', 'order', 'fill', 'details', 'optimize')
+
+# 默认测试规模与随机种子
+DEFAULT_SIZES = (100, 1000)
+DEFAULT_SEED = 20250806
+DEFAULT_REPEATS = 3
+
+# 仓库内保存的基线结果
+DEFAULT_BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'route_planning_benchmark_baseline.json')
+
+# 回归判定容差：延迟和内存允许增长的比例、质量允许下降的比例
+DEFAULT_LATENCY_TOLERANCE = 0.5
+DEFAULT_MEMORY_TOLERANCE = 0.25
+DEFAULT_QUALITY_TOLERANCE = 0.05
+
+# 亚毫秒级阶段的计时抖动较大，延迟比较时额外允许的绝对误差（毫秒）
+LATENCY_SLACK_MS = 1.0
+
+# 基准画像：覆盖短/长时间、有无兴趣、不同体力
+BENCHMARK_PROFILES = (
+    UserProfile('adult', [], 90, 'medium', 'individual', 'leisure'),
+    UserProfile('youth', ['革命', '文物'], 180, 'high', 'group', 'education'),
+    UserProfile('senior', ['历史'], 300, 'low', 'family', 'research'),
+)
+
+
+def _measure(func: Callable[[], Any], repeats: int) -> Dict[str, Any]:
+    """多次计时取中位数，再在tracemalloc下运行一次测量峰值内存"""
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {'latency_ms': round(statistics.median(timings), 3), 'peak_memory_kb': round(peak / 1024, 1)}
+
+
+def _route_quality(optimizer: RouteOptimizer, selector, user: UserProfile, rows: np.ndarray) -> Dict[str, float]:
+    """路线质量：总步行距离、收集的重要程度、时间预算利用率"""
+    nodes = np.concatenate(([optimizer.entrance_node], optimizer.exhibit_nodes[rows], [optimizer.exit_node]))
+    distance = float(optimizer.distance_matrix.matrix[nodes[:-1], nodes[1:]].sum())
+    minutes = distance * selector.minutes_per_meter + float(optimizer.table.duration[rows].sum())
+    return {
+        'total_distance': round(distance, 2),
+        'importance_collected': int(optimizer.table.importance[rows].sum()),
+        'budget_utilisation': round(minutes / user.available_time, 4)
+    }
+
+
+def _mean_quality(qualities: List[Dict[str, float]]) -> Dict[str, float]:
+    """多个画像的质量指标取平均"""
+    return {key: round(statistics.fmean(q[key] for q in qualities), 4) for key in qualities[0]}
+
+
+def benchmark_size(size: int, seed: int = DEFAULT_SEED, repeats: int = DEFAULT_REPEATS) -> Dict[str, Any]:
+    """在单个规模的合成场馆上测量全部阶段"""
+    exhibits, layout = SyntheticVenueGenerator(seed).generate(size)
+    points = collect_points(exhibits, layout)
+
+    def compile_matrix():
+        return WalkwayGraph(layout['walkways'], layout['connectors']).compile(points)
+
+    results: Dict[str, Any] = {'compile': _measure(compile_matrix, 1)}
+    optimizer = RouteOptimizer(exhibits, layout, distance_matrix=compile_matrix())
+
+    # 逐阶段准备各画像的输入，保证每个阶段单独计时
+    stage_inputs: Dict[str, list] = {stage: [] for stage in BENCHMARK_STAGES[1:]}
+    qualities: Dict[str, list] = {'select': [], 'order': [], 'fill': [], 'optimize': []}
+    for user in BENCHMARK_PROFILES:
+        rows = optimizer._selection_rows()
+        selector = optimizer._build_selector(rows, user)
+        selected = optimizer._select_by_time_constraint(rows, selector)
+        ordered = optimizer._optimize_visit_order(selected)
+        filled = optimizer._fill_remaining_time(ordered, rows, selector)
+        optimized = optimizer.optimize_route(user)
+
+        stage_inputs['select'].append(
+            lambda user=user, rows=rows: optimizer._select_by_time_constraint(rows, optimizer._build_selector(rows, user))
+        )
+        stage_inputs['order'].append(lambda selected=selected: optimizer._optimize_visit_order(selected))
+        stage_inputs['fill'].append(
+            lambda ordered=ordered, rows=rows, selector=selector: optimizer._fill_remaining_time(ordered, rows, selector)
+        )
+        stage_inputs['details'].append(lambda filled=filled, user=user: optimizer._generate_route_details(filled, user))
+        stage_inputs['optimize'].append(lambda user=user: optimizer.optimize_route(user))
+
+        qualities['select'].append(_route_quality(optimizer, selector, user, selected))
+        qualities['order'].append(_route_quality(optimizer, selector, user, ordered))
+        qualities['fill'].append(_route_quality(optimizer, selector, user, filled))
+        optimized_rows = np.array([optimizer.table.row[item['id']] for item in optimized['route']], dtype=np.intp)
+        qualities['optimize'].append(_route_quality(optimizer, selector, user, optimized_rows))
+
+    for stage, calls in stage_inputs.items():
+        # 同一阶段在全部画像上各运行一次记为一次测量，结果按画像数平均
+        measured = _measure(lambda calls=calls: [call() for call in calls], repeats)
+        measured['latency_ms'] = round(measured['latency_ms'] / len(calls), 3)
+        if stage in qualities:
+            measured['quality'] = _mean_quality(qualities[stage])
+        results[stage] = measured
+
+    return {
+        'exhibits': len(exhibits),
+        'floors': len(layout['floors']),
+        'walkway_segments': sum(len(walkway) - 1 for walkway in layout['walkways']),
+        'stages': results
+    }
+
+
+def run_benchmark(sizes=DEFAULT_SIZES, seed: int = DEFAULT_SEED, repeats: int = DEFAULT_REPEATS) -> Dict[str, Any]:
+    """运行全部规模的基准测试"""
+    return {
+        'generated_at': datetime.now().isoformat(),
+        'seed': seed,
+        'repeats': repeats,
+        'environment': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'cpu_count': os.cpu_count()
+        },
+        'results': {str(size): benchmark_size(size, seed, repeats) for size in sizes}
+    }
+
+
+def compare_with_baseline(report: Dict[str, Any], baseline: Dict[str, Any],
+                          latency_tolerance: float = DEFAULT_LATENCY_TOLERANCE,
+                          memory_tolerance: float = DEFAULT_MEMORY_TOLERANCE,
+                          quality_tolerance: float = DEFAULT_QUALITY_TOLERANCE) -> List[str]:
+    """与基线逐阶段比较，返回回归描述列表（基线中没有的规模或阶段不比较）"""
+    regressions = []
+    for size, result in report['results'].items():
+        base_stages = baseline.get('results', {}).get(size, {}).get('stages', {})
+        for stage, current in result['stages'].items():
+            base = base_stages.get(stage)
+            if base is None:
+                continue
+
+            limit = base['latency_ms'] * (1 + latency_tolerance) + LATENCY_SLACK_MS
+            if current['latency_ms'] > limit:
+                regressions.append(f"{size}/{stage}: 延迟 {current['latency_ms']}ms 超过基线 {base['latency_ms']}ms")
+
+            limit = base['peak_memory_kb'] * (1 + memory_tolerance)
+            if current['peak_memory_kb'] > limit:
+                regressions.append(f"{size}/{stage}: 峰值内存 {current['peak_memory_kb']}KB 超过基线 {base['peak_memory_kb']}KB")
+
+            if 'quality' in base and 'quality' in current:
+                base_importance = base['quality']['importance_collected']
+                importance = current['quality']['importance_collected']
+                if importance < base_importance * (1 - quality_tolerance):
+                    regressions.append(f"{size}/{stage}: 收集的重要程度 {importance} 低于基线 {base_importance}")
+                base_distance = base['quality']['total_distance']
+                distance = current['quality']['total_distance']
+                if importance <= base_importance and distance > base_distance * (1 + quality_tolerance):
+                    regressions.append(f"{size}/{stage}: 总步行距离 {distance} 高于基线 {base_distance}")
+    return regressions
+
+
+def main(argv: List[str] = None) -> int:
+    """命令行入口：运行基准测试、输出JSON，存在回归时返回1"""
+    parser = argparse.ArgumentParser(description='路线优化器性能基准测试')
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES), help='展品规模')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help='合成场馆随机种子')
+    parser.add_argument('--repeats', type=int, default=DEFAULT_REPEATS, help='每个阶段的计时次数')
+    parser.add_argument('--output', help='结果JSON输出路径（默认输出到标准输出）')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE_PATH, help='基线JSON路径')
+    parser.add_argument('--update-baseline', action='store_true', help='把本次结果写为新的基线')
+    parser.add_argument('--latency-tolerance', type=float, default=DEFAULT_LATENCY_TOLERANCE)
+    parser.add_argument('--memory-tolerance', type=float, default=DEFAULT_MEMORY_TOLERANCE)
+    parser.add_argument('--quality-tolerance', type=float, default=DEFAULT_QUALITY_TOLERANCE)
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args.sizes, args.seed, args.repeats)
+
+    if args.update_baseline:
+        report['regressions'] = []
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('seed') != args.seed:
+            print(f"基线种子 {baseline.get('seed')} 与本次 {args.seed} 不同，跳过回归比较", file=sys.stderr)
+            report['regressions'] = []
+        else:
+            report['regressions'] = compare_with_baseline(
+                report, baseline, args.latency_tolerance, args.memory_tolerance, args.quality_tolerance
+            )
+    else:
+        report['regressions'] = []
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    else:
+        print(output)
+
+    for regression in report['regressions']:
+        print(f"性能回归: {regression}", file=sys.stderr)
+    return 1 if report['regressions'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
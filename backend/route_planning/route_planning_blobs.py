@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+"""
+路线内容寻址存储模块
+Content-Addressed Route Storage for Route Planning
+相同画像的游客得到字节相同的路线，只需存储一次：
+- 路线按规范化JSON（键排序、紧凑分隔符）的 SHA-256 寻址；生成时间、优化耗时、讲解词等
+  每次生成都可能不同的字段不参与哈希也不存储，读取时由调用方补回
+- 较大的路线以 zlib 压缩存储，哈希始终基于未压缩内容
+- 历史记录和分享链接只保存哈希；内容不可变，按哈希读取可放心缓存
+"""
+
+import hashlib
+import json
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+
+from sqlalchemy import insert
+
+from backend.models import db, RouteBlob
+
+# 超过该字节数的路线压缩存储
+DEFAULT_COMPRESS_MIN_BYTES = 512
+
+# 按哈希读取的路线缓存容量
+DEFAULT_BLOB_CACHE_SIZE = 2048
+
+# 已知已存储的哈希集合容量（避免重复写入时反复查询数据库）
+KNOWN_HASHES_SIZE = 65536
+
+# 存储编码
+ENCODING_JSON = 'json'
+ENCODING_ZLIB = 'zlib'
+
+# 不参与哈希的易变字段：路线顶层、optimization 中、每个站点中
+VOLATILE_ROUTE_FIELDS = ('generated_at',)
+VOLATILE_OPTIMIZATION_FIELDS = ('elapsed_ms',)
+VOLATILE_STOP_FIELDS = ('guide_text', 'guide_source')
+
+
+def stable_route(route: Dict[str, Any]) -> Dict[str, Any]:
+    """去掉易变字段后的路线副本（不修改传入的路线）"""
+    stable = {key: value for key, value in route.items() if key not in VOLATILE_ROUTE_FIELDS}
+    if isinstance(stable.get('optimization'), dict):
+        stable['optimization'] = {key: value for key, value in stable['optimization'].items()
+                                  if key not in VOLATILE_OPTIMIZATION_FIELDS}
+    if isinstance(stable.get('route'), list):
+        stable['route'] = [
+            {key: value for key, value in stop.items() if key not in VOLATILE_STOP_FIELDS}
+            if isinstance(stop, dict) else stop
+            for stop in stable['route']
+        ]
+    return stable
+
+
+def canonical_route_json(route: Dict[str, Any]) -> bytes:
+    """规范化JSON：去掉易变字段，键排序、无多余空白、保留中文，相同内容得到相同字节"""
+    return json.dumps(stable_route(route), ensure_ascii=False, sort_keys=True,
+                      separators=(',', ':')).encode('utf-8')
+
+
+def route_content_hash(route: Dict[str, Any]) -> str:
+    """路线内容哈希"""
+    return hashlib.sha256(canonical_route_json(route)).hexdigest()
+
+
+def is_route_hash(value: str) -> bool:
+    """是否为合法的路线哈希（64位小写十六进制）"""
+    return isinstance(value, str) and len(value) == 64 and all(c in '0123456789abcdef' for c in value)
+
+
+class RouteBlobStore:
+    """路线内容存储：写入时去重，读取时走进程内LRU缓存
+
+    缓存中的路线在请求间共享，调用方应视为只读
+    """
+
+    def __init__(self, compress_min_bytes: Optional[int] = DEFAULT_COMPRESS_MIN_BYTES,
+                 cache_size: int = DEFAULT_BLOB_CACHE_SIZE):
+        self.compress_min_bytes = compress_min_bytes
+        self.cache_size = cache_size
+        self._cache: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._known: 'OrderedDict[str, None]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def configure(self, compress: bool = None, compress_min_bytes: int = None, cache_size: int = None) -> None:
+        """按部署配置调整；compress=False 时不压缩"""
+        if compress_min_bytes is not None:
+            self.compress_min_bytes = compress_min_bytes
+        if compress is False:
+            self.compress_min_bytes = None
+        elif compress and self.compress_min_bytes is None:
+            self.compress_min_bytes = DEFAULT_COMPRESS_MIN_BYTES
+        if cache_size is not None:
+            self.cache_size = cache_size
+
+    # ==================== 编码 ====================
+
+    def encode(self, route: Dict[str, Any]) -> Dict[str, Any]:
+        """把路线编码为 route_blobs 表的一行（只保存稳定字段，哈希基于未压缩内容）"""
+        raw = canonical_route_json(route)
+        data, encoding = raw, ENCODING_JSON
+        if self.compress_min_bytes is not None and len(raw) >= self.compress_min_bytes:
+            compressed = zlib.compress(raw, 6)
+            if len(compressed) < len(raw):
+                data, encoding = compressed, ENCODING_ZLIB
+        return {
+            'hash': hashlib.sha256(raw).hexdigest(),
+            'encoding': encoding,
+            'data': data,
+            'size': len(raw)
+        }
+
+    @staticmethod
+    def decode(encoding: str, data: bytes) -> Dict[str, Any]:
+        """解码存储的路线"""
+        if encoding == ENCODING_ZLIB:
+            data = zlib.decompress(data)
+        return json.loads(data.decode('utf-8'))
+
+    # ==================== 写入 ====================
+
+    def _remember(self, hashes) -> None:
+        """记录已存储的哈希"""
+        with self._lock:
+            for content_hash in hashes:
+                self._known[content_hash] = None
+                self._known.move_to_end(content_hash)
+            while len(self._known) > KNOWN_HASHES_SIZE:
+                self._known.popitem(last=False)
+
+    def store_many(self, routes: List[Dict[str, Any]]) -> List[str]:
+        """在当前事务中写入一批路线（已存在的内容跳过），返回与输入对齐的哈希列表
+
+        调用方负责提交事务
+        """
+        encoded = [self.encode(route) for route in routes]
+        hashes = [row['hash'] for row in encoded]
+
+        with self._lock:
+            candidates = {row['hash']: row for row in encoded if row['hash'] not in self._known}
+        if candidates:
+            existing = {
+                content_hash for (content_hash,) in
+                db.session.query(RouteBlob.hash).filter(RouteBlob.hash.in_(list(candidates)))
+            }
+            missing = [row for content_hash, row in candidates.items() if content_hash not in existing]
+            if missing:
+                db.session.execute(self._insert_ignoring_duplicates(), missing)
+        return hashes
+
+    def store(self, route: Dict[str, Any]) -> str:
+        """写入单条路线，返回哈希（调用方负责提交事务）"""
+        return self.store_many([route])[0]
+
+    def committed(self, hashes) -> None:
+        """事务提交后调用，之后相同内容的写入不再查询数据库"""
+        self._remember(hashes)
+
+    @staticmethod
+    def _insert_ignoring_duplicates():
+        """并发写入相同内容时忽略主键冲突（SQLite / PostgreSQL 使用 ON CONFLICT DO NOTHING）"""
+        dialect = db.session.get_bind().dialect.name
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        elif dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            return insert(RouteBlob.__table__)
+        return dialect_insert(RouteBlob.__table__).on_conflict_do_nothing()
+
+    # ==================== 读取 ====================
+
+    def get(self, content_hash: str) -> Optional[Dict[str, Any]]:
+        """按哈希读取路线（缓存命中时不访问数据库），不存在时返回None"""
+        with self._lock:
+            route = self._cache.get(content_hash)
+            if route is not None:
+                self._cache.move_to_end(content_hash)
+                return route
+
+        row: Optional[Tuple[str, bytes]] = db.session.query(RouteBlob.encoding, RouteBlob.data)\
+                                                     .filter_by(hash=content_hash).first()
+        if row is None:
+            return None
+        route = self.decode(*row)
+
+        with self._lock:
+            self._cache[content_hash] = route
+            self._cache.move_to_end(content_hash)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        self._remember([content_hash])
+        return route
+
+    def clear(self) -> None:
+        """清空读取缓存和已知哈希（更换数据库后调用）"""
+        with self._lock:
+            self._cache.clear()
+            self._known.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """缓存状态"""
+        with self._lock:
+            return {'cached_routes': len(self._cache), 'known_hashes': len(self._known)}
+
+
+route_blob_store = RouteBlobStore()
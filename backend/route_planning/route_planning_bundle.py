@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+场馆数据包
+Versioned Venue Bundle for Route Planning
+路线规划页面需要的展品、布局、推荐路线模板和热门展品合并为一个文档，页面加载只需一次请求：
+- 展品按列存储（列名一次、每个展品一行数组），热门展品只引用展品ID，避免重复数据
+- 文档序列化一次并预先gzip压缩，按内容哈希寻址：/bundle/<哈希> 内容不可变，客户端可永久缓存
+- 目录快照替换时重建；热门展品随反馈变化，至多每 refresh_interval 秒重建一次（内容不变时哈希不变）
+- 页面渲染时嵌入当前数据包地址；请求了本进程已不保留的哈希时直接返回当前数据包（需重新验证，
+  Content-Location 为当前哈希地址），不重定向，避免在内容不一致的工作进程之间来回跳转
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+from .route_planning_catalog import CatalogSnapshot, catalog_store
+from .route_planning_database import RoutePlanningDatabase
+from .route_planning_responses import PreparedBody, catalog_response_cache
+
+# 数据包格式版本（字段结构变化时加一）
+BUNDLE_FORMAT = 1
+
+# 展品列（与展品接口的字段一致，不含 is_active：快照中只有启用的展品）
+BUNDLE_EXHIBIT_COLUMNS = ('id', 'name', 'description', 'location', 'importance',
+                          'visit_duration', 'category', 'period')
+
+# 数据包中的热门展品数
+DEFAULT_BUNDLE_POPULAR_LIMIT = 10
+
+# 热门展品部分的最短重建间隔（秒）
+DEFAULT_BUNDLE_REFRESH_INTERVAL = 300.0
+
+# 每个进程按哈希保留的最近数据包个数（页面已嵌入的旧地址在重建后仍可读取）
+BUNDLE_HISTORY_SIZE = 8
+
+# 按哈希寻址的数据包内容不可变
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+def build_bundle_payload(snapshot: CatalogSnapshot, popular_limit: int) -> Dict[str, Any]:
+    """数据包内容（不含进程相关的版本号和时间，各进程对相同数据得到相同哈希）"""
+    popular = RoutePlanningDatabase.get_popular_exhibits(limit=popular_limit) if popular_limit > 0 else []
+    return {
+        'success': True,
+        'data': {
+            'format': BUNDLE_FORMAT,
+            'exhibits': {
+                'columns': list(BUNDLE_EXHIBIT_COLUMNS),
+                'rows': [[exhibit.get(column) for column in BUNDLE_EXHIBIT_COLUMNS]
+                         for exhibit in snapshot.exhibits_data]
+            },
+            'layout': dict(snapshot.layout_data),
+            'recommendations': RoutePlanningDatabase.get_route_recommendations(),
+            'popular': [{'id': exhibit['id'], 'popularity': exhibit['popularity']} for exhibit in popular]
+        }
+    }
+
+
+class VenueBundleStore:
+    """进程级数据包：当前数据包 + 按哈希保留的最近几个数据包"""
+
+    def __init__(self, popular_limit: int = DEFAULT_BUNDLE_POPULAR_LIMIT,
+                 refresh_interval: float = DEFAULT_BUNDLE_REFRESH_INTERVAL):
+        self.popular_limit = popular_limit
+        self.refresh_interval = refresh_interval
+        self._current: Optional[PreparedBody] = None
+        self._built_at = 0.0
+        self._by_digest: 'OrderedDict[str, PreparedBody]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def configure(self, popular_limit: int = None, refresh_interval: float = None) -> None:
+        """按部署配置调整"""
+        if popular_limit is not None:
+            self.popular_limit = popular_limit
+        if refresh_interval is not None:
+            self.refresh_interval = refresh_interval
+        self.invalidate()
+
+    def invalidate(self, snapshot: CatalogSnapshot = None) -> None:
+        """下次读取时重建（作为目录快照替换的回调）"""
+        self._built_at = 0.0
+
+    def _fresh(self, current: Optional[PreparedBody], snapshot: CatalogSnapshot) -> bool:
+        return (current is not None and current.catalog_version == snapshot.version
+                and time.monotonic() - self._built_at < self.refresh_interval)
+
+    def current(self) -> PreparedBody:
+        """当前数据包（需要应用上下文；未过期时只是一次属性读取）"""
+        snapshot = catalog_store.get()
+        current = self._current
+        if self._fresh(current, snapshot):
+            return current
+        with self._lock:
+            current = self._current
+            if self._fresh(current, snapshot):
+                return current
+            prepared = catalog_response_cache.prepare(build_bundle_payload(snapshot, self.popular_limit), snapshot)
+            # 内容未变化时沿用原对象（哈希与ETag不变）
+            if current is not None and current.digest == prepared.digest:
+                current.catalog_version = prepared.catalog_version
+                prepared = current
+            self._current = prepared
+            self._built_at = time.monotonic()
+            self._by_digest[prepared.digest] = prepared
+            self._by_digest.move_to_end(prepared.digest)
+            while len(self._by_digest) > BUNDLE_HISTORY_SIZE:
+                self._by_digest.popitem(last=False)
+            return prepared
+
+    def get(self, digest: str) -> Optional[PreparedBody]:
+        """按哈希读取本进程保留的数据包"""
+        return self._by_digest.get(digest)
+
+
+# 进程级数据包，目录快照替换后重建
+venue_bundle_store = VenueBundleStore()
+catalog_store.subscribe(venue_bundle_store.invalidate)
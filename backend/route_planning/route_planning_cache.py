@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+路线规划结果缓存模块
+Route Result Cache for Route Planning
+按标准化的用户偏好 + 目录版本缓存路线结果：
+- 有界LRU + TTL过期
+- 目录（展品/布局）变化时整体失效
+- 并发的相同请求合并为一次计算
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from .route_planning_catalog import catalog_store
+
+# 默认缓存容量与过期时间（秒）
+DEFAULT_CACHE_SIZE = 1024
+DEFAULT_CACHE_TTL = 600
+
+
+class _InFlight:
+    """正在计算中的缓存项，后到的相同请求在此等待结果"""
+
+    __slots__ = ('event', 'value', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class CoalescingLRUCache:
+    """带TTL和请求合并的有界LRU缓存
+
+    缓存的值在多个请求间共享，调用方应把取到的值视为只读
+    """
+
+    def __init__(self, max_size: int = DEFAULT_CACHE_SIZE, ttl_seconds: float = DEFAULT_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: 'OrderedDict[Hashable, tuple]' = OrderedDict()
+        self._inflight: Dict[Hashable, _InFlight] = {}
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'coalesced': 0, 'evictions': 0, 'expirations': 0}
+
+    def configure(self, max_size: int = None, ttl_seconds: float = None) -> None:
+        """调整容量和过期时间"""
+        with self._lock:
+            if max_size is not None:
+                self.max_size = max_size
+            if ttl_seconds is not None:
+                self.ttl_seconds = ttl_seconds
+            self._evict_overflow()
+
+    def _evict_overflow(self) -> None:
+        """淘汰超出容量的最久未使用项（调用方持有锁）"""
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self._counters['evictions'] += 1
+
+    def _lookup(self, key: Hashable):
+        """查找未过期的缓存项（调用方持有锁），返回 (是否命中, 值)"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self._counters['expirations'] += 1
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def get(self, key: Hashable, default=None):
+        """读取缓存项，不存在或已过期时返回default"""
+        with self._lock:
+            found, value = self._lookup(key)
+            self._counters['hits' if found else 'misses'] += 1
+            return value if found else default
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """写入缓存项"""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            self._evict_overflow()
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """命中则直接返回；未命中时只有第一个请求执行compute，其余相同请求等待其结果"""
+        with self._lock:
+            found, value = self._lookup(key)
+            if found:
+                self._counters['hits'] += 1
+                return value
+            inflight = self._inflight.get(key)
+            if inflight is not None:
+                self._counters['coalesced'] += 1
+                leader = False
+            else:
+                self._counters['misses'] += 1
+                inflight = self._inflight[key] = _InFlight()
+                leader = True
+
+        if not leader:
+            inflight.event.wait()
+            if inflight.error is not None:
+                raise inflight.error
+            return inflight.value
+
+        try:
+            inflight.value = compute()
+            self.put(key, inflight.value)
+            return inflight.value
+        except Exception as e:
+            inflight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            inflight.event.set()
+
+    def clear(self) -> None:
+        """清空全部缓存项（正在计算的请求不受影响）"""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        """缓存中的条目数（含已过期但尚未淘汰的）"""
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """命中/未命中等计数"""
+        with self._lock:
+            stats = dict(self._counters)
+            stats['size'] = len(self._entries)
+            stats['max_size'] = self.max_size
+            lookups = stats['hits'] + stats['misses'] + stats['coalesced']
+            stats['hit_rate'] = round((stats['hits'] + stats['coalesced']) / lookups, 4) if lookups else 0.0
+            return stats
+
+
+def route_cache_key(preferences: Dict[str, Any], catalog_version: int, dwell_version: int = 0,
+                    deadline_ms: Optional[float] = None) -> str:
+    """由标准化的用户偏好、目录版本、停留时间估计版本和截止时间档位生成缓存键"""
+    return json.dumps([catalog_version, dwell_version, deadline_ms, preferences], sort_keys=True, ensure_ascii=False)
+
+
+# 进程级路线结果缓存，展品或布局变化时整体失效
+route_cache = CoalescingLRUCache()
+catalog_store.subscribe(lambda snapshot: route_cache.clear())
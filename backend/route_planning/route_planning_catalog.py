@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""
+路线规划展品目录快照模块
+Catalog Snapshot for Route Planning
+进程内只读的展品目录快照：从 exhibits / memorial_layouts 表加载一次，
+预先构建列式展品表和步行距离矩阵；经 RoutePlanningDatabase 写入时整体替换
+"""
+
+import threading
+from datetime import datetime
+from types import MappingProxyType
+from typing import List, Dict, Any, Tuple, Callable
+
+import numpy as np
+
+from backend.models import Exhibit as ExhibitModel, MemorialLayout
+
+from .route_planning_core import Exhibit, MockDataGenerator, RouteOptimizer
+from .route_planning_arrays import ExhibitTable
+from .route_planning_graph import WalkwayDistanceMatrix, get_walkway_graph, collect_points
+from .route_planning_sqlite import read_session
+
+
+def _freeze(value):
+    """把布局中的列表递归转换为元组，保证快照不可变"""
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+class CatalogSnapshot:
+    """展品目录快照 - 构建后只读，可在请求线程间无锁共享"""
+    
+    __slots__ = ('version', 'source', 'exhibits', 'layout', 'table',
+                 'distance_matrix', 'exhibits_data', 'layout_data', 'loaded_at')
+    
+    def __init__(self, version: int, source: str, exhibits: Tuple[Exhibit, ...],
+                 layout: Dict[str, Any], exhibits_data: List[Dict[str, Any]],
+                 layout_data: Dict[str, Any], distance_matrix: WalkwayDistanceMatrix = None):
+        self.version = version
+        self.source = source  # database / mock
+        self.exhibits = exhibits
+        
+        # 布局带上目录版本，通道网络按版本只编译一次
+        frozen_layout = {key: _freeze(value) for key, value in layout.items()}
+        frozen_layout['version'] = f"catalog:{version}"
+        self.layout = MappingProxyType(frozen_layout)
+        
+        self.table = ExhibitTable(exhibits)
+        self.distance_matrix = distance_matrix or get_walkway_graph(self.layout).compile(
+            collect_points(exhibits, self.layout)
+        )
+        if isinstance(self.distance_matrix.matrix, np.ndarray):
+            self.distance_matrix.matrix.setflags(write=False)
+        
+        # 预先序列化好的API数据
+        self.exhibits_data = tuple(exhibits_data)
+        self.layout_data = MappingProxyType(layout_data)
+        self.loaded_at = datetime.utcnow()
+    
+    def __reduce__(self):
+        """序列化时携带已编译的距离矩阵（传给进程池工作进程时无需重新编译）"""
+        return (_restore_snapshot, (
+            self.version, self.source, self.exhibits, dict(self.layout),
+            list(self.exhibits_data), dict(self.layout_data), self.distance_matrix
+        ))
+    
+    def create_optimizer(self, dwell_estimates=None) -> RouteOptimizer:
+        """基于快照创建路线优化器（复用预编译的展品表和距离矩阵，可附带与之对齐的停留时间估计）"""
+        return RouteOptimizer(list(self.exhibits), self.layout,
+                              distance_matrix=self.distance_matrix,
+                              exhibit_table=self.table,
+                              dwell_estimates=dwell_estimates)
+
+
+def _restore_snapshot(version, source, exhibits, layout, exhibits_data, layout_data,
+                      distance_matrix) -> CatalogSnapshot:
+    """反序列化目录快照"""
+    return CatalogSnapshot(version, source, exhibits, layout, exhibits_data, layout_data,
+                           distance_matrix=distance_matrix)
+
+
+def _mock_exhibit_data(exhibit: Exhibit) -> Dict[str, Any]:
+    """模拟展品的API数据格式"""
+    return {
+        'id': exhibit.id,
+        'name': exhibit.name,
+        'description': exhibit.description,
+        'location': exhibit.location,
+        'importance': exhibit.importance,
+        'visit_duration': exhibit.visit_duration,
+        'category': exhibit.category,
+        'period': exhibit.period
+    }
+
+
+def load_catalog(version: int) -> CatalogSnapshot:
+    """从数据库加载展品和布局构建快照，没有数据时使用模拟数据"""
+    # 只读连接：重建快照不占用写连接，也不受正在进行的写事务阻塞
+    with read_session() as session:
+        rows = session.query(ExhibitModel).filter_by(is_active=True).order_by(ExhibitModel.id).all()
+        layout_row = session.query(MemorialLayout).filter_by(is_active=True).first()
+        exhibits_data = [row.to_dict() for row in rows]
+        layout_data = layout_row.to_dict() if layout_row else None
+    
+    if rows:
+        exhibits = tuple(
+            Exhibit(row.id, row.name, row.description or "", (row.location_x, row.location_y),
+                    row.importance, row.visit_duration, row.category or "", row.period or "")
+            for row in rows
+        )
+        source = 'database'
+    else:
+        exhibits = tuple(MockDataGenerator.generate_exhibits())
+        exhibits_data = [_mock_exhibit_data(exhibit) for exhibit in exhibits]
+        source = 'mock'
+    
+    if layout_data is None:
+        layout_data = MockDataGenerator.generate_layout()
+    
+    return CatalogSnapshot(version, source, exhibits, layout_data, exhibits_data, layout_data)
+
+
+class CatalogStore:
+    """进程级目录快照持有者
+    
+    读取只是一次属性访问，不加锁也不查询数据库；
+    写入方在提交后调用 refresh()，新快照构建完成后整体替换引用
+    """
+    
+    def __init__(self):
+        self._snapshot = None
+        self._version = 0
+        self._refresh_lock = threading.Lock()
+        self._listeners: List[Callable[[CatalogSnapshot], None]] = []
+        self._write_listeners: List[Callable[[CatalogSnapshot], None]] = []
+    
+    def subscribe(self, listener: Callable[['CatalogSnapshot'], None]) -> None:
+        """注册快照替换后的回调（如清空依赖目录版本的缓存）"""
+        self._listeners.append(listener)
+    
+    def subscribe_writes(self, listener: Callable[['CatalogSnapshot'], None]) -> None:
+        """注册写入后刷新的回调（只在显式 refresh() 时调用，首次加载不调用），如通知其他工作进程"""
+        self._write_listeners.append(listener)
+    
+    @property
+    def version(self) -> int:
+        """当前快照版本"""
+        return self._version
+    
+    def get(self) -> CatalogSnapshot:
+        """获取当前快照（首次访问时加载）"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            snapshot = self.refresh(only_if_missing=True)
+        return snapshot
+    
+    def refresh(self, only_if_missing: bool = False) -> CatalogSnapshot:
+        """重新加载目录并原子替换快照，版本号加一"""
+        with self._refresh_lock:
+            if only_if_missing and self._snapshot is not None:
+                return self._snapshot
+            snapshot = load_catalog(self._version + 1)
+            self._version = snapshot.version
+            self._snapshot = snapshot
+        for listener in self._listeners:
+            listener(snapshot)
+        if not only_if_missing:
+            for listener in self._write_listeners:
+                listener(snapshot)
+        return snapshot
+    
+    def clear(self) -> None:
+        """丢弃当前快照（下次访问时重新加载）"""
+        with self._refresh_lock:
+            self._snapshot = None
+
+
+# 进程级目录快照
+catalog_store = CatalogStore()
@@ -12,10 +12,35 @@ from dataclasses import dataclass
 from datetime import datetime, timedelta
 import json
 import random
+import time
 
-@dataclass
+import numpy as np
+
+from .route_planning_arrays import ExhibitTable, path_length
+from .route_planning_graph import WalkwayDistanceMatrix, get_distance_matrix, exhibit_key
+from .route_planning_tour import TourOrderingEngine, IMPROVEMENT_EPSILON
+from .route_planning_selection import OrienteeringSelector, EXACT_MAX_CANDIDATES
+from .route_planning_utils import RoutePlanningUtils, DIFFICULTY_LEVELS
+from .route_planning_metrics import stage_timer
+
+# 时间预算中预留给洗手间、休息等的缓冲比例
+TIME_BUFFER_RATIO = 0.1
+
+# 每命中一个兴趣标签带来的额外收益
+INTEREST_PRIZE_WEIGHT = 2
+
+# 限时优化中连续多少轮没有改进即提前结束
+ANYTIME_MAX_STALL = 30
+
+# 限时优化每轮扰动时移除的最长连续片段占路线长度的比例
+ANYTIME_PERTURB_RATIO = 0.2
+
+# 增量重规划时在原路线之外额外考虑的候选展品数（取离当前位置最近者）
+REPLAN_EXTRA_CANDIDATES = 48
+
+@dataclass(frozen=True, slots=True)
 class Exhibit:
-    """展品数据模型"""
+    """展品数据模型（不可变、可哈希，供只读目录快照共享）"""
     id: str
     name: str
     description: str
@@ -74,106 +99,277 @@ class MockDataGenerator:
 class RouteOptimizer:
     """路线优化算法"""
     
-    def __init__(self, exhibits: List[Exhibit], layout: Dict[str, Any]):
+    def __init__(self, exhibits: List[Exhibit], layout: Dict[str, Any],
+                 distance_matrix: WalkwayDistanceMatrix = None,
+                 exhibit_table: ExhibitTable = None,
+                 dwell_estimates=None):
         self.exhibits = exhibits
         self.layout = layout
+        # 列式展品表，行号与exhibits顺序一致
+        self.table = exhibit_table or ExhibitTable(exhibits)
+        # 通道网络步行距离矩阵（按布局版本缓存，只编译一次）
+        self.distance_matrix = distance_matrix or get_distance_matrix(exhibits, layout)
+        
+        index = self.distance_matrix.index
+        self.entrance_node = index["entrance"]
+        self.exit_node = index["exit"]
+        # 展品行号 -> 距离矩阵下标
+        self.exhibit_nodes = np.array([index[exhibit_key(i)] for i in self.table.ids], dtype=np.intp)
+        # 由反馈学习的停留时间估计（与展品表行号对齐，提供 durations(age_group)），为空时使用建议参观时间
+        self.dwell_estimates = dwell_estimates
+    
+    def visit_durations(self, user: UserProfile) -> np.ndarray:
+        """该用户各展品的预计参观时间（分钟）"""
+        if self.dwell_estimates is None:
+            return self.table.duration
+        return self.dwell_estimates.durations(user.age_group)
     
     def calculate_distance(self, point1: Tuple[float, float], point2: Tuple[float, float]) -> float:
-        """计算两点间距离"""
+        """计算两点间直线距离"""
         return ((point1[0] - point2[0])**2 + (point1[1] - point2[1])**2)**0.5
     
-    def filter_exhibits_by_interests(self, user: UserProfile) -> List[Exhibit]:
-        """根据用户兴趣筛选展品"""
+    def walking_distance(self, key1: str, key2: str) -> float:
+        """查询两个兴趣点之间沿通道的步行距离"""
+        return self.distance_matrix.distance(key1, key2)
+    
+    def _candidate_rows(self, user: UserProfile) -> np.ndarray:
+        """根据用户兴趣筛选候选展品行号（向量化匹配）"""
         if not user.interests:
-            return self.exhibits
+            return np.arange(len(self.table))
         
-        # 兴趣匹配算法（简化版）
-        relevant_exhibits = []
-        for exhibit in self.exhibits:
-            # 根据兴趣标签匹配展品类别
-            if any(interest in exhibit.category.lower() or 
-                   interest in exhibit.description.lower() for interest in user.interests):
-                relevant_exhibits.append(exhibit)
+        # 兴趣匹配算法：兴趣标签出现在展品类别或描述中
+        relevant = self.table.interest_scores(user.interests) > 0
         
         # 如果匹配结果太少，添加高重要度展品
-        if len(relevant_exhibits) < 3:
-            high_importance = [e for e in self.exhibits if e.importance >= 4]
-            relevant_exhibits.extend(high_importance)
+        if np.count_nonzero(relevant) < 3:
+            relevant |= self.table.importance >= 4
+        
+        return np.flatnonzero(relevant)
+    
+    def _selection_rows(self) -> np.ndarray:
+        """参与展品选择的候选行号（全部展品，兴趣只影响收益）"""
+        return np.arange(len(self.table))
+    
+    def filter_exhibits_by_interests(self, user: UserProfile) -> List[Exhibit]:
+        """根据用户兴趣筛选展品"""
+        return [self.exhibits[row] for row in self._candidate_rows(user)]
+    
+    def optimize_route(self, user: UserProfile, ordering_engine: str = 'auto',
+                       ordering_budget_ms: float = None, deadline_ms: float = None) -> Dict[str, Any]:
+        """优化参观路线
+        
+        ordering_engine: 访问顺序引擎 auto / exact / local_search / nearest_neighbor
+        ordering_budget_ms: 访问顺序优化的时间预算（毫秒），None表示不限
+        deadline_ms: 整体优化截止时间（毫秒）。给定时先得到可行路线，
+                     再在截止时间前持续改进并返回找到的最优结果；None表示只做一轮优化
+        """
+        started = time.perf_counter()
+        deadline = started + deadline_ms / 1000.0 if deadline_ms is not None else None
         
-        return list(set(relevant_exhibits))  # 去重
+        # 1. 全部展品都是候选：兴趣匹配通过收益加成优先入选，剩余时间仍可用于其他展品
+        candidate_rows = self._selection_rows()
+        
+        # 2. 在时间预算（含按体力状况估算的步行时间）内选择展品
+        with stage_timer('select'):
+            selector = self._build_selector(candidate_rows, user)
+            route = self._select_by_time_constraint(candidate_rows, selector)
+        
+        # 3. 优化访问顺序（不超过截止时间）
+        if deadline is not None:
+            remaining_ms = max(0.0, (deadline - time.perf_counter()) * 1000)
+            ordering_budget_ms = remaining_ms if ordering_budget_ms is None else min(ordering_budget_ms, remaining_ms)
+        with stage_timer('order'):
+            optimized_route = self._optimize_visit_order(route, ordering_engine, ordering_budget_ms)
+        
+        # 4. 顺序优化节省出的时间再用于插入展品
+        with stage_timer('fill'):
+            optimized_route = self._fill_remaining_time(optimized_route, candidate_rows, selector)
+        
+        # 5. 截止时间前持续改进（扰动 + 局部搜索 + 重新插入）
+        position = {row: i for i, row in enumerate(candidate_rows.tolist())}
+        order = [position[row] for row in optimized_route.tolist()]
+        initial_prize, initial_time = self._route_score(selector, order)
+        iterations, stopped = 0, 'single_pass'
+        if deadline is not None:
+            with stage_timer('improve'):
+                order, iterations, stopped = self._improve_until(selector, order, deadline)
+        final_prize, final_time = self._route_score(selector, order)
+        
+        # 6. 生成详细路线信息
+        with stage_timer('details'):
+            details = self._generate_route_details(candidate_rows[order], user)
+        details["optimization"] = {
+            "deadline_ms": deadline_ms,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+            "iterations": iterations,
+            "stopped": stopped,
+            "initial_score": round(initial_prize, 2),
+            "final_score": round(final_prize, 2),
+            "score_improvement": round(final_prize - initial_prize, 2),
+            "initial_minutes": round(initial_time, 1),
+            "final_minutes": round(final_time, 1)
+        }
+        return details
+    
+    def _route_score(self, selector: OrienteeringSelector, order: List[int]) -> Tuple[float, float]:
+        """路线的总收益和总耗时（分钟）"""
+        return float(selector.prizes[order].sum()), selector.path_time(self.entrance_node, order, self.exit_node)
     
-    def optimize_route(self, user: UserProfile) -> Dict[str, Any]:
-        """优化参观路线"""
-        # 1. 根据兴趣筛选展品
-        candidate_exhibits = self.filter_exhibits_by_interests(user)
+    def _improve_until(self, selector: OrienteeringSelector, order: List[int],
+                       deadline: float) -> Tuple[List[int], int, str]:
+        """迭代局部搜索：随机移除一段展品，重排顺序后再贪心插入，收益更高（或收益相同耗时更短）时接受
         
-        # 2. 根据时间约束筛选
-        selected_exhibits = self._select_by_time_constraint(candidate_exhibits, user.available_time)
+        返回 (最优顺序, 迭代轮数, 结束原因 deadline / converged / exact)
+        """
+        if len(selector.nodes) <= EXACT_MAX_CANDIDATES:
+            # 候选较少时展品选择已精确求解，无需继续改进
+            return order, 0, 'exact'
         
-        # 3. 根据体力状况调整
-        route = self._adjust_for_physical_ability(selected_exhibits, user.physical_ability)
+        rng = random.Random(len(order))
+        best = list(order)
+        best_prize, best_time = self._route_score(selector, best)
+        iterations = stall = 0
         
-        # 4. 优化访问顺序
-        optimized_route = self._optimize_visit_order(route)
+        while time.perf_counter() < deadline and stall < ANYTIME_MAX_STALL:
+            iterations += 1
+            candidate = list(best)
+            if candidate:
+                length = rng.randint(1, max(1, int(len(candidate) * ANYTIME_PERTURB_RATIO)))
+                cut = rng.randrange(len(candidate))
+                del candidate[cut:cut + length]
+            
+            remaining_ms = max(0.0, (deadline - time.perf_counter()) * 1000)
+            ordering = TourOrderingEngine(selector.matrix, engine='local_search', budget_ms=remaining_ms)
+            nodes = selector.nodes[candidate].tolist()
+            position = dict(zip(nodes, candidate))
+            candidate = [position[node] for node in ordering.improve(self.entrance_node, nodes, self.exit_node)]
+            candidate = selector.insert_greedy(self.entrance_node, candidate, self.exit_node)
+            
+            prize, used = self._route_score(selector, candidate)
+            if (prize > best_prize + IMPROVEMENT_EPSILON
+                    or (prize > best_prize - IMPROVEMENT_EPSILON and used < best_time - IMPROVEMENT_EPSILON)):
+                best, best_prize, best_time = candidate, prize, used
+                stall = 0
+            else:
+                stall += 1
         
-        # 5. 生成详细路线信息
-        return self._generate_route_details(optimized_route, user)
+        return best, iterations, 'deadline' if stall < ANYTIME_MAX_STALL else 'converged'
     
-    def _select_by_time_constraint(self, exhibits: List[Exhibit], available_time: int) -> List[Exhibit]:
-        """根据时间约束筛选展品"""
-        # 按重要程度排序
-        sorted_exhibits = sorted(exhibits, key=lambda x: x.importance, reverse=True)
+    def replan_route(self, user: UserProfile, position: Tuple[float, float],
+                     remaining_ids: List[str], visited_ids: List[str] = (),
+                     ordering_engine: str = 'local_search',
+                     ordering_budget_ms: float = None) -> Dict[str, Any]:
+        """游客已在馆内时的增量重规划（以原路线为初始解热启动）
+        
+        position: 游客当前位置坐标
+        remaining_ids: 原路线中的展品（按原顺序，已参观的会被去掉）
+        user.available_time: 剩余可用时间(分钟)
+        只在原路线展品和离当前位置最近的少量候选上求解，避免重新处理整个目录
+        """
+        visited = set(visited_ids)
+        
+        # 1. 原路线去掉已参观展品作为初始解
+        kept = [self.table.row[exhibit_id] for exhibit_id in dict.fromkeys(remaining_ids)
+                if exhibit_id in self.table.row and exhibit_id not in visited]
+        
+        # 2. 额外候选：全部展品中未参观、离当前位置最近的若干展品
+        origin = self.distance_matrix.distances_from(position)
+        excluded = np.zeros(len(self.table), dtype=bool)
+        excluded[kept] = True
+        excluded[[self.table.row[i] for i in visited if i in self.table.row]] = True
+        extra = self._selection_rows()
+        extra = extra[~excluded[extra]]
+        if len(extra) > REPLAN_EXTRA_CANDIDATES:
+            nearest = np.argpartition(origin[self.exhibit_nodes[extra]], REPLAN_EXTRA_CANDIDATES)
+            extra = extra[nearest[:REPLAN_EXTRA_CANDIDATES]]
+        rows = np.concatenate((np.array(kept, dtype=np.intp), extra)).astype(np.intp)
         
-        selected = []
-        total_time = 0
+        # 3. 局部步行距离矩阵：0 为当前位置，1..k 为候选展品，k+1 为出口
+        nodes = np.append(self.exhibit_nodes[rows], self.exit_node)
+        local = np.zeros((len(nodes) + 1, len(nodes) + 1))
+        local[1:, 1:] = self.distance_matrix.matrix[np.ix_(nodes, nodes)]
+        local[0, 1:] = local[1:, 0] = origin[nodes]
+        start, end = 0, len(nodes)
         
-        for exhibit in sorted_exhibits:
-            if total_time + exhibit.visit_duration <= available_time * 0.8:  # 留20%缓冲时间
-                selected.append(exhibit)
-                total_time += exhibit.visit_duration
+        # 4. 热启动改进剩余展品的访问顺序
+        ordering = TourOrderingEngine(local, engine=ordering_engine, budget_ms=ordering_budget_ms)
+        order = [node - 1 for node in ordering.improve(start, list(range(1, len(kept) + 1)), end)]
         
-        return selected
+        # 5. 超出剩余时间则移除性价比最低的展品，仍有富余则贪心插入附近展品
+        selector = self._build_selector(rows, user, matrix=local, nodes=np.arange(1, len(rows) + 1))
+        order = selector.drop_greedy(start, order, end)
+        order = selector.insert_greedy(start, order, end)
+        
+        route_rows = rows[order]
+        total_distance = path_length(local, [start] + [i + 1 for i in order] + [end])
+        details = self._generate_route_details(route_rows, user, total_distance=total_distance)
+        
+        kept_ids = {self.table.ids[row] for row in kept}
+        route_ids = [self.table.ids[row] for row in route_rows]
+        details["replan"] = {
+            "visited": len(visited),
+            "kept": len(kept_ids.intersection(route_ids)),
+            "dropped": sorted(kept_ids.difference(route_ids)),
+            "added": [i for i in route_ids if i not in kept_ids]
+        }
+        return details
     
-    def _adjust_for_physical_ability(self, exhibits: List[Exhibit], ability: str) -> List[Exhibit]:
-        """根据体力状况调整路线"""
-        if ability == "low":
-            # 体力较弱，减少展品数量，优先选择重要展品
-            return sorted(exhibits, key=lambda x: x.importance, reverse=True)[:5]
-        elif ability == "high":
-            # 体力较好，可以参观更多展品
-            return exhibits
-        else:
-            # 中等体力，适中选择
-            return exhibits[:7]
+    def _build_selector(self, rows: np.ndarray, user: UserProfile,
+                        matrix: np.ndarray = None, nodes: np.ndarray = None) -> OrienteeringSelector:
+        """构建展品选择求解器：收益 = 重要程度 + 兴趣匹配加成"""
+        prizes = self.table.importance[rows] + INTEREST_PRIZE_WEIGHT * self.table.interest_scores(user.interests)[rows]
+        
+        return OrienteeringSelector(
+            self.distance_matrix.matrix if matrix is None else matrix,
+            self.exhibit_nodes[rows] if nodes is None else nodes,
+            prizes, self.visit_durations(user)[rows],
+            budget=user.available_time * (1 - TIME_BUFFER_RATIO),
+            walking_speed=RoutePlanningUtils.get_walking_speed(user.physical_ability)
+        )
     
-    def _optimize_visit_order(self, exhibits: List[Exhibit]) -> List[Exhibit]:
-        """优化访问顺序 - 简化版最近邻算法"""
-        if not exhibits:
-            return []
-        
-        # 从入口开始
-        current_pos = self.layout["entrance"]
-        route = []
-        remaining = exhibits.copy()
-        
-        while remaining:
-            # 找到距离当前位置最近的展品
-            nearest = min(remaining, key=lambda e: self.calculate_distance(current_pos, e.location))
-            route.append(nearest)
-            remaining.remove(nearest)
-            current_pos = nearest.location
-        
-        return route
+    def _select_by_time_constraint(self, rows: np.ndarray,
+                                   selector: OrienteeringSelector) -> np.ndarray:
+        """根据时间约束筛选展品（参观时间与步行时间一并计入预算）"""
+        order = selector.select(self.entrance_node, self.exit_node)
+        return rows[order]
+    
+    def _fill_remaining_time(self, route: np.ndarray, rows: np.ndarray,
+                             selector: OrienteeringSelector) -> np.ndarray:
+        """在已优化的顺序上贪心插入仍放得下的展品"""
+        position = {row: i for i, row in enumerate(rows.tolist())}
+        order = selector.insert_greedy(
+            self.entrance_node, [position[row] for row in route.tolist()], self.exit_node
+        )
+        return rows[order]
+    
+    def _optimize_visit_order(self, route: np.ndarray, engine: str = 'auto',
+                              budget_ms: float = None) -> np.ndarray:
+        """优化访问顺序 - 入口到出口的开放路径"""
+        if len(route) == 0:
+            return route
+        
+        nodes = self.exhibit_nodes[route].tolist()
+        row_of = dict(zip(nodes, route.tolist()))
+        
+        ordering = TourOrderingEngine(self.distance_matrix.matrix, engine=engine, budget_ms=budget_ms)
+        order = ordering.order(self.entrance_node, nodes, self.exit_node)
+        
+        return np.array([row_of[node] for node in order], dtype=np.intp)
     
-    def _generate_route_details(self, route: List[Exhibit], user: UserProfile) -> Dict[str, Any]:
-        """生成详细路线信息"""
-        total_time = sum(exhibit.visit_duration for exhibit in route)
-        total_distance = 0
+    def _generate_route_details(self, route_rows: np.ndarray, user: UserProfile,
+                                total_distance: float = None) -> Dict[str, Any]:
+        """生成详细路线信息（total_distance为空时按入口到出口计算）"""
+        route = [self.exhibits[row] for row in route_rows]
+        durations = self.visit_durations(user)
+        visit_time = int(round(durations[route_rows].sum()))
         
-        # 计算总距离
-        positions = [self.layout["entrance"]] + [e.location for e in route] + [self.layout["exit"]]
-        for i in range(len(positions) - 1):
-            total_distance += self.calculate_distance(positions[i], positions[i + 1])
+        # 计算总步行距离
+        if total_distance is None:
+            path = np.concatenate(([self.entrance_node], self.exhibit_nodes[route_rows], [self.exit_node]))
+            total_distance = path_length(self.distance_matrix.matrix, path)
+        walking_time = RoutePlanningUtils.estimate_walking_minutes(
+            total_distance, RoutePlanningUtils.get_walking_speed(user.physical_ability)
+        )
         
         return {
             "route": [
@@ -183,13 +379,16 @@ class RouteOptimizer:
                     "description": exhibit.description,
                     "location": exhibit.location,
                     "visit_duration": exhibit.visit_duration,
+                    "expected_duration": round(float(durations[row]), 1),
                     "importance": exhibit.importance,
                     "category": exhibit.category
-                } for exhibit in route
+                } for exhibit, row in zip(route, route_rows.tolist())
             ],
             "summary": {
                 "total_exhibits": len(route),
-                "estimated_time": total_time,
+                "estimated_time": round(visit_time + walking_time),
+                "visit_time": visit_time,
+                "walking_time": round(walking_time, 1),
                 "total_distance": round(total_distance, 2),
                 "difficulty": self._calculate_difficulty(route, user.physical_ability)
             },
@@ -200,11 +399,11 @@ class RouteOptimizer:
     def _calculate_difficulty(self, route: List[Exhibit], ability: str) -> str:
         """计算路线难度"""
         if len(route) <= 3:
-            return "简单"
+            return DIFFICULTY_LEVELS[0]
         elif len(route) <= 6:
-            return "适中"
+            return DIFFICULTY_LEVELS[1]
         else:
-            return "具有挑战性"
+            return DIFFICULTY_LEVELS[2]
     
     def _generate_recommendations(self, route: List[Exhibit], user: UserProfile) -> List[str]:
         """生成个性化建议"""
@@ -7,18 +7,35 @@ Route Planning Database Operations
 
 from backend.models import (
     db, Exhibit, MemorialLayout, UserProfile, 
-    RouteHistory, User
+    RouteHistory, RouteStop, User, ExhibitPopularity, ExhibitDwellStat
 )
 from datetime import datetime
 import json
 
+from sqlalchemy import func, inspect, text
+
+from .route_planning_catalog import catalog_store
+from .route_planning_llm import attach_guide_texts, audience_for
+from .route_planning_service import guide_language
+from .route_planning_history import route_history_writer, route_stop_ids
+from .route_planning_blobs import route_blob_store
+from .route_planning_popularity import (
+    PopularityDelta, apply_popularity, top_exhibit_counters, rebuild_popularity,
+    stored_route, visit_minutes, WINDOW_ALL, SORT_VISITS
+)
+from .route_planning_dwell import DwellObservations, apply_dwell, dwell_audience, rebuild_dwell_stats, dwell_model
+
 class RoutePlanningDatabase:
     """路线规划数据库操作类"""
     
     @staticmethod
     def create_exhibit(exhibit_id, name, description, location_x, location_y, 
-                      importance=3, visit_duration=10, category="", period=""):
-        """创建展品记录"""
+                      importance=3, visit_duration=10, category="", period="",
+                      refresh_catalog=True):
+        """创建展品记录
+        
+        refresh_catalog: 提交后是否立即重建目录快照（批量写入时可在最后统一刷新）
+        """
         try:
             exhibit = Exhibit(
                 id=exhibit_id,
@@ -33,6 +50,8 @@ class RoutePlanningDatabase:
             )
             db.session.add(exhibit)
             db.session.commit()
+            if refresh_catalog:
+                catalog_store.refresh()
             return {'success': True, 'exhibit_id': exhibit_id}
         except Exception as e:
             db.session.rollback()
@@ -50,7 +69,8 @@ class RoutePlanningDatabase:
     
     @staticmethod
     def create_memorial_layout(name, entrance_x, entrance_y, exit_x, exit_y,
-                              restrooms=None, rest_areas=None, emergency_exits=None, walkways=None):
+                              restrooms=None, rest_areas=None, emergency_exits=None, walkways=None,
+                              refresh_catalog=True):
         """创建纪念馆布局"""
         try:
             layout = MemorialLayout(
@@ -66,6 +86,8 @@ class RoutePlanningDatabase:
             )
             db.session.add(layout)
             db.session.commit()
+            if refresh_catalog:
+                catalog_store.refresh()
             return {'success': True, 'layout_id': layout.id}
         except Exception as e:
             db.session.rollback()
@@ -120,21 +142,56 @@ class RoutePlanningDatabase:
                           estimated_duration, visit_date=None):
         """保存路线历史"""
         try:
+            # 路线内容按哈希去重存储，历史记录只保存哈希
+            route_hash = route_blob_store.store(route_data)
             route_history = RouteHistory(
                 user_id=user_id,
                 route_name=route_name,
-                route_data=json.dumps(route_data),
+                route_hash=route_hash,
                 user_preferences=json.dumps(user_preferences),
                 estimated_duration=estimated_duration,
                 visit_date=visit_date or datetime.utcnow()
             )
             db.session.add(route_history)
+            db.session.flush()
+            stop_ids = route_stop_ids(route_data)
+            db.session.add_all([
+                RouteStop(route_id=route_history.id, seq=seq, exhibit_id=exhibit_id)
+                for seq, exhibit_id in enumerate(stop_ids)
+            ])
+            popularity = PopularityDelta()
+            popularity.add_visits(stop_ids)
+            apply_popularity(popularity)
             db.session.commit()
-            return {'success': True, 'route_id': route_history.id}
+            route_blob_store.committed([route_hash])
+            return {'success': True, 'route_id': route_history.id, 'route_hash': route_hash}
         except Exception as e:
             db.session.rollback()
             return {'success': False, 'message': str(e)}
     
+    @staticmethod
+    def queue_route_history(user_id, route_name, route_data, user_preferences,
+                            estimated_duration, visit_date=None):
+        """把路线历史放入后写队列（生成路线时使用，不在请求中提交事务）
+        
+        记录由后台线程批量写入，因此不返回route_id；需要route_id时使用save_route_history
+        """
+        try:
+            now = datetime.utcnow()
+            route_history_writer.submit({
+                'user_id': user_id,
+                'route_name': route_name,
+                'route': route_data,
+                'user_preferences': json.dumps(user_preferences),
+                'estimated_duration': estimated_duration,
+                'visit_date': visit_date or now,
+                'created_at': now,
+                'stop_ids': route_stop_ids(route_data)
+            })
+            return {'success': True, 'queued': not route_history_writer.synchronous}
+        except Exception as e:
+            return {'success': False, 'message': str(e)}
+    
     @staticmethod
     def get_user_route_history(user_id, limit=10):
         """获取用户的路线历史"""
@@ -142,21 +199,189 @@ class RoutePlanningDatabase:
                                 .order_by(RouteHistory.created_at.desc())\
                                 .limit(limit).all()
     
+    @staticmethod
+    def route_history_to_dict(route_history):
+        """路线历史转换为字典（内容寻址存储的路线按哈希读取）
+        
+        存储的路线不含易变字段，读取时补回：生成时间取记录的创建时间，
+        讲解词按记录的偏好从讲解词缓存读取（未命中时使用模板文本）
+        """
+        data = route_history.to_dict()
+        if route_history.route_hash and not route_history.route_data:
+            route = route_blob_store.get(route_history.route_hash)
+            if route and isinstance(route.get('route'), list):
+                preferences = data.get('user_preferences')
+                if not isinstance(preferences, dict):
+                    preferences = {}
+                route = attach_guide_texts(route, catalog_store.get(), audience_for(preferences),
+                                           guide_language(preferences))
+                if route_history.created_at:
+                    route = dict(route, generated_at=route_history.created_at.isoformat())
+            data['route_data'] = route or {}
+        return data
+    
+    @staticmethod
+    def get_shared_route(route_hash):
+        """按哈希读取分享的路线（进程内缓存命中时不访问数据库），不存在时返回None"""
+        return route_blob_store.get(route_hash)
+    
+    @staticmethod
+    def share_route(route_data):
+        """存储要分享的路线并返回其哈希（相同内容只存储一次）"""
+        try:
+            route_hash = route_blob_store.store(route_data)
+            db.session.commit()
+            route_blob_store.committed([route_hash])
+            return {'success': True, 'route_hash': route_hash}
+        except Exception as e:
+            db.session.rollback()
+            return {'success': False, 'message': str(e)}
+    
+    @staticmethod
+    def get_user_route_summaries(user_id, limit=10, offset=0):
+        """获取用户的路线历史列表（只查询列表所需的列，不读取和解析路线JSON）
+        
+        走 (user_id, created_at) 索引，站点数由 route_stops 表计数
+        """
+        # 相关子查询按主键前缀(route_id)计数，只访问本页路线的站点
+        stop_count = db.session.query(func.count())\
+                               .filter(RouteStop.route_id == RouteHistory.id)\
+                               .correlate(RouteHistory)\
+                               .scalar_subquery()
+        
+        rows = db.session.query(
+            RouteHistory.id,
+            RouteHistory.route_name,
+            RouteHistory.estimated_duration,
+            RouteHistory.actual_duration,
+            RouteHistory.user_rating,
+            RouteHistory.visit_date,
+            RouteHistory.created_at,
+            RouteHistory.route_hash,
+            stop_count
+        ).filter(RouteHistory.user_id == user_id)\
+         .order_by(RouteHistory.created_at.desc())\
+         .limit(limit).offset(offset).all()
+        
+        return [
+            {
+                'id': route_id,
+                'route_name': route_name,
+                'estimated_duration': estimated_duration,
+                'actual_duration': actual_duration,
+                'user_rating': user_rating,
+                'visit_date': visit_date.isoformat() if visit_date else None,
+                'created_at': created_at.isoformat() if created_at else None,
+                'route_hash': route_hash,
+                'stop_count': stop_count
+            }
+            for (route_id, route_name, estimated_duration, actual_duration,
+                 user_rating, visit_date, created_at, route_hash, stop_count) in rows
+        ]
+    
+    @staticmethod
+    def get_route_history_detail(route_id, user_id):
+        """获取单条路线历史的完整数据（只解析这一条的JSON）"""
+        route_history = RouteHistory.query.filter_by(id=route_id, user_id=user_id).first()
+        if route_history is None:
+            return None
+        detail = RoutePlanningDatabase.route_history_to_dict(route_history)
+        detail['stops'] = [
+            exhibit_id for (exhibit_id,) in db.session.query(RouteStop.exhibit_id)
+                                                       .filter_by(route_id=route_id)
+                                                       .order_by(RouteStop.seq)
+        ]
+        return detail
+    
+    @staticmethod
+    def ensure_route_history_schema():
+        """为已存在的数据库补建路线历史的新列和索引，并为旧记录回填站点表
+        
+        db.create_all() 只创建缺失的表，不会给已有的表添加列和索引
+        """
+        try:
+            engine = db.engine
+            inspector = inspect(engine)
+            
+            # 升级前的表没有route_hash列
+            columns = {column['name'] for column in inspector.get_columns(RouteHistory.__tablename__)}
+            if 'route_hash' not in columns:
+                with engine.begin() as connection:
+                    connection.execute(text('ALTER TABLE route_histories ADD COLUMN route_hash VARCHAR(64)'))
+            
+            existing = {index['name'] for index in inspect(engine).get_indexes(RouteHistory.__tablename__)}
+            for index in RouteHistory.__table__.indexes:
+                if index.name not in existing:
+                    index.create(engine)
+            
+            # 站点表为空而历史表有数据时，说明是升级前的记录，逐条解析一次后回填
+            if RouteStop.query.first() is None and RouteHistory.query.first() is not None:
+                stops = []
+                for route_id, route_data in db.session.query(RouteHistory.id, RouteHistory.route_data):
+                    try:
+                        data = json.loads(route_data) if route_data else {}
+                    except ValueError:
+                        continue
+                    stops.extend(
+                        {'route_id': route_id, 'seq': seq, 'exhibit_id': exhibit_id}
+                        for seq, exhibit_id in enumerate(route_stop_ids(data))
+                    )
+                if stops:
+                    db.session.execute(RouteStop.__table__.insert(), stops)
+                db.session.commit()
+            
+            # 热度计数表为空而历史表有数据时，由已有路线重建一次
+            if ExhibitPopularity.query.first() is None and RouteHistory.query.first() is not None:
+                rebuild_popularity()
+                db.session.commit()
+            
+            # 停留时间统计同理，由已有反馈批量估计一次
+            if ExhibitDwellStat.query.first() is None and \
+                    RouteHistory.query.filter(RouteHistory.actual_duration.isnot(None)).first() is not None:
+                rebuild_dwell_stats()
+                db.session.commit()
+                dwell_model.invalidate()
+            return {'success': True}
+        except Exception as e:
+            db.session.rollback()
+            return {'success': False, 'message': str(e)}
+    
     @staticmethod
     def update_route_feedback(route_id, actual_duration=None, user_rating=None, feedback=None):
         """更新路线反馈"""
         try:
-            route_history = RouteHistory.query.get(route_id)
+            route_history = db.session.get(RouteHistory, route_id)
             if not route_history:
                 return {'success': False, 'message': '路线记录不存在'}
             
+            old_duration, old_rating = route_history.actual_duration, route_history.user_rating
             if actual_duration is not None:
-                route_history.actual_duration = actual_duration
+                route_history.actual_duration = int(actual_duration)
             if user_rating is not None:
-                route_history.user_rating = user_rating
+                route_history.user_rating = int(user_rating)
             if feedback is not None:
                 route_history.feedback = feedback
             
+            # 评分和用时的变化计入路线中各展品的热度；用时扣除步行时间后作为停留时间观测
+            stop_ids = [exhibit_id for (exhibit_id,) in
+                        db.session.query(RouteStop.exhibit_id).filter_by(route_id=route_id).order_by(RouteStop.seq)]
+            old_minutes = new_minutes = None
+            if route_history.actual_duration is not None:
+                route = stored_route(route_history.route_hash, route_history.route_data)
+                old_minutes = visit_minutes(old_duration, route)
+                new_minutes = visit_minutes(route_history.actual_duration, route)
+            popularity = PopularityDelta()
+            popularity.add_feedback(stop_ids, old_rating, route_history.user_rating, old_minutes, new_minutes)
+            apply_popularity(popularity)
+            
+            if new_minutes != old_minutes:
+                audience = dwell_audience(route_history.user_preferences)
+                previous, current = DwellObservations(), DwellObservations()
+                previous.add_route(stop_ids, old_minutes, audience)
+                current.add_route(stop_ids, new_minutes, audience)
+                apply_dwell(previous, remove=True)
+                apply_dwell(current)
+            
             db.session.commit()
             return {'success': True, 'message': '反馈更新成功'}
         except Exception as e:
@@ -164,13 +389,63 @@ class RoutePlanningDatabase:
             return {'success': False, 'message': str(e)}
     
     @staticmethod
-    def get_popular_exhibits(limit=10):
-        """获取热门展品（基于访问历史）"""
-        # 这里可以根据访问统计来获取热门展品
-        # 暂时返回按重要程度排序的展品
-        return Exhibit.query.filter_by(is_active=True)\
-                           .order_by(Exhibit.importance.desc())\
-                           .limit(limit).all()
+    def get_popular_exhibits(limit=10, window=WINDOW_ALL, sort=SORT_VISITS):
+        """获取热门展品（读取增量维护的热度计数，取前limit个）
+        
+        window: all / today / week（近7天）；sort: visits / rating
+        计数不足limit个时，用目录中按重要程度排序的展品补齐（popularity为空）
+        """
+        snapshot = catalog_store.get()
+        popular = []
+        # 多取几条，跳过已下架（不在目录快照中）的展品
+        for counters in top_exhibit_counters(limit * 2, window, sort):
+            row = snapshot.table.row.get(counters['exhibit_id'])
+            if row is None:
+                continue
+            popular.append(dict(snapshot.exhibits_data[row], popularity=counters))
+            if len(popular) >= limit:
+                return popular
+        
+        chosen = {exhibit['id'] for exhibit in popular}
+        by_importance = sorted(snapshot.exhibits_data, key=lambda exhibit: -(exhibit.get('importance') or 0))
+        popular.extend(
+            dict(exhibit, popularity=None) for exhibit in by_importance if exhibit['id'] not in chosen
+        )
+        return popular[:limit]
+    
+    @staticmethod
+    def get_route_recommendations():
+        """获取推荐路线模板"""
+        # 模拟推荐数据（后续可以从数据库获取）
+        return [
+            {
+                'id': 1,
+                'name': '经典红色之旅',
+                'description': '追寻革命足迹，感受红色精神',
+                'duration': 90,
+                'difficulty': '适中',
+                'target_audience': '成人游客',
+                'highlights': ['红船模型', '中共一大会址', '革命文物']
+            },
+            {
+                'id': 2,
+                'name': '亲子教育路线',
+                'description': '寓教于乐，适合家庭参观',
+                'duration': 60,
+                'difficulty': '简单',
+                'target_audience': '家庭游客',
+                'highlights': ['互动体验区', '多媒体展示', '历史照片']
+            },
+            {
+                'id': 3,
+                'name': '深度学术研究',
+                'description': '详细了解历史背景和文献资料',
+                'duration': 120,
+                'difficulty': '具有挑战性',
+                'target_audience': '研究学者',
+                'highlights': ['党章展示', '历史文献', '领袖题词']
+            }
+        ]
     
     @staticmethod
     def initialize_sample_data():
@@ -193,7 +468,7 @@ class RoutePlanningDatabase:
             ]
             
             for exhibit_data in sample_exhibits:
-                RoutePlanningDatabase.create_exhibit(*exhibit_data)
+                RoutePlanningDatabase.create_exhibit(*exhibit_data, refresh_catalog=False)
             
             # 创建示例布局
             RoutePlanningDatabase.create_memorial_layout(
@@ -207,9 +482,13 @@ class RoutePlanningDatabase:
                     [[0, 0], [10, 10], [20, 20], [30, 30], [40, 40], [50, 40]],
                     [[10, 10], [15, 25], [25, 30]],
                     [[20, 20], [35, 20], [45, 35]]
-                ]
+                ],
+                refresh_catalog=False
             )
             
+            # 全部写入后只重建一次目录快照
+            catalog_store.refresh()
+            
             return {'success': True, 'message': '示例数据初始化完成'}
             
         except Exception as e:
@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+"""
+路线规划数据库并发基准测试
+SQLite Concurrency Benchmark for Route Planning
+在临时SQLite文件上用多线程混合执行（对应 threaded=True 的开发服务器）：
+- 目录快照加载、热门展品查询、路线历史列表（读）
+- 保存路线历史、更新路线反馈（写）
+分别在默认设置与调优设置（route_planning_sqlite）下运行，比较吞吐量、延迟和锁错误数
+
+用法：
+    python -m backend.route_planning.route_planning_db_benchmark --threads 16 --duration 5
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+from typing import Dict, Any, List
+
+from flask import Flask
+
+from backend.models import db, Exhibit
+
+from .route_planning_catalog import load_catalog
+from .route_planning_database import RoutePlanningDatabase
+from .route_planning_sqlite import setup_database, sqlite_status
+
+# 默认线程数、每种设置的运行时长（秒）、展品数
+DEFAULT_THREADS = 16
+DEFAULT_DURATION = 5.0
+DEFAULT_EXHIBITS = 200
+DEFAULT_SEED = 20250806
+
+# 操作及其权重（读多写少）
+OPERATION_WEIGHTS = (
+    ('catalog', 1),
+    ('popular', 3),
+    ('history', 3),
+    ('save_history', 2),
+    ('feedback', 1)
+)
+
+# 每条路线的站点数
+ROUTE_STOPS = 8
+
+
+def build_app(path: str, tuned: bool) -> Flask:
+    """创建使用指定数据库文件的应用（tuned 时启用SQLite调优）"""
+    app = Flask(__name__)
+    app.config.update(SQLALCHEMY_DATABASE_URI=f"sqlite:///{path}", SQLALCHEMY_TRACK_MODIFICATIONS=False)
+    if tuned:
+        setup_database(app)
+    else:
+        db.init_app(app)
+    return app
+
+
+def seed_exhibits(app: Flask, count: int, rng: random.Random) -> List[str]:
+    """写入展品，返回展品ID列表"""
+    ids = [f"B{index:05d}" for index in range(count)]
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([
+            Exhibit(id=exhibit_id, name=f"展品{exhibit_id}", description='基准测试展品',
+                    location_x=rng.uniform(0, 500), location_y=rng.uniform(0, 300),
+                    importance=rng.randint(1, 5), visit_duration=rng.randint(3, 20),
+                    category='文物', period='建党时期')
+            for exhibit_id in ids
+        ])
+        db.session.commit()
+    return ids
+
+
+def _is_lock_error(message: str) -> bool:
+    """是否为SQLite锁冲突"""
+    return 'locked' in message or 'busy' in message
+
+
+class Workload:
+    """一种设置下的混合读写负载"""
+
+    def __init__(self, app: Flask, exhibit_ids: List[str], seed: int):
+        self.app = app
+        self.exhibit_ids = exhibit_ids
+        self.seed = seed
+        self.route_ids: List[int] = []
+        self.latencies: Dict[str, List[float]] = {name: [] for name, _ in OPERATION_WEIGHTS}
+        self.errors: Dict[str, int] = {'locked': 0, 'other': 0}
+        self._lock = threading.Lock()
+
+    def _operation(self, name: str, rng: random.Random, sequence: int) -> None:
+        """执行一次操作，失败时抛出异常"""
+        if name == 'catalog':
+            load_catalog(sequence)
+        elif name == 'popular':
+            RoutePlanningDatabase.get_popular_exhibits(10)
+        elif name == 'history':
+            RoutePlanningDatabase.get_user_route_summaries(rng.randint(1, 50))
+        elif name == 'save_history':
+            stops = rng.sample(self.exhibit_ids, ROUTE_STOPS)
+            result = RoutePlanningDatabase.save_route_history(
+                rng.randint(1, 50), '基准测试路线', {'route': [{'id': stop} for stop in stops]},
+                {'age_group': 'adult'}, rng.randint(30, 180)
+            )
+            if not result['success']:
+                raise RuntimeError(result['message'])
+            with self._lock:
+                self.route_ids.append(result['route_id'])
+        elif name == 'feedback':
+            with self._lock:
+                route_id = rng.choice(self.route_ids) if self.route_ids else None
+            if route_id is None:
+                return
+            result = RoutePlanningDatabase.update_route_feedback(route_id, user_rating=rng.randint(1, 5))
+            if not result['success']:
+                raise RuntimeError(result['message'])
+
+    def _worker(self, index: int, deadline: float) -> None:
+        """单个线程：每次操作使用独立的应用上下文（与一次请求相同）"""
+        rng = random.Random(self.seed + index)
+        names = [name for name, _ in OPERATION_WEIGHTS]
+        weights = [weight for _, weight in OPERATION_WEIGHTS]
+        sequence = 0
+        while time.perf_counter() < deadline:
+            name = rng.choices(names, weights)[0]
+            sequence += 1
+            started = time.perf_counter()
+            try:
+                with self.app.app_context():
+                    self._operation(name, rng, sequence)
+            except Exception as e:
+                with self._lock:
+                    self.errors['locked' if _is_lock_error(str(e)) else 'other'] += 1
+                continue
+            elapsed = (time.perf_counter() - started) * 1000
+            with self._lock:
+                self.latencies[name].append(elapsed)
+
+    def run(self, threads: int, duration: float) -> Dict[str, Any]:
+        """运行负载并汇总结果"""
+        deadline = time.perf_counter() + duration
+        workers = [threading.Thread(target=self._worker, args=(index, deadline)) for index in range(threads)]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+
+        all_latencies = [value for values in self.latencies.values() for value in values]
+        return {
+            'ops': len(all_latencies),
+            'ops_per_second': round(len(all_latencies) / elapsed, 1),
+            'errors': dict(self.errors),
+            'latency_ms': _summarize(all_latencies),
+            'operations': {name: dict(_summarize(values), ops=len(values))
+                           for name, values in self.latencies.items()}
+        }
+
+
+def _summarize(values: List[float]) -> Dict[str, float]:
+    """延迟分位数（毫秒）"""
+    if not values:
+        return {'p50': 0.0, 'p95': 0.0, 'p99': 0.0}
+    ordered = sorted(values)
+
+    def percentile(fraction):
+        return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))], 2)
+
+    return {'p50': round(statistics.median(ordered), 2), 'p95': percentile(0.95), 'p99': percentile(0.99)}
+
+
+def run_benchmark(threads: int = DEFAULT_THREADS, duration: float = DEFAULT_DURATION,
+                  exhibits: int = DEFAULT_EXHIBITS, seed: int = DEFAULT_SEED) -> Dict[str, Any]:
+    """依次在默认设置与调优设置下运行同一负载"""
+    results = {'threads': threads, 'duration': duration, 'exhibits': exhibits, 'settings': {}}
+    for name, tuned in (('default', False), ('tuned', True)):
+        with tempfile.TemporaryDirectory() as directory:
+            app = build_app(os.path.join(directory, 'benchmark.db'), tuned)
+            exhibit_ids = seed_exhibits(app, exhibits, random.Random(seed))
+            result = Workload(app, exhibit_ids, seed).run(threads, duration)
+            with app.app_context():
+                result['pragmas'] = sqlite_status()
+                for engine in db.engines.values():
+                    engine.dispose()
+            results['settings'][name] = result
+    return results
+
+
+def main(argv=None) -> None:
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description='路线规划SQLite并发基准测试')
+    parser.add_argument('--threads', type=int, default=DEFAULT_THREADS)
+    parser.add_argument('--duration', type=float, default=DEFAULT_DURATION, help='每种设置的运行时长（秒）')
+    parser.add_argument('--exhibits', type=int, default=DEFAULT_EXHIBITS)
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--output', help='结果JSON文件路径')
+    args = parser.parse_args(argv)
+
+    results = run_benchmark(args.threads, args.duration, args.exhibits, args.seed)
+    for name, result in results['settings'].items():
+        latency = result['latency_ms']
+        print(f"{name:>8}: {result['ops_per_second']:>8} ops/s  "
+              f"p50 {latency['p50']}ms  p95 {latency['p95']}ms  p99 {latency['p99']}ms  "
+              f"锁错误 {result['errors']['locked']}  其他错误 {result['errors']['other']}  "
+              f"{result['pragmas']}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
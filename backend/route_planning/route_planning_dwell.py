@@ -0,0 +1,289 @@
+# -*- coding: utf-8 -*-
+"""
+展品停留时间模型
+Learned Dwell-Time Model for Route Planning
+展品的建议参观时间是人工填写的常数，这里用游客反馈的实际用时来修正：
+- 每条反馈的停留总分钟数（实际用时扣除步行时间）按建议时长比例分摊到路线中的各展品，作为一次观测
+- 按 (展品, 受众) 维护在线均值和方差（Welford），写入时用 ON CONFLICT 合并，多进程并发写入不丢更新；
+  修改反馈时先移除旧观测再加入新观测
+- 估计值向先验收缩：全部受众的估计收缩到建议参观时间，各受众的估计再收缩到全部受众的估计，
+  观测越多越接近实测均值
+- 估计值按目录快照预先算成与展品表对齐的数组，每个进程至多每 refresh_interval 秒重算一次，
+  优化器直接读取，请求中没有额外计算
+"""
+
+import json
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Iterable, Tuple, Union
+
+import numpy as np
+from sqlalchemy import case
+
+from backend.models import db, ExhibitDwellStat, RouteHistory, RouteStop
+
+from .route_planning_catalog import CatalogSnapshot
+from .route_planning_metrics import Gauge, metrics_registry
+from .route_planning_popularity import split_dwell_time, stored_route, visit_minutes
+from .route_planning_sqlite import read_session
+from .route_planning_utils import RoutePlanningUtils
+
+# 全部受众合并统计使用的受众名
+ALL_AUDIENCES = 'all'
+
+# 先验权重：建议参观时间相当于多少次观测
+DEFAULT_DWELL_PRIOR_WEIGHT = 5.0
+
+# 每个进程重算估计值的最短间隔（秒）
+DEFAULT_DWELL_REFRESH_INTERVAL = 60.0
+
+# 单条路线停留总分钟数的上限，超过视为异常反馈（如忘记结束参观）不计入
+MAX_VISIT_MINUTES = 600
+
+
+def dwell_audience(user_preferences: Union[str, Dict[str, Any], None]) -> str:
+    """反馈所属受众：标准化偏好中的年龄组（与优化器使用的 UserProfile.age_group 一致）
+
+    user_preferences 可以是路线历史中保存的JSON文本，无法解析时按默认年龄组处理
+    """
+    if isinstance(user_preferences, str):
+        try:
+            user_preferences = json.loads(user_preferences)
+        except ValueError:
+            user_preferences = None
+    if not isinstance(user_preferences, dict):
+        user_preferences = {}
+    return RoutePlanningUtils.validate_user_preferences(user_preferences)['age_group']
+
+
+class DwellObservations:
+    """一批停留时间观测，按 (展品, 受众) 汇总为 (次数, 均值, m2) 后一次写入"""
+
+    def __init__(self):
+        self.stats: Dict[Tuple[str, str], List[float]] = defaultdict(lambda: [0, 0.0, 0.0])
+
+    def add(self, exhibit_id: str, audience: str, minutes: float) -> None:
+        """加入一次观测（同时计入该展品的全部受众统计）"""
+        for key in ((exhibit_id, audience), (exhibit_id, ALL_AUDIENCES)):
+            stat = self.stats[key]
+            stat[0] += 1
+            delta = minutes - stat[1]
+            stat[1] += delta / stat[0]
+            stat[2] += delta * (minutes - stat[1])
+
+    def add_route(self, stop_ids: Iterable[str], minutes: Optional[float], audience: str) -> None:
+        """一条路线的停留总分钟数分摊到各展品（无效的用时不计入）"""
+        if minutes is None or minutes <= 0 or minutes > MAX_VISIT_MINUTES:
+            return
+        for exhibit_id, share in split_dwell_time(list(dict.fromkeys(stop_ids)), minutes).items():
+            self.add(exhibit_id, audience, share)
+
+    def __bool__(self) -> bool:
+        return bool(self.stats)
+
+
+def apply_dwell(observations: DwellObservations, remove: bool = False) -> None:
+    """在当前事务中把观测合并进统计表（remove=True 时移除这些观测），调用方负责提交
+
+    两组统计的合并（Chan 公式）：n = n1 + n2，mean = mean1 + d·n2/n，m2 = m1 + m2' + d²·n1·n2/n，d = mean2 - mean1；
+    移除观测相当于合并次数和m2取负的一组统计
+    """
+    if not observations:
+        return
+    sign = -1 if remove else 1
+    now = datetime.utcnow()
+    rows = [
+        {'exhibit_id': exhibit_id, 'audience': audience,
+         'count': sign * count, 'mean': mean, 'm2': sign * m2, 'updated_at': now}
+        for (exhibit_id, audience), (count, mean, m2) in observations.stats.items()
+    ]
+
+    table = ExhibitDwellStat.__table__
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        statement = dialect_insert(table)
+        new = statement.excluded
+        total = table.c.count + new.count
+        delta = new.mean - table.c.mean
+        # SET 中的列引用都是更新前的值；次数归零时均值和m2清零
+        statement = statement.on_conflict_do_update(
+            index_elements=['exhibit_id', 'audience'],
+            set_={
+                'count': total,
+                'mean': case((total > 0, table.c.mean + delta * new.count / total), else_=0.0),
+                'm2': case((total > 1, table.c.m2 + new.m2 + delta * delta * table.c.count * new.count / total),
+                           else_=0.0),
+                'updated_at': new.updated_at
+            }
+        )
+        db.session.execute(statement, rows)
+        return
+
+    # 其他数据库：逐行读取后合并
+    for row in rows:
+        stat = db.session.get(ExhibitDwellStat, (row['exhibit_id'], row['audience']))
+        if stat is None:
+            db.session.add(ExhibitDwellStat(**row))
+            continue
+        total = stat.count + row['count']
+        delta = row['mean'] - stat.mean
+        stat.m2 = stat.m2 + row['m2'] + delta * delta * stat.count * row['count'] / total if total > 1 else 0.0
+        stat.mean = stat.mean + delta * row['count'] / total if total > 0 else 0.0
+        stat.count = total
+        stat.updated_at = now
+
+
+def rebuild_dwell_stats() -> int:
+    """批量估计：由全部有实际用时的路线历史重建统计表（调用方负责提交），返回计入的路线数"""
+    db.session.query(ExhibitDwellStat).delete()
+
+    histories = db.session.query(
+        RouteHistory.id, RouteHistory.actual_duration, RouteHistory.user_preferences,
+        RouteHistory.route_hash, RouteHistory.route_data
+    ).filter(RouteHistory.actual_duration.isnot(None)).all()
+    if not histories:
+        return 0
+
+    stops: Dict[int, List[str]] = defaultdict(list)
+    for route_id, exhibit_id in db.session.query(RouteStop.route_id, RouteStop.exhibit_id)\
+                                          .filter(RouteStop.route_id.in_([row[0] for row in histories]))\
+                                          .order_by(RouteStop.route_id, RouteStop.seq):
+        stops[route_id].append(exhibit_id)
+
+    observations = DwellObservations()
+    for route_id, duration, preferences, route_hash, route_data in histories:
+        minutes = visit_minutes(duration, stored_route(route_hash, route_data))
+        observations.add_route(stops.get(route_id, ()), minutes, dwell_audience(preferences))
+    apply_dwell(observations)
+    return len(histories)
+
+
+# ==================== 预计算的估计值 ====================
+
+class DwellEstimates:
+    """与某个目录快照的展品表对齐的停留时间估计（分钟），构建后只读"""
+
+    __slots__ = ('version', 'catalog_version', 'pooled', 'by_audience', 'observed')
+
+    def __init__(self, version: int, catalog_version: int, pooled: np.ndarray,
+                 by_audience: Dict[str, np.ndarray], observed: int):
+        self.version = version
+        self.catalog_version = catalog_version
+        self.pooled = pooled
+        self.by_audience = by_audience
+        self.observed = observed  # 有观测的展品数
+
+    def durations(self, audience: str) -> np.ndarray:
+        """某受众各展品的预计停留时间（没有该受众观测时使用全部受众的估计）"""
+        return self.by_audience.get(audience, self.pooled)
+
+    def same_values(self, other: Optional['DwellEstimates']) -> bool:
+        """估计值是否与另一份完全相同（相同时沿用版本号，路线缓存不失效）"""
+        if other is None or other.by_audience.keys() != self.by_audience.keys():
+            return False
+        return np.array_equal(self.pooled, other.pooled) and all(
+            np.array_equal(values, other.by_audience[audience]) for audience, values in self.by_audience.items()
+        )
+
+
+def compute_estimates(snapshot: CatalogSnapshot, stats: Iterable[Tuple[str, str, int, float]],
+                      prior_weight: float, version: int = 0) -> DwellEstimates:
+    """由统计行 (展品ID, 受众, 次数, 均值) 计算收缩估计
+
+    全部受众：(n·均值 + k·建议时间) / (n + k)；各受众：(n·均值 + k·全部受众估计) / (n + k)
+    """
+    configured = snapshot.table.duration
+    pooled = configured.copy()
+    audience_stats: Dict[str, List[Tuple[int, int, float]]] = defaultdict(list)
+    observed = 0
+    for exhibit_id, audience, count, mean in stats:
+        row = snapshot.table.row.get(exhibit_id)
+        if row is None or count <= 0:
+            continue
+        if audience == ALL_AUDIENCES:
+            pooled[row] = (count * mean + prior_weight * configured[row]) / (count + prior_weight)
+            observed += 1
+        else:
+            audience_stats[audience].append((row, count, mean))
+
+    by_audience = {}
+    for audience, entries in audience_stats.items():
+        values = pooled.copy()
+        for row, count, mean in entries:
+            values[row] = (count * mean + prior_weight * pooled[row]) / (count + prior_weight)
+        values.setflags(write=False)
+        by_audience[audience] = values
+    pooled.setflags(write=False)
+    return DwellEstimates(version, snapshot.version, pooled, by_audience, observed)
+
+
+class DwellModel:
+    """进程级停留时间估计：按目录快照缓存，过期后在下一次读取时重算"""
+
+    def __init__(self, prior_weight: float = DEFAULT_DWELL_PRIOR_WEIGHT,
+                 refresh_interval: float = DEFAULT_DWELL_REFRESH_INTERVAL):
+        self.prior_weight = prior_weight
+        self.refresh_interval = refresh_interval
+        self.enabled = True
+        self._estimates: Optional[DwellEstimates] = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def configure(self, prior_weight: float = None, refresh_interval: float = None, enabled: bool = None) -> None:
+        """按部署配置调整"""
+        if prior_weight is not None:
+            self.prior_weight = prior_weight
+        if refresh_interval is not None:
+            self.refresh_interval = refresh_interval
+        if enabled is not None:
+            self.enabled = enabled
+        self.invalidate()
+
+    def invalidate(self) -> None:
+        """下次读取时重算（批量重建统计后调用）"""
+        self._loaded_at = 0.0
+
+    def _fresh(self, estimates: Optional[DwellEstimates], snapshot: CatalogSnapshot) -> bool:
+        return (estimates is not None and estimates.catalog_version == snapshot.version
+                and time.monotonic() - self._loaded_at < self.refresh_interval)
+
+    def get(self, snapshot: CatalogSnapshot) -> DwellEstimates:
+        """当前快照的估计值（需要应用上下文；未过期时只是一次属性读取）"""
+        estimates = self._estimates
+        if self._fresh(estimates, snapshot):
+            return estimates
+        with self._lock:
+            estimates = self._estimates
+            if self._fresh(estimates, snapshot):
+                return estimates
+            if self.enabled:
+                with read_session() as session:
+                    stats = session.query(ExhibitDwellStat.exhibit_id, ExhibitDwellStat.audience,
+                                          ExhibitDwellStat.count, ExhibitDwellStat.mean).all()
+            else:
+                stats = []
+            version = estimates.version if estimates is not None else 0
+            fresh = compute_estimates(snapshot, stats, self.prior_weight, version)
+            if not fresh.same_values(estimates):
+                fresh.version = version + 1
+            self._estimates = fresh
+            self._loaded_at = time.monotonic()
+            return fresh
+
+    def observed(self) -> int:
+        """当前估计中有观测的展品数"""
+        estimates = self._estimates
+        return estimates.observed if estimates is not None else 0
+
+
+dwell_model = DwellModel()
+
+metrics_registry.register(Gauge(
+    'route_dwell_observed_exhibits', '停留时间估计中有反馈观测的展品数', dwell_model.observed
+))
@@ -0,0 +1,344 @@
+# -*- coding: utf-8 -*-
+"""
+路线规划通道网络模块
+Walkway Graph for Route Planning
+把场馆布局中的通道折线编译成带权图，并预计算兴趣点之间的步行距离矩阵
+内存上界：通道拐点间距离 V² × 8 字节；兴趣点不超过 DENSE_MAX_POINTS 时为稠密矩阵 N² × 8 字节，
+超过时按行计算，只缓存最近使用的 ROW_CACHE_SIZE 行（ROW_CACHE_SIZE × N × 8 字节）
+"""
+
+import json
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Tuple
+
+import numpy as np
+
+from .route_planning_arrays import euclidean_matrix, path_length as _path_length
+
+Point = Tuple[float, float]
+
+# 布局中除展品外需要吸附到通道上的兴趣点
+LAYOUT_POINT_FIELDS = ('restrooms', 'rest_areas')
+
+# 距离矩阵缓存的最大布局版本数
+MATRIX_CACHE_SIZE = 8
+
+# 分块计算时每块的行数，限制中间数组的内存占用
+BLOCK_ROWS = 512
+
+# 兴趣点数不超过该值时预计算稠密的全源距离矩阵（1024个点约8MB）
+DENSE_MAX_POINTS = 1024
+
+# 按行计算时缓存的最近使用行数（5000个兴趣点时约10MB）
+ROW_CACHE_SIZE = 256
+
+
+def _as_point(value) -> Point:
+    """把列表或元组形式的坐标统一转换为浮点元组"""
+    return (float(value[0]), float(value[1]))
+
+
+def layout_fingerprint(layout: Dict[str, Any]) -> str:
+    """计算布局版本标识（布局自带version时直接使用）"""
+    if layout.get('version') is not None:
+        return str(layout['version'])
+    return json.dumps(
+        {
+            'entrance': layout.get('entrance'),
+            'exit': layout.get('exit'),
+            'restrooms': layout.get('restrooms', []),
+            'rest_areas': layout.get('rest_areas', []),
+            'walkways': layout.get('walkways', []),
+            'connectors': layout.get('connectors', []),
+        },
+        sort_keys=True, default=list
+    )
+
+
+class OnDemandDistanceMatrix:
+    """按行计算的步行距离矩阵 - 兴趣点较多时代替稠密矩阵，只缓存最近使用的行
+
+    支持优化器用到的下标形式：m[i, j]、m[rows, cols]（逐对）、m[np.ix_(rows, cols)]；
+    取出的值与稠密矩阵相同（对角线为0）
+    """
+
+    def __init__(self, coords: np.ndarray, graph: 'WalkwayGraph' = None,
+                 snaps: Tuple[np.ndarray, ...] = None, cache_rows: int = ROW_CACHE_SIZE):
+        self.coords = coords
+        self.graph = graph
+        self.snaps = snaps
+        self.cache_rows = cache_rows
+        self.shape = (len(coords), len(coords))
+        self._rows: 'OrderedDict[int, np.ndarray]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """兴趣点数"""
+        return self.shape[0]
+
+    def __getstate__(self):
+        """序列化时不携带行缓存和锁"""
+        state = self.__dict__.copy()
+        del state['_rows'], state['_lock']
+        return state
+
+    def __setstate__(self, state) -> None:
+        """反序列化后重建空的行缓存"""
+        self.__dict__.update(state)
+        self._rows = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __getitem__(self, key) -> np.ndarray:
+        """按 (行下标, 列下标) 取值，行下标可为整数或任意形状的数组"""
+        rows, cols = key
+        rows = np.asarray(rows, dtype=np.intp)
+        unique, inverse = np.unique(rows, return_inverse=True)
+        return self.rows(unique)[inverse.reshape(rows.shape), cols]
+
+    def rows(self, indices) -> np.ndarray:
+        """取出若干完整的行，缓存中没有的行一次批量计算"""
+        indices = [int(i) for i in indices]
+        with self._lock:
+            found = {}
+            for i in indices:
+                row = self._rows.get(i)
+                if row is not None:
+                    self._rows.move_to_end(i)
+                    found[i] = row
+        missing = [i for i in dict.fromkeys(indices) if i not in found]
+        if missing:
+            block = self._compute(np.array(missing, dtype=np.intp))
+            with self._lock:
+                for i, row in zip(missing, block):
+                    # 逐行复制，避免缓存的行让整块中间结果常驻内存
+                    row = row.copy()
+                    row.setflags(write=False)
+                    found[i] = self._rows[i] = row
+                while len(self._rows) > self.cache_rows:
+                    self._rows.popitem(last=False)
+        if not indices:
+            return np.empty((0, self.shape[1]))
+        return np.stack([found[i] for i in indices])
+
+    def _compute(self, rows: np.ndarray) -> np.ndarray:
+        """计算指定兴趣点到全部兴趣点的步行距离"""
+        coords = self.coords[rows]
+        if self.graph is None:
+            block = euclidean_matrix(coords, self.coords)
+        else:
+            block_snaps = tuple(column[rows] for column in self.snaps)
+            block = self.graph.distances_between(coords, block_snaps, self.coords, self.snaps)
+        block[np.arange(len(rows)), rows] = 0.0
+        return block
+
+
+class WalkwayDistanceMatrix:
+    """兴趣点步行距离矩阵 - 优化器各阶段通过下标做O(1)查表
+
+    matrix: 稠密的 np.ndarray，兴趣点较多时为按行计算的 OnDemandDistanceMatrix
+    """
+
+    def __init__(self, keys: List[str], matrix, graph: 'WalkwayGraph' = None,
+                 coords: np.ndarray = None, snaps: Tuple[np.ndarray, ...] = None):
+        self.keys = keys
+        self.index = {key: i for i, key in enumerate(keys)}
+        self.matrix = matrix
+        # 保留兴趣点坐标和吸附结果，用于计算任意位置到各兴趣点的步行距离
+        self.graph = graph
+        self.coords = coords
+        self.snaps = snaps
+
+    def distances_from(self, point: Point) -> np.ndarray:
+        """任意位置（如游客当前位置）到全部兴趣点的步行距离向量"""
+        origin = np.array([_as_point(point)], dtype=np.float64)
+        if self.graph is None or self.snaps is None:
+            return euclidean_matrix(origin, self.coords)[0]
+        return self.graph.distances_between(origin, self.graph.snap(origin),
+                                            self.coords, self.snaps)[0]
+
+    def distance(self, key1: str, key2: str) -> float:
+        """按兴趣点键查询步行距离"""
+        return float(self.matrix[self.index[key1], self.index[key2]])
+
+    def path_length(self, keys: List[str]) -> float:
+        """计算按顺序经过各兴趣点的总步行距离"""
+        return _path_length(self.matrix, [self.index[key] for key in keys])
+
+
+class WalkwayGraph:
+    """通道网络图 - 顶点为通道折线的拐点，边为折线线段
+
+    connectors: 楼梯、电梯等连接通道，每项为 (端点A, 端点B, 步行长度)；
+    只参与最短路计算，兴趣点不会吸附到连接通道上
+    """
+
+    def __init__(self, walkways: List[List[Point]], connectors: List[Tuple[Point, Point, float]] = None):
+        nodes: List[Point] = []
+        node_index: Dict[Point, int] = {}
+        segments: List[Tuple[int, int]] = []
+
+        def node_of(raw_point) -> int:
+            point = _as_point(raw_point)
+            if point not in node_index:
+                node_index[point] = len(nodes)
+                nodes.append(point)
+            return node_index[point]
+
+        for walkway in walkways or []:
+            previous = None
+            for raw_point in walkway:
+                current = node_of(raw_point)
+                if previous is not None and previous != current:
+                    segments.append((previous, current))
+                previous = current
+        walkway_count = len(segments)
+
+        connector_lengths = []
+        for point_a, point_b, length in connectors or []:
+            segments.append((node_of(point_a), node_of(point_b)))
+            connector_lengths.append(float(length))
+
+        self.node_index = node_index
+        self.nodes = np.array(nodes, dtype=np.float64).reshape(len(nodes), 2)
+        pairs = np.array(segments, dtype=np.intp).reshape(len(segments), 2)
+        self.seg_a, self.seg_b = pairs[:, 0], pairs[:, 1]
+        self.seg_len = np.hypot(*(self.nodes[self.seg_b] - self.nodes[self.seg_a]).T)
+        self.seg_len[walkway_count:] = connector_lengths
+        # 可供兴趣点吸附的线段（不含连接通道）
+        self.walkway_count = walkway_count
+        self.vertex_distances = self._all_pairs_vertex_distances()
+
+    def _all_pairs_vertex_distances(self) -> np.ndarray:
+        """Floyd-Warshall 计算通道拐点间最短步行距离（每轮一次向量化松弛）"""
+        size = len(self.nodes)
+        dist = np.full((size, size), np.inf)
+        np.fill_diagonal(dist, 0.0)
+        np.minimum.at(dist, (self.seg_a, self.seg_b), self.seg_len)
+        np.minimum.at(dist, (self.seg_b, self.seg_a), self.seg_len)
+        for k in range(size):
+            np.minimum(dist, dist[:, k, None] + dist[None, k, :], out=dist)
+        return dist
+
+    def snap(self, points: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """把一组兴趣点吸附到各自最近的通道线段
+
+        返回三列：线段下标、投影点到线段起点的距离、兴趣点到投影点的距离
+        """
+        walkable = slice(0, self.walkway_count)
+        start = self.nodes[self.seg_a[walkable]]
+        direction = self.nodes[self.seg_b[walkable]] - start
+        seg_len = self.seg_len[walkable]
+        length_sq = np.where(seg_len > 0, seg_len ** 2, 1.0)
+
+        seg = np.empty(len(points), dtype=np.intp)
+        along = np.empty(len(points))
+        offset = np.empty(len(points))
+        for lo in range(0, len(points), BLOCK_ROWS):
+            block = points[lo:lo + BLOCK_ROWS]
+            rel = block[:, None, :] - start[None, :, :]
+            t = np.clip(np.einsum('psk,sk->ps', rel, direction) / length_sq, 0.0, 1.0)
+            gap = rel - t[:, :, None] * direction[None, :, :]
+            gap_len = np.hypot(gap[:, :, 0], gap[:, :, 1])
+            best = gap_len.argmin(axis=1)
+            rows = np.arange(len(block))
+            seg[lo:lo + BLOCK_ROWS] = best
+            along[lo:lo + BLOCK_ROWS] = t[rows, best] * self.seg_len[best]
+            offset[lo:lo + BLOCK_ROWS] = gap_len[rows, best]
+        return seg, along, offset
+
+    def distances_between(self, coords1: np.ndarray, snaps1, coords2: np.ndarray, snaps2) -> np.ndarray:
+        """两组已吸附兴趣点之间沿通道的步行距离矩阵"""
+        seg1, along1, offset1 = snaps1
+        seg2, along2, offset2 = snaps2
+        # 每个兴趣点可经由所在线段的两个端点进入通道网络
+        ends1 = ((self.seg_a[seg1], along1), (self.seg_b[seg1], self.seg_len[seg1] - along1))
+        ends2 = ((self.seg_a[seg2], along2), (self.seg_b[seg2], self.seg_len[seg2] - along2))
+
+        best = np.full((len(coords1), len(coords2)), np.inf)
+        for v1, d1 in ends1:
+            via = self.vertex_distances[v1]
+            for v2, d2 in ends2:
+                np.minimum(best, d1[:, None] + via[:, v2] + d2[None, :], out=best)
+        # 同一线段上的两个兴趣点可直接沿线段行走
+        same = seg1[:, None] == seg2[None, :]
+        direct = np.abs(along1[:, None] - along2[None, :])
+        best = np.where(same, np.minimum(best, direct), best)
+        best += offset1[:, None] + offset2[None, :]
+        # 通道网络不连通时退回直线距离
+        unreachable = np.isinf(best)
+        if unreachable.any():
+            best[unreachable] = euclidean_matrix(coords1, coords2)[unreachable]
+        return best
+
+    def compile(self, points: Dict[str, Point]) -> WalkwayDistanceMatrix:
+        """把兴趣点吸附到通道网络并生成全源步行距离矩阵（兴趣点过多时改为按行计算）"""
+        keys = list(points.keys())
+        coords = np.array([_as_point(points[key]) for key in keys], dtype=np.float64).reshape(len(keys), 2)
+        dense = len(keys) <= DENSE_MAX_POINTS
+        if self.walkway_count == 0:
+            matrix = euclidean_matrix(coords, coords) if dense else OnDemandDistanceMatrix(coords)
+            return WalkwayDistanceMatrix(keys, matrix, coords=coords)
+
+        snaps = self.snap(coords)
+        if not dense:
+            return WalkwayDistanceMatrix(keys, OnDemandDistanceMatrix(coords, self, snaps),
+                                         graph=self, coords=coords, snaps=snaps)
+        matrix = np.empty((len(keys), len(keys)))
+        for lo in range(0, len(keys), BLOCK_ROWS):
+            hi = min(lo + BLOCK_ROWS, len(keys))
+            block_snaps = tuple(column[lo:hi] for column in snaps)
+            matrix[lo:hi] = self.distances_between(coords[lo:hi], block_snaps, coords, snaps)
+        np.fill_diagonal(matrix, 0.0)
+        return WalkwayDistanceMatrix(keys, matrix, graph=self, coords=coords, snaps=snaps)
+
+
+def exhibit_key(exhibit_id: str) -> str:
+    """展品在距离矩阵中的键"""
+    return f"exhibit:{exhibit_id}"
+
+
+def collect_points(exhibits, layout: Dict[str, Any]) -> Dict[str, Point]:
+    """收集需要吸附到通道网络上的全部兴趣点"""
+    points = {
+        'entrance': _as_point(layout['entrance']),
+        'exit': _as_point(layout['exit']),
+    }
+    for field in LAYOUT_POINT_FIELDS:
+        for i, point in enumerate(layout.get(field) or []):
+            points[f"{field}:{i}"] = _as_point(point)
+    for exhibit in exhibits:
+        points[exhibit_key(exhibit.id)] = _as_point(exhibit.location)
+    return points
+
+
+_graph_cache: Dict[str, WalkwayGraph] = {}
+_matrix_cache: Dict[Tuple[str, Tuple], WalkwayDistanceMatrix] = {}
+
+
+def _remember(cache: Dict, key, value) -> None:
+    """写入缓存并淘汰最早的布局版本"""
+    if len(cache) >= MATRIX_CACHE_SIZE:
+        cache.pop(next(iter(cache)))
+    cache[key] = value
+
+
+def get_walkway_graph(layout: Dict[str, Any]) -> WalkwayGraph:
+    """获取（必要时编译）布局对应的通道网络图"""
+    version = layout_fingerprint(layout)
+    graph = _graph_cache.get(version)
+    if graph is None:
+        graph = WalkwayGraph(layout.get('walkways') or [], layout.get('connectors'))
+        _remember(_graph_cache, version, graph)
+    return graph
+
+
+def get_distance_matrix(exhibits, layout: Dict[str, Any]) -> WalkwayDistanceMatrix:
+    """获取布局版本和展品集合对应的步行距离矩阵，每个版本只计算一次"""
+    points = collect_points(exhibits, layout)
+    cache_key = (layout_fingerprint(layout), tuple(sorted(points.items())))
+    matrix = _matrix_cache.get(cache_key)
+    if matrix is None:
+        matrix = get_walkway_graph(layout).compile(points)
+        _remember(_matrix_cache, cache_key, matrix)
+    return matrix
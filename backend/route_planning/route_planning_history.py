@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+"""
+路线历史后写队列模块
+Write-Behind Queue for Route History
+生成路线时不再同步提交路线历史，而是放入有界队列，由后台线程批量写入：
+- 累积到 batch_size 条或最早一条等待超过 flush_interval 秒时，以一个事务批量插入
+- 队列满时调用方最多等待 enqueue_timeout 秒，仍满则由调用方自己写出一批（背压）
+- 进程退出时写出剩余记录；synchronous 模式下逐条同步写入，便于测试
+"""
+
+import atexit
+import os
+import queue
+import threading
+import time
+from typing import Dict, Any, List, Optional
+
+from backend.models import db, RouteHistory, RouteStop
+
+from .route_planning_metrics import Counter, Gauge, Histogram, metrics_registry
+from .route_planning_blobs import route_blob_store
+from .route_planning_popularity import PopularityDelta, apply_popularity
+
+# 默认批量大小、最长等待时间（秒）、队列容量与入队等待时间（秒）
+DEFAULT_HISTORY_BATCH_SIZE = 100
+DEFAULT_HISTORY_FLUSH_INTERVAL = 1.0
+DEFAULT_HISTORY_MAX_PENDING = 10000
+DEFAULT_HISTORY_ENQUEUE_TIMEOUT = 0.5
+
+# 等待后台线程写完当前批次时，在攒批时间之外额外等待的秒数
+FLUSH_WAIT_SLACK = 5.0
+
+# 批量写入耗时分桶（秒）
+FLUSH_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+HISTORY_ROWS = metrics_registry.register(Counter(
+    'route_history_rows_total', '路线历史写入条数', ('result',)
+))
+HISTORY_FLUSH_SECONDS = metrics_registry.register(Histogram(
+    'route_history_flush_seconds', '路线历史批量写入耗时（秒）', FLUSH_BUCKETS, ('trigger',)
+))
+
+
+def route_stop_ids(route_data: Any) -> List[str]:
+    """路线数据中按顺序参观的展品ID（兼容客户端提交的任意结构，无法识别时返回空列表）"""
+    stops = route_data.get('route') if isinstance(route_data, dict) else None
+    if not isinstance(stops, list):
+        return []
+    ids = []
+    for stop in stops:
+        exhibit_id = stop.get('id') if isinstance(stop, dict) else stop
+        if isinstance(exhibit_id, (str, int)):
+            ids.append(str(exhibit_id))
+    return ids
+
+
+class RouteHistoryWriter:
+    """路线历史后写队列（每个进程一个后台写线程，首次入队时启动）"""
+
+    def __init__(self, batch_size: int = DEFAULT_HISTORY_BATCH_SIZE,
+                 flush_interval: float = DEFAULT_HISTORY_FLUSH_INTERVAL,
+                 max_pending: int = DEFAULT_HISTORY_MAX_PENDING,
+                 enqueue_timeout: float = DEFAULT_HISTORY_ENQUEUE_TIMEOUT,
+                 synchronous: bool = False):
+        self.app = None
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self.synchronous = synchronous
+        self._queue: 'queue.Queue[Dict[str, Any]]' = queue.Queue(max_pending)
+        self._thread: Optional[threading.Thread] = None
+        self._thread_pid: Optional[int] = None
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        # 同一时刻只有一个线程执行批量写入，避免SQLite上的写锁竞争
+        self._flush_lock = threading.Lock()
+
+    def configure(self, app=None, batch_size: int = None, flush_interval: float = None,
+                  max_pending: int = None, enqueue_timeout: float = None,
+                  synchronous: bool = None) -> None:
+        """按部署配置调整（在开始处理请求前调用）"""
+        if app is not None:
+            self.app = app
+        if batch_size is not None:
+            self.batch_size = max(1, batch_size)
+        if flush_interval is not None:
+            self.flush_interval = flush_interval
+        if enqueue_timeout is not None:
+            self.enqueue_timeout = enqueue_timeout
+        if synchronous is not None:
+            self.synchronous = synchronous
+        if max_pending is not None and max_pending != self._queue.maxsize:
+            self.flush()
+            self._queue = queue.Queue(max_pending)
+
+    def pending(self) -> int:
+        """队列中尚未写入的记录数"""
+        return self._queue.qsize()
+
+    # ==================== 入队 ====================
+
+    def submit(self, row: Dict[str, Any]) -> None:
+        """提交一条路线历史（route_histories 表的列 -> 值，另加 route 路线内容和 stop_ids 站点列表）
+
+        路线内容在写入时编码为内容寻址存储，历史记录只保存哈希
+
+        同步模式（或未绑定应用）时在调用方的应用上下文中立即写入，失败时抛出异常
+        """
+        if self.synchronous or self.app is None:
+            with HISTORY_FLUSH_SECONDS.time('sync'):
+                self._insert([row])
+            return
+
+        self._ensure_thread()
+        try:
+            self._queue.put(row, timeout=self.enqueue_timeout)
+        except queue.Full:
+            # 背压：后台写入跟不上时，由调用方写出一批后再入队
+            HISTORY_ROWS.inc(1, 'backpressure')
+            self._drain('backpressure')
+            self._queue.put(row)
+
+    # ==================== 后台写入 ====================
+
+    def _ensure_thread(self) -> None:
+        """启动后台写线程（fork出的子进程中重新启动）"""
+        with self._lock:
+            if self._thread is not None and self._thread_pid == os.getpid() and self._thread.is_alive():
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name='route-history-writer', daemon=True)
+            self._thread_pid = os.getpid()
+            self._thread.start()
+
+    def _run(self) -> None:
+        """攒够一批或等待超时后写入"""
+        while not self._stopping.is_set():
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            batch = [first]
+            deadline = time.monotonic() + self.flush_interval
+            trigger = 'size'
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self._stopping.is_set():
+                    trigger = 'time'
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    trigger = 'time'
+                    break
+            self._write(batch, trigger)
+
+    def _take_batch(self) -> List[Dict[str, Any]]:
+        """不等待地取出至多一批记录"""
+        batch = []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _drain(self, trigger: str) -> int:
+        """同步写出队列中的全部记录，返回写入条数"""
+        written = 0
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                return written
+            self._write(batch, trigger)
+            written += len(batch)
+
+    def _write(self, rows: List[Dict[str, Any]], trigger: str) -> None:
+        """在一个事务中批量插入（失败时回滚并计数，不影响后续批次）"""
+        app = self.app
+        try:
+            with self._flush_lock, HISTORY_FLUSH_SECONDS.time(trigger):
+                with app.app_context():
+                    try:
+                        self._insert(rows)
+                    except Exception:
+                        app.logger.exception('路线历史批量写入失败（%d条）', len(rows))
+        finally:
+            for _ in rows:
+                self._queue.task_done()
+
+    def _insert(self, rows: List[Dict[str, Any]]) -> None:
+        """在同一事务中写入路线内容、路线历史及其站点、展品热度计数并提交"""
+        try:
+            hashes = route_blob_store.store_many([row['route'] for row in rows])
+            histories = [
+                dict({key: value for key, value in row.items() if key not in ('route', 'stop_ids')},
+                     route_hash=content_hash, route_data=None)
+                for row, content_hash in zip(rows, hashes)
+            ]
+            # RETURNING 按参数顺序返回新记录ID，用于写入站点表
+            result = db.session.execute(
+                RouteHistory.__table__.insert().returning(
+                    RouteHistory.__table__.c.id, sort_by_parameter_order=True
+                ),
+                histories
+            )
+            stops = [
+                {'route_id': route_id, 'seq': seq, 'exhibit_id': exhibit_id}
+                for route_id, row in zip(result.scalars().all(), rows)
+                for seq, exhibit_id in enumerate(row.get('stop_ids', ()))
+            ]
+            if stops:
+                db.session.execute(RouteStop.__table__.insert(), stops)
+            # 整批路线的展品访问计数汇总后一次写入
+            popularity = PopularityDelta()
+            for row in rows:
+                popularity.add_visits(row.get('stop_ids', ()), row.get('created_at'))
+            apply_popularity(popularity)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            HISTORY_ROWS.inc(len(rows), 'failed')
+            raise
+        route_blob_store.committed(hashes)
+        HISTORY_ROWS.inc(len(rows), 'written')
+
+    def _wait_idle(self, timeout: float) -> bool:
+        """等待后台线程正在写入的批次完成"""
+        tasks = self._queue
+        deadline = time.monotonic() + timeout
+        with tasks.all_tasks_done:
+            while tasks.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                tasks.all_tasks_done.wait(remaining)
+        return True
+
+    def flush(self) -> int:
+        """立即写出全部待写记录（包括后台线程已取出、尚未写完的批次），返回本线程写入的条数"""
+        written = self._drain('flush')
+        self._wait_idle(self.flush_interval + FLUSH_WAIT_SLACK)
+        return written
+
+    def close(self) -> None:
+        """停止后台线程并写出剩余记录（进程退出时调用）"""
+        self._stopping.set()
+        thread = self._thread
+        if thread is not None and self._thread_pid == os.getpid():
+            thread.join(timeout=self.flush_interval + 1)
+        self._thread = None
+        self.flush()
+
+
+route_history_writer = RouteHistoryWriter()
+atexit.register(route_history_writer.close)
+
+metrics_registry.register(Gauge(
+    'route_history_pending', '等待写入的路线历史条数', route_history_writer.pending
+))
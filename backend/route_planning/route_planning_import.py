@@ -0,0 +1,434 @@
+# -*- coding: utf-8 -*-
+"""
+展品与布局批量导入模块
+Bulk Catalog Import for Route Planning
+从 CSV / JSON / JSONL 文件导入展品和布局：
+- 逐行校验，不合格的行记录行号和原因后跳过（strict 模式下整批放弃）
+- 合格的行在一个事务中批量写入：展品按ID插入或更新（executemany），布局按名称插入或更新
+- 任何写入失败都整体回滚，不留下部分数据；成功后目录快照只重建一次（版本号只加一）
+
+文件格式：
+- CSV：每行一个展品，列名与展品字段相同（id, name, description, location_x, location_y,
+  importance, visit_duration, category, period, is_active）
+- JSON：展品数组，或 {"exhibits": [...], "layouts": [...]}
+- JSONL：每行一个对象，"type": "layout" 的行为布局，其余为展品
+
+用法：
+    flask --app app import-catalog exhibits.csv [--dry-run] [--strict]
+    python -m backend.route_planning.route_planning_import exhibits.jsonl --database sqlite:////path/to/db.sqlite
+"""
+
+import argparse
+import csv
+import io
+import json
+import math
+import os
+import time
+from datetime import datetime
+from typing import Dict, Any, List, Iterator, Tuple, Optional, TextIO
+
+from sqlalchemy import insert, update
+
+from backend.models import db, Exhibit, MemorialLayout
+
+from .route_planning_catalog import catalog_store
+
+# 支持的文件格式（按扩展名识别）
+IMPORT_FORMATS = {
+    '.csv': 'csv',
+    '.json': 'json',
+    '.jsonl': 'jsonl',
+    '.ndjson': 'jsonl'
+}
+
+# 每条批量语句包含的行数
+IMPORT_CHUNK_SIZE = 1000
+
+# 报告中最多列出的不合格行数
+MAX_REPORTED_REJECTIONS = 200
+
+# 字段长度限制（与数据库列一致）
+MAX_ID_LENGTH = 50
+MAX_NAME_LENGTH = 200
+MAX_LABEL_LENGTH = 100
+
+# 建议参观时间上限（分钟）
+MAX_VISIT_DURATION = 600
+
+# 布局中以JSON存储的点位和通道字段
+LAYOUT_LIST_FIELDS = ('restrooms', 'rest_areas', 'emergency_exits', 'walkways')
+
+# 真值文本（CSV中的 is_active 列）
+TRUE_TEXT = ('1', 'true', 'yes', 'y', '是')
+FALSE_TEXT = ('0', 'false', 'no', 'n', '否')
+
+
+# ==================== 读取 ====================
+
+def detect_format(path: str, requested: Optional[str] = None) -> str:
+    """按参数或扩展名确定文件格式"""
+    if requested:
+        if requested not in IMPORT_FORMATS.values():
+            raise ValueError(f"不支持的格式: {requested}")
+        return requested
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in IMPORT_FORMATS:
+        raise ValueError(f"无法从扩展名识别格式: {path}（可用 --format 指定 csv / json / jsonl）")
+    return IMPORT_FORMATS[extension]
+
+
+def read_records(stream: TextIO, file_format: str) -> Iterator[Tuple[str, str, Any]]:
+    """逐条读取记录，产出 (位置, 类型 exhibit/layout, 原始记录)"""
+    if file_format == 'csv':
+        # 表头为第1行，数据从第2行开始
+        for line, record in enumerate(csv.DictReader(stream), start=2):
+            yield f"第{line}行", 'exhibit', record
+    elif file_format == 'jsonl':
+        for line, text in enumerate(stream, start=1):
+            if not text.strip():
+                continue
+            try:
+                record = json.loads(text)
+            except ValueError as e:
+                yield f"第{line}行", 'exhibit', ValueError(f"JSON格式错误: {e}")
+                continue
+            kind = record.pop('type', 'exhibit') if isinstance(record, dict) else 'exhibit'
+            yield f"第{line}行", kind, record
+    else:
+        document = json.load(stream)
+        if isinstance(document, list):
+            document = {'exhibits': document}
+        if not isinstance(document, dict):
+            raise ValueError('JSON文件应为展品数组或包含 exhibits / layouts 的对象')
+        for kind, key in (('exhibit', 'exhibits'), ('layout', 'layouts')):
+            for index, record in enumerate(document.get(key) or []):
+                yield f"{key}[{index}]", kind, record
+
+
+# ==================== 校验 ====================
+
+def _text(record: Dict[str, Any], field: str, max_length: int, required: bool = False) -> str:
+    value = record.get(field)
+    value = '' if value is None else str(value).strip()
+    if required and not value:
+        raise ValueError(f"缺少{field}")
+    if len(value) > max_length:
+        raise ValueError(f"{field}超过{max_length}个字符")
+    return value
+
+
+def _number(value: Any, field: str) -> float:
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{field}必须是数字")
+    if not math.isfinite(number):
+        raise ValueError(f"{field}必须是有限数字")
+    return number
+
+
+def _integer(record: Dict[str, Any], field: str, default: int, low: int, high: int) -> int:
+    value = record.get(field)
+    if value is None or value == '':
+        return default
+    number = _number(value, field)
+    if number != int(number) or not low <= number <= high:
+        raise ValueError(f"{field}必须是{low}到{high}之间的整数")
+    return int(number)
+
+
+def _flag(value: Any, field: str, default: bool = True) -> bool:
+    if value is None or value == '':
+        return default
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in TRUE_TEXT:
+        return True
+    if text in FALSE_TEXT:
+        return False
+    raise ValueError(f"{field}必须是布尔值")
+
+
+def _point(record: Dict[str, Any], field: str) -> Tuple[float, float]:
+    """坐标：[x, y]，或 field_x / field_y 两列"""
+    value = record.get(field)
+    if value is None:
+        value = (record.get(f"{field}_x"), record.get(f"{field}_y"))
+    if not isinstance(value, (list, tuple)) or len(value) != 2:
+        raise ValueError(f"{field}必须是[x, y]坐标")
+    return (_number(value[0], f"{field}_x"), _number(value[1], f"{field}_y"))
+
+
+def validate_exhibit(record: Any) -> Dict[str, Any]:
+    """校验一条展品记录，返回展品表的一行；不合格时抛出ValueError"""
+    if not isinstance(record, dict):
+        raise ValueError('展品记录必须是对象')
+    location_x, location_y = _point(record, 'location')
+    return {
+        'id': _text(record, 'id', MAX_ID_LENGTH, required=True),
+        'name': _text(record, 'name', MAX_NAME_LENGTH, required=True),
+        'description': _text(record, 'description', 10000),
+        'location_x': location_x,
+        'location_y': location_y,
+        'importance': _integer(record, 'importance', 3, 1, 5),
+        'visit_duration': _integer(record, 'visit_duration', 10, 1, MAX_VISIT_DURATION),
+        'category': _text(record, 'category', MAX_LABEL_LENGTH),
+        'period': _text(record, 'period', MAX_LABEL_LENGTH),
+        'is_active': _flag(record.get('is_active'), 'is_active')
+    }
+
+
+def validate_layout(record: Any) -> Dict[str, Any]:
+    """校验一条布局记录，返回布局表的一行（点位和通道编码为JSON）；不合格时抛出ValueError"""
+    if not isinstance(record, dict):
+        raise ValueError('布局记录必须是对象')
+    entrance = _point(record, 'entrance')
+    exit_point = _point(record, 'exit')
+    row = {
+        'name': _text(record, 'name', MAX_LABEL_LENGTH, required=True),
+        'entrance_x': entrance[0],
+        'entrance_y': entrance[1],
+        'exit_x': exit_point[0],
+        'exit_y': exit_point[1],
+        'is_active': _flag(record.get('is_active'), 'is_active')
+    }
+    for field in LAYOUT_LIST_FIELDS:
+        value = record.get(field) or []
+        if not isinstance(value, list):
+            raise ValueError(f"{field}必须是列表")
+        row[field] = json.dumps(value)
+    return row
+
+
+# ==================== 导入 ====================
+
+class ImportReport:
+    """导入结果：各类记录的写入数和不合格行"""
+
+    def __init__(self, file_format: str, dry_run: bool):
+        self.format = file_format
+        self.dry_run = dry_run
+        self.received = 0
+        self.exhibits_inserted = 0
+        self.exhibits_updated = 0
+        self.layouts_inserted = 0
+        self.layouts_updated = 0
+        self.rejected: List[Dict[str, Any]] = []
+        self.rejected_count = 0
+        self.committed = False
+        self.catalog_version = None
+        self.elapsed_ms = 0.0
+        self.refresh_ms = 0.0  # 其中重建目录快照的耗时
+
+    def reject(self, position: str, record: Any, error: Exception) -> None:
+        """记录一条不合格的行"""
+        self.rejected_count += 1
+        if len(self.rejected) < MAX_REPORTED_REJECTIONS:
+            record_id = (record.get('id') or record.get('name')) if isinstance(record, dict) else None
+            self.rejected.append({'row': position, 'id': record_id, 'error': str(error)})
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'format': self.format,
+            'dry_run': self.dry_run,
+            'committed': self.committed,
+            'received': self.received,
+            'exhibits': {'inserted': self.exhibits_inserted, 'updated': self.exhibits_updated},
+            'layouts': {'inserted': self.layouts_inserted, 'updated': self.layouts_updated},
+            'rejected_count': self.rejected_count,
+            'rejected': self.rejected,
+            'catalog_version': self.catalog_version,
+            'elapsed_ms': self.elapsed_ms,
+            'refresh_ms': self.refresh_ms
+        }
+
+
+def _chunks(rows: List[Dict[str, Any]], size: int = IMPORT_CHUNK_SIZE) -> Iterator[List[Dict[str, Any]]]:
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def _existing_exhibit_ids(ids: List[str]) -> set:
+    """已存在的展品ID（分块查询，避免超出SQL参数个数限制）"""
+    existing = set()
+    for start in range(0, len(ids), IMPORT_CHUNK_SIZE):
+        chunk = ids[start:start + IMPORT_CHUNK_SIZE]
+        existing.update(exhibit_id for (exhibit_id,) in
+                        db.session.query(Exhibit.id).filter(Exhibit.id.in_(chunk)))
+    return existing
+
+
+def _upsert_exhibits(rows: List[Dict[str, Any]], existing: set) -> None:
+    """批量插入或更新展品（SQLite / PostgreSQL 使用 ON CONFLICT DO UPDATE，其他数据库分别批量插入和更新）"""
+    now = datetime.utcnow()
+    for row in rows:
+        row['updated_at'] = now
+    table = Exhibit.__table__
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        statement = dialect_insert(table)
+        # created_at 只在插入时设置
+        statement = statement.on_conflict_do_update(
+            index_elements=['id'],
+            set_={column: statement.excluded[column] for column in rows[0] if column != 'id'}
+        )
+        for chunk in _chunks(rows):
+            db.session.execute(statement, chunk)
+        return
+
+    new_rows = [dict(row, created_at=now) for row in rows if row['id'] not in existing]
+    changed_rows = [row for row in rows if row['id'] in existing]
+    for chunk in _chunks(new_rows):
+        db.session.execute(insert(Exhibit), chunk)
+    for chunk in _chunks(changed_rows):
+        db.session.execute(update(Exhibit), chunk)
+
+
+def _upsert_layouts(rows: List[Dict[str, Any]], report: ImportReport) -> None:
+    """按名称插入或更新布局；导入了启用的布局时停用其他布局（目录只使用一个启用的布局）"""
+    existing = {layout.name: layout for layout in
+                MemorialLayout.query.filter(MemorialLayout.name.in_([row['name'] for row in rows]))}
+    if any(row['is_active'] for row in rows):
+        db.session.execute(
+            update(MemorialLayout)
+            .where(MemorialLayout.name.notin_([row['name'] for row in rows]))
+            .values(is_active=False)
+        )
+    for row in rows:
+        layout = existing.get(row['name'])
+        if layout is None:
+            db.session.add(MemorialLayout(**row))
+            report.layouts_inserted += 1
+        else:
+            for column, value in row.items():
+                setattr(layout, column, value)
+            report.layouts_updated += 1
+
+
+def import_catalog(stream: TextIO, file_format: str, dry_run: bool = False,
+                   strict: bool = False) -> Dict[str, Any]:
+    """导入展品和布局（需要应用上下文），返回导入报告
+
+    dry_run: 只校验不写入；strict: 有不合格的行时整批不写入
+    同一文件中重复的展品ID或布局名称，后出现的行视为不合格
+    """
+    started = time.perf_counter()
+    report = ImportReport(file_format, dry_run)
+    exhibits: Dict[str, Dict[str, Any]] = {}
+    layouts: Dict[str, Dict[str, Any]] = {}
+
+    for position, kind, record in read_records(stream, file_format):
+        report.received += 1
+        try:
+            if isinstance(record, Exception):
+                raise record
+            if kind == 'layout':
+                row = validate_layout(record)
+                if row['name'] in layouts:
+                    raise ValueError(f"布局名称重复: {row['name']}")
+                layouts[row['name']] = row
+            elif kind == 'exhibit':
+                row = validate_exhibit(record)
+                if row['id'] in exhibits:
+                    raise ValueError(f"展品ID重复: {row['id']}")
+                exhibits[row['id']] = row
+            else:
+                raise ValueError(f"未知的记录类型: {kind}")
+        except ValueError as e:
+            report.reject(position, record, e)
+
+    if dry_run or (strict and report.rejected_count):
+        report.elapsed_ms = round((time.perf_counter() - started) * 1000, 2)
+        return report.to_dict()
+
+    rows = list(exhibits.values())
+    try:
+        existing = _existing_exhibit_ids(list(exhibits))
+        if rows:
+            _upsert_exhibits(rows, existing)
+        if layouts:
+            _upsert_layouts(list(layouts.values()), report)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    report.exhibits_updated = len(existing)
+    report.exhibits_inserted = len(rows) - len(existing)
+    report.committed = True
+
+    # 全部写入后只重建一次目录快照
+    if rows or layouts:
+        refresh_started = time.perf_counter()
+        report.catalog_version = catalog_store.refresh().version
+        report.refresh_ms = round((time.perf_counter() - refresh_started) * 1000, 2)
+    report.elapsed_ms = round((time.perf_counter() - started) * 1000, 2)
+    return report.to_dict()
+
+
+def import_catalog_file(path: str, file_format: Optional[str] = None, dry_run: bool = False,
+                        strict: bool = False) -> Dict[str, Any]:
+    """从文件导入（需要应用上下文）"""
+    file_format = detect_format(path, file_format)
+    with open(path, 'r', encoding='utf-8-sig', newline='') as stream:
+        return import_catalog(stream, file_format, dry_run=dry_run, strict=strict)
+
+
+def import_catalog_records(exhibits: List[Dict[str, Any]], layouts: List[Dict[str, Any]] = (),
+                           strict: bool = True) -> Dict[str, Any]:
+    """从内存中的记录导入（示例数据初始化等场景）"""
+    document = json.dumps({'exhibits': list(exhibits), 'layouts': list(layouts)}, ensure_ascii=False)
+    return import_catalog(io.StringIO(document), 'json', strict=strict)
+
+
+# ==================== 命令行 ====================
+
+def register_import_command(app) -> None:
+    """注册 flask import-catalog 命令"""
+    import click
+
+    @app.cli.command('import-catalog')
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--format', 'file_format', type=click.Choice(sorted(set(IMPORT_FORMATS.values()))),
+                  help='文件格式（默认按扩展名识别）')
+    @click.option('--dry-run', is_flag=True, help='只校验，不写入')
+    @click.option('--strict', is_flag=True, help='有不合格的行时整批不写入')
+    def import_catalog_command(path, file_format, dry_run, strict):
+        """从 CSV / JSON / JSONL 批量导入展品和布局"""
+        report = import_catalog_file(path, file_format, dry_run=dry_run, strict=strict)
+        click.echo(json.dumps(report, ensure_ascii=False, indent=2))
+        if report['rejected_count'] and (strict or dry_run):
+            raise SystemExit(1)
+
+
+def main(argv=None) -> None:
+    """独立运行的命令行入口（不加载完整应用，直接连接指定数据库）"""
+    parser = argparse.ArgumentParser(description='批量导入展品和布局')
+    parser.add_argument('path')
+    parser.add_argument('--database', required=True, help='SQLAlchemy数据库URI')
+    parser.add_argument('--format', dest='file_format', choices=sorted(set(IMPORT_FORMATS.values())))
+    parser.add_argument('--dry-run', action='store_true', help='只校验，不写入')
+    parser.add_argument('--strict', action='store_true', help='有不合格的行时整批不写入')
+    args = parser.parse_args(argv)
+
+    from flask import Flask
+    from .route_planning_sqlite import setup_database
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = args.database
+    setup_database(app)
+    with app.app_context():
+        db.create_all()
+        report = import_catalog_file(args.path, args.file_format, dry_run=args.dry_run, strict=args.strict)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if report['rejected_count'] and (args.strict or args.dry_run):
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
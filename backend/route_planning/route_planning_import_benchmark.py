@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+展品批量导入基准测试
+Bulk Catalog Import Benchmark for Route Planning
+用合成场馆生成CSV文件，在临时SQLite数据库上比较：
+- 逐行导入：对每行调用 create_exhibit（每行一次提交），目录快照最后刷新一次
+- 批量导入：import_catalog_file 一个事务写入全部行（首次为插入，再次导入同一文件为更新）
+逐行导入较慢，默认只取前 --per-row 行测量，按行/秒比较；行/秒只计写入，
+导入后重建目录快照（含通道距离矩阵）的耗时单独列出
+
+用法：
+    python -m backend.route_planning.route_planning_import_benchmark --rows 10000 --per-row 1000
+"""
+
+import argparse
+import csv
+import json
+import os
+import tempfile
+import time
+from typing import Dict, Any, List
+
+from flask import Flask
+
+from backend.models import db
+
+from .route_planning_catalog import catalog_store
+from .route_planning_database import RoutePlanningDatabase
+from .route_planning_import import import_catalog_file
+from .route_planning_sqlite import setup_database
+from .route_planning_synthetic import SyntheticVenueGenerator
+
+# 默认行数、逐行导入测量的行数、随机种子
+DEFAULT_ROWS = 10000
+DEFAULT_PER_ROW = 1000
+DEFAULT_SEED = 20250806
+
+# CSV列
+CSV_COLUMNS = ('id', 'name', 'description', 'location_x', 'location_y',
+               'importance', 'visit_duration', 'category', 'period')
+
+
+def write_csv(path: str, rows: int, seed: int) -> List[Dict[str, Any]]:
+    """生成合成展品并写入CSV，返回行数据"""
+    exhibits, _ = SyntheticVenueGenerator(seed).generate(rows)
+    records = [
+        {'id': exhibit.id, 'name': exhibit.name, 'description': exhibit.description,
+         'location_x': exhibit.location[0], 'location_y': exhibit.location[1],
+         'importance': exhibit.importance, 'visit_duration': exhibit.visit_duration,
+         'category': exhibit.category, 'period': exhibit.period}
+        for exhibit in exhibits
+    ]
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_COLUMNS)
+        writer.writeheader()
+        writer.writerows(records)
+    return records
+
+
+def build_app(path: str) -> Flask:
+    """创建使用指定数据库文件的应用"""
+    app = Flask(__name__)
+    app.config.update(SQLALCHEMY_DATABASE_URI=f"sqlite:///{path}", SQLALCHEMY_TRACK_MODIFICATIONS=False)
+    setup_database(app)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def _dispose(app: Flask) -> None:
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+def run_per_row(directory: str, records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """逐行调用 create_exhibit 导入"""
+    app = build_app(os.path.join(directory, 'per_row.db'))
+    with app.app_context():
+        started = time.perf_counter()
+        for record in records:
+            RoutePlanningDatabase.create_exhibit(
+                record['id'], record['name'], record['description'],
+                record['location_x'], record['location_y'], record['importance'],
+                record['visit_duration'], record['category'], record['period'],
+                refresh_catalog=False
+            )
+        elapsed = time.perf_counter() - started
+        refresh_started = time.perf_counter()
+        catalog_store.refresh()
+        refresh = time.perf_counter() - refresh_started
+    _dispose(app)
+    return {'rows': len(records), 'seconds': round(elapsed, 3), 'rows_per_second': round(len(records) / elapsed),
+            'refresh_seconds': round(refresh, 3)}
+
+
+def run_bulk(directory: str, csv_path: str) -> Dict[str, Any]:
+    """批量导入CSV两次：首次全部插入，再次全部更新"""
+    app = build_app(os.path.join(directory, 'bulk.db'))
+    results = {}
+    with app.app_context():
+        for name in ('insert', 'update'):
+            started = time.perf_counter()
+            report = import_catalog_file(csv_path)
+            refresh = report['refresh_ms'] / 1000
+            elapsed = time.perf_counter() - started - refresh
+            rows = report['exhibits']['inserted'] + report['exhibits']['updated']
+            results[name] = {
+                'rows': rows, 'seconds': round(elapsed, 3), 'rows_per_second': round(rows / elapsed),
+                'refresh_seconds': round(refresh, 3),
+                'inserted': report['exhibits']['inserted'], 'updated': report['exhibits']['updated'],
+                'rejected': report['rejected_count'], 'catalog_version': report['catalog_version']
+            }
+    _dispose(app)
+    return results
+
+
+def run_benchmark(rows: int = DEFAULT_ROWS, per_row: int = DEFAULT_PER_ROW,
+                  seed: int = DEFAULT_SEED) -> Dict[str, Any]:
+    """逐行导入与批量导入的对比（各自使用新的临时数据库）"""
+    with tempfile.TemporaryDirectory() as directory:
+        csv_path = os.path.join(directory, 'exhibits.csv')
+        records = write_csv(csv_path, rows, seed)
+        per_row_result = run_per_row(directory, records[:per_row])
+        bulk = run_bulk(directory, csv_path)
+    return {'rows': rows, 'per_row': per_row_result, 'bulk': bulk}
+
+
+def main(argv=None) -> None:
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description='展品批量导入基准测试')
+    parser.add_argument('--rows', type=int, default=DEFAULT_ROWS, help='批量导入的行数')
+    parser.add_argument('--per-row', type=int, default=DEFAULT_PER_ROW, help='逐行导入测量的行数')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--output', help='结果JSON文件路径')
+    args = parser.parse_args(argv)
+
+    results = run_benchmark(args.rows, args.per_row, args.seed)
+    per_row = results['per_row']
+    print(f"  逐行导入: {per_row['rows']:>6} 行  {per_row['seconds']:>8}s  {per_row['rows_per_second']:>8} 行/秒  "
+          f"重建目录 {per_row['refresh_seconds']}s")
+    for name, result in results['bulk'].items():
+        print(f"批量{'插入' if name == 'insert' else '更新'}: {result['rows']:>6} 行  {result['seconds']:>8}s  "
+              f"{result['rows_per_second']:>8} 行/秒  重建目录 {result['refresh_seconds']}s  "
+              f"目录版本 {result['catalog_version']}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,350 @@
+# -*- coding: utf-8 -*-
+"""
+路线规划大模型讲解词客户端
+LLM Enrichment Client for Route Planning
+为路线中的展品生成面向不同受众的讲解词：
+- 后台事件循环中异步调用模型服务，并发数有上限，单次调用有超时
+- 结果按 (展品, 受众, 语言) 缓存，LRU淘汰并持久化到磁盘
+- 路线生成只读取缓存，未命中时立即使用模板文本并在后台补齐，
+  接口延迟与模型延迟无关
+"""
+
+import asyncio
+import atexit
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Dict, Any, Optional, Tuple
+from urllib.parse import urlsplit
+
+from .route_planning_core import Exhibit, LLMIntegration
+from .route_planning_catalog import CatalogSnapshot
+from .route_planning_metrics import Counter, metrics_registry
+
+# 默认并发上限、单次调用超时（秒）与缓存容量
+DEFAULT_LLM_CONCURRENCY = 4
+DEFAULT_LLM_TIMEOUT = 2.0
+DEFAULT_LLM_CACHE_SIZE = 5000
+
+# 缓存落盘间隔（秒）
+CACHE_FLUSH_INTERVAL = 5.0
+
+# 讲解词来源
+SOURCE_LLM = 'llm'
+SOURCE_TEMPLATE = 'template'
+
+LLM_CALLS = metrics_registry.register(Counter(
+    'llm_enrichment_calls_total', '讲解词模型调用次数', ('result',)
+))
+
+
+def audience_for(preferences: Dict[str, Any]) -> str:
+    """由标准化偏好确定讲解词受众（与 LLMIntegration 模板的受众一致）"""
+    if preferences.get('visit_purpose') == 'research':
+        return 'researcher'
+    if preferences.get('age_group') == 'child':
+        return 'child'
+    return 'adult'
+
+
+def _cache_key(exhibit_id: str, audience: str, language: str) -> str:
+    """缓存键（同时用作持久化文件中的键）"""
+    return f"{exhibit_id}|{audience}|{language}"
+
+
+async def _read_response(reader: asyncio.StreamReader) -> Tuple[int, bytes]:
+    """读取一个HTTP/1.1响应，返回 (状态码, 响应体)
+
+    支持 chunked 传输编码；有 Content-Length 时按长度读取，连接提前关闭时抛出异常；
+    两者都没有时读到连接关闭为止（请求带 Connection: close）
+    """
+    status_line = await reader.readline()
+    parts = status_line.split()
+    if len(parts) < 2 or not parts[0].startswith(b'HTTP/') or not parts[1].isdigit():
+        raise RuntimeError(f"模型服务返回了无效的状态行: {status_line[:80]!r}")
+    status = int(parts[1])
+
+    headers: Dict[str, str] = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    try:
+        if 'chunked' in headers.get('transfer-encoding', '').lower():
+            chunks = []
+            while True:
+                size_line = await reader.readline()
+                size = int(size_line.split(b';', 1)[0], 16)
+                if size == 0:
+                    # 跳过尾部字段直到空行
+                    while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                        pass
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readline()
+            return status, b''.join(chunks)
+        if 'content-length' in headers:
+            return status, await reader.readexactly(int(headers['content-length']))
+    except asyncio.IncompleteReadError as e:
+        raise RuntimeError(f"模型服务响应不完整（收到 {len(e.partial)} 字节）") from None
+    except ValueError:
+        raise RuntimeError('模型服务响应的长度字段无效') from None
+    return status, await reader.read()
+
+
+class EnrichmentCache:
+    """讲解词LRU缓存，可持久化到JSON文件"""
+
+    def __init__(self, max_size: int = DEFAULT_LLM_CACHE_SIZE, path: str = None):
+        self.max_size = max_size
+        self.path = path
+        self._entries: 'OrderedDict[str, str]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._dirty = False
+        if path:
+            self.load()
+
+    def get(self, key: str) -> Optional[str]:
+        """读取缓存并标记为最近使用"""
+        with self._lock:
+            text = self._entries.get(key)
+            if text is not None:
+                self._entries.move_to_end(key)
+            return text
+
+    def put(self, key: str, text: str) -> None:
+        """写入缓存，超出容量时淘汰最久未使用的条目"""
+        with self._lock:
+            self._entries[key] = text
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            self._dirty = True
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _read_file(self) -> Dict[str, str]:
+        """读取磁盘上的缓存文件（不存在或损坏时返回空字典）"""
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return entries if isinstance(entries, dict) else {}
+
+    def load(self) -> None:
+        """从磁盘加载（文件不存在或损坏时从空缓存开始）"""
+        entries = self._read_file()
+        with self._lock:
+            # 文件中按最近使用顺序保存，只保留最新的max_size条
+            for key, text in list(entries.items())[-self.max_size:]:
+                self._entries[key] = text
+
+    def save(self) -> None:
+        """有新条目时与磁盘上的内容合并后原子地写回
+
+        多个工作进程共享同一个缓存文件：每个进程写入各自的临时文件，
+        并先合并其他进程已写入的条目（本进程的条目视为最近使用），避免互相覆盖
+        """
+        if not self.path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            snapshot = OrderedDict(self._entries)
+            self._dirty = False
+        merged = OrderedDict((key, text) for key, text in self._read_file().items() if key not in snapshot)
+        merged.update(snapshot)
+        entries = dict(list(merged.items())[-self.max_size:])
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f"{os.path.basename(self.path)}.", suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(entries, f, ensure_ascii=False)
+            os.replace(temp_path, self.path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+
+class LLMEnrichmentClient:
+    """异步、有界、带缓存的讲解词客户端
+
+    endpoint 为空时不调用模型，所有讲解词使用模板文本
+    """
+
+    def __init__(self, endpoint: str = None, concurrency: int = DEFAULT_LLM_CONCURRENCY,
+                 timeout: float = DEFAULT_LLM_TIMEOUT, cache: EnrichmentCache = None):
+        self.endpoint = endpoint
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.cache = cache or EnrichmentCache()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_pid: Optional[int] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def configure(self, endpoint: str = None, concurrency: int = None, timeout: float = None,
+                  cache_size: int = None, cache_path: str = None) -> None:
+        """按部署配置调整（在开始处理请求前调用）"""
+        self.endpoint = endpoint
+        if concurrency is not None:
+            self.concurrency = concurrency
+        if timeout is not None:
+            self.timeout = timeout
+        if cache_size is not None or cache_path is not None:
+            self.cache = EnrichmentCache(cache_size or self.cache.max_size, cache_path)
+
+    # ==================== 后台事件循环 ====================
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        """首次调用模型时启动后台事件循环线程（fork出的子进程不继承线程，重新启动）"""
+        with self._lock:
+            if self._loop is not None and self._loop_pid != os.getpid():
+                self._loop = None
+                self._inflight = {}
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+
+                def run():
+                    asyncio.set_event_loop(loop)
+                    self._semaphore = asyncio.Semaphore(self.concurrency)
+                    loop.create_task(self._flush_periodically())
+                    ready.set()
+                    loop.run_forever()
+
+                threading.Thread(target=run, name='llm-enrichment', daemon=True).start()
+                ready.wait()
+                self._loop = loop
+                self._loop_pid = os.getpid()
+            return self._loop
+
+    async def _flush_periodically(self) -> None:
+        """定期把新增的缓存条目落盘"""
+        while True:
+            await asyncio.sleep(CACHE_FLUSH_INTERVAL)
+            await asyncio.get_running_loop().run_in_executor(None, self.cache.save)
+
+    def close(self) -> None:
+        """停止后台循环并落盘缓存"""
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is not None and self._loop_pid == os.getpid():
+            loop.call_soon_threadsafe(loop.stop)
+        self.cache.save()
+
+    # ==================== 模型调用 ====================
+
+    async def _post_json(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """向模型服务发送一次JSON请求（HTTP/1.1，短连接；响应体可为chunked编码）"""
+        url = urlsplit(self.endpoint)
+        secure = url.scheme == 'https'
+        reader, writer = await asyncio.open_connection(
+            url.hostname, url.port or (443 if secure else 80), ssl=True if secure else None
+        )
+        try:
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            target = (url.path or '/') + (f'?{url.query}' if url.query else '')
+            head = (f"POST {target} HTTP/1.1\r\n"
+                    f"Host: {url.netloc}\r\n"
+                    "Content-Type: application/json\r\n"
+                    f"Content-Length: {len(body)}\r\n"
+                    "Connection: close\r\n\r\n")
+            writer.write(head.encode('ascii') + body)
+            await writer.drain()
+
+            status, data = await _read_response(reader)
+            if status != 200:
+                raise RuntimeError(f"模型服务返回状态码 {status}")
+            return json.loads(data.decode('utf-8'))
+        finally:
+            writer.close()
+
+    async def _describe(self, exhibit: Exhibit, audience: str, language: str) -> Tuple[str, str]:
+        """调用模型生成讲解词，超时或失败时退回模板文本"""
+        async with self._semaphore:
+            try:
+                result = await asyncio.wait_for(self._post_json({
+                    'exhibit': {
+                        'id': exhibit.id,
+                        'name': exhibit.name,
+                        'description': exhibit.description,
+                        'category': exhibit.category,
+                        'period': exhibit.period
+                    },
+                    'audience': audience,
+                    'language': language
+                }), self.timeout)
+                text = str(result['text'])
+            except Exception as e:
+                LLM_CALLS.inc(1, 'timeout' if isinstance(e, asyncio.TimeoutError) else 'error')
+                return LLMIntegration.generate_exhibit_description(exhibit, audience), SOURCE_TEMPLATE
+        LLM_CALLS.inc(1, 'ok')
+        self.cache.put(_cache_key(exhibit.id, audience, language), text)
+        return text, SOURCE_LLM
+
+    def describe(self, exhibit: Exhibit, audience: str, language: str = 'zh') -> Future:
+        """异步获取讲解词，返回结果为 (文本, 来源) 的Future；相同的未完成请求只调用一次模型"""
+        key = _cache_key(exhibit.id, audience, language)
+        future: Future = Future()
+        cached = self.cache.get(key)
+        if cached is not None:
+            future.set_result((cached, SOURCE_LLM))
+            return future
+        if not self.endpoint:
+            future.set_result((LLMIntegration.generate_exhibit_description(exhibit, audience), SOURCE_TEMPLATE))
+            return future
+
+        loop = self._ensure_loop()
+        with self._lock:
+            inflight = self._inflight.get(key)
+            if inflight is not None:
+                return inflight
+            future = asyncio.run_coroutine_threadsafe(self._describe(exhibit, audience, language), loop)
+            self._inflight[key] = future
+        future.add_done_callback(lambda _: self._forget(key))
+        return future
+
+    def _forget(self, key: str) -> None:
+        """请求完成后移出进行中列表"""
+        with self._lock:
+            self._inflight.pop(key, None)
+
+    def describe_now(self, exhibit: Exhibit, audience: str, language: str = 'zh') -> Tuple[str, str]:
+        """立即返回讲解词：缓存命中用模型结果，否则用模板文本并在后台请求模型"""
+        future = self.describe(exhibit, audience, language)
+        if future.done():
+            return future.result()
+        return LLMIntegration.generate_exhibit_description(exhibit, audience), SOURCE_TEMPLATE
+
+
+llm_client = LLMEnrichmentClient()
+atexit.register(llm_client.close)
+
+
+def attach_guide_texts(route: Dict[str, Any], snapshot: CatalogSnapshot, audience: str,
+                       language: str = 'zh', client: LLMEnrichmentClient = None) -> Dict[str, Any]:
+    """返回带讲解词的路线副本（不修改缓存中共享的路线）
+
+    未命中缓存的讲解词先用模板文本，模型结果在后台写入缓存供后续请求使用
+    """
+    client = client or llm_client
+    stops = []
+    for stop in route['route']:
+        row = snapshot.table.row.get(stop['id'])
+        if row is None:
+            stops.append(stop)
+            continue
+        text, source = client.describe_now(snapshot.exhibits[row], audience, language)
+        stops.append(dict(stop, guide_text=text, guide_source=source))
+    return dict(route, route=stops)
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+路线规划讲解词模型本地替身服务
+Local LLM Stub Server for Route Planning
+实现与 LLMEnrichmentClient 相同的接口（POST JSON，返回 {"text": ...}），
+延迟、抖动和失败率可配置，用于开发、测试和基准测试
+
+用法：
+    python -m backend.route_planning.route_planning_llm_stub --port 8090 --latency-ms 800
+然后在配置中设置 LLM_ENDPOINT = 'http://127.0.0.1:8090/v1/describe'
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Tuple
+
+# 各受众的讲解词开头
+AUDIENCE_OPENINGS = {
+    'child': '小朋友们，我们来认识',
+    'adult': '欢迎参观',
+    'researcher': '从史料研究的角度看，'
+}
+
+
+class StubSettings:
+    """替身服务的延迟与失败率设置"""
+
+    def __init__(self, latency_ms: float = 500.0, jitter_ms: float = 0.0, failure_rate: float = 0.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.failure_rate = failure_rate
+
+
+def _make_handler(settings: StubSettings):
+    """生成绑定了设置的请求处理类"""
+
+    class StubHandler(BaseHTTPRequestHandler):
+        """讲解词请求处理"""
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            try:
+                payload = json.loads(self.rfile.read(length).decode('utf-8'))
+                exhibit = payload['exhibit']
+            except (ValueError, KeyError):
+                self._reply(400, {'error': 'invalid payload'})
+                return
+
+            delay = settings.latency_ms + random.uniform(-settings.jitter_ms, settings.jitter_ms)
+            time.sleep(max(0.0, delay) / 1000.0)
+            if random.random() < settings.failure_rate:
+                self._reply(503, {'error': 'simulated failure'})
+                return
+
+            opening = AUDIENCE_OPENINGS.get(payload.get('audience'), AUDIENCE_OPENINGS['adult'])
+            self._reply(200, {
+                'text': f"{opening}{exhibit.get('name', '')}。{exhibit.get('description', '')}",
+                'model': 'local-stub'
+            })
+
+        def _reply(self, status: int, body: dict):
+            data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            """不输出每个请求的访问日志"""
+
+    return StubHandler
+
+
+def start_stub_server(host: str = '127.0.0.1', port: int = 0,
+                      settings: StubSettings = None) -> Tuple[ThreadingHTTPServer, str]:
+    """在后台线程启动替身服务，返回 (服务实例, 接口地址)；port为0时自动分配端口"""
+    server = ThreadingHTTPServer((host, port), _make_handler(settings or StubSettings()))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='llm-stub', daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1/describe"
+
+
+def main(argv=None) -> None:
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description='讲解词模型本地替身服务')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8090)
+    parser.add_argument('--latency-ms', type=float, default=500.0, help='每次调用的平均延迟')
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help='延迟的随机波动范围')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='返回503的概率')
+    args = parser.parse_args(argv)
+
+    settings = StubSettings(args.latency_ms, args.jitter_ms, args.failure_rate)
+    server = ThreadingHTTPServer((args.host, args.port), _make_handler(settings))
+    print(f"讲解词替身服务: http://{args.host}:{args.port}/v1/describe "
+          f"(延迟 {args.latency_ms}±{args.jitter_ms}ms, 失败率 {args.failure_rate})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
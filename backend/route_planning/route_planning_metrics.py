@@ -0,0 +1,314 @@
+# -*- coding: utf-8 -*-
+"""
+路线规划运行指标模块
+Runtime Metrics for Route Planning
+低开销的进程内指标，按 Prometheus 文本格式导出：
+- 路线优化各阶段耗时直方图
+- 每个接口的请求延迟直方图
+- 每个请求的 SQLAlchemy 查询次数与耗时
+每次记录只做一次二分查找和加锁自增，可在生产环境常开
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from typing import List, Dict, Any, Tuple, Callable
+
+from flask import g, request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# 默认延迟分桶（秒）
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# 优化阶段分桶（秒），阶段耗时通常在亚毫秒到几十毫秒之间
+STAGE_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+# 单个请求的查询次数分桶
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+# Prometheus 导出的 Content-Type
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value: Any) -> str:
+    """转义标签值中的反斜杠、引号和换行"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple, extra: str = '') -> str:
+    """拼接 {name="value",...} 形式的标签"""
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _format_number(value: float) -> str:
+    """整数值不带小数点输出"""
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    """单调递增计数器"""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, *labels) -> None:
+        """按标签值（与label_names顺序一致）累加"""
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels) -> float:
+        """读取当前值"""
+        return self._values.get(labels, 0.0)
+
+    def render(self) -> List[str]:
+        """导出为 Prometheus 文本行"""
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f'{self.name}{_format_labels(self.label_names, labels)} {_format_number(value)}'
+                for labels, value in items]
+
+
+class Gauge:
+    """在导出时通过回调读取当前值的仪表"""
+
+    kind = 'gauge'
+
+    def __init__(self, name: str, help_text: str, read: Callable[[], float]):
+        self.name = name
+        self.help_text = help_text
+        self.read = read
+
+    def render(self) -> List[str]:
+        """导出为 Prometheus 文本行"""
+        return [f'{self.name} {_format_number(self.read())}']
+
+
+class Histogram:
+    """固定分桶直方图，各桶内部按非累积计数存储，导出时再累加"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...] = LATENCY_BUCKETS,
+                 label_names: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(sorted(buckets))
+        self.label_names = tuple(label_names)
+        # 标签值 -> [各桶计数..., +Inf桶计数, 总和]
+        self._series: Dict[Tuple, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels) -> None:
+        """记录一次观测值"""
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def time(self, *labels) -> '_Timer':
+        """以秒为单位记录代码块耗时：with histogram.time(...): ..."""
+        return _Timer(self, labels)
+
+    def summary(self) -> Dict[Tuple, Dict[str, float]]:
+        """各标签组合的观测次数与总和"""
+        with self._lock:
+            return {labels: {'count': sum(series[:-1]), 'sum': series[-1]}
+                    for labels, series in self._series.items()}
+
+    def render(self) -> List[str]:
+        """导出为 Prometheus 文本行"""
+        with self._lock:
+            items = sorted((labels, list(series)) for labels, series in self._series.items())
+        lines = []
+        for labels, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series[:-1]):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float('inf') else f'le="{_format_number(bound)}"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.label_names, labels, le)} {cumulative}')
+            label_text = _format_labels(self.label_names, labels)
+            lines.append(f'{self.name}_sum{label_text} {_format_number(series[-1])}')
+            lines.append(f'{self.name}_count{label_text} {cumulative}')
+        return lines
+
+
+class _Timer:
+    """直方图计时上下文（比生成器实现的上下文管理器开销更低）"""
+
+    __slots__ = ('histogram', 'labels', 'started')
+
+    def __init__(self, histogram: Histogram, labels: Tuple):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self) -> '_Timer':
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.histogram.observe(time.perf_counter() - self.started, *self.labels)
+
+
+class MetricsRegistry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        """注册指标（同名指标只保留第一次注册的实例）"""
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def unregister(self, name: str) -> None:
+        """移除指标"""
+        with self._lock:
+            self._metrics.pop(name, None)
+
+    def render(self) -> str:
+        """导出全部指标的 Prometheus 文本"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.help_text}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+# ==================== 进程级指标 ====================
+
+metrics_registry = MetricsRegistry()
+
+STAGE_SECONDS = metrics_registry.register(Histogram(
+    'route_planning_stage_seconds', '路线规划各阶段耗时（秒）', STAGE_BUCKETS, ('stage',)
+))
+REQUEST_SECONDS = metrics_registry.register(Histogram(
+    'http_request_duration_seconds', '接口请求延迟（秒）', LATENCY_BUCKETS, ('endpoint', 'method', 'status')
+))
+REQUEST_QUERIES = metrics_registry.register(Histogram(
+    'http_request_db_queries', '单个请求执行的SQL查询次数', QUERY_COUNT_BUCKETS, ('endpoint',)
+))
+REQUEST_QUERY_SECONDS = metrics_registry.register(Histogram(
+    'http_request_db_seconds', '单个请求的SQL查询总耗时（秒）', LATENCY_BUCKETS, ('endpoint',)
+))
+DB_QUERIES = metrics_registry.register(Counter(
+    'db_queries_total', '已执行的SQL查询总数'
+))
+DB_QUERY_SECONDS = metrics_registry.register(Counter(
+    'db_query_seconds_total', 'SQL查询累计耗时（秒）'
+))
+
+PROCESS_STARTED_AT = time.time()
+
+
+def stage_timer(stage: str) -> _Timer:
+    """路线规划阶段计时：with stage_timer('select'): ..."""
+    return STAGE_SECONDS.time(stage)
+
+
+# ==================== SQLAlchemy 查询计数 ====================
+
+_sqlalchemy_installed = False
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    """记录查询开始时间"""
+    conn.info.setdefault('query_started_at', []).append(time.perf_counter())
+
+
+def _record_query(conn) -> None:
+    """取出最近一次查询的开始时间，累计查询次数与耗时（全局计数 + 当前请求计数）"""
+    started = conn.info.get('query_started_at')
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    DB_QUERIES.inc()
+    DB_QUERY_SECONDS.inc(elapsed)
+    if has_request_context():
+        g.db_queries = g.get('db_queries', 0) + 1
+        g.db_seconds = g.get('db_seconds', 0.0) + elapsed
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    """查询成功完成"""
+    _record_query(conn)
+
+
+def _handle_error(exception_context):
+    """查询抛出异常时同样取出开始时间，避免连接上的记录随失败的查询不断累积"""
+    if exception_context.connection is not None and exception_context.execution_context is not None:
+        _record_query(exception_context.connection)
+
+
+def install_sqlalchemy_metrics() -> None:
+    """在所有SQLAlchemy引擎上统计查询次数与耗时（只安装一次）"""
+    global _sqlalchemy_installed
+    if _sqlalchemy_installed:
+        return
+    event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(Engine, 'handle_error', _handle_error)
+    _sqlalchemy_installed = True
+
+
+# ==================== Flask 请求计时 ====================
+
+def install_request_metrics(app) -> None:
+    """为应用的每个请求记录延迟和SQL查询统计"""
+    install_sqlalchemy_metrics()
+
+    @app.before_request
+    def _start_request_timer():
+        g.request_started_at = time.perf_counter()
+
+    @app.after_request
+    def _record_request_metrics(response):
+        started = g.pop('request_started_at', None)
+        if started is None:
+            return response
+        # 按路由规则而非具体URL聚合，避免标签数量无限增长
+        endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint, request.method, response.status_code)
+        REQUEST_QUERIES.observe(g.get('db_queries', 0), endpoint)
+        REQUEST_QUERY_SECONDS.observe(g.get('db_seconds', 0.0), endpoint)
+        return response
+
+
+def request_totals() -> Dict[str, Any]:
+    """请求与查询汇总（供系统状态接口使用）"""
+    requests = errors = 0
+    latency = 0.0
+    for (endpoint, method, status), item in REQUEST_SECONDS.summary().items():
+        requests += item['count']
+        latency += item['sum']
+        if int(status) >= 500:
+            errors += item['count']
+    return {
+        'requests': requests,
+        'server_errors': errors,
+        'mean_latency_ms': round(latency / requests * 1000, 2) if requests else 0.0,
+        'db_queries': int(DB_QUERIES.value()),
+        'db_query_ms': round(DB_QUERY_SECONDS.value() * 1000, 2),
+        'uptime_seconds': round(time.time() - PROCESS_STARTED_AT, 1)
+    }
+
+
+def render_metrics() -> str:
+    """导出全部指标（Prometheus 文本格式）"""
+    return metrics_registry.render()
@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+"""
+展品热度计数模块
+Incremental Exhibit Popularity Counters for Route Planning
+热门展品不再扫描全部路线历史，而是读取增量维护的计数：
+- 保存路线时，路线中每个展品的访问次数 +1
+- 提交反馈时，评分计入路线中每个展品；实际用时扣除步行时间后按建议参观时长分摊为各展品的停留时间
+- 计数同时写入累计表（exhibit_popularity）和按UTC日期分桶的日表（exhibit_daily_stats），
+  与路线历史在同一事务中更新；今日/近7天热门只读取对应日期的行
+"""
+
+import json
+from collections import defaultdict
+from datetime import datetime, date, timedelta
+from typing import Dict, Any, List, Iterable, Optional, Tuple
+
+from sqlalchemy import func, select
+
+from backend.models import db, ExhibitPopularity, ExhibitDailyStat, RouteHistory, RouteStop
+
+from .route_planning_catalog import catalog_store
+from .route_planning_blobs import route_blob_store
+from .route_planning_sqlite import read_session
+
+# 时间窗口：累计、今日、近7天（含今日）
+WINDOW_ALL = 'all'
+WINDOW_TODAY = 'today'
+WINDOW_WEEK = 'week'
+POPULARITY_WINDOWS = (WINDOW_ALL, WINDOW_TODAY, WINDOW_WEEK)
+WEEK_DAYS = 7
+
+# 排序指标
+SORT_VISITS = 'visits'
+SORT_RATING = 'rating'
+POPULARITY_SORTS = (SORT_VISITS, SORT_RATING)
+
+# 计数列
+COUNTER_COLUMNS = ('visits', 'rating_sum', 'rating_count', 'dwell_sum', 'dwell_count')
+
+
+def _event_day(when: Optional[datetime] = None) -> date:
+    """事件所在的UTC日期"""
+    return (when or datetime.utcnow()).date()
+
+
+class PopularityDelta:
+    """一批待写入的计数增量（按 展品 和 (展品, 日期) 汇总后一次写入）"""
+
+    def __init__(self):
+        self.totals: Dict[str, Dict[str, float]] = defaultdict(lambda: dict.fromkeys(COUNTER_COLUMNS, 0))
+        self.daily: Dict[Tuple[str, date], Dict[str, float]] = defaultdict(lambda: dict.fromkeys(COUNTER_COLUMNS, 0))
+
+    def add(self, exhibit_id: str, day: date, **counters) -> None:
+        """累加一个展品的计数"""
+        for target in (self.totals[exhibit_id], self.daily[(exhibit_id, day)]):
+            for column, value in counters.items():
+                target[column] += value
+
+    def add_visits(self, stop_ids: Iterable[str], when: Optional[datetime] = None) -> None:
+        """一条路线被保存：路线中每个展品访问 +1（同一路线重复出现的展品只计一次）"""
+        day = _event_day(when)
+        for exhibit_id in dict.fromkeys(stop_ids):
+            self.add(exhibit_id, day, visits=1)
+
+    def add_feedback(self, stop_ids: List[str], old_rating: Optional[int], new_rating: Optional[int],
+                     old_duration: Optional[float], new_duration: Optional[float],
+                     when: Optional[datetime] = None) -> None:
+        """一条路线的反馈变化：计入新值、扣除旧值（重复提交反馈时不重复计数）
+
+        old_duration / new_duration 为停留总分钟数（见 visit_minutes）；修改的差值记在提交当天的日表中
+        """
+        day = _event_day(when)
+        stop_ids = list(dict.fromkeys(stop_ids))
+        if new_rating != old_rating:
+            rating_sum = (new_rating or 0) - (old_rating or 0)
+            rating_count = (new_rating is not None) - (old_rating is not None)
+            for exhibit_id in stop_ids:
+                self.add(exhibit_id, day, rating_sum=rating_sum, rating_count=rating_count)
+        if new_duration != old_duration:
+            old_shares = split_dwell_time(stop_ids, old_duration)
+            new_shares = split_dwell_time(stop_ids, new_duration)
+            dwell_count = (new_duration is not None) - (old_duration is not None)
+            for exhibit_id in stop_ids:
+                self.add(exhibit_id, day,
+                         dwell_sum=new_shares.get(exhibit_id, 0.0) - old_shares.get(exhibit_id, 0.0),
+                         dwell_count=dwell_count)
+
+    def __bool__(self) -> bool:
+        return bool(self.totals)
+
+
+def stored_route(route_hash: Optional[str], route_data: Optional[str]) -> Dict[str, Any]:
+    """路线历史中保存的路线内容（内容寻址存储或旧的route_data列），无法读取时返回空字典"""
+    if route_hash:
+        return route_blob_store.get(route_hash) or {}
+    try:
+        return json.loads(route_data) if route_data else {}
+    except ValueError:
+        return {}
+
+
+def visit_minutes(actual_duration: Optional[float], route: Dict[str, Any]) -> Optional[float]:
+    """实际用时扣除路线预计的步行时间，得到在展品前停留的总分钟数"""
+    if actual_duration is None:
+        return None
+    summary = route.get('summary') if isinstance(route, dict) else None
+    walking = (summary or {}).get('walking_time') or 0
+    return max(0.0, float(actual_duration) - float(walking))
+
+
+def split_dwell_time(stop_ids: List[str], duration: Optional[float]) -> Dict[str, float]:
+    """把停留总分钟数按各展品建议参观时长的比例分摊（目录中没有的展品按平均时长计）"""
+    if duration is None or not stop_ids:
+        return {}
+    snapshot = catalog_store.get()
+    suggested = []
+    for exhibit_id in stop_ids:
+        row = snapshot.table.row.get(exhibit_id)
+        suggested.append(snapshot.exhibits[row].visit_duration if row is not None else None)
+    known = [value for value in suggested if value]
+    fallback = (sum(known) / len(known)) if known else 1.0
+    weights = [value or fallback for value in suggested]
+    total = sum(weights)
+    return {exhibit_id: duration * weight / total for exhibit_id, weight in zip(stop_ids, weights)}
+
+
+def _upsert(model, rows: List[Dict[str, Any]], keys: Tuple[str, ...]) -> None:
+    """计数累加写入：已有行在原值上累加（SQLite / PostgreSQL 使用 ON CONFLICT DO UPDATE）"""
+    if not rows:
+        return
+    table = model.__table__
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        statement = dialect_insert(table)
+        updates = {column: table.c[column] + statement.excluded[column] for column in COUNTER_COLUMNS}
+        if 'updated_at' in table.c:
+            updates['updated_at'] = statement.excluded.updated_at
+        db.session.execute(statement.on_conflict_do_update(index_elements=list(keys), set_=updates), rows)
+        return
+
+    # 其他数据库：逐行读取后累加
+    for row in rows:
+        existing = db.session.get(model, tuple(row[key] for key in keys))
+        if existing is None:
+            db.session.add(model(**row))
+            continue
+        for column in COUNTER_COLUMNS:
+            setattr(existing, column, getattr(existing, column) + row[column])
+
+
+def apply_popularity(delta: PopularityDelta) -> None:
+    """在当前事务中写入计数增量（调用方负责提交）"""
+    if not delta:
+        return
+    now = datetime.utcnow()
+    _upsert(ExhibitPopularity, [
+        dict(counters, exhibit_id=exhibit_id, updated_at=now)
+        for exhibit_id, counters in delta.totals.items()
+    ], ('exhibit_id',))
+    _upsert(ExhibitDailyStat, [
+        dict(counters, exhibit_id=exhibit_id, day=day)
+        for (exhibit_id, day), counters in delta.daily.items()
+    ], ('exhibit_id', 'day'))
+
+
+def _counter_query(session, window: str, today: date):
+    """指定窗口内各展品的计数（累计窗口直接读累计表，其余按日期汇总日表）"""
+    if window == WINDOW_ALL:
+        model = ExhibitPopularity
+        columns = [model.exhibit_id] + [getattr(model, column).label(column) for column in COUNTER_COLUMNS]
+        return session.query(*columns), model
+
+    model = ExhibitDailyStat
+    start = today if window == WINDOW_TODAY else today - timedelta(days=WEEK_DAYS - 1)
+    columns = [model.exhibit_id] + [func.sum(getattr(model, column)).label(column) for column in COUNTER_COLUMNS]
+    return session.query(*columns).filter(model.day >= start).group_by(model.exhibit_id), model
+
+
+def top_exhibit_counters(limit: int = 10, window: str = WINDOW_ALL,
+                         sort: str = SORT_VISITS) -> List[Dict[str, Any]]:
+    """窗口内排名前 limit 的展品计数（只读连接，不扫描路线历史）"""
+    if window not in POPULARITY_WINDOWS:
+        raise ValueError(f"window必须是{', '.join(POPULARITY_WINDOWS)}之一")
+    if sort not in POPULARITY_SORTS:
+        raise ValueError(f"sort必须是{', '.join(POPULARITY_SORTS)}之一")
+
+    with read_session() as session:
+        query, model = _counter_query(session, window, _event_day())
+        visits = func.sum(model.visits) if window != WINDOW_ALL else model.visits
+        if sort == SORT_RATING:
+            rating_sum = func.sum(model.rating_sum) if window != WINDOW_ALL else model.rating_sum
+            rating_count = func.sum(model.rating_count) if window != WINDOW_ALL else model.rating_count
+            # 没有评分的展品排在最后
+            order = [(rating_count > 0).desc(), (rating_sum * 1.0 / func.nullif(rating_count, 0)).desc(),
+                     visits.desc()]
+        else:
+            order = [visits.desc()]
+        rows = query.order_by(*order, model.exhibit_id).limit(limit).all()
+
+    return [popularity_to_dict(row) for row in rows]
+
+
+def popularity_to_dict(row) -> Dict[str, Any]:
+    """计数行转换为接口数据（平均评分、平均停留分钟数）"""
+    return {
+        'exhibit_id': row.exhibit_id,
+        'visits': int(row.visits or 0),
+        'rating_count': int(row.rating_count or 0),
+        'avg_rating': round(row.rating_sum / row.rating_count, 2) if row.rating_count else None,
+        'avg_dwell_minutes': round(row.dwell_sum / row.dwell_count, 1) if row.dwell_count else None
+    }
+
+
+def rebuild_popularity() -> int:
+    """由已有路线历史重建计数（升级时计数表为空才调用；评分与用时的日期按路线创建日期计），返回路线数"""
+    db.session.query(ExhibitDailyStat).delete()
+    db.session.query(ExhibitPopularity).delete()
+
+    histories = db.session.execute(
+        select(RouteHistory.id, RouteHistory.created_at, RouteHistory.user_rating, RouteHistory.actual_duration,
+               RouteHistory.route_hash, RouteHistory.route_data)
+    ).all()
+    stops: Dict[int, List[str]] = defaultdict(list)
+    for route_id, exhibit_id in db.session.execute(
+        select(RouteStop.route_id, RouteStop.exhibit_id).order_by(RouteStop.route_id, RouteStop.seq)
+    ):
+        stops[route_id].append(exhibit_id)
+
+    delta = PopularityDelta()
+    for route_id, created_at, rating, duration, route_hash, route_data in histories:
+        stop_ids = stops.get(route_id)
+        if not stop_ids:
+            continue
+        minutes = visit_minutes(duration, stored_route(route_hash, route_data)) if duration is not None else None
+        delta.add_visits(stop_ids, created_at)
+        delta.add_feedback(stop_ids, None, rating, None, minutes, created_at)
+    apply_popularity(delta)
+    return len(histories)
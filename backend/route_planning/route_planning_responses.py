@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+目录类接口的预序列化响应
+Pre-serialized Catalog Responses for Route Planning
+展品、布局、推荐路线等接口对所有客户端返回相同内容，且只在目录快照替换时变化：
+- 每个目录版本只序列化一次JSON，并预先压缩一份gzip，之后的请求直接返回缓存的字节
+- ETag 由内容哈希得到（不依赖进程内的版本号，多进程部署时各进程一致），If-None-Match 命中返回304
+- Cache-Control: no-cache：客户端每次都重新验证，目录变化后立即看到新内容，未变化时只有一个304
+"""
+
+import gzip
+import hashlib
+import threading
+from datetime import datetime
+from typing import Dict, Any, Callable, Optional, Tuple
+
+from flask import current_app, request
+
+from .route_planning_catalog import CatalogSnapshot, catalog_store
+from .route_planning_metrics import Counter, metrics_registry
+
+# 小于此字节数的响应不压缩
+DEFAULT_GZIP_MIN_BYTES = 1024
+
+# gzip压缩级别（只在每个目录版本压缩一次，使用较高级别）
+DEFAULT_GZIP_LEVEL = 9
+
+# 重新验证策略：可缓存，但每次使用前需向服务器验证
+CATALOG_CACHE_CONTROL = 'no-cache'
+
+CATALOG_RESPONSES = metrics_registry.register(Counter(
+    'route_catalog_responses_total', '目录类接口响应数', ('endpoint', 'result')
+))
+
+
+class PreparedBody:
+    """一份预先序列化好的响应体（原文和gzip两种编码）"""
+
+    __slots__ = ('body', 'gzip_body', 'digest', 'last_modified', 'catalog_version')
+
+    def __init__(self, body: bytes, gzip_body: Optional[bytes], last_modified: datetime, catalog_version: int):
+        self.body = body
+        self.gzip_body = gzip_body
+        self.digest = hashlib.sha256(body).hexdigest()[:32]
+        self.last_modified = last_modified
+        self.catalog_version = catalog_version
+
+    def etag(self, gzipped: bool) -> str:
+        """各编码的强ETag（gzip编码带 -gz 后缀）"""
+        return f'"{self.digest}-gz"' if gzipped else f'"{self.digest}"'
+
+    def matches(self, if_none_match: str) -> bool:
+        """If-None-Match 是否包含本内容的任一编码的ETag"""
+        if not if_none_match:
+            return False
+        for tag in if_none_match.split(','):
+            tag = tag.strip()
+            if tag == '*':
+                return True
+            if tag.startswith('W/'):
+                tag = tag[2:]
+            if tag.strip('"').removesuffix('-gz') == self.digest:
+                return True
+        return False
+
+
+class CatalogResponseCache:
+    """按 (接口名, 目录版本) 缓存预序列化响应体；目录快照替换后整体清空"""
+
+    def __init__(self, gzip_min_bytes: int = DEFAULT_GZIP_MIN_BYTES, gzip_level: int = DEFAULT_GZIP_LEVEL):
+        self.gzip_min_bytes = gzip_min_bytes
+        self.gzip_level = gzip_level
+        self._bodies: Dict[Tuple[str, int], PreparedBody] = {}
+        self._lock = threading.Lock()
+
+    def configure(self, gzip_min_bytes: int = None, gzip_level: int = None) -> None:
+        """按部署配置调整；gzip_min_bytes 为负数时不压缩"""
+        if gzip_min_bytes is not None:
+            self.gzip_min_bytes = gzip_min_bytes
+        if gzip_level is not None:
+            self.gzip_level = gzip_level
+        self.clear()
+
+    def clear(self, snapshot: CatalogSnapshot = None) -> None:
+        """清空缓存（作为目录快照替换的回调时丢弃旧版本的响应体）"""
+        with self._lock:
+            self._bodies = {}
+
+    def prepare(self, payload: Any, snapshot: CatalogSnapshot) -> PreparedBody:
+        """序列化并压缩一份响应体（与 jsonify 的输出一致）"""
+        body = current_app.json.dumps(payload, separators=(',', ':')).encode('utf-8') + b'\n'
+        gzip_body = None
+        if 0 <= self.gzip_min_bytes <= len(body):
+            # mtime固定为0，相同内容得到相同的压缩结果
+            compressed = gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+            if len(compressed) < len(body):
+                gzip_body = compressed
+        return PreparedBody(body, gzip_body, snapshot.loaded_at.replace(microsecond=0), snapshot.version)
+
+    def get(self, name: str, snapshot: CatalogSnapshot, build: Callable[[CatalogSnapshot], Any]) -> PreparedBody:
+        """当前目录版本的响应体（首次访问时由 build(snapshot) 生成数据并序列化）"""
+        key = (name, snapshot.version)
+        prepared = self._bodies.get(key)
+        if prepared is None:
+            prepared = self.prepare(build(snapshot), snapshot)
+            with self._lock:
+                prepared = self._bodies.setdefault(key, prepared)
+        return prepared
+
+
+def accepts_gzip() -> bool:
+    """客户端是否接受gzip编码"""
+    return request.accept_encodings['gzip'] > 0
+
+
+def send_prepared(prepared: PreparedBody, name: str, cache_control: str = CATALOG_CACHE_CONTROL):
+    """发送预序列化响应体：未变化时304，否则按 Accept-Encoding 返回原文或gzip的缓存字节"""
+    gzipped = prepared.gzip_body is not None and accepts_gzip()
+
+    if_none_match = request.headers.get('If-None-Match')
+    if prepared.matches(if_none_match) or (
+        if_none_match is None and request.if_modified_since is not None
+        and prepared.last_modified <= request.if_modified_since.replace(tzinfo=None)
+    ):
+        response = current_app.response_class(status=304)
+        CATALOG_RESPONSES.inc(1, name, 'not_modified')
+    else:
+        response = current_app.response_class(
+            prepared.gzip_body if gzipped else prepared.body, mimetype='application/json'
+        )
+        if gzipped:
+            response.headers['Content-Encoding'] = 'gzip'
+        CATALOG_RESPONSES.inc(1, name, 'gzip' if gzipped else 'identity')
+
+    response.headers['ETag'] = prepared.etag(gzipped)
+    response.last_modified = prepared.last_modified
+    response.headers['Cache-Control'] = cache_control
+    response.headers['X-Catalog-Version'] = str(prepared.catalog_version)
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def catalog_json_response(name: str, build: Callable[[CatalogSnapshot], Any],
+                          snapshot: CatalogSnapshot = None):
+    """返回目录类接口的预序列化响应
+
+    build(snapshot) 返回完整的接口数据（如 {'success': True, 'data': ...}），每个目录版本只调用一次
+    """
+    snapshot = snapshot or catalog_store.get()
+    return send_prepared(catalog_response_cache.get(name, snapshot, build), name)
+
+
+# 进程级响应缓存，目录快照替换后清空
+catalog_response_cache = CatalogResponseCache()
+catalog_store.subscribe(catalog_response_cache.clear)
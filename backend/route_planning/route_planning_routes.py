@@ -5,55 +5,133 @@ Route Planning API Routes
 专门处理路线规划相关的API接口
 """
 
-from flask import request, jsonify, render_template, session
-from backend.route_planning import (
-    RouteOptimizer, MockDataGenerator, LLMIntegration, 
-    RoutePlannerUserProfile
+from flask import (
+    request, jsonify, render_template, session, current_app, Response, stream_with_context, url_for
 )
 from backend.route_planning.route_planning_database import RoutePlanningDatabase
+from backend.route_planning.route_planning_cache import route_cache
+from backend.route_planning.route_planning_service import generate_route_with_guides, replan_visitor_route
+from backend.route_planning.route_planning_llm import llm_client
+from backend.route_planning.route_planning_history import route_history_writer
+from backend.route_planning.route_planning_stream import (
+    stream_route_events, encode_ndjson, encode_sse, wants_sse, NDJSON_CONTENT_TYPE, SSE_CONTENT_TYPE
+)
+from backend.route_planning.route_planning_batch import generate_routes_batch, DEFAULT_BATCH_MAX_SIZE
+from backend.route_planning.route_planning_blobs import route_blob_store, is_route_hash
+from backend.route_planning.route_planning_dwell import dwell_model
+from backend.route_planning.route_planning_import import register_import_command
+from backend.route_planning.route_planning_responses import (
+    catalog_json_response, catalog_response_cache, send_prepared
+)
+from backend.route_planning.route_planning_bundle import venue_bundle_store, IMMUTABLE_CACHE_CONTROL
+from backend.route_planning.route_planning_admission import (
+    admission_controller, client_key, retry_after_header, Overloaded, RateLimited
+)
+from backend.route_planning.route_planning_utils import RoutePlanningUtils
 import json
+import re
+
+# 历史路线列表单页最多返回的条数
+HISTORY_MAX_PAGE_SIZE = 100
+
+# 热门展品最多返回的条数
+POPULAR_MAX_LIMIT = 50
+
+# 场馆数据包地址中的内容哈希
+BUNDLE_DIGEST_PATTERN = re.compile(r'[0-9a-f]{32}')
 
 def register_route_planning_routes(app):
     """注册路线规划相关的路由"""
     
+    # 路线结果缓存的容量与过期时间按部署配置
+    route_cache.configure(
+        max_size=app.config.get('ROUTE_CACHE_SIZE'),
+        ttl_seconds=app.config.get('ROUTE_CACHE_TTL')
+    )
+    
+    # 讲解词模型服务地址、并发上限、超时与缓存（未配置地址时只使用模板文本）
+    llm_client.configure(
+        endpoint=app.config.get('LLM_ENDPOINT'),
+        concurrency=app.config.get('LLM_CONCURRENCY'),
+        timeout=app.config.get('LLM_TIMEOUT'),
+        cache_size=app.config.get('LLM_CACHE_SIZE'),
+        cache_path=app.config.get('LLM_CACHE_PATH')
+    )
+    
+    # 路线历史后写队列：测试环境默认同步写入
+    route_history_writer.configure(
+        app=app,
+        batch_size=app.config.get('ROUTE_HISTORY_BATCH_SIZE'),
+        flush_interval=app.config.get('ROUTE_HISTORY_FLUSH_INTERVAL'),
+        max_pending=app.config.get('ROUTE_HISTORY_MAX_PENDING'),
+        enqueue_timeout=app.config.get('ROUTE_HISTORY_ENQUEUE_TIMEOUT'),
+        synchronous=app.config.get('ROUTE_HISTORY_SYNC', app.testing)
+    )
+    
+    # 停留时间估计的先验权重与重算间隔
+    dwell_model.configure(
+        prior_weight=app.config.get('DWELL_PRIOR_WEIGHT'),
+        refresh_interval=app.config.get('DWELL_REFRESH_INTERVAL'),
+        enabled=app.config.get('DWELL_MODEL_ENABLED')
+    )
+    
+    # 路线内容存储的压缩与读取缓存
+    route_blob_store.configure(
+        compress=app.config.get('ROUTE_BLOB_COMPRESS'),
+        compress_min_bytes=app.config.get('ROUTE_BLOB_COMPRESS_MIN_BYTES'),
+        cache_size=app.config.get('ROUTE_BLOB_CACHE_SIZE')
+    )
+    
+    # 目录类接口预序列化响应的gzip阈值与级别
+    catalog_response_cache.configure(
+        gzip_min_bytes=app.config.get('CATALOG_GZIP_MIN_BYTES'),
+        gzip_level=app.config.get('CATALOG_GZIP_LEVEL')
+    )
+    
+    # 场馆数据包中的热门展品数与重建间隔
+    venue_bundle_store.configure(
+        popular_limit=app.config.get('BUNDLE_POPULAR_LIMIT'),
+        refresh_interval=app.config.get('BUNDLE_REFRESH_INTERVAL')
+    )
+    
+    # 生成接口的准入控制：并发优化数、等待队列、过载处理方式和按客户端限流
+    admission_controller.configure(
+        max_concurrent=app.config.get('ADMISSION_MAX_CONCURRENT'),
+        queue_size=app.config.get('ADMISSION_QUEUE_SIZE'),
+        queue_timeout_ms=app.config.get('ADMISSION_QUEUE_TIMEOUT_MS'),
+        overload_action=app.config.get('ADMISSION_OVERLOAD'),
+        retry_after=app.config.get('ADMISSION_RETRY_AFTER'),
+        rate=app.config.get('ADMISSION_RATE'),
+        burst=app.config.get('ADMISSION_BURST')
+    )
+    
+    # 批量导入展品和布局的命令行（flask import-catalog）
+    register_import_command(app)
+    
     @app.route('/route-planner')
     def route_planner_page():
-        """路线规划页面 - 集成地图功能"""
-        return render_template('route_planning_with_map.html')
+        """路线规划页面 - 集成地图功能（嵌入当前场馆数据包地址，页面数据只需一次请求）"""
+        try:
+            bundle_url = url_for('get_venue_bundle_version', digest=venue_bundle_store.current().digest)
+        except Exception:
+            # 数据包生成失败时页面改用不带哈希的地址
+            bundle_url = url_for('get_venue_bundle')
+        return render_template('route_planning_with_map.html', bundle_url=bundle_url)
     
     @app.route('/api/route-planning/generate', methods=['POST'])
     def generate_route():
-        """生成智能路线API"""
+        """生成智能路线API（超过限流返回429；过载时返回503或降级的模板路线）"""
         try:
-            data = request.get_json()
-            
-            # 创建用户画像
-            user_profile = RoutePlannerUserProfile(
-                age_group=data.get('age_group', 'adult'),
-                interests=data.get('interests', []),
-                available_time=int(data.get('available_time', 60)),
-                physical_ability=data.get('physical_ability', 'medium'),
-                group_type=data.get('group_type', 'individual'),
-                visit_purpose=data.get('visit_purpose', 'education')
-            )
-            
-            # 生成模拟数据（后续会从数据库获取）
-            exhibits = MockDataGenerator.generate_exhibits()
-            layout = MockDataGenerator.generate_layout()
+            data = request.get_json() or {}
+            admission_controller.check_rate(client_key())
             
-            # 创建路线优化器
-            optimizer = RouteOptimizer(exhibits, layout)
+            # 相同画像（标准化偏好 + 目录版本）的路线直接复用缓存结果，讲解词不等待模型
+            enhanced_route = generate_route_with_guides(data, current_app.config)
             
-            # 生成优化路线
-            route = optimizer.optimize_route(user_profile)
-            
-            # 大模型增强
-            enhanced_route = LLMIntegration.optimize_route_with_llm(route, user_profile)
-            
-            # 如果用户已登录，保存路线历史
+            # 如果用户已登录，保存路线历史（放入后写队列，不在请求中提交）
             user_id = session.get('user_id')
             if user_id:
-                RoutePlanningDatabase.save_route_history(
+                RoutePlanningDatabase.queue_route_history(
                     user_id=user_id,
                     route_name=f"智能路线_{data.get('age_group', 'adult')}",
                     route_data=enhanced_route,
@@ -64,67 +142,185 @@ def register_route_planning_routes(app):
             return jsonify({
                 'success': True,
                 'data': enhanced_route,
-                'message': '路线生成成功！'
+                'message': '当前访问量较大，已返回推荐模板路线' if 'degraded' in enhanced_route else '路线生成成功！'
             })
             
+        except (RateLimited, Overloaded) as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 429 if isinstance(e, RateLimited) else 503, retry_after_header(e.retry_after)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 400
         except Exception as e:
             return jsonify({
                 'success': False,
                 'message': f'路线生成失败: {str(e)}'
             }), 500
     
-    @app.route('/api/route-planning/exhibits')
-    def get_exhibits():
-        """获取所有展品信息API"""
+    @app.route('/api/route-planning/generate/stream', methods=['POST'])
+    def generate_route_stream():
+        """流式生成智能路线API：先返回有序展品与概要，讲解词和建议随后逐条推送
+
+        默认输出NDJSON；Accept为text/event-stream或?format=sse时输出Server-Sent Events
+        """
         try:
-            # 优先从数据库获取，如果没有数据则使用模拟数据
-            db_exhibits = RoutePlanningDatabase.get_all_exhibits()
+            data = request.get_json() or {}
+            user_id = session.get('user_id')
+            admission_controller.check_rate(client_key())
             
-            if db_exhibits:
-                exhibits_data = [exhibit.to_dict() for exhibit in db_exhibits]
-            else:
-                # 使用模拟数据
-                exhibits = MockDataGenerator.generate_exhibits()
-                exhibits_data = [
-                    {
-                        'id': exhibit.id,
-                        'name': exhibit.name,
-                        'description': exhibit.description,
-                        'location': exhibit.location,
-                        'importance': exhibit.importance,
-                        'visit_duration': exhibit.visit_duration,
-                        'category': exhibit.category,
-                        'period': exhibit.period
-                    } for exhibit in exhibits
-                ]
+            def save_history(route):
+                # 讲解词全部就绪后保存完整路线
+                if user_id:
+                    RoutePlanningDatabase.queue_route_history(
+                        user_id=user_id,
+                        route_name=f"智能路线_{data.get('age_group', 'adult')}",
+                        route_data=route,
+                        user_preferences=data,
+                        estimated_duration=route['summary']['estimated_time']
+                    )
+            
+            # 路线在此同步计算，参数错误仍以普通JSON返回
+            events = stream_route_events(data, current_app.config, on_complete=save_history)
+            
+        except (RateLimited, Overloaded) as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 429 if isinstance(e, RateLimited) else 503, retry_after_header(e.retry_after)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 400
+        except Exception as e:
+            return jsonify({
+                'success': False,
+                'message': f'路线生成失败: {str(e)}'
+            }), 500
+        
+        sse = wants_sse(request.headers.get('Accept'), request.args.get('format'))
+        encode = encode_sse if sse else encode_ndjson
+        
+        def body():
+            try:
+                for event, payload in events:
+                    yield encode(event, payload)
+            except Exception as e:
+                yield encode('error', {'message': f'路线生成失败: {str(e)}'})
+        
+        return Response(
+            stream_with_context(body()),
+            content_type=SSE_CONTENT_TYPE if sse else NDJSON_CONTENT_TYPE,
+            headers={
+                'Cache-Control': 'no-cache',
+                # 关闭反向代理缓冲，保证事件即时到达
+                'X-Accel-Buffering': 'no'
+            }
+        )
+    
+    @app.route('/api/route-planning/generate-batch', methods=['POST'])
+    def generate_route_batch():
+        """批量生成智能路线API（旅行团、自助终端；超过限流返回429，过载时返回503）"""
+        try:
+            data = request.get_json() or {}
+            profiles = data.get('profiles')
+            max_size = current_app.config.get('ROUTE_BATCH_MAX_SIZE', DEFAULT_BATCH_MAX_SIZE)
+            
+            if not isinstance(profiles, list) or not profiles:
+                return jsonify({
+                    'success': False,
+                    'message': 'profiles必须是非空列表'
+                }), 400
+            if len(profiles) > max_size:
+                return jsonify({
+                    'success': False,
+                    'message': f'单次最多生成{max_size}条路线'
+                }), 400
+            admission_controller.check_rate(client_key())
+            
+            result = generate_routes_batch(profiles, current_app.config)
             
             return jsonify({
                 'success': True,
-                'data': exhibits_data
+                'data': result['routes'],
+                'stats': result['stats'],
+                'message': f"成功生成{len(result['routes'])}条路线"
             })
             
+        except (RateLimited, Overloaded) as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 429 if isinstance(e, RateLimited) else 503, retry_after_header(e.retry_after)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 400
         except Exception as e:
             return jsonify({
                 'success': False,
-                'message': f'获取展品信息失败: {str(e)}'
+                'message': f'批量生成路线失败: {str(e)}'
             }), 500
     
-    @app.route('/api/route-planning/layout')
-    def get_layout():
-        """获取场馆布局信息API"""
+    @app.route('/api/route-planning/replan', methods=['POST'])
+    def replan_route():
+        """馆内增量重规划API：按当前位置、已参观展品和剩余时间调整路线（超过限流返回429，过载时返回503）"""
         try:
-            # 优先从数据库获取
-            db_layout = RoutePlanningDatabase.get_active_layout()
+            data = request.get_json() or {}
+            admission_controller.check_rate(client_key())
+            route = replan_visitor_route(data, current_app.config)
             
-            if db_layout:
-                layout_data = db_layout.to_dict()
-            else:
-                # 使用模拟数据
-                layout_data = MockDataGenerator.generate_layout()
+            return jsonify({
+                'success': True,
+                'data': route,
+                'message': '路线已更新'
+            })
             
+        except (RateLimited, Overloaded) as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 429 if isinstance(e, RateLimited) else 503, retry_after_header(e.retry_after)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 400
+        except Exception as e:
             return jsonify({
+                'success': False,
+                'message': f'路线重规划失败: {str(e)}'
+            }), 500
+    
+    @app.route('/api/route-planning/exhibits')
+    def get_exhibits():
+        """获取所有展品信息API（预序列化响应，支持ETag与gzip）"""
+        try:
+            # 展品数据来自目录快照（数据库无数据时快照内为模拟数据），每个目录版本只序列化一次
+            return catalog_json_response('exhibits', lambda snapshot: {
                 'success': True,
-                'data': layout_data
+                'data': list(snapshot.exhibits_data)
+            })
+            
+        except Exception as e:
+            return jsonify({
+                'success': False,
+                'message': f'获取展品信息失败: {str(e)}'
+            }), 500
+    
+    @app.route('/api/route-planning/layout')
+    def get_layout():
+        """获取场馆布局信息API（预序列化响应，支持ETag与gzip）"""
+        try:
+            # 布局数据来自目录快照（数据库无数据时快照内为模拟数据），每个目录版本只序列化一次
+            return catalog_json_response('layout', lambda snapshot: {
+                'success': True,
+                'data': dict(snapshot.layout_data)
             })
             
         except Exception as e:
@@ -133,6 +329,49 @@ def register_route_planning_routes(app):
                 'message': f'获取布局信息失败: {str(e)}'
             }), 500
     
+    @app.route('/api/route-planning/bundle')
+    def get_venue_bundle():
+        """获取当前场馆数据包API（展品、布局、推荐路线、热门展品；需重新验证，Content-Location 为不可变地址）"""
+        try:
+            prepared = venue_bundle_store.current()
+            response = send_prepared(prepared, 'bundle')
+            response.headers['Content-Location'] = url_for('get_venue_bundle_version', digest=prepared.digest)
+            return response
+            
+        except Exception as e:
+            return jsonify({
+                'success': False,
+                'message': f'获取场馆数据包失败: {str(e)}'
+            }), 500
+    
+    @app.route('/api/route-planning/bundle/<digest>')
+    def get_venue_bundle_version(digest):
+        """按内容哈希获取场馆数据包API（内容不可变，可永久缓存）"""
+        try:
+            if not BUNDLE_DIGEST_PATTERN.fullmatch(digest):
+                return jsonify({
+                    'success': False,
+                    'message': '数据包地址无效'
+                }), 404
+            
+            prepared = venue_bundle_store.get(digest)
+            if prepared is None:
+                current = venue_bundle_store.current()
+                if current.digest != digest:
+                    # 本进程没有该版本（已被替换或由尚未重建的其他进程生成）：直接返回当前数据包但要求重新验证，
+                    # 不重定向到本进程的哈希，避免请求在内容不一致的工作进程之间来回重定向
+                    response = send_prepared(current, 'bundle')
+                    response.headers['Content-Location'] = url_for('get_venue_bundle_version', digest=current.digest)
+                    return response
+                prepared = current
+            return send_prepared(prepared, 'bundle', IMMUTABLE_CACHE_CONTROL)
+            
+        except Exception as e:
+            return jsonify({
+                'success': False,
+                'message': f'获取场馆数据包失败: {str(e)}'
+            }), 500
+    
     @app.route('/api/route-planning/save', methods=['POST'])
     def save_route():
         """保存用户路线API"""
@@ -174,8 +413,16 @@ def register_route_planning_routes(app):
                     'message': '请先登录'
                 }), 401
             
-            routes = RoutePlanningDatabase.get_user_route_history(user_id)
-            routes_data = [route.to_dict() for route in routes]
+            limit = min(request.args.get('limit', 10, type=int), HISTORY_MAX_PAGE_SIZE)
+            offset = max(request.args.get('offset', 0, type=int), 0)
+            
+            if request.args.get('include') == 'route':
+                # 兼容旧客户端：返回含完整路线数据的记录
+                routes = RoutePlanningDatabase.get_user_route_history(user_id, limit)
+                routes_data = [RoutePlanningDatabase.route_history_to_dict(route) for route in routes]
+            else:
+                # 列表只需要名称、时长等字段，不解析路线JSON
+                routes_data = RoutePlanningDatabase.get_user_route_summaries(user_id, limit, offset)
             
             return jsonify({
                 'success': True,
@@ -188,6 +435,101 @@ def register_route_planning_routes(app):
                 'message': f'获取历史路线失败: {str(e)}'
             }), 500
     
+    @app.route('/api/route-planning/history/<int:route_id>')
+    def get_route_history_detail(route_id):
+        """获取单条历史路线详情API"""
+        try:
+            user_id = session.get('user_id')
+            
+            if not user_id:
+                return jsonify({
+                    'success': False,
+                    'message': '请先登录'
+                }), 401
+            
+            detail = RoutePlanningDatabase.get_route_history_detail(route_id, user_id)
+            if detail is None:
+                return jsonify({
+                    'success': False,
+                    'message': '路线记录不存在'
+                }), 404
+            
+            return jsonify({
+                'success': True,
+                'data': detail
+            })
+            
+        except Exception as e:
+            return jsonify({
+                'success': False,
+                'message': f'获取历史路线失败: {str(e)}'
+            }), 500
+    
+    @app.route('/api/route-planning/share', methods=['POST'])
+    def share_route_link():
+        """生成路线分享链接API：路线按内容哈希存储，相同路线共用同一链接"""
+        try:
+            data = request.get_json() or {}
+            route_data = data.get('route_data')
+            
+            if not isinstance(route_data, dict) or not isinstance(route_data.get('route'), list):
+                return jsonify({
+                    'success': False,
+                    'message': 'route_data必须是包含route列表的路线数据'
+                }), 400
+            
+            result = RoutePlanningDatabase.share_route(route_data)
+            if not result['success']:
+                return jsonify(result), 500
+            
+            base_url = current_app.config.get('ROUTE_SHARE_BASE_URL') or request.host_url
+            return jsonify({
+                'success': True,
+                'data': RoutePlanningUtils.generate_route_qr_code_data(result['route_hash'], base_url),
+                'sharing': RoutePlanningUtils.generate_route_sharing_info(route_data)
+            })
+            
+        except Exception as e:
+            return jsonify({
+                'success': False,
+                'message': f'生成分享链接失败: {str(e)}'
+            }), 500
+    
+    @app.route('/api/route-planning/share/<route_hash>')
+    def get_shared_route(route_hash):
+        """按分享链接读取路线API（内容不可变，可长期缓存）"""
+        try:
+            if not is_route_hash(route_hash):
+                return jsonify({
+                    'success': False,
+                    'message': '分享链接无效'
+                }), 404
+            
+            # 内容由哈希唯一确定，ETag直接使用哈希
+            etag = f'"{route_hash}"'
+            if etag in request.headers.get('If-None-Match', ''):
+                response = current_app.response_class(status=304)
+            else:
+                route_data = RoutePlanningDatabase.get_shared_route(route_hash)
+                if route_data is None:
+                    return jsonify({
+                        'success': False,
+                        'message': '分享的路线不存在'
+                    }), 404
+                response = jsonify({
+                    'success': True,
+                    'data': route_data
+                })
+            response.headers['ETag'] = etag
+            response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+            return response
+            
+        except Exception as e:
+            return jsonify({
+                'success': False,
+                'message': f'获取分享路线失败: {str(e)}'
+            }), 500
+    
     @app.route('/api/route-planning/feedback', methods=['POST'])
     def submit_feedback():
         """提交路线反馈API"""
@@ -218,42 +560,11 @@ def register_route_planning_routes(app):
     
     @app.route('/api/route-planning/recommendations')
     def get_recommendations():
-        """获取推荐路线模板API"""
+        """获取推荐路线模板API（预序列化响应，支持ETag与gzip）"""
         try:
-            # 模拟推荐数据（后续可以从数据库获取）
-            recommendations = [
-                {
-                    'id': 1,
-                    'name': '经典红色之旅',
-                    'description': '追寻革命足迹，感受红色精神',
-                    'duration': 90,
-                    'difficulty': '适中',
-                    'target_audience': '成人游客',
-                    'highlights': ['红船模型', '中共一大会址', '革命文物']
-                },
-                {
-                    'id': 2,
-                    'name': '亲子教育路线',
-                    'description': '寓教于乐，适合家庭参观',
-                    'duration': 60,
-                    'difficulty': '简单',
-                    'target_audience': '家庭游客',
-                    'highlights': ['互动体验区', '多媒体展示', '历史照片']
-                },
-                {
-                    'id': 3,
-                    'name': '深度学术研究',
-                    'description': '详细了解历史背景和文献资料',
-                    'duration': 120,
-                    'difficulty': '具有挑战性',
-                    'target_audience': '研究学者',
-                    'highlights': ['党章展示', '历史文献', '领袖题词']
-                }
-            ]
-            
-            return jsonify({
+            return catalog_json_response('recommendations', lambda snapshot: {
                 'success': True,
-                'data': recommendations
+                'data': RoutePlanningDatabase.get_route_recommendations()
             })
             
         except Exception as e:
@@ -264,16 +575,28 @@ def register_route_planning_routes(app):
     
     @app.route('/api/route-planning/popular-exhibits')
     def get_popular_exhibits():
-        """获取热门展品API"""
+        """获取热门展品API
+        
+        查询参数：window=all|today|week（默认all）、sort=visits|rating（默认visits）、limit（默认5）
+        """
         try:
-            popular_exhibits = RoutePlanningDatabase.get_popular_exhibits(limit=5)
-            exhibits_data = [exhibit.to_dict() for exhibit in popular_exhibits]
+            limit = max(1, min(request.args.get('limit', 5, type=int), POPULAR_MAX_LIMIT))
+            exhibits_data = RoutePlanningDatabase.get_popular_exhibits(
+                limit=limit,
+                window=request.args.get('window', 'all'),
+                sort=request.args.get('sort', 'visits')
+            )
             
             return jsonify({
                 'success': True,
                 'data': exhibits_data
             })
             
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 400
         except Exception as e:
             return jsonify({
                 'success': False,
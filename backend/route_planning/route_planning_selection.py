@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+"""
+路线规划展品选择模块
+Orienteering Selection for Route Planning
+在总时间预算（参观时间 + 步行时间）内选择总收益最高的展品：
+- 候选较少：带上界剪枝的状态压缩动态规划精确求解
+- 候选较多：按"收益 / 新增时间"的贪心插入启发式（对全部候选向量化计算）
+- 已有路线超出预算时：按"收益 / 节省时间"由低到高移除展品
+"""
+
+from typing import List, Dict
+
+import numpy as np
+
+# 精确求解的最大候选展品数
+EXACT_MAX_CANDIDATES = 10
+
+# 浮点比较容差
+TIME_EPSILON = 1e-9
+
+
+class OrienteeringSelector:
+    """定向越野（带奖励收集）问题求解器
+
+    matrix: 步行距离矩阵（米）
+    nodes: 各候选展品在距离矩阵中的下标
+    prizes / durations: 与nodes对齐的展品收益和参观时间（分钟）
+    walking_speed: 步行速度（米/秒）
+    选择结果以候选位置（nodes中的下标）表示
+    """
+
+    def __init__(self, matrix: np.ndarray, nodes: np.ndarray, prizes: np.ndarray,
+                 durations: np.ndarray, budget: float, walking_speed: float):
+        self.matrix = matrix
+        self.nodes = np.asarray(nodes, dtype=np.intp)
+        self.prizes = np.asarray(prizes, dtype=np.float64)
+        self.durations = np.asarray(durations, dtype=np.float64)
+        self.budget = budget
+        # 距离（米）换算为步行分钟数的系数
+        self.minutes_per_meter = 1.0 / walking_speed / 60.0
+
+    def path_time(self, start: int, order: List[int], end: int) -> float:
+        """路径总耗时 = 步行时间 + 途经展品参观时间"""
+        path = np.concatenate(([start], self.nodes[order], [end])).astype(np.intp)
+        walking = self.matrix[path[:-1], path[1:]].sum() * self.minutes_per_meter
+        return float(walking + self.durations[order].sum())
+
+    def select(self, start: int, end: int) -> List[int]:
+        """选择展品并返回可行的访问顺序（候选位置，不含起终点）"""
+        if len(self.nodes) <= EXACT_MAX_CANDIDATES:
+            return self.solve_exact(start, end)
+        return self.insert_greedy(start, [], end)
+
+    # ==================== 精确算法 ====================
+
+    def solve_exact(self, start: int, end: int) -> List[int]:
+        """状态压缩DP：time[mask][j] 为从起点出发访问mask并停在j的最短耗时"""
+        n = len(self.nodes)
+        budget = self.budget + TIME_EPSILON
+        prize_of = self.prizes.tolist()
+        duration_of = self.durations.tolist()
+
+        # 局部步行分钟矩阵：0..n-1 为候选展品，n 为起点，n+1 为终点
+        local_nodes = np.concatenate((self.nodes, [start, end])).astype(np.intp)
+        walk = (self.matrix[np.ix_(local_nodes, local_nodes)] * self.minutes_per_meter).tolist()
+        from_start, to_end = walk[n], [row[n + 1] for row in walk]
+
+        mask_prize = [0.0] * (1 << n)
+        for mask in range(1, 1 << n):
+            low = mask & -mask
+            mask_prize[mask] = mask_prize[mask ^ low] + prize_of[low.bit_length() - 1]
+
+        best_mask, best_last, best_prize, best_time = 0, -1, 0.0, from_start[n + 1]
+        if best_time > budget:
+            return []
+
+        time_of: List[Dict[int, float]] = [None] * (1 << n)
+        parent: List[Dict[int, int]] = [None] * (1 << n)
+        for j in range(n):
+            elapsed = from_start[j] + duration_of[j]
+            if elapsed + to_end[j] <= budget:
+                time_of[1 << j] = {j: elapsed}
+                parent[1 << j] = {j: -1}
+
+        for mask in range(1, 1 << n):
+            layer = time_of[mask]
+            if layer is None:
+                continue
+            prize = mask_prize[mask]
+            most_left = 0.0
+            for j, elapsed in layer.items():
+                finish = elapsed + to_end[j]
+                if prize > best_prize or (prize == best_prize and finish < best_time):
+                    best_mask, best_last, best_prize, best_time = mask, j, prize, finish
+                most_left = max(most_left, budget - finish)
+
+            # 上界剪枝：剩余时间内单独放得下的展品全部收下也无法超过当前最优
+            bound = prize + sum(
+                prize_of[k] for k in range(n)
+                if not mask & (1 << k) and duration_of[k] <= most_left
+            )
+            if bound <= best_prize:
+                continue
+
+            for j, elapsed in layer.items():
+                row = walk[j]
+                for k in range(n):
+                    bit = 1 << k
+                    if mask & bit:
+                        continue
+                    arrive = elapsed + row[k] + duration_of[k]
+                    if arrive + to_end[k] > budget:
+                        continue
+                    nxt = mask | bit
+                    if time_of[nxt] is None:
+                        time_of[nxt] = {}
+                        parent[nxt] = {}
+                    if arrive < time_of[nxt].get(k, float('inf')):
+                        time_of[nxt][k] = arrive
+                        parent[nxt][k] = j
+
+        order = []
+        mask, last = best_mask, best_last
+        while last != -1:
+            order.append(last)
+            previous = parent[mask][last]
+            mask ^= 1 << last
+            last = previous
+        order.reverse()
+        return order
+
+    # ==================== 启发式算法 ====================
+
+    def _edge_detour(self, a: int, b: int, positions: np.ndarray) -> np.ndarray:
+        """把positions中的候选插入边(a, b)时新增的步行分钟数"""
+        nodes = self.nodes[positions]
+        matrix = self.matrix
+        return (matrix[a, nodes] + matrix[b, nodes] - matrix[a, b]) * self.minutes_per_meter
+
+    def _relax_edges(self, path: List[int], edges, positions: np.ndarray,
+                     best_detour: np.ndarray, best_edge: np.ndarray) -> None:
+        """用给定边更新候选的最优插入位置"""
+        for i in edges:
+            detour = self._edge_detour(path[i], path[i + 1], positions)
+            better = detour < best_detour[positions]
+            best_detour[positions[better]] = detour[better]
+            best_edge[positions[better]] = i
+
+    def insert_greedy(self, start: int, order: List[int], end: int) -> List[int]:
+        """从已有顺序出发，按收益/新增时间比贪心插入展品，直到预算用尽"""
+        size = len(self.nodes)
+        order = list(order)
+        path = [start] + self.nodes[order].tolist() + [end]
+        members = [-1] + order + [-1]
+        used = self.path_time(start, order, end)
+
+        alive = np.ones(size, dtype=bool)
+        alive[order] = False
+        best_detour = np.full(size, np.inf)
+        best_edge = np.full(size, -1, dtype=np.intp)
+        # 缓存每个候选当前的最优插入边，插入后只需检查新产生的两条边
+        self._relax_edges(path, range(len(path) - 1), np.flatnonzero(alive), best_detour, best_edge)
+
+        while True:
+            cost = best_detour + self.durations
+            feasible = alive & (cost <= self.budget - used + TIME_EPSILON)
+            if not feasible.any():
+                break
+            ratio = np.where(feasible, self.prizes / np.maximum(cost, TIME_EPSILON), -np.inf)
+            chosen = int(ratio.argmax())
+            edge = int(best_edge[chosen])
+
+            path.insert(edge + 1, int(self.nodes[chosen]))
+            members.insert(edge + 1, chosen)
+            used += float(cost[chosen])
+            alive[chosen] = False
+
+            # 原最优边被拆开的候选整体重算，其余候选只检查两条新边
+            broken = alive & (best_edge == edge)
+            best_edge[alive & (best_edge > edge)] += 1
+            broken_positions = np.flatnonzero(broken)
+            best_detour[broken_positions] = np.inf
+            self._relax_edges(path, range(len(path) - 1), broken_positions, best_detour, best_edge)
+            self._relax_edges(path, (edge, edge + 1), np.flatnonzero(alive & ~broken),
+                              best_detour, best_edge)
+
+        return members[1:-1]
+
+    def drop_greedy(self, start: int, order: List[int], end: int) -> List[int]:
+        """从已有顺序中依次移除"收益 / 节省时间"最低的展品，直到满足时间预算"""
+        order = list(order)
+        used = self.path_time(start, order, end)
+
+        while order and used > self.budget + TIME_EPSILON:
+            path = np.concatenate(([start], self.nodes[order], [end])).astype(np.intp)
+            before, stops, after = path[:-2], path[1:-1], path[2:]
+            walk_saved = (self.matrix[before, stops] + self.matrix[stops, after]
+                          - self.matrix[before, after]) * self.minutes_per_meter
+            saved = walk_saved + self.durations[order]
+            ratio = self.prizes[order] / np.maximum(saved, TIME_EPSILON)
+            dropped = int(ratio.argmin())
+            used -= float(saved[dropped])
+            del order[dropped]
+
+        return order
@@ -0,0 +1,421 @@
+# -*- coding: utf-8 -*-
+"""
+多进程生产服务入口
+Pre-fork WSGI Server for Production
+app.py 中的 app.run 是单进程、开启调试器的开发服务器，CPU密集的路线优化受GIL限制只能用一个核。
+本模块提供预先fork的多进程服务：
+- 主进程创建应用并同步预热（目录快照、通道距离矩阵、序列化响应、模板），然后fork工作进程；
+  只读数据在fork前冻结（gc.freeze），各工作进程以写时复制方式共享这些内存页
+- 所有工作进程共享同一个监听socket，每个工作进程用固定大小的线程池处理请求；
+  线程都在忙时不再accept，连接留在内核队列中由空闲的工作进程接收
+- SIGHUP 平滑重载：主进程重新加载应用和目录后fork新一代工作进程，旧工作进程停止接收新连接、处理完已接收的请求后退出
+- SIGTERM / SIGINT 平滑停止，SIGQUIT 立即停止；SIGTTIN / SIGTTOU 增加 / 减少一个工作进程
+- SQLite连接在fork后由子进程丢弃重建（见 route_planning_sqlite），路线历史后写线程在子进程中按需启动
+工作进程各自维护缓存和指标（/api/system/metrics 返回处理该请求的工作进程的计数）；
+目录快照同样属于各工作进程：某个工作进程写入目录（如 init-sample-data）后向主进程发送 SIGHUP，
+由平滑重载让全部工作进程加载新目录，重载完成前其他工作进程仍返回旧目录；
+其他进程（如 flask import-catalog）修改目录后，需手动发送 SIGHUP
+
+用法：
+    python -m backend.route_planning.route_planning_server --bind 0.0.0.0:8080 --workers 4 --threads 4
+    kill -HUP $(cat server.pid)   # 平滑重载（需 --pid server.pid）
+"""
+
+import argparse
+import gc
+import os
+import select
+import signal
+import socket
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Callable, Optional, Tuple
+
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+from backend.models import db
+
+from .route_planning_batch import batch_pool
+from .route_planning_catalog import catalog_store
+from .route_planning_history import route_history_writer
+from .route_planning_llm import llm_client
+from .route_planning_warmup import WARMUP_SYNC, warmup_state
+
+# 默认监听地址
+DEFAULT_BIND = '127.0.0.1:8080'
+
+# 每个工作进程的请求线程数（优化器是CPU密集的，线程主要用于覆盖数据库和网络等待）
+DEFAULT_THREADS = 4
+
+# 平滑停止 / 重载时等待工作进程处理完已接收请求的最长时间（秒）
+DEFAULT_GRACEFUL_TIMEOUT = 30.0
+
+# 监听队列长度
+DEFAULT_BACKLOG = 2048
+
+# 工作进程检查停止信号的间隔（秒）
+WORKER_POLL_INTERVAL = 0.5
+
+# 主进程等待信号的间隔（秒）
+MASTER_POLL_INTERVAL = 1.0
+
+# 工作进程启动后很快退出时，重新fork前等待的时间（秒），避免反复崩溃时占满CPU
+WORKER_RESPAWN_DELAY = 1.0
+
+
+def default_workers() -> int:
+    """默认工作进程数：环境变量 WEB_CONCURRENCY，否则为CPU核数"""
+    return int(os.environ.get('WEB_CONCURRENCY') or os.cpu_count() or 1)
+
+
+def parse_bind(bind: str) -> Tuple[str, int]:
+    """解析 host:port 形式的监听地址"""
+    host, separator, port = bind.rpartition(':')
+    if not separator or not port.isdigit():
+        raise ValueError(f'监听地址必须是 host:port 形式: {bind}')
+    return host.strip('[]') or '0.0.0.0', int(port)
+
+
+def _log(message: str) -> None:
+    """输出带进程号的日志到标准错误"""
+    print(f'[{os.getpid()}] {message}', file=sys.stderr, flush=True)
+
+
+class _RequestHandler(WSGIRequestHandler):
+    """每个连接只处理一个请求，空闲的长连接不会占住线程池中的线程"""
+
+    protocol_version = 'HTTP/1.0'
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """在主进程已经监听的socket上，用固定大小的线程池处理请求"""
+
+    multithread = True
+    multiprocess = True
+
+    def __init__(self, app, listener: socket.socket, threads: int = DEFAULT_THREADS):
+        host, port = listener.getsockname()[:2]
+        super().__init__(host, port, app, handler=_RequestHandler, fd=listener.fileno())
+        # 多个工作进程等待同一个socket：没抢到连接的进程accept时立即返回，而不是阻塞
+        self.socket.setblocking(False)
+        self.threads = threads
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='wsgi')
+        self._slots = threading.BoundedSemaphore(threads)
+
+    def _handle_request_noblock(self) -> None:
+        # 先占一个空闲线程再accept：线程都在忙时连接留在内核队列，由其他工作进程接收
+        if not self._slots.acquire(timeout=WORKER_POLL_INTERVAL):
+            return
+        try:
+            request, client_address = self.get_request()
+        except OSError:
+            self._slots.release()
+            return
+        request.setblocking(True)
+        try:
+            self._executor.submit(self._process, request, client_address)
+        except RuntimeError:
+            # 线程池已关闭（正在停止）
+            self._slots.release()
+            self.shutdown_request(request)
+
+    def _process(self, request, client_address) -> None:
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self._slots.release()
+
+    def drain(self) -> None:
+        """停止后等待已接收的请求处理完"""
+        self._executor.shutdown(wait=True)
+
+
+def _notify_master(pid: int) -> None:
+    """请求主进程平滑重载（主进程已退出时忽略）"""
+    try:
+        os.kill(pid, signal.SIGHUP)
+    except ProcessLookupError:
+        pass
+
+
+def _dispose_engines(app) -> None:
+    """关闭应用的数据库连接池"""
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+def _create_app(config: Dict[str, Any]):
+    """默认的应用工厂"""
+    # 生产入口使用项目根目录 app.py 的工厂函数
+    from app import create_app
+    return create_app(config)
+
+
+class PreforkServer:
+    """主进程：预加载应用、监听socket、维护工作进程并处理信号"""
+
+    def __init__(self, bind: str = DEFAULT_BIND, workers: int = None, threads: int = DEFAULT_THREADS,
+                 graceful_timeout: float = DEFAULT_GRACEFUL_TIMEOUT, backlog: int = DEFAULT_BACKLOG,
+                 config: Dict[str, Any] = None, app_factory: Callable[[Dict[str, Any]], Any] = None,
+                 pid_path: str = None):
+        if threads < 1:
+            raise ValueError('threads必须至少为1')
+        self.host, self.port = parse_bind(bind)
+        self.workers = max(1, workers if workers is not None else default_workers())
+        self.threads = threads
+        self.graceful_timeout = graceful_timeout
+        self.backlog = backlog
+        self.config = dict(config or {})
+        self.app_factory = app_factory or _create_app
+        self.pid_path = pid_path
+        self.app = None
+        self.listener: Optional[socket.socket] = None
+        self.generation = 0
+        # 工作进程pid -> (所属代, 启动时间)
+        self._children: Dict[int, Tuple[int, float]] = {}
+        # 已通知停止的工作进程pid -> 强制结束的时间点
+        self._retiring: Dict[int, float] = {}
+        self._stopping = False
+        self._next_spawn = 0.0
+
+    # ==================== 预加载 ====================
+
+    def load(self) -> None:
+        """创建应用并同步预热，冻结当前对象以便fork后以写时复制方式共享"""
+        previous = self.app
+        gc.unfreeze()
+        catalog_store.clear()
+        warmup_state.reset()
+        started = time.perf_counter()
+        self.app = self.app_factory(dict(self.config, WARMUP_MODE=WARMUP_SYNC))
+        if previous is not None:
+            _dispose_engines(previous)
+        # 主进程不处理请求，预热时建立的连接不带入子进程
+        _dispose_engines(self.app)
+        gc.collect()
+        gc.freeze()
+        _log(f'应用已预加载（目录版本 {catalog_store.version}，'
+             f'{(time.perf_counter() - started) * 1000:.0f}ms，预热状态 {warmup_state.status}）')
+
+    # ==================== 工作进程 ====================
+
+    def _spawn(self) -> None:
+        """fork一个属于当前代的工作进程"""
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                code = self._worker_main()
+            except BaseException:
+                traceback.print_exc()
+            finally:
+                os._exit(code)
+        self._children[pid] = (self.generation, time.monotonic())
+
+    def _worker_main(self) -> int:
+        """工作进程：在共享的监听socket上处理请求，收到SIGTERM后平滑退出"""
+        signal.set_wakeup_fd(-1)
+        os.close(self._wakeup_read)
+        os.close(self._wakeup_write)
+        # 各工作进程已经分别占用CPU核，批量计算的进程池按工作进程数平分核数；
+        # 只剩一个核时批量请求在请求线程中计算，不再向计算进程传递目录快照
+        batch_pool.limit_workers(max(1, (os.cpu_count() or 1) // self.workers))
+        # 本进程写入目录后通知主进程平滑重载，其他工作进程随之加载新目录
+        master = os.getppid()
+        catalog_store.subscribe_writes(lambda snapshot: _notify_master(master))
+        server = PooledWSGIServer(self.app, self.listener, self.threads)
+
+        def graceful(signum, frame):
+            # shutdown() 等待 serve_forever 返回，不能在运行 serve_forever 的主线程中直接调用
+            threading.Thread(target=server.shutdown, daemon=True).start()
+
+        signal.signal(signal.SIGTERM, graceful)
+        signal.signal(signal.SIGQUIT, lambda signum, frame: os._exit(0))
+        # Ctrl+C 和重载信号由主进程统一处理
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        for signum in (signal.SIGCHLD, signal.SIGTTIN, signal.SIGTTOU):
+            signal.signal(signum, signal.SIG_DFL)
+
+        server.serve_forever(poll_interval=WORKER_POLL_INTERVAL)
+        server.drain()
+        # os._exit 不执行 atexit：显式写完路线历史、讲解词缓存落盘并关闭批量计算进程池
+        route_history_writer.close()
+        llm_client.close()
+        batch_pool.shutdown()
+        return 0
+
+    def _current_children(self):
+        """当前代中未被通知停止的工作进程"""
+        return [pid for pid, (generation, _) in self._children.items()
+                if generation == self.generation and pid not in self._retiring]
+
+    def _retire(self, pid: int, deadline: float) -> None:
+        """通知工作进程平滑退出，超过deadline后强制结束"""
+        if pid in self._retiring:
+            return
+        self._retiring[pid] = deadline
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+    def _reap(self) -> None:
+        """回收已退出的工作进程，意外退出的由 _manage_workers 补足"""
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            entry = self._children.pop(pid, None)
+            retired = self._retiring.pop(pid, None) is not None
+            if entry is not None and not retired and not self._stopping:
+                _log(f'工作进程 {pid} 意外退出（{os.waitstatus_to_exitcode(status)}），重新启动')
+                if time.monotonic() - entry[1] < WORKER_RESPAWN_DELAY:
+                    self._next_spawn = time.monotonic() + WORKER_RESPAWN_DELAY
+
+    def _manage_workers(self) -> None:
+        """补足或减少当前代的工作进程，强制结束超时未退出的旧工作进程"""
+        now = time.monotonic()
+        for pid, deadline in list(self._retiring.items()):
+            if now >= deadline:
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+        if self._stopping:
+            return
+        current = self._current_children()
+        if len(current) < self.workers and now >= self._next_spawn:
+            for _ in range(self.workers - len(current)):
+                self._spawn()
+        for pid in current[self.workers:]:
+            self._retire(pid, now + self.graceful_timeout)
+
+    # ==================== 信号 ====================
+
+    def reload(self) -> None:
+        """平滑重载：重新加载应用后启动新一代工作进程，再让旧工作进程处理完请求后退出"""
+        _log('收到重载信号，重新加载应用')
+        try:
+            self.load()
+        except Exception:
+            traceback.print_exc()
+            _log('重新加载失败，继续使用当前工作进程')
+            return
+        old = self._current_children()
+        self.generation += 1
+        self._manage_workers()
+        deadline = time.monotonic() + self.graceful_timeout
+        for pid in old:
+            self._retire(pid, deadline)
+
+    def stop(self, graceful: bool = True) -> None:
+        """停止全部工作进程（graceful 时等待已接收的请求处理完）"""
+        self._stopping = True
+        deadline = time.monotonic() + (self.graceful_timeout if graceful else 0)
+        for pid in list(self._children):
+            self._retire(pid, deadline)
+
+    def _handle_signal(self, signum: int) -> None:
+        """在主循环中处理一个信号"""
+        if signum == signal.SIGHUP:
+            self.reload()
+        elif signum in (signal.SIGTERM, signal.SIGINT):
+            if not self._stopping:
+                _log('平滑停止')
+                self.stop()
+        elif signum == signal.SIGQUIT:
+            self.stop(graceful=False)
+        elif signum == signal.SIGTTIN:
+            self.workers += 1
+        elif signum == signal.SIGTTOU:
+            self.workers = max(1, self.workers - 1)
+
+    # ==================== 主循环 ====================
+
+    def listen(self) -> socket.socket:
+        """创建监听socket（fork前创建，所有工作进程共享）"""
+        family = socket.AF_INET6 if ':' in self.host else socket.AF_INET
+        self.listener = socket.create_server((self.host, self.port), family=family, backlog=self.backlog)
+        self.listener.setblocking(False)
+        self.host, self.port = self.listener.getsockname()[:2]
+        return self.listener
+
+    def run(self) -> None:
+        """预加载、监听并运行到收到停止信号"""
+        if self.app is None:
+            self.load()
+        if self.listener is None:
+            self.listen()
+        if self.pid_path:
+            with open(self.pid_path, 'w') as f:
+                f.write(str(os.getpid()))
+
+        # 信号处理函数只负责唤醒主循环，信号编号经管道传回，在主循环中处理
+        self._wakeup_read, self._wakeup_write = os.pipe()
+        os.set_blocking(self._wakeup_read, False)
+        os.set_blocking(self._wakeup_write, False)
+        signal.set_wakeup_fd(self._wakeup_write)
+        for signum in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT, signal.SIGQUIT,
+                       signal.SIGCHLD, signal.SIGTTIN, signal.SIGTTOU):
+            signal.signal(signum, lambda signum, frame: None)
+
+        _log(f'监听 http://{self.host}:{self.port}，{self.workers} 个工作进程 × {self.threads} 个线程')
+        try:
+            while True:
+                self._reap()
+                if self._stopping and not self._children:
+                    break
+                self._manage_workers()
+                readable, _, _ = select.select([self._wakeup_read], [], [], MASTER_POLL_INTERVAL)
+                if readable:
+                    try:
+                        received = os.read(self._wakeup_read, 64)
+                    except BlockingIOError:
+                        received = b''
+                    # 同一批中的多个重载请求（如连续的目录写入）只重载一次
+                    if signal.SIGHUP in received:
+                        self._handle_signal(signal.SIGHUP)
+                    for signum in received:
+                        if signum != signal.SIGHUP:
+                            self._handle_signal(signum)
+        finally:
+            signal.set_wakeup_fd(-1)
+            os.close(self._wakeup_read)
+            os.close(self._wakeup_write)
+            self.listener.close()
+            if self.pid_path and os.path.exists(self.pid_path):
+                os.remove(self.pid_path)
+            _log('已停止')
+
+
+def main(argv=None) -> None:
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description='多进程生产服务（预加载应用后fork工作进程）')
+    parser.add_argument('--bind', default=os.environ.get('BIND', DEFAULT_BIND), help='监听地址 host:port')
+    parser.add_argument('--workers', type=int, default=None, help='工作进程数（默认 WEB_CONCURRENCY 或CPU核数）')
+    parser.add_argument('--threads', type=int, default=DEFAULT_THREADS, help='每个工作进程的请求线程数')
+    parser.add_argument('--graceful-timeout', type=float, default=DEFAULT_GRACEFUL_TIMEOUT,
+                        help='平滑停止 / 重载时等待请求处理完的秒数')
+    parser.add_argument('--backlog', type=int, default=DEFAULT_BACKLOG)
+    parser.add_argument('--pid', dest='pid_path', help='写入主进程pid的文件（用于 kill -HUP）')
+    args = parser.parse_args(argv)
+
+    PreforkServer(
+        bind=args.bind, workers=args.workers, threads=args.threads,
+        graceful_timeout=args.graceful_timeout, backlog=args.backlog, pid_path=args.pid_path
+    ).run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+"""
+多进程服务吞吐基准测试
+Pre-fork Server Throughput Benchmark
+在同一个临时数据库上，以不同的工作进程数启动 route_planning_server，
+用固定并发的客户端持续请求 /api/route-planning/generate（关闭路线缓存，每个请求都运行优化器），
+记录每秒请求数、相对单进程的加速比和延迟分位数，观察吞吐随CPU核数的扩展情况。
+客户端与服务在同一台机器上运行，会占用部分CPU；工作进程数超过核数后吞吐不再增加
+
+用法：
+    python -m backend.route_planning.route_planning_server_benchmark --workers 1,2,4 --duration 10
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator, List
+
+from .route_planning_startup_benchmark import DEFAULT_EXHIBITS, DEFAULT_SEED, prepare_database, project_root
+
+# 每个工作进程的线程数
+DEFAULT_THREADS = 4
+
+# 并发客户端数（应不少于 最大工作进程数 × 线程数，保证服务端满载）
+DEFAULT_CLIENTS = 16
+
+# 每种配置的压测时长与预热时长（秒）
+DEFAULT_DURATION = 10.0
+WARMUP_SECONDS = 1.0
+
+# 等待服务就绪的最长时间（秒）
+READY_TIMEOUT = 60.0
+
+# 请求的偏好组合（关闭路线缓存后，各组合都需要完整计算）
+AGE_GROUPS = ('child', 'youth', 'adult', 'senior')
+INTEREST_SETS = ((), ('history',), ('art', 'culture'), ('science', 'technology'), ('history', 'culture', 'art'))
+TIME_BUDGETS = (45, 60, 90, 120, 180)
+
+# 子进程：按给定参数运行多进程服务
+SERVER_SCRIPT = '''
+import json, sys
+from backend.route_planning.route_planning_server import PreforkServer
+PreforkServer(**json.loads(sys.argv[1])).run()
+'''
+
+
+def default_worker_counts() -> List[int]:
+    """1、2、4……直到CPU核数"""
+    cores = os.cpu_count() or 1
+    counts = [1]
+    while counts[-1] * 2 <= cores:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != cores:
+        counts.append(cores)
+    return counts
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _request(port: int, method: str, path: str, body: Dict[str, Any] = None):
+    """发出一个请求，返回 (状态码, 响应体)"""
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    try:
+        payload = json.dumps(body).encode('utf-8') if body is not None else None
+        headers = {'Content-Type': 'application/json'} if payload is not None else {}
+        connection.request(method, path, body=payload, headers=headers)
+        response = connection.getresponse()
+        return response.status, response.read()
+    finally:
+        connection.close()
+
+
+def wait_ready(port: int, process: subprocess.Popen, timeout: float = READY_TIMEOUT) -> None:
+    """等待 /ready 返回200"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'服务进程已退出（{process.returncode}）')
+        try:
+            if _request(port, 'GET', '/ready')[0] == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError('等待服务就绪超时')
+
+
+def build_payloads(seed: int) -> List[Dict[str, Any]]:
+    """全部偏好组合（打乱顺序）"""
+    payloads = [
+        {'age_group': age_group, 'interests': list(interests), 'available_time': budget}
+        for age_group in AGE_GROUPS for interests in INTEREST_SETS for budget in TIME_BUDGETS
+    ]
+    random.Random(seed).shuffle(payloads)
+    return payloads
+
+
+def run_load(port: int, clients: int, duration: float, payloads: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """clients 个线程持续发送生成请求 duration 秒"""
+    latencies: List[float] = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def client(index: int) -> None:
+        own, failed = [], 0
+        position = index
+        while time.monotonic() < deadline:
+            payload = payloads[position % len(payloads)]
+            position += clients
+            started = time.perf_counter()
+            try:
+                status, _ = _request(port, 'POST', '/api/route-planning/generate', payload)
+            except OSError:
+                status = None
+            if status == 200:
+                own.append((time.perf_counter() - started) * 1000)
+            else:
+                failed += 1
+        with lock:
+            latencies.extend(own)
+            errors[0] += failed
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=client, args=(index,)) for index in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    latencies.sort()
+
+    def percentile(fraction: float) -> float:
+        return round(latencies[min(len(latencies) - 1, int(len(latencies) * fraction))], 2) if latencies else 0.0
+
+    return {
+        'requests': len(latencies),
+        'errors': errors[0],
+        'throughput': round(len(latencies) / elapsed, 2),
+        'mean_ms': round(statistics.fmean(latencies), 2) if latencies else 0.0,
+        'p50_ms': percentile(0.50),
+        'p95_ms': percentile(0.95),
+        'p99_ms': percentile(0.99)
+    }
+
+
+@contextmanager
+def running_server(uri: str, workers: int, threads: int, config: Dict[str, Any] = None) -> Iterator[int]:
+    """在子进程中启动多进程服务并等待就绪，返回端口；退出时平滑停止"""
+    port = _free_port()
+    options = {
+        'bind': f'127.0.0.1:{port}',
+        'workers': workers,
+        'threads': threads,
+        'config': dict({
+            'SQLALCHEMY_DATABASE_URI': uri,
+            'FAST_START': True,
+            # 每个请求都运行优化器，测量的是计算吞吐而不是缓存命中
+            'ROUTE_CACHE_SIZE': 0
+        }, **(config or {}))
+    }
+    process = subprocess.Popen(
+        [sys.executable, '-c', SERVER_SCRIPT, json.dumps(options)],
+        cwd=project_root(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        wait_ready(port, process)
+        yield port
+    finally:
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(timeout=READY_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def run_scenario(uri: str, workers: int, threads: int, clients: int, duration: float,
+                 payloads: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """启动一个多进程服务，预热后压测，结束后平滑停止"""
+    with running_server(uri, workers, threads) as port:
+        run_load(port, clients, WARMUP_SECONDS, payloads)
+        result = run_load(port, clients, duration, payloads)
+    result.update(workers=workers, threads=threads)
+    return result
+
+
+def run_benchmark(worker_counts: List[int], threads: int = DEFAULT_THREADS, clients: int = DEFAULT_CLIENTS,
+                  duration: float = DEFAULT_DURATION, exhibits: int = DEFAULT_EXHIBITS,
+                  seed: int = DEFAULT_SEED) -> Dict[str, Any]:
+    """依次测量各工作进程数"""
+    results = {'cpu_count': os.cpu_count(), 'exhibits': exhibits, 'threads': threads,
+               'clients': clients, 'duration': duration, 'scenarios': []}
+    payloads = build_payloads(seed)
+    with tempfile.TemporaryDirectory() as directory:
+        uri = f"sqlite:///{os.path.join(directory, 'server.db')}"
+        prepare_database(uri, exhibits, seed)
+        for workers in worker_counts:
+            results['scenarios'].append(run_scenario(uri, workers, threads, clients, duration, payloads))
+    baseline = results['scenarios'][0]['throughput'] or 1.0
+    for scenario in results['scenarios']:
+        scenario['speedup'] = round(scenario['throughput'] / baseline, 2)
+    return results
+
+
+def main(argv=None) -> None:
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description='多进程服务吞吐基准测试')
+    parser.add_argument('--workers', help='逗号分隔的工作进程数（默认 1、2、4……直到CPU核数）')
+    parser.add_argument('--threads', type=int, default=DEFAULT_THREADS)
+    parser.add_argument('--clients', type=int, default=DEFAULT_CLIENTS)
+    parser.add_argument('--duration', type=float, default=DEFAULT_DURATION)
+    parser.add_argument('--exhibits', type=int, default=DEFAULT_EXHIBITS, help='数据库中的合成展品数')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--output', help='结果JSON文件路径')
+    args = parser.parse_args(argv)
+
+    worker_counts = ([int(value) for value in args.workers.split(',')] if args.workers
+                     else default_worker_counts())
+    results = run_benchmark(worker_counts, args.threads, args.clients, args.duration, args.exhibits, args.seed)
+    print(f"CPU核数 {results['cpu_count']}，{args.clients} 个并发客户端，每个工作进程 {args.threads} 个线程")
+    for scenario in results['scenarios']:
+        print(f"{scenario['workers']:>3} 个工作进程: {scenario['throughput']:>8} 请求/秒  "
+              f"加速比 {scenario['speedup']:>5}  p50 {scenario['p50_ms']:>8}ms  "
+              f"p95 {scenario['p95_ms']:>8}ms  p99 {scenario['p99_ms']:>8}ms  错误 {scenario['errors']}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
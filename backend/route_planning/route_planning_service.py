@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+"""
+路线规划服务模块
+Route Planning Service
+把"偏好标准化 → 目录快照 → 路线优化 → 大模型增强"串成可复用的流程，
+供单条生成、结果缓存、馆内重规划等入口共用
+"""
+
+from datetime import datetime
+from typing import Dict, Any, Optional, Tuple
+
+from .route_planning_core import UserProfile, LLMIntegration
+from .route_planning_catalog import CatalogSnapshot, catalog_store
+from .route_planning_cache import CoalescingLRUCache, route_cache, route_cache_key
+from .route_planning_utils import RoutePlanningUtils
+from .route_planning_metrics import stage_timer
+from .route_planning_llm import attach_guide_texts, audience_for
+from .route_planning_dwell import DwellEstimates, dwell_model
+from .route_planning_admission import Overloaded, admission_controller
+
+# 讲解词默认语言
+DEFAULT_GUIDE_LANGUAGE = 'zh'
+
+# 单次请求允许的最长优化时间（毫秒），请求中的deadline_ms超过时按此截断
+DEFAULT_DEADLINE_MAX_MS = 1000
+
+# 缓存键中的截止时间档位（毫秒）：截止时间向下取到档位后计算，同一档位的请求共享结果，
+# 较短截止时间下算出的路线不会提供给允许更长截止时间的请求
+DEADLINE_CACHE_BUCKETS_MS = (0, 25, 50, 100, 250, 500, 1000, 2000, 5000)
+
+# 过载降级时使用的模板路线时长档位（分钟），取不超过请求时长的最大一档
+TEMPLATE_TIME_BUDGETS = (30, 60, 90, 120, 180, 240, 300)
+
+# 模板路线缓存（按目录版本、停留时间估计版本和时长档位）
+template_route_cache = CoalescingLRUCache(max_size=len(TEMPLATE_TIME_BUDGETS) * 2, ttl_seconds=86400)
+
+
+def build_user_profile(preferences: Dict[str, Any]) -> UserProfile:
+    """由标准化后的偏好构建用户画像"""
+    return UserProfile(
+        age_group=preferences['age_group'],
+        interests=list(preferences['interests']),
+        available_time=preferences['available_time'],
+        physical_ability=preferences['physical_ability'],
+        group_type=preferences['group_type'],
+        visit_purpose=preferences['visit_purpose']
+    )
+
+
+def resolve_deadline_ms(payload: Dict[str, Any], config: Dict[str, Any]) -> Optional[float]:
+    """请求的优化截止时间（毫秒）：取请求中的deadline_ms或部署默认值，并受服务端上限约束"""
+    deadline_ms = payload.get('deadline_ms', config.get('ROUTE_DEADLINE_DEFAULT_MS'))
+    if deadline_ms is None:
+        return None
+    try:
+        deadline_ms = float(deadline_ms)
+    except (TypeError, ValueError):
+        raise ValueError('deadline_ms必须是毫秒数')
+    if deadline_ms < 0:
+        raise ValueError('deadline_ms不能为负数')
+    return min(deadline_ms, config.get('ROUTE_DEADLINE_MAX_MS', DEFAULT_DEADLINE_MAX_MS))
+
+
+def deadline_bucket(deadline_ms: Optional[float]) -> Optional[float]:
+    """截止时间向下取到档位（None表示不限，单独一档）"""
+    if deadline_ms is None:
+        return None
+    return max(bucket for bucket in DEADLINE_CACHE_BUCKETS_MS if bucket <= deadline_ms)
+
+
+def plan_route(snapshot: CatalogSnapshot, preferences: Dict[str, Any],
+               ordering_engine: str = 'auto', ordering_budget_ms: float = None,
+               deadline_ms: float = None, dwell: Optional[DwellEstimates] = None) -> Dict[str, Any]:
+    """在给定目录快照（及与之对齐的停留时间估计）上为一组标准化偏好生成路线"""
+    user_profile = build_user_profile(preferences)
+    optimizer = snapshot.create_optimizer(dwell)
+    route = optimizer.optimize_route(
+        user_profile,
+        ordering_engine=ordering_engine,
+        ordering_budget_ms=ordering_budget_ms,
+        deadline_ms=deadline_ms
+    )
+    with stage_timer('llm'):
+        return LLMIntegration.optimize_route_with_llm(route, user_profile)
+
+
+def route_request(raw_preferences: Dict[str, Any], config: Dict[str, Any], snapshot: CatalogSnapshot,
+                  dwell: DwellEstimates) -> Tuple[Dict[str, Any], Optional[float], str]:
+    """单条与批量生成共用：返回 (标准化偏好, 截止时间档位, 路线缓存键)"""
+    preferences = RoutePlanningUtils.validate_user_preferences(raw_preferences)
+    deadline_ms = deadline_bucket(resolve_deadline_ms(raw_preferences, config))
+    return preferences, deadline_ms, route_cache_key(preferences, snapshot.version, dwell.version, deadline_ms)
+
+
+def fresh_route(route: Dict[str, Any]) -> Dict[str, Any]:
+    """复制缓存中共享的路线，生成时间为本次请求的时间"""
+    return dict(route, generated_at=datetime.now().isoformat())
+
+
+def generate_route_cached(raw_preferences: Dict[str, Any], config: Dict[str, Any]) -> Dict[str, Any]:
+    """标准化偏好后查询路线缓存，未命中时生成（并发的相同请求只计算一次）
+
+    返回的路线（除 generated_at 外）在请求间共享，调用方不应修改；
+    截止时间按档位计入缓存键，未命中时以档位值作为截止时间计算；
+    未命中时需先取得准入名额，过载时抛出Overloaded（相同请求的合并等待者一起收到）
+    """
+    snapshot = catalog_store.get()
+    dwell = dwell_model.get(snapshot)
+    preferences, deadline_ms, key = route_request(raw_preferences, config, snapshot, dwell)
+    route = route_cache.get_or_compute(
+        key,
+        lambda: admission_controller.solve(lambda: plan_route(
+            snapshot, preferences,
+            ordering_engine=config.get('ROUTE_ORDERING_ENGINE', 'auto'),
+            ordering_budget_ms=config.get('ROUTE_ORDERING_BUDGET_MS'),
+            deadline_ms=deadline_ms,
+            dwell=dwell
+        ))
+    )
+    # 缓存命中时生成时间为本次请求的时间
+    return fresh_route(route)
+
+
+def template_route(raw_preferences: Dict[str, Any]) -> Dict[str, Any]:
+    """过载时的降级路线：默认画像在不超过请求时长的最大档位上的路线
+
+    每个档位每个目录版本只计算一次，不占用准入名额；返回的路线带 degraded 标记
+    """
+    preferences = RoutePlanningUtils.validate_user_preferences(raw_preferences)
+    budget = max([minutes for minutes in TEMPLATE_TIME_BUDGETS if minutes <= preferences['available_time']],
+                 default=TEMPLATE_TIME_BUDGETS[0])
+    snapshot = catalog_store.get()
+    dwell = dwell_model.get(snapshot)
+    route = template_route_cache.get_or_compute(
+        (snapshot.version, dwell.version, budget),
+        lambda: plan_route(snapshot, RoutePlanningUtils.validate_user_preferences({'available_time': budget}),
+                           dwell=dwell)
+    )
+    return dict(route, degraded={'reason': 'overloaded', 'template_time': budget})
+
+
+def warm_template_routes() -> int:
+    """预先计算全部档位的模板路线（启动预热时调用），返回档位数"""
+    for minutes in TEMPLATE_TIME_BUDGETS:
+        template_route({'available_time': minutes})
+    return len(TEMPLATE_TIME_BUDGETS)
+
+
+def generate_route_admitted(raw_preferences: Dict[str, Any], config: Dict[str, Any]) -> Dict[str, Any]:
+    """经准入控制生成路线：过载时按配置抛出Overloaded（503）或返回模板路线"""
+    try:
+        return generate_route_cached(raw_preferences, config)
+    except Overloaded:
+        if not admission_controller.degrade:
+            raise
+        return template_route(raw_preferences)
+
+
+def guide_language(payload: Dict[str, Any]) -> str:
+    """讲解词语言（默认中文）"""
+    return str(payload.get('language') or DEFAULT_GUIDE_LANGUAGE)[:16]
+
+
+def with_guides(route: Dict[str, Any], raw_preferences: Dict[str, Any],
+                snapshot: CatalogSnapshot = None) -> Dict[str, Any]:
+    """按请求的受众和语言给路线附上各展品讲解词（返回副本）
+
+    讲解词只读取讲解词缓存，未命中时使用模板文本并在后台请求模型，不等待模型返回
+    """
+    preferences = RoutePlanningUtils.validate_user_preferences(raw_preferences)
+    return attach_guide_texts(route, snapshot or catalog_store.get(), audience_for(preferences),
+                              guide_language(raw_preferences))
+
+
+def generate_route_with_guides(raw_preferences: Dict[str, Any], config: Dict[str, Any]) -> Dict[str, Any]:
+    """生成（或复用缓存的）路线并附上各展品讲解词"""
+    return with_guides(generate_route_admitted(raw_preferences, config), raw_preferences)
+
+
+def _resolve_position(payload: Dict[str, Any], snapshot: CatalogSnapshot) -> Tuple[float, float]:
+    """游客当前位置：优先使用坐标，其次是所在展品，都没有时视为在入口"""
+    position = payload.get('current_position')
+    if position is not None:
+        try:
+            return (float(position[0]), float(position[1]))
+        except (TypeError, ValueError, IndexError, KeyError):
+            raise ValueError('current_position必须是[x, y]坐标')
+    
+    exhibit_id = payload.get('current_exhibit_id')
+    if exhibit_id is not None:
+        row = snapshot.table.row.get(str(exhibit_id))
+        if row is None:
+            raise ValueError(f'未知的展品: {exhibit_id}')
+        return tuple(snapshot.exhibits[row].location)
+    
+    return tuple(snapshot.layout['entrance'])
+
+
+def replan_visitor_route(payload: Dict[str, Any], config: Dict[str, Any]) -> Dict[str, Any]:
+    """馆内游客增量重规划：按当前位置、已参观展品和剩余时间调整原路线
+
+    结果与位置相关，不进入路线缓存；参数不合法时抛出ValueError，过载时抛出Overloaded
+    """
+    try:
+        remaining_time = int(payload['remaining_time'])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError('remaining_time必须是剩余分钟数')
+    if remaining_time <= 0:
+        raise ValueError('remaining_time必须大于0')
+    
+    route_ids = payload.get('route_ids') or []
+    visited_ids = payload.get('visited_ids') or []
+    if not isinstance(route_ids, list) or not isinstance(visited_ids, list):
+        raise ValueError('route_ids和visited_ids必须是展品ID列表')
+    
+    preferences = RoutePlanningUtils.validate_user_preferences(payload.get('user_preferences') or {})
+    user_profile = build_user_profile(preferences)
+    user_profile.available_time = remaining_time
+    
+    snapshot = catalog_store.get()
+    optimizer = snapshot.create_optimizer(dwell_model.get(snapshot))
+    position = _resolve_position(payload, snapshot)
+    # 重规划同样占用优化名额；结果与位置相关，过载时没有模板路线可降级，直接抛出Overloaded
+    with stage_timer('replan'):
+        route = admission_controller.solve(lambda: optimizer.replan_route(
+            user_profile,
+            position,
+            [str(exhibit_id) for exhibit_id in route_ids],
+            [str(exhibit_id) for exhibit_id in visited_ids],
+            ordering_budget_ms=config.get('ROUTE_REPLAN_BUDGET_MS')
+        ))
+    with stage_timer('llm'):
+        route = LLMIntegration.optimize_route_with_llm(route, user_profile)
+    return attach_guide_texts(route, snapshot, audience_for(preferences), guide_language(payload))
@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""
+路线规划SQLite调优模块
+SQLite Production Tuning for Route Planning
+为基于SQLite文件的部署提供：
+- 每个新连接执行的PRAGMA（WAL、busy_timeout、synchronous、mmap等）
+- 适合多线程、多进程的连接池设置（fork后子进程丢弃继承的连接）
+- 只读连接（目录快照与统计查询），不与写入争用写锁
+非SQLite数据库或内存数据库不做改动
+
+用法（替代 db.init_app(app)）：
+    setup_database(app)
+"""
+
+import os
+import sqlite3
+import weakref
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator, Optional
+from urllib.parse import quote
+
+from sqlalchemy import event
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.orm import Session
+
+from backend.models import db
+
+# 每个读写连接执行的PRAGMA（可用配置项 SQLITE_PRAGMAS 覆盖单项）
+DEFAULT_SQLITE_PRAGMAS = {
+    # WAL：读写互不阻塞，写入只追加日志
+    'journal_mode': 'WAL',
+    # WAL下NORMAL只在检查点时fsync，断电最多丢失最后几个事务，不会损坏数据库
+    'synchronous': 'NORMAL',
+    # 遇到写锁时等待而不是立即报 database is locked（毫秒）
+    'busy_timeout': 5000,
+    'temp_store': 'MEMORY',
+    # 256MB内存映射读取、约20MB页缓存（负数表示KB）
+    'mmap_size': 268435456,
+    'cache_size': -20000
+}
+
+# 只读连接额外执行的PRAGMA（journal_mode需要写权限，只读连接不设置）
+READONLY_PRAGMAS = {
+    'query_only': 'ON'
+}
+
+# 连接池默认设置
+DEFAULT_SQLITE_POOL_SIZE = 8
+DEFAULT_SQLITE_POOL_OVERFLOW = 16
+DEFAULT_SQLITE_POOL_TIMEOUT = 10
+
+# 只读连接使用的绑定名
+READONLY_BIND = 'readonly'
+
+
+def sqlite_file_path(uri: str) -> Optional[str]:
+    """SQLite文件数据库的路径；非SQLite或内存数据库返回None"""
+    try:
+        url = make_url(uri)
+    except Exception:
+        return None
+    if url.get_backend_name() != 'sqlite' or url.database in (None, '', ':memory:'):
+        return None
+    if url.query.get('mode') == 'memory':
+        return None
+    return url.database
+
+
+def _readonly_uri(path: str, app) -> str:
+    """只读连接的URI（SQLite URI模式，mode=ro）"""
+    if not os.path.isabs(path):
+        # 与Flask-SQLAlchemy一致：相对路径相对于实例目录
+        path = os.path.join(app.instance_path, path)
+    # URI文件名中的 ?、#、% 和空格等字符需要转义，否则SQLite会把其后的部分当作查询参数；
+    # 经 URL 对象渲染，SQLAlchemy解析URI时的反转义不会还原这层转义
+    return URL.create('sqlite', database=f"file:{quote(path)}",
+                      query={'mode': 'ro', 'uri': 'true'}).render_as_string()
+
+
+def _pool_options(config) -> Dict[str, Any]:
+    """文件数据库的连接池设置"""
+    return {
+        'pool_size': config.get('SQLITE_POOL_SIZE', DEFAULT_SQLITE_POOL_SIZE),
+        'max_overflow': config.get('SQLITE_POOL_OVERFLOW', DEFAULT_SQLITE_POOL_OVERFLOW),
+        'pool_timeout': config.get('SQLITE_POOL_TIMEOUT', DEFAULT_SQLITE_POOL_TIMEOUT),
+        # 连接在线程间传递（连接池），由连接池保证同一时刻只有一个线程使用
+        'connect_args': {'check_same_thread': False}
+    }
+
+
+def configure_sqlite(app) -> bool:
+    """在 db.init_app 之前设置引擎参数和只读绑定，返回是否为SQLite文件数据库
+
+    已显式配置的 SQLALCHEMY_ENGINE_OPTIONS / 只读绑定不会被覆盖
+    """
+    config = app.config
+    path = sqlite_file_path(config.get('SQLALCHEMY_DATABASE_URI', ''))
+    if path is None or not config.get('SQLITE_TUNING', True):
+        return False
+
+    options = dict(_pool_options(config))
+    options.update(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+    binds = dict(config.get('SQLALCHEMY_BINDS') or {})
+    if config.get('SQLITE_READONLY_CONNECTIONS', True):
+        binds.setdefault(READONLY_BIND, dict(_pool_options(config), url=_readonly_uri(path, app)))
+    config['SQLALCHEMY_BINDS'] = binds
+    return True
+
+
+def _pragma_listener(pragmas: Dict[str, Any]):
+    """新连接建立时依次执行PRAGMA"""
+    statements = [f"PRAGMA {name}={value}" for name, value in pragmas.items()]
+
+    def on_connect(dbapi_connection, connection_record):
+        if not isinstance(dbapi_connection, sqlite3.Connection):
+            return
+        cursor = dbapi_connection.cursor()
+        try:
+            for statement in statements:
+                cursor.execute(statement)
+        finally:
+            cursor.close()
+
+    return on_connect
+
+
+# fork后需要在子进程中丢弃连接的引擎（多次 setup_database 只在这里累积，不重复注册fork钩子）
+_forked_engines: 'weakref.WeakSet' = weakref.WeakSet()
+
+
+def _dispose_in_child() -> None:
+    """子进程不能使用父进程打开的SQLite连接；close=False 不影响父进程中的连接"""
+    for engine in list(_forked_engines):
+        engine.dispose(close=False)
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_dispose_in_child)
+
+
+def install_sqlite_pragmas(app) -> None:
+    """为应用的SQLite引擎安装连接PRAGMA，并在fork后让子进程丢弃继承的连接"""
+    pragmas = dict(DEFAULT_SQLITE_PRAGMAS)
+    pragmas.update(app.config.get('SQLITE_PRAGMAS') or {})
+    readonly_pragmas = {name: value for name, value in pragmas.items()
+                        if name not in ('journal_mode', 'synchronous')}
+    readonly_pragmas.update(READONLY_PRAGMAS)
+
+    with app.app_context():
+        engines = dict(db.engines)
+    for bind, engine in engines.items():
+        if engine.dialect.name != 'sqlite':
+            continue
+        listener = _pragma_listener(readonly_pragmas if bind == READONLY_BIND else pragmas)
+        event.listen(engine, 'connect', listener)
+
+    _forked_engines.update(engines.values())
+
+
+def setup_database(app) -> None:
+    """初始化数据库扩展（SQLite文件数据库时附带调优）"""
+    tuned = configure_sqlite(app)
+    db.init_app(app)
+    if tuned:
+        install_sqlite_pragmas(app)
+
+
+@contextmanager
+def read_session() -> Iterator[Session]:
+    """只读查询使用的会话：有只读绑定时使用独立的只读连接，否则使用当前请求的会话"""
+    engine = db.engines.get(READONLY_BIND)
+    if engine is None:
+        yield db.session
+        return
+    session = Session(bind=engine)
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+def sqlite_status() -> Dict[str, Any]:
+    """当前连接的实际PRAGMA值（供系统状态接口使用）"""
+    if db.engine.dialect.name != 'sqlite':
+        return {}
+    with db.engine.connect() as connection:
+        raw = connection.connection.dbapi_connection
+        return {
+            name: raw.execute(f"PRAGMA {name}").fetchone()[0]
+            for name in ('journal_mode', 'synchronous', 'busy_timeout', 'mmap_size')
+        }
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+应用启动时间基准测试
+Startup Time Benchmark
+每次在新的Python进程中创建应用（app.create_app），比较以下启动方式：
+- classic：每次启动建表、检查示例数据，不预热（首个请求加载目录快照）
+- fast：快速启动（不建表），后台预热，/ready 就绪后接收流量
+- fast_sync：快速启动，同步预热（预加载后再fork工作进程的方式）
+记录导入耗时、create_app 耗时、就绪耗时、首个请求延迟和整个进程的耗时，多次运行取中位数
+
+用法：
+    python -m backend.route_planning.route_planning_startup_benchmark --runs 5 --exhibits 1000
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, Any, List
+
+# 默认运行次数、展品数
+DEFAULT_RUNS = 5
+DEFAULT_EXHIBITS = 1000
+DEFAULT_SEED = 20250806
+
+# 启动方式及其配置
+STARTUP_SCENARIOS = {
+    'classic': {'FAST_START': False, 'WARMUP_MODE': 'off'},
+    'fast': {'FAST_START': True, 'WARMUP_MODE': 'background'},
+    'fast_sync': {'FAST_START': True, 'WARMUP_MODE': 'sync'}
+}
+
+# 子进程：创建应用，等待就绪后依次发出首批请求，最后一行输出JSON结果
+CHILD_SCRIPT = '''
+import json, sys, time
+started = time.perf_counter()
+import app as app_module
+from backend.route_planning.route_planning_warmup import warmup_state
+imported = time.perf_counter()
+application = app_module.create_app(json.loads(sys.argv[1]))
+created = time.perf_counter()
+while not warmup_state.ready:
+    time.sleep(0.005)
+ready = time.perf_counter()
+client = application.test_client()
+requests = {}
+for name, method, url, body in (
+    ('exhibits', 'get', '/api/route-planning/exhibits', None),
+    ('page', 'get', '/route-planner', None),
+    ('generate', 'post', '/api/route-planning/generate', {'age_group': 'adult', 'time_budget': 60}),
+):
+    request_started = time.perf_counter()
+    response = getattr(client, method)(url, json=body)
+    requests[name] = round((time.perf_counter() - request_started) * 1000, 2)
+    assert response.status_code == 200, (url, response.status_code)
+served = time.perf_counter()
+print(json.dumps({
+    'import_ms': round((imported - started) * 1000, 2),
+    'create_ms': round((created - imported) * 1000, 2),
+    'ready_ms': round((ready - started) * 1000, 2),
+    'first_requests_ms': requests,
+    'served_ms': round((served - started) * 1000, 2),
+    'warmup': warmup_state.to_dict()['steps']
+}))
+'''
+
+
+def project_root() -> str:
+    """项目根目录（app.py 所在目录）"""
+    return os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def prepare_database(uri: str, exhibits: int, seed: int) -> None:
+    """建表、写入示例数据和合成展品（相当于部署时执行一次 flask init-db 和展品导入）"""
+    sys.path.insert(0, project_root())
+    from app import create_app
+    from .route_planning_import import import_catalog_file
+    from .route_planning_import_benchmark import write_csv
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': uri, 'FAST_START': False, 'WARMUP_MODE': 'off'})
+    if exhibits <= 0:
+        return
+    with tempfile.TemporaryDirectory() as directory, app.app_context():
+        path = os.path.join(directory, 'exhibits.csv')
+        write_csv(path, exhibits, seed)
+        import_catalog_file(path)
+
+
+def run_once(config: Dict[str, Any]) -> Dict[str, Any]:
+    """在新进程中启动一次，返回子进程的测量结果和进程总耗时"""
+    started = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, '-c', CHILD_SCRIPT, json.dumps(config)],
+        cwd=project_root(), capture_output=True, text=True, check=True
+    )
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result['process_ms'] = round((time.perf_counter() - started) * 1000, 2)
+    return result
+
+
+def _summarize(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """各指标的中位数和最小/最大值"""
+    def column(values: List[float]) -> Dict[str, float]:
+        return {'median': round(statistics.median(values), 2), 'min': min(values), 'max': max(values)}
+
+    summary = {key: column([run[key] for run in runs])
+               for key in ('import_ms', 'create_ms', 'ready_ms', 'served_ms', 'process_ms')}
+    summary['first_requests_ms'] = {
+        name: column([run['first_requests_ms'][name] for run in runs]) for name in runs[0]['first_requests_ms']
+    }
+    summary['warmup'] = runs[-1]['warmup']
+    return summary
+
+
+def run_benchmark(runs: int = DEFAULT_RUNS, exhibits: int = DEFAULT_EXHIBITS,
+                  seed: int = DEFAULT_SEED) -> Dict[str, Any]:
+    """在同一个临时数据库上依次测量各启动方式"""
+    results = {'runs': runs, 'exhibits': exhibits, 'scenarios': {}}
+    with tempfile.TemporaryDirectory() as directory:
+        uri = f"sqlite:///{os.path.join(directory, 'startup.db')}"
+        prepare_database(uri, exhibits, seed)
+        for name, scenario in STARTUP_SCENARIOS.items():
+            config = dict(scenario, SQLALCHEMY_DATABASE_URI=uri)
+            results['scenarios'][name] = _summarize([run_once(config) for _ in range(runs)])
+    return results
+
+
+def main(argv=None) -> None:
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description='应用启动时间基准测试')
+    parser.add_argument('--runs', type=int, default=DEFAULT_RUNS)
+    parser.add_argument('--exhibits', type=int, default=DEFAULT_EXHIBITS, help='数据库中的合成展品数')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--output', help='结果JSON文件路径')
+    args = parser.parse_args(argv)
+
+    results = run_benchmark(args.runs, args.exhibits, args.seed)
+    for name, summary in results['scenarios'].items():
+        first = summary['first_requests_ms']
+        print(f"{name:>10}: create_app {summary['create_ms']['median']:>8}ms  "
+              f"就绪 {summary['ready_ms']['median']:>8}ms  "
+              f"首个生成请求 {first['generate']['median']:>8}ms  "
+              f"首批请求完成 {summary['served_ms']['median']:>8}ms  "
+              f"进程 {summary['process_ms']['median']:>8}ms")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+路线规划流式响应模块
+Streamed Route Responses for Route Planning
+把路线生成结果拆成先后到达的事件，缩短地图页面的感知延迟：
+1. route           —— 优化器完成后立即发送有序展品列表与概要（前端可马上绘制路线）
+2. recommendations —— 个性化建议
+3. guide           —— 每个展品的讲解词，按模型返回的先后逐条发送
+4. done            —— 结束标记
+事件可编码为 NDJSON（每行一个JSON）或 Server-Sent Events
+"""
+
+import json
+import time
+from concurrent.futures import as_completed, TimeoutError as FuturesTimeoutError
+from typing import Dict, Any, Iterator, Tuple, Callable, Optional
+
+from .route_planning_core import LLMIntegration
+from .route_planning_catalog import catalog_store
+from .route_planning_service import generate_route_admitted, guide_language
+from .route_planning_utils import RoutePlanningUtils
+from .route_planning_llm import llm_client, audience_for, SOURCE_TEMPLATE
+
+# 等待全部讲解词的最长时间（秒），超时后剩余展品使用模板文本
+DEFAULT_STREAM_GUIDE_TIMEOUT = 10.0
+
+# 两种编码的 Content-Type
+NDJSON_CONTENT_TYPE = 'application/x-ndjson; charset=utf-8'
+SSE_CONTENT_TYPE = 'text/event-stream; charset=utf-8'
+
+# 路线骨架中不包含、随后单独发送的字段
+DEFERRED_FIELDS = ('recommendations', 'llm_enhanced')
+
+
+def stream_route_events(raw_preferences: Dict[str, Any], config: Dict[str, Any],
+                        on_complete: Optional[Callable[[Dict[str, Any]], None]] = None,
+                        client=None) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """生成路线并返回 (事件名, 数据) 迭代器
+
+    路线在调用时立即计算（参数不合法时在此抛出ValueError，过载且不降级时抛出Overloaded），讲解词在迭代过程中逐条产出；
+    全部讲解词就绪后以完整路线（含讲解词）调用 on_complete，再发送 done 事件
+    """
+    client = client or llm_client
+    started = time.perf_counter()
+    route = generate_route_admitted(raw_preferences, config)
+    preferences = RoutePlanningUtils.validate_user_preferences(raw_preferences)
+    snapshot = catalog_store.get()
+    audience = audience_for(preferences)
+    language = guide_language(raw_preferences)
+    timeout = config.get('ROUTE_STREAM_GUIDE_TIMEOUT', DEFAULT_STREAM_GUIDE_TIMEOUT)
+
+    def events():
+        skeleton = {key: value for key, value in route.items() if key not in DEFERRED_FIELDS}
+        yield 'route', dict(skeleton, pending_guides=len(route['route']),
+                            elapsed_ms=round((time.perf_counter() - started) * 1000, 2))
+        yield 'recommendations', {key: route[key] for key in DEFERRED_FIELDS if key in route}
+
+        # 讲解词请求同时发出，缓存命中的立即完成，其余按模型返回的先后产出
+        stops = [dict(stop) for stop in route['route']]
+        pending: Dict[Any, list] = {}
+        for index, stop in enumerate(stops):
+            row = snapshot.table.row.get(stop['id'])
+            if row is None:
+                continue
+            future = client.describe(snapshot.exhibits[row], audience, language)
+            pending.setdefault(future, []).append(index)
+
+        def guide(index, text, source):
+            stops[index].update(guide_text=text, guide_source=source)
+            return 'guide', {'index': index, 'id': stops[index]['id'],
+                             'guide_text': text, 'guide_source': source}
+
+        try:
+            for future in as_completed(list(pending), timeout=timeout):
+                text, source = future.result()
+                for index in pending.pop(future):
+                    yield guide(index, text, source)
+        except FuturesTimeoutError:
+            for indexes in pending.values():
+                for index in indexes:
+                    exhibit = snapshot.exhibits[snapshot.table.row[stops[index]['id']]]
+                    yield guide(index, LLMIntegration.generate_exhibit_description(exhibit, audience),
+                                SOURCE_TEMPLATE)
+
+        if on_complete is not None:
+            on_complete(dict(route, route=stops))
+        yield 'done', {'elapsed_ms': round((time.perf_counter() - started) * 1000, 2)}
+
+    return events()
+
+
+def encode_ndjson(event: str, data: Dict[str, Any]) -> str:
+    """编码为一行NDJSON：{"event": ..., "data": ...}"""
+    return json.dumps({'event': event, 'data': data}, ensure_ascii=False) + '\n'
+
+
+def encode_sse(event: str, data: Dict[str, Any]) -> str:
+    """编码为一条Server-Sent Events消息"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def wants_sse(accept: str, requested_format: str = None) -> bool:
+    """按 format 参数或 Accept 头选择SSE编码（默认NDJSON）"""
+    if requested_format:
+        return requested_format.lower() == 'sse'
+    return 'text/event-stream' in (accept or '')
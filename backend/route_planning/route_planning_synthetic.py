@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+路线规划合成场馆生成器
+Synthetic Venue Generator for Route Planning
+按随机种子可复现地生成任意规模的场馆：
+- 多楼层，楼层之间以楼梯（连接通道）相连
+- 每层为网格状通道网络
+- 展品按主题展厅成簇分布，重要程度和参观时间服从偏态分布
+用于性能基准测试和大规模场景下的算法验证
+"""
+
+import math
+from typing import List, Dict, Any, Tuple
+
+import numpy as np
+
+from .route_planning_core import Exhibit
+
+# 主题展厅的类别与历史时期
+SYNTHETIC_CATEGORIES = ('会议', '模型', '文献', '文物', '照片', '书法', '多媒体', '互动')
+SYNTHETIC_PERIODS = ('建党时期', '革命时期', '建设时期', '改革开放', '新时代')
+
+# 展品描述中随机出现的兴趣关键词（与前端兴趣标签对应）
+SYNTHETIC_KEYWORDS = ('历史', '革命', '文物', '建党', '英雄', '文献', '艺术', '科技')
+
+# 重要程度1-5的分布：多数为普通展品，少量为核心展品
+IMPORTANCE_WEIGHTS = (0.15, 0.30, 0.30, 0.17, 0.08)
+
+# 每个展品平均占用的展厅面积（平方米）和相邻通道间距（米）
+AREA_PER_EXHIBIT = 40.0
+CORRIDOR_SPACING = 25.0
+
+# 每个主题展厅的平均展品数
+EXHIBITS_PER_CLUSTER = 60
+
+# 楼层在平面坐标上依次横向排列的间隔（米）与楼梯步行长度（米）
+FLOOR_GAP = 50.0
+STAIR_LENGTH = 30.0
+
+# 单层最小边长（米）
+MIN_FLOOR_SIZE = 60.0
+
+
+def default_floor_count(exhibit_count: int) -> int:
+    """按展品规模估计楼层数"""
+    if exhibit_count <= 200:
+        return 1
+    if exhibit_count <= 2000:
+        return 2
+    return 3
+
+
+class SyntheticVenueGenerator:
+    """可复现的合成场馆生成器（相同种子与参数得到相同场馆）"""
+
+    def __init__(self, seed: int = 0):
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+
+    def generate(self, exhibit_count: int, floors: int = None) -> Tuple[List[Exhibit], Dict[str, Any]]:
+        """生成展品列表和场馆布局"""
+        floors = floors or default_floor_count(exhibit_count)
+        per_floor = np.full(floors, exhibit_count // floors)
+        per_floor[:exhibit_count % floors] += 1
+
+        size = max(MIN_FLOOR_SIZE, math.sqrt(per_floor.max() * AREA_PER_EXHIBIT))
+        lines = np.linspace(0.0, size, max(2, int(round(size / CORRIDOR_SPACING)) + 1))
+
+        exhibits: List[Exhibit] = []
+        walkways: List[List[Tuple[float, float]]] = []
+        floor_info = []
+        restrooms, rest_areas = [], []
+        for level in range(floors):
+            origin = level * (size + FLOOR_GAP)
+            walkways.extend(self._grid_walkways(origin, lines))
+            exhibits.extend(self._floor_exhibits(level, origin, size, int(per_floor[level]), len(exhibits)))
+            restrooms.append((origin + lines[0], lines[-1]))
+            restrooms.append((origin + lines[-1], lines[-1]))
+            rest_areas.append(self._grid_point(origin, lines))
+            rest_areas.append(self._grid_point(origin, lines))
+            floor_info.append({'level': level + 1, 'origin': [origin, 0.0], 'width': size, 'height': size})
+
+        # 相邻楼层之间在两侧各设一部楼梯
+        middle = float(lines[len(lines) // 2])
+        connectors = []
+        for level in range(floors - 1):
+            lower, upper = level * (size + FLOOR_GAP), (level + 1) * (size + FLOOR_GAP)
+            for x in (lines[0], lines[-1]):
+                connectors.append(((lower + x, middle), (upper + x, middle), STAIR_LENGTH))
+
+        layout = {
+            'name': f'合成场馆（{exhibit_count}件展品，{floors}层，种子{self.seed}）',
+            'entrance': (0.0, 0.0),
+            'exit': (float(lines[-1]), 0.0),
+            'restrooms': restrooms,
+            'rest_areas': rest_areas,
+            'emergency_exits': [],
+            'walkways': walkways,
+            'connectors': connectors,
+            'floors': floor_info
+        }
+        return exhibits, layout
+
+    def _grid_walkways(self, origin: float, lines: np.ndarray) -> List[List[Tuple[float, float]]]:
+        """单层网格通道：每条通道经过与其相交的全部交叉口"""
+        xs = [float(origin + x) for x in lines]
+        ys = [float(y) for y in lines]
+        walkways = [[(x, y) for y in ys] for x in xs]
+        walkways.extend([[(x, y) for x in xs] for y in ys])
+        return walkways
+
+    def _grid_point(self, origin: float, lines: np.ndarray) -> Tuple[float, float]:
+        """随机选取一个通道交叉口"""
+        x, y = self.rng.choice(lines, size=2)
+        return (float(origin + x), float(y))
+
+    def _floor_exhibits(self, level: int, origin: float, size: float,
+                        count: int, first_index: int) -> List[Exhibit]:
+        """在单层内按主题展厅成簇生成展品"""
+        if count == 0:
+            return []
+        rng = self.rng
+        clusters = max(1, int(round(count / EXHIBITS_PER_CLUSTER)))
+        margin = min(5.0, size / 10)
+        centers = rng.uniform(margin, size - margin, size=(clusters, 2))
+        spread = size / (2.5 * math.sqrt(clusters))
+
+        membership = rng.integers(0, clusters, size=count)
+        xy = np.clip(centers[membership] + rng.normal(0.0, spread, size=(count, 2)), margin, size - margin)
+        importance = rng.choice(np.arange(1, 6), size=count, p=IMPORTANCE_WEIGHTS)
+        # 参观时间为对数正态分布，越重要的展品停留越久
+        duration = np.clip(np.round(rng.lognormal(math.log(5.0), 0.5, size=count) + 1.5 * importance), 2, 45)
+        cluster_category = rng.integers(0, len(SYNTHETIC_CATEGORIES), size=clusters)
+        cluster_period = rng.integers(0, len(SYNTHETIC_PERIODS), size=clusters)
+        keyword_picks = rng.integers(0, len(SYNTHETIC_KEYWORDS), size=(count, 2))
+
+        exhibits = []
+        for i in range(count):
+            cluster = membership[i]
+            category = SYNTHETIC_CATEGORIES[cluster_category[cluster]]
+            keywords = '、'.join(dict.fromkeys(SYNTHETIC_KEYWORDS[k] for k in keyword_picks[i]))
+            exhibits.append(Exhibit(
+                f"S{first_index + i + 1:05d}",
+                f"{level + 1}F-{cluster + 1}号展厅-{category}{i + 1}",
+                f"{category}主题展品，涉及{keywords}",
+                (round(float(origin + xy[i, 0]), 2), round(float(xy[i, 1]), 2)),
+                int(importance[i]),
+                int(duration[i]),
+                category,
+                SYNTHETIC_PERIODS[cluster_period[cluster]]
+            ))
+        return exhibits
@@ -0,0 +1,298 @@
+# -*- coding: utf-8 -*-
+"""
+路线规划访问顺序引擎
+Tour Ordering Engine for Route Planning
+在步行距离矩阵上求解"入口 → 全部展品 → 出口"的开放路径
+- 小规模：Held-Karp 动态规划精确求解
+- 大规模：最近邻构造 + 基于近邻表的 2-opt / Or-opt 局部搜索
+"""
+
+import time
+from typing import List, Optional
+
+import numpy as np
+
+from .route_planning_arrays import path_length as _path_length
+
+# 可选的排序引擎
+ORDERING_ENGINES = ('auto', 'exact', 'local_search', 'nearest_neighbor')
+
+# auto模式下使用精确算法的最大展品数
+EXACT_MAX_STOPS = 10
+
+# 每个节点的候选近邻数量
+DEFAULT_NEIGHBOR_COUNT = 8
+
+# Or-opt 一次搬移的最长片段
+OR_OPT_MAX_SEGMENT = 3
+
+# 浮点比较容差，避免因舍入误差来回交换
+IMPROVEMENT_EPSILON = 1e-9
+
+
+class TourOrderingEngine:
+    """开放路径访问顺序引擎"""
+
+    def __init__(self, matrix: np.ndarray, engine: str = 'auto',
+                 budget_ms: Optional[float] = None, max_passes: Optional[int] = None,
+                 neighbor_count: int = DEFAULT_NEIGHBOR_COUNT):
+        if engine not in ORDERING_ENGINES:
+            raise ValueError(f"未知的排序引擎: {engine}")
+        # 稠密矩阵或按行计算的距离矩阵（只通过下标取值）
+        self.matrix = matrix if hasattr(matrix, 'shape') else np.asarray(matrix)
+        self.engine = engine
+        self.budget_ms = budget_ms
+        self.max_passes = max_passes
+        self.neighbor_count = neighbor_count
+        self.deadline = None
+        # 当前求解所用的局部子矩阵：下标0为起点、1..n为展品、n+1为终点
+        self.local = None
+
+    def order(self, start: int, stops: List[int], end: int) -> List[int]:
+        """返回从start出发、经过全部stops、到达end的展品访问顺序（不含起终点）"""
+        if len(stops) <= 1:
+            return list(stops)
+
+        engine = self._resolve_engine(len(stops))
+        nodes, sub = self._prepare(start, stops, end, engine)
+        last = len(nodes) - 1
+
+        if engine == 'exact':
+            order = self.held_karp(0, list(range(1, last)), last)
+        else:
+            order = self.nearest_neighbor(sub, 0, last)
+            if engine == 'local_search':
+                order = self.local_search(sub, 0, order, last)
+        return [nodes[i] for i in order]
+
+    def improve(self, start: int, stops: List[int], end: int) -> List[int]:
+        """以已有顺序为初始解（热启动）改进访问顺序，小规模时直接精确求解"""
+        if len(stops) <= 1:
+            return list(stops)
+
+        engine = self._resolve_engine(len(stops))
+        if engine == 'nearest_neighbor':
+            return list(stops)
+        nodes, sub = self._prepare(start, stops, end, engine)
+        last = len(nodes) - 1
+
+        if engine == 'exact':
+            order = self.held_karp(0, list(range(1, last)), last)
+        else:
+            order = self.local_search(sub, 0, list(range(1, last)), last)
+        return [nodes[i] for i in order]
+
+    def _resolve_engine(self, size: int) -> str:
+        """auto模式下按展品数选择精确算法或局部搜索；指定exact时超过精确求解上限也改用局部搜索"""
+        if self.engine in ('auto', 'exact'):
+            return 'exact' if size <= EXACT_MAX_STOPS else 'local_search'
+        return self.engine
+
+    def _prepare(self, start: int, stops: List[int], end: int, engine: str):
+        """开始计时并取出本次涉及的节点构成子矩阵"""
+        self.deadline = (time.perf_counter() + self.budget_ms / 1000.0
+                         if self.budget_ms is not None else None)
+
+        # 内层循环在Python列表上查表
+        nodes = [start] + list(stops) + [end]
+        sub = np.asarray(self.matrix[np.ix_(nodes, nodes)])
+        if engine != 'nearest_neighbor':
+            self.local = sub.tolist()
+        return nodes, sub
+
+    def path_length(self, path: List[int]) -> float:
+        """计算节点序列（原矩阵下标）的总长度"""
+        return _path_length(self.matrix, path)
+
+    def _out_of_budget(self) -> bool:
+        """检查是否超出时间预算"""
+        return self.deadline is not None and time.perf_counter() >= self.deadline
+
+    # ==================== 构造算法 ====================
+
+    def nearest_neighbor(self, sub: np.ndarray, start: int, end: int) -> List[int]:
+        """最近邻贪心构造初始顺序（每步一次向量化argmin）"""
+        # 已访问节点的惩罚置为无穷大，每步只需对当前行做一次argmin
+        penalty = np.zeros(len(sub))
+        penalty[[start, end]] = np.inf
+        current = start
+        tour = []
+        for _ in range(len(sub) - 2):
+            current = int((sub[current] + penalty).argmin())
+            penalty[current] = np.inf
+            tour.append(current)
+        return tour
+
+    # ==================== 精确算法 ====================
+
+    def held_karp(self, start: int, stops: List[int], end: int) -> List[int]:
+        """Held-Karp 状态压缩动态规划，O(2^n · n²)"""
+        matrix = self.local
+        n = len(stops)
+        full = (1 << n) - 1
+
+        # cost[mask][j]: 从起点出发访问mask内全部展品并停在第j个展品的最短距离
+        cost = [None] * (1 << n)
+        parent = [None] * (1 << n)
+        for j in range(n):
+            mask = 1 << j
+            cost[mask] = {j: matrix[start][stops[j]]}
+            parent[mask] = {j: -1}
+
+        for mask in range(1, full + 1):
+            layer = cost[mask]
+            if layer is None:
+                continue
+            for j, base in layer.items():
+                row = matrix[stops[j]]
+                for k in range(n):
+                    bit = 1 << k
+                    if mask & bit:
+                        continue
+                    nxt = mask | bit
+                    candidate = base + row[stops[k]]
+                    if cost[nxt] is None:
+                        cost[nxt] = {}
+                        parent[nxt] = {}
+                    if candidate < cost[nxt].get(k, float('inf')):
+                        cost[nxt][k] = candidate
+                        parent[nxt][k] = j
+
+        last = min(cost[full], key=lambda j: cost[full][j] + matrix[stops[j]][end])
+        order = []
+        mask = full
+        while last != -1:
+            order.append(stops[last])
+            previous = parent[mask][last]
+            mask ^= 1 << last
+            last = previous
+        order.reverse()
+        return order
+
+    # ==================== 局部搜索 ====================
+
+    def _neighbor_lists(self, sub: np.ndarray) -> List[List[int]]:
+        """为每个节点预先计算最近的若干候选近邻（按距离升序）"""
+        count = min(self.neighbor_count + 1, len(sub))
+        nearest = np.argpartition(sub, count - 1, axis=1)[:, :count]
+        rows = np.arange(len(sub))[:, None]
+        ordered = np.take_along_axis(nearest, sub[rows, nearest].argsort(axis=1), axis=1)
+        return ordered.tolist()
+
+    def local_search(self, sub: np.ndarray, start: int, stops: List[int], end: int) -> List[int]:
+        """基于近邻表与不看位(don't-look bits)的 2-opt + Or-opt 改进"""
+        path = [start] + list(stops) + [end]
+        neighbors = self._neighbor_lists(sub)
+        active = set(stops)
+        passes = 0
+        # 节点在path中的下标，每次改动只更新被反转或搬移的区间
+        position = {node: i for i, node in enumerate(path)}
+
+        while active and not self._out_of_budget():
+            if self.max_passes is not None and passes >= self.max_passes:
+                break
+            passes += 1
+            queue = list(active)
+            active = set()
+            for node in queue:
+                if self._out_of_budget():
+                    break
+                changed = (self._try_two_opt(path, position, node, neighbors)
+                           or self._try_or_opt(path, position, node, neighbors))
+                if changed:
+                    active.update(changed)
+        return path[1:-1]
+
+    @staticmethod
+    def _reindex(path, position, begin: int, end: int) -> None:
+        """更新 path[begin..end] 中节点的下标"""
+        for index in range(begin, end + 1):
+            position[path[index]] = index
+
+    def _try_two_opt(self, path, position, node, neighbors) -> Optional[set]:
+        """尝试以node为端点的 2-opt 交换，成功时返回受影响的节点"""
+        matrix = self.local
+        last = len(path) - 1
+        i = position[node]
+
+        # 情形一：断开 (node, succ) 与 (c, succ_c)，反转 path[i+1..j]
+        if i < last:
+            succ = path[i + 1]
+            removed = matrix[node][succ]
+            for c in neighbors[node]:
+                add = matrix[node][c]
+                if add >= removed:
+                    break
+                j = position[c]
+                if j <= i + 1 or j >= last:
+                    continue
+                d = path[j + 1]
+                gain = removed + matrix[c][d] - add - matrix[succ][d]
+                if gain > IMPROVEMENT_EPSILON:
+                    path[i + 1:j + 1] = path[i + 1:j + 1][::-1]
+                    self._reindex(path, position, i + 1, j)
+                    return {node, succ, c, d}
+
+        # 情形二：断开 (pred, node) 与 (pred_c, c)，反转 path[j..i-1]
+        if i > 0:
+            pred = path[i - 1]
+            removed = matrix[pred][node]
+            for c in neighbors[node]:
+                add = matrix[node][c]
+                if add >= removed:
+                    break
+                j = position[c]
+                if j >= i - 1 or j <= 0:
+                    continue
+                b = path[j - 1]
+                gain = removed + matrix[b][c] - add - matrix[b][pred]
+                if gain > IMPROVEMENT_EPSILON:
+                    path[j:i] = path[j:i][::-1]
+                    self._reindex(path, position, j, i - 1)
+                    return {node, pred, c, b}
+        return None
+
+    def _try_or_opt(self, path, position, node, neighbors) -> Optional[set]:
+        """尝试把以node开头的短片段搬到其近邻旁边（可反向插入）"""
+        matrix = self.local
+        last = len(path) - 1
+        i = position[node]
+        if i == 0 or i == last:
+            return None
+
+        for length in range(1, OR_OPT_MAX_SEGMENT + 1):
+            j = i + length - 1
+            if j >= last:
+                break
+            first, tail = path[i], path[j]
+            before, after = path[i - 1], path[j + 1]
+            removal_gain = (matrix[before][first] + matrix[tail][after]
+                            - matrix[before][after])
+            if removal_gain <= IMPROVEMENT_EPSILON:
+                continue
+            for c in neighbors[node]:
+                k = position[c]
+                if i - 1 <= k <= j:
+                    continue
+                # 插入到边 (c, c的后继) 之间
+                if k >= last:
+                    continue
+                d = path[k + 1]
+                if i <= k + 1 <= j:
+                    continue
+                forward = matrix[c][first] + matrix[tail][d] - matrix[c][d]
+                backward = matrix[c][tail] + matrix[first][d] - matrix[c][d]
+                insert_cost = min(forward, backward)
+                if removal_gain - insert_cost > IMPROVEMENT_EPSILON:
+                    segment = path[i:j + 1]
+                    if backward < forward:
+                        segment.reverse()
+                    # 只改写片段原位置与插入位置之间的区间
+                    if k > j:
+                        path[i:k + 1] = path[j + 1:k + 1] + segment
+                        self._reindex(path, position, i, k)
+                    else:
+                        path[k + 1:j + 1] = segment + path[k + 1:i]
+                        self._reindex(path, position, k + 1, j)
+                    return {before, after, c, d, first, tail}
+        return None
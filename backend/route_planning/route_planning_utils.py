@@ -10,6 +10,26 @@ import json
 from datetime import datetime, timedelta
 from typing import List, Dict, Any, Tuple
 
+import numpy as np
+
+from .route_planning_arrays import euclidean_matrix, manhattan_matrix
+
+# 路线难度等级（按从易到难的顺序编码）
+DIFFICULTY_LEVELS = ('简单', '适中', '具有挑战性')
+
+# 可用时间按此粒度（分钟）取整，便于相同画像的请求共享缓存
+TIME_BUDGET_STEP = 5
+
+# 分享链接的默认站点地址（实际部署时通过 ROUTE_SHARE_BASE_URL 配置）
+SHARE_BASE_URL = 'https://example.com'
+
+# 不同体力状况的步行速度（米/秒）
+WALKING_SPEEDS = {
+    'low': 0.8,
+    'medium': 1.2,
+    'high': 1.4
+}
+
 class RoutePlanningUtils:
     """路线规划工具类"""
     
@@ -23,11 +43,30 @@ class RoutePlanningUtils:
         """计算两点间的曼哈顿距离（更适合室内导航）"""
         return abs(point1[0] - point2[0]) + abs(point1[1] - point2[1])
     
+    @staticmethod
+    def calculate_distance_matrix(points_a, points_b=None, metric: str = 'euclidean') -> np.ndarray:
+        """批量计算两组点之间的距离矩阵（euclidean / manhattan）"""
+        points_a = np.asarray(points_a, dtype=np.float64).reshape(-1, 2)
+        points_b = points_a if points_b is None else np.asarray(points_b, dtype=np.float64).reshape(-1, 2)
+        if metric == 'manhattan':
+            return manhattan_matrix(points_a, points_b)
+        return euclidean_matrix(points_a, points_b)
+    
+    @staticmethod
+    def get_walking_speed(physical_ability: str) -> float:
+        """根据体力状况获取步行速度（米/秒）"""
+        return WALKING_SPEEDS.get(physical_ability, WALKING_SPEEDS['medium'])
+    
+    @staticmethod
+    def estimate_walking_minutes(distance: float, walking_speed: float = 1.2) -> float:
+        """估算步行时间（分钟，不取整，供优化器累加使用）"""
+        return distance / walking_speed / 60
+    
     @staticmethod
     def estimate_walking_time(distance: float, walking_speed: float = 1.2) -> int:
         """估算步行时间（米/秒）"""
         # 默认步行速度 1.2 m/s（约4.3 km/h，适合室内参观）
-        return int(distance / walking_speed / 60)  # 转换为分钟
+        return int(RoutePlanningUtils.estimate_walking_minutes(distance, walking_speed))  # 转换为分钟
     
     @staticmethod
     def validate_user_preferences(preferences: Dict[str, Any]) -> Dict[str, Any]:
@@ -52,13 +91,24 @@ class RoutePlanningUtils:
         if validated['group_type'] not in valid_group_types:
             validated['group_type'] = 'individual'
         
-        # 时间验证
-        validated['available_time'] = max(30, min(300, preferences.get('available_time', 60)))
+        # 参观目的验证
+        valid_purposes = ['education', 'leisure', 'research']
+        validated['visit_purpose'] = preferences.get('visit_purpose', 'education')
+        if validated['visit_purpose'] not in valid_purposes:
+            validated['visit_purpose'] = 'education'
+        
+        # 时间验证（按 TIME_BUDGET_STEP 分钟取整）
+        try:
+            available_time = int(preferences.get('available_time', 60))
+        except (ValueError, TypeError):
+            available_time = 60
+        available_time = int(round(available_time / TIME_BUDGET_STEP)) * TIME_BUDGET_STEP
+        validated['available_time'] = max(30, min(300, available_time))
         
-        # 兴趣标签验证
+        # 兴趣标签验证（去重并排序，顺序不影响结果）
         interests = preferences.get('interests', [])
         if isinstance(interests, list):
-            validated['interests'] = interests
+            validated['interests'] = sorted({str(i).strip() for i in interests if str(i).strip()})
         else:
             validated['interests'] = []
         
@@ -155,47 +205,52 @@ class RoutePlanningUtils:
         
         return sharing_info
     
+    @staticmethod
+    def calculate_accessibility_scores(exhibit_counts, durations, difficulty_codes) -> Dict[str, np.ndarray]:
+        """批量计算多条路线的无障碍友好程度
+        
+        三个参数均为按路线对齐的数组，difficulty_codes 为 DIFFICULTY_LEVELS 中的下标
+        """
+        exhibit_counts = np.asarray(exhibit_counts)
+        durations = np.asarray(durations)
+        difficulty_codes = np.asarray(difficulty_codes)
+        
+        # 基于展品数量、总时长、路线复杂度分别评分
+        count_score = np.select([exhibit_counts <= 5, exhibit_counts <= 8], [30, 20], 10)
+        duration_score = np.select([durations <= 60, durations <= 90], [30, 20], 10)
+        difficulty_score = np.select([difficulty_codes == 0, difficulty_codes == 1], [40, 30], 20)
+        
+        return {
+            'score': np.minimum(100, count_score + duration_score + difficulty_score),
+            'many_exhibits': exhibit_counts > 8,
+            'long_duration': durations > 90,
+            'challenging': difficulty_codes > 1
+        }
+    
     @staticmethod
     def calculate_accessibility_score(route_data: Dict[str, Any]) -> Dict[str, Any]:
         """计算路线无障碍友好程度"""
         if 'route' not in route_data:
             return {'score': 0, 'suggestions': []}
         
-        route = route_data['route']
-        accessibility_score = 0
-        suggestions = []
+        summary = route_data.get('summary', {})
+        difficulty = summary.get('difficulty')
+        difficulty_code = DIFFICULTY_LEVELS.index(difficulty) if difficulty in DIFFICULTY_LEVELS else 2
+        result = RoutePlanningUtils.calculate_accessibility_scores(
+            [len(route_data['route'])], [summary.get('estimated_time', 0)], [difficulty_code]
+        )
         
-        # 基于展品数量评分
-        exhibit_count = len(route)
-        if exhibit_count <= 5:
-            accessibility_score += 30
-        elif exhibit_count <= 8:
-            accessibility_score += 20
-        else:
-            accessibility_score += 10
+        accessibility_score = int(result['score'][0])
+        suggestions = []
+        if result['many_exhibits'][0]:
             suggestions.append("路线包含较多展品，建议适当休息")
-        
-        # 基于总时长评分
-        total_duration = route_data.get('summary', {}).get('estimated_time', 0)
-        if total_duration <= 60:
-            accessibility_score += 30
-        elif total_duration <= 90:
-            accessibility_score += 20
-        else:
-            accessibility_score += 10
+        if result['long_duration'][0]:
             suggestions.append("参观时间较长，建议在休息区适当停留")
-        
-        # 基于路线复杂度评分
-        if route_data.get('summary', {}).get('difficulty') == '简单':
-            accessibility_score += 40
-        elif route_data.get('summary', {}).get('difficulty') == '适中':
-            accessibility_score += 30
-        else:
-            accessibility_score += 20
+        if result['challenging'][0]:
             suggestions.append("路线具有一定挑战性，建议量力而行")
         
         return {
-            'score': min(100, accessibility_score),
+            'score': accessibility_score,
             'level': '优秀' if accessibility_score >= 80 else '良好' if accessibility_score >= 60 else '一般',
             'suggestions': suggestions
         }
@@ -227,11 +282,11 @@ class RoutePlanningUtils:
             return high_importance + other_exhibits[:3]  # 限制展品数量
     
     @staticmethod
-    def generate_route_qr_code_data(route_id: int) -> Dict[str, Any]:
-        """生成路线二维码数据"""
+    def generate_route_qr_code_data(route_hash: str, base_url: str = SHARE_BASE_URL) -> Dict[str, Any]:
+        """生成路线二维码数据（链接指向内容哈希，打开时按哈希读取路线）"""
         return {
             'type': 'nanhu_memorial_route',
-            'route_id': route_id,
+            'route_hash': route_hash,
             'generated_at': datetime.now().isoformat(),
-            'url': f"https://example.com/route/{route_id}"  # 实际部署时需要修改
+            'url': f"{base_url.rstrip('/')}/route-planner?share={route_hash}"
         }
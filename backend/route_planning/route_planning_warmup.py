@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+启动预热与就绪状态
+Startup Warm-up and Readiness for Route Planning
+进程启动后、接收流量前把首个请求才会付出的开销提前做完：
+- 加载目录快照（含通道距离矩阵）、停留时间估计
+- 预先序列化展品 / 布局 / 推荐路线响应和场馆数据包
+- 编译全部页面模板
+- 用默认画像生成一条路线（预热优化器并填充路线缓存），计算过载降级用的模板路线
+预热可在后台线程中进行（background，进程立即开始监听）、同步完成（sync，预加载后再fork工作进程时使用）或关闭（off）；
+/ready 在预热完成前返回503，负载均衡据此决定何时把流量切到新进程
+"""
+
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Any, List, Callable, Optional, Tuple
+
+from .route_planning_catalog import catalog_store
+from .route_planning_dwell import dwell_model
+from .route_planning_metrics import Gauge, metrics_registry
+from .route_planning_service import generate_route_cached, warm_template_routes
+
+# 预热方式
+WARMUP_BACKGROUND = 'background'
+WARMUP_SYNC = 'sync'
+WARMUP_OFF = 'off'
+WARMUP_MODES = (WARMUP_BACKGROUND, WARMUP_SYNC, WARMUP_OFF)
+
+# 预热状态
+STATUS_PENDING = 'pending'
+STATUS_RUNNING = 'running'
+STATUS_READY = 'ready'
+STATUS_FAILED = 'failed'
+
+
+def _warm_catalog(app) -> Dict[str, Any]:
+    snapshot = catalog_store.get()
+    return {'catalog_version': snapshot.version, 'exhibits': len(snapshot.exhibits)}
+
+
+def _warm_dwell(app) -> Dict[str, Any]:
+    return {'observed': dwell_model.get(catalog_store.get()).observed}
+
+
+def _warm_responses(app) -> Dict[str, Any]:
+    """经测试客户端请求目录类接口和数据包，预先生成序列化响应（与真实请求走同一代码路径，计入请求指标）"""
+    client = app.test_client()
+    sizes = {}
+    for name in ('exhibits', 'layout', 'recommendations', 'bundle'):
+        response = client.get(f'/api/route-planning/{name}', headers={'Accept-Encoding': 'gzip'})
+        if response.status_code != 200:
+            raise RuntimeError(f"{name} 返回状态码 {response.status_code}")
+        sizes[name] = len(response.data)
+    return sizes
+
+
+def _warm_templates(app) -> Dict[str, Any]:
+    names = app.jinja_env.list_templates(extensions=('html',))
+    for name in names:
+        app.jinja_env.get_template(name)
+    return {'templates': len(names)}
+
+
+def _warm_optimizer(app) -> Dict[str, Any]:
+    route = generate_route_cached({}, app.config)
+    return {'stops': len(route.get('route', []))}
+
+
+def _warm_template_routes(app) -> Dict[str, Any]:
+    return {'budgets': warm_template_routes()}
+
+
+# 预热步骤（按顺序执行，单步失败不影响后续步骤）
+WARMUP_STEPS: Tuple[Tuple[str, Callable], ...] = (
+    ('catalog', _warm_catalog),
+    ('dwell', _warm_dwell),
+    ('responses', _warm_responses),
+    ('templates', _warm_templates),
+    ('optimizer', _warm_optimizer),
+    ('template_routes', _warm_template_routes)
+)
+
+
+class WarmupState:
+    """进程的预热进度（供 /ready 和指标读取）"""
+
+    def __init__(self):
+        self.status = STATUS_PENDING
+        self.mode: Optional[str] = None
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.elapsed_ms: Optional[float] = None
+        self.steps: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        """是否可以接收流量（预热完成，或预热失败但不阻止服务）"""
+        return self.status in (STATUS_READY, STATUS_FAILED)
+
+    def run(self, app, steps=WARMUP_STEPS) -> None:
+        """在应用上下文中依次执行预热步骤"""
+        with self._lock:
+            if self.status != STATUS_PENDING:
+                return
+            self.status = STATUS_RUNNING
+            self.started_at = datetime.utcnow()
+        started = time.perf_counter()
+        failed = False
+        with app.app_context():
+            for name, step in steps:
+                step_started = time.perf_counter()
+                record = {'name': name}
+                try:
+                    record['result'] = step(app)
+                    record['ok'] = True
+                except Exception as e:
+                    record['ok'] = False
+                    record['error'] = str(e)
+                    failed = True
+                    app.logger.warning('预热步骤 %s 失败: %s', name, e)
+                record['elapsed_ms'] = round((time.perf_counter() - step_started) * 1000, 2)
+                self.steps.append(record)
+        self.elapsed_ms = round((time.perf_counter() - started) * 1000, 2)
+        self.finished_at = datetime.utcnow()
+        # 预热失败只意味着首个请求较慢，不阻止进程接收流量
+        self.status = STATUS_FAILED if failed else STATUS_READY
+
+    def skip(self) -> None:
+        """不预热，直接标记就绪"""
+        with self._lock:
+            if self.status == STATUS_PENDING:
+                self.status = STATUS_READY
+
+    def reset(self) -> None:
+        """回到未预热状态（预加载的应用重新加载后再次预热）"""
+        with self._lock:
+            self.status = STATUS_PENDING
+            self.started_at = None
+            self.finished_at = None
+            self.elapsed_ms = None
+            self.steps = []
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'ready': self.ready,
+            'status': self.status,
+            'mode': self.mode,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'elapsed_ms': self.elapsed_ms,
+            'steps': list(self.steps)
+        }
+
+
+def start_warmup(app, mode: str = WARMUP_BACKGROUND) -> WarmupState:
+    """按方式启动预热：background 在后台线程中进行，sync 完成后才返回，off 直接标记就绪"""
+    if mode not in WARMUP_MODES:
+        raise ValueError(f"WARMUP_MODE必须是{', '.join(WARMUP_MODES)}之一")
+    warmup_state.mode = mode
+    if mode == WARMUP_OFF:
+        warmup_state.skip()
+    elif mode == WARMUP_SYNC:
+        warmup_state.run(app)
+    else:
+        threading.Thread(target=warmup_state.run, args=(app,), name='route-planning-warmup', daemon=True).start()
+    return warmup_state
+
+
+# 进程级预热状态
+warmup_state = WarmupState()
+
+metrics_registry.register(Gauge(
+    'app_ready', '预热是否已完成（1为就绪）', lambda: 1 if warmup_state.ready else 0
+))
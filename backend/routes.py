@@ -7,16 +7,35 @@ Main Routes Handler
 路线规划相关的路由已移至 backend/route_planning/route_planning_routes.py
 """
 
-from flask import render_template, request, jsonify, redirect, url_for, flash, session
-from backend.database import *
+import time
+
+from flask import render_template, request, jsonify, redirect, url_for, flash, session, Response
+from sqlalchemy import text
+from backend.models import db, User
 from backend.route_planning import register_route_planning_routes
+from backend.route_planning.route_planning_cache import route_cache
+from backend.route_planning.route_planning_catalog import catalog_store
+from backend.route_planning.route_planning_warmup import warmup_state
+from backend.route_planning.route_planning_admission import admission_controller
+from backend.route_planning.route_planning_metrics import (
+    Gauge, metrics_registry, install_request_metrics, request_totals, render_metrics,
+    PROMETHEUS_CONTENT_TYPE
+)
 
 def init_routes(app):
     """初始化基础路由"""
     
+    # 请求延迟与SQL查询统计
+    install_request_metrics(app)
+    
     # 注册路线规划专用路由
     register_route_planning_routes(app)
     
+    # 导出时读取的路线缓存与目录指标
+    metrics_registry.register(Gauge('route_cache_entries', '路线缓存条目数', lambda: len(route_cache)))
+    metrics_registry.register(Gauge('route_cache_hit_ratio', '路线缓存命中率', lambda: route_cache.stats()['hit_rate']))
+    metrics_registry.register(Gauge('route_catalog_version', '当前展品目录快照版本', lambda: catalog_store.version))
+    
     @app.route('/')
     def index():
         """首页"""
@@ -80,20 +99,65 @@ def init_routes(app):
     
     @app.route('/api/system/status')
     def system_status():
-        """系统状态API"""
+        """系统状态API（各模块的实际运行数据）"""
+        database = {'ok': True}
+        try:
+            started = time.perf_counter()
+            db.session.execute(text('SELECT 1'))
+            database['ping_ms'] = round((time.perf_counter() - started) * 1000, 2)
+            users = {'ok': True, 'users': User.query.count()}
+        except Exception as e:
+            db.session.rollback()
+            database = {'ok': False, 'error': str(e)}
+            users = {'ok': False}
+        
+        try:
+            snapshot = catalog_store.get()
+            route_planning = {
+                'ok': True,
+                'catalog_version': snapshot.version,
+                'catalog_source': snapshot.source,
+                'exhibits': len(snapshot.exhibits)
+            }
+        except Exception as e:
+            route_planning = {'ok': False, 'error': str(e)}
+        
+        healthy = database['ok'] and route_planning['ok']
         return jsonify({
-            'success': True,
+            'success': healthy,
             'system': {
                 'name': '南湖纪念馆智能路线规划系统',
                 'version': '1.0.0',
                 'modules': {
-                    'route_planning': True,
-                    'user_management': True,
-                    'database': True
-                }
+                    'route_planning': route_planning,
+                    'user_management': users,
+                    'database': database
+                },
+                'requests': request_totals(),
+                'route_cache': route_cache.stats(),
+                'admission': admission_controller.stats()
             },
-            'message': '系统运行正常'
+            'message': '系统运行正常' if healthy else '部分模块异常'
+        }), 200 if healthy else 503
+    
+    @app.route('/ready')
+    def ready():
+        """就绪检查（启动预热完成前返回503，负载均衡据此决定何时转发流量）"""
+        state = warmup_state.to_dict()
+        response = jsonify({
+            'success': state['ready'],
+            'data': state,
+            'message': '服务已就绪' if state['ready'] else '服务预热中'
         })
+        if not state['ready']:
+            response.status_code = 503
+            response.headers['Retry-After'] = '1'
+        return response
+    
+    @app.route('/api/system/metrics')
+    def system_metrics():
+        """运行指标（Prometheus 文本格式）"""
+        return Response(render_metrics(), content_type=PROMETHEUS_CONTENT_TYPE)
     
     # ==================== 错误处理 ====================
     
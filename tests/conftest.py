@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+测试公共夹具
+Shared Test Fixtures
+每个测试使用临时SQLite文件数据库上的独立Flask应用；
+路线规划的进程级单例（目录快照、路线缓存、路线内容存储、准入控制、后写队列）在测试前后恢复默认状态
+"""
+
+import os
+import sys
+
+import pytest
+from flask import Flask
+
+# 测试不依赖项目根目录的 config.py，直接以仓库根目录作为导入路径
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from backend.models import db, User  # noqa: E402
+from backend.routes import init_routes  # noqa: E402
+from backend.route_planning.route_planning_admission import (  # noqa: E402
+    AdmissionController, admission_controller
+)
+from backend.route_planning.route_planning_blobs import route_blob_store  # noqa: E402
+from backend.route_planning.route_planning_cache import route_cache  # noqa: E402
+from backend.route_planning.route_planning_catalog import catalog_store  # noqa: E402
+from backend.route_planning.route_planning_history import (  # noqa: E402
+    DEFAULT_HISTORY_MAX_PENDING, route_history_writer
+)
+
+
+def _reset_singletons() -> None:
+    """恢复进程级单例的默认状态"""
+    catalog_store.clear()
+    route_cache.clear()
+    route_blob_store.clear()
+    defaults = AdmissionController()
+    admission_controller.configure(
+        max_concurrent=defaults.max_concurrent, queue_size=defaults.queue_size,
+        queue_timeout_ms=defaults.queue_timeout_ms, overload_action=defaults.overload_action,
+        retry_after=defaults.retry_after, rate=0, burst=defaults.burst, store=defaults.store
+    )
+
+
+@pytest.fixture
+def app(tmp_path):
+    """临时数据库上的测试应用（已建表、已注册路由，路线历史同步写入）"""
+    app = Flask('tests', root_path=ROOT, template_folder=os.path.join(ROOT, 'templates'),
+                static_folder=os.path.join(ROOT, 'static'))
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'test.db'}",
+        SECRET_KEY='test',
+        TESTING=True
+    )
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+    _reset_singletons()
+    init_routes(app)
+
+    with app.app_context():
+        yield app
+        route_history_writer.close()
+        route_history_writer.configure(max_pending=DEFAULT_HISTORY_MAX_PENDING, synchronous=True)
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+    _reset_singletons()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def user(app):
+    """一个已存在的用户"""
+    user = User(username='visitor', email='visitor@example.com', password_hash='x')
+    db.session.add(user)
+    db.session.commit()
+    return user
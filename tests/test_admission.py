@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""准入控制：并发名额、有界等待队列、排队超时、限流与过载时的接口响应"""
+
+import threading
+import time
+
+import pytest
+
+from backend.route_planning.route_planning_admission import (
+    OVERLOAD_DEGRADE, OVERLOAD_REJECT, AdmissionController, MemoryRateLimitStore, Overloaded, RateLimited,
+    RateLimitStore, admission_controller
+)
+from backend.route_planning.route_planning_database import RoutePlanningDatabase
+
+
+def _wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError('等待条件超时')
+        time.sleep(0.005)
+
+
+def test_acquire_within_limit_is_immediate():
+    controller = AdmissionController(max_concurrent=2, queue_size=0)
+    controller.acquire()
+    controller.acquire()
+    assert controller.stats()['active'] == 2
+    controller.release()
+    controller.release()
+    assert controller.stats()['active'] == 0
+
+
+def test_release_hands_slot_to_waiters_in_arrival_order():
+    controller = AdmissionController(max_concurrent=1, queue_size=4, queue_timeout_ms=2000)
+    controller.acquire()
+    order = []
+
+    def waiter(name):
+        controller.acquire()
+        order.append(name)
+        controller.release()
+
+    threads = []
+    for name in ('first', 'second', 'third'):
+        thread = threading.Thread(target=waiter, args=(name,))
+        thread.start()
+        threads.append(thread)
+        _wait_for(lambda: controller.stats()['waiting'] == len(threads))
+
+    controller.release()
+    for thread in threads:
+        thread.join(timeout=2)
+    assert order == ['first', 'second', 'third']
+    assert controller.stats()['active'] == 0
+    assert controller.stats()['waiting'] == 0
+
+
+def test_full_queue_is_rejected_immediately():
+    controller = AdmissionController(max_concurrent=1, queue_size=0, retry_after=3)
+    controller.acquire()
+    started = time.perf_counter()
+    with pytest.raises(Overloaded) as raised:
+        controller.acquire()
+    assert time.perf_counter() - started < 0.1
+    assert raised.value.reason == 'queue_full'
+    assert raised.value.retry_after == 3
+    controller.release()
+
+
+def test_queue_timeout_rejects_and_leaves_queue():
+    """排队超过等待上限时拒绝，并从队列中移除，不占用之后释放的名额"""
+    controller = AdmissionController(max_concurrent=1, queue_size=4, queue_timeout_ms=50)
+    controller.acquire()
+    started = time.perf_counter()
+    with pytest.raises(Overloaded) as raised:
+        controller.acquire()
+    assert raised.value.reason == 'queue_timeout'
+    assert time.perf_counter() - started >= 0.045
+    assert controller.stats()['waiting'] == 0
+
+    controller.release()
+    assert controller.stats()['active'] == 0
+    controller.acquire()
+    controller.release()
+
+
+def test_solve_releases_slot_when_compute_raises():
+    controller = AdmissionController(max_concurrent=1, queue_size=0)
+    with pytest.raises(ValueError):
+        controller.solve(lambda: (_ for _ in ()).throw(ValueError('bad')))
+    assert controller.stats()['active'] == 0
+    assert controller.solve(lambda: 42) == 42
+
+
+def test_rate_limit_allows_burst_then_reports_wait():
+    store = MemoryRateLimitStore()
+    assert [store.consume('client', 1.0, 3) for _ in range(3)] == [0.0, 0.0, 0.0]
+    wait = store.consume('client', 1.0, 3)
+    assert 0 < wait <= 1.0
+    # 其他客户端各自计数
+    assert store.consume('other', 1.0, 3) == 0.0
+
+    controller = AdmissionController(rate=0.5, burst=1, store=MemoryRateLimitStore())
+    controller.check_rate('client')
+    with pytest.raises(RateLimited) as raised:
+        controller.check_rate('client')
+    assert raised.value.retry_after > 0
+
+
+def test_rate_limit_store_evicts_least_recent_clients():
+    store = MemoryRateLimitStore(max_clients=2)
+    for client in ('a', 'b', 'c'):
+        store.consume(client, 1.0, 1)
+    assert len(store) == 2
+    # a 已被淘汰，重新获得完整的令牌桶
+    assert store.consume('a', 1.0, 1) == 0.0
+
+
+def test_incomplete_rate_limit_store_cannot_be_created():
+    """缺少 reset 的存储实现在创建时即失败，而不是在第一个请求时"""
+    class ConsumeOnly(RateLimitStore):
+        def consume(self, key, rate, burst):
+            return 0.0
+
+    with pytest.raises(TypeError):
+        ConsumeOnly()
+    with pytest.raises(TypeError):
+        RateLimitStore()
+
+
+# ==================== 接口响应 ====================
+
+@pytest.fixture
+def busy(app):
+    """占满全部优化名额且不允许排队（路线缓存为空，每个请求都需要计算）"""
+    RoutePlanningDatabase.create_exhibit('e1', '展品一', '', 10, 10)
+    RoutePlanningDatabase.create_exhibit('e2', '展品二', '', 40, 10)
+    admission_controller.configure(max_concurrent=1, queue_size=0, retry_after=2)
+    admission_controller.acquire()
+    yield admission_controller
+    admission_controller.release()
+
+
+@pytest.mark.parametrize('path, payload', [
+    ('/api/route-planning/generate', {'age_group': 'adult', 'available_time': 61}),
+    ('/api/route-planning/generate-batch', {'profiles': [{'available_time': 62}, {'available_time': 63}]}),
+    ('/api/route-planning/replan', {'remaining_time': 30})
+])
+def test_overload_returns_503_with_retry_after(client, busy, path, payload):
+    busy.configure(overload_action=OVERLOAD_REJECT)
+    response = client.post(path, json=payload)
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '2'
+    assert not response.get_json()['success']
+
+
+def test_overload_degrades_generate_to_template_route(client, busy):
+    busy.configure(overload_action=OVERLOAD_DEGRADE)
+    response = client.post('/api/route-planning/generate', json={'available_time': 90})
+    assert response.status_code == 200
+    data = response.get_json()['data']
+    assert data['degraded']['reason'] == 'overloaded'
+    assert data['degraded']['template_time'] <= 90
+
+
+@pytest.mark.parametrize('path, payload', [
+    ('/api/route-planning/generate', {}),
+    ('/api/route-planning/generate-batch', {'profiles': [{}]}),
+    ('/api/route-planning/replan', {'remaining_time': 30})
+])
+def test_rate_limit_returns_429_with_retry_after(app, client, path, payload):
+    admission_controller.configure(rate=0.01, burst=1)
+    assert client.post(path, json=payload).status_code == 200
+    response = client.post(path, json=payload)
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) >= 1
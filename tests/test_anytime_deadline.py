@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""限时优化：遵守截止时间，改进后的收益不低于初始路线且仍在时间预算内"""
+
+import time
+
+import pytest
+
+from backend.route_planning.route_planning_core import (
+    TIME_BUFFER_RATIO, MockDataGenerator, RouteOptimizer, UserProfile
+)
+from backend.route_planning.route_planning_synthetic import SyntheticVenueGenerator
+
+# 截止时间之后生成路线详情等收尾工作允许的额外耗时（毫秒）
+FINISH_SLACK_MS = 60
+
+
+@pytest.fixture(scope='module')
+def optimizer():
+    exhibits, layout = SyntheticVenueGenerator(5).generate(400)
+    return RouteOptimizer(exhibits, layout)
+
+
+def _user(minutes=150):
+    return UserProfile('adult', ['history'], minutes, 'medium', 'individual', 'education')
+
+
+@pytest.mark.parametrize('deadline_ms', [20, 80])
+def test_deadline_is_respected(optimizer, deadline_ms):
+    started = time.perf_counter()
+    route = optimizer.optimize_route(_user(), deadline_ms=deadline_ms)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    optimization = route['optimization']
+    assert optimization['deadline_ms'] == deadline_ms
+    assert optimization['stopped'] in ('deadline', 'converged')
+    assert elapsed_ms <= deadline_ms + FINISH_SLACK_MS
+
+
+def test_improvement_never_lowers_score_or_breaks_budget(optimizer):
+    user = _user()
+    optimization = optimizer.optimize_route(user, deadline_ms=100)['optimization']
+    assert optimization['final_score'] >= optimization['initial_score']
+    assert optimization['final_minutes'] <= user.available_time * (1 - TIME_BUFFER_RATIO) + 1e-6
+
+
+def test_expired_deadline_returns_the_initial_route(optimizer):
+    user = _user()
+    rows = optimizer._selection_rows()
+    selector = optimizer._build_selector(rows, user)
+    order = selector.insert_greedy(optimizer.entrance_node, [], optimizer.exit_node)
+
+    improved, iterations, stopped = optimizer._improve_until(selector, order, time.perf_counter())
+    assert (improved, iterations, stopped) == (order, 0, 'deadline')
+
+
+def test_without_deadline_runs_a_single_pass(optimizer):
+    optimization = optimizer.optimize_route(_user())['optimization']
+    assert optimization['stopped'] == 'single_pass'
+    assert optimization['iterations'] == 0
+    assert optimization['final_score'] == optimization['initial_score']
+
+
+def test_small_catalog_is_already_exact():
+    small = RouteOptimizer(MockDataGenerator.generate_exhibits(), MockDataGenerator.generate_layout())
+    optimization = small.optimize_route(_user(90), deadline_ms=200)['optimization']
+    assert optimization['stopped'] == 'exact'
+    assert optimization['elapsed_ms'] < 200
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""批量生成：与逐条调用单条生成的结果一致（截止时间档位、路线副本、讲解词）"""
+
+import pytest
+
+from backend.route_planning.route_planning_batch import generate_routes_batch
+from backend.route_planning.route_planning_cache import route_cache
+from backend.route_planning.route_planning_database import RoutePlanningDatabase
+from backend.route_planning.route_planning_service import generate_route_cached, generate_route_with_guides
+
+PROFILES = [
+    {'age_group': 'child', 'interests': ['history'], 'available_time': 60},
+    {'age_group': 'adult', 'available_time': 90, 'deadline_ms': 70, 'language': 'en'},
+    {'age_group': 'senior', 'available_time': 45},
+    {'age_group': 'child', 'interests': ['history'], 'available_time': 60}
+]
+
+
+@pytest.fixture
+def catalog(app):
+    for index in range(6):
+        RoutePlanningDatabase.create_exhibit(f'e{index}', f'展品{index}', 'history' if index % 2 else '',
+                                             10 + index * 15, 10 + index * 5, visit_duration=5 + index)
+    app.config.update(ROUTE_BATCH_WORKERS=1, ROUTE_DEADLINE_DEFAULT_MS=30)
+    return app.config
+
+
+def _stable(route):
+    """去掉每次请求都会变化的字段"""
+    optimization = dict(route['optimization'], elapsed_ms=None)
+    return dict(route, generated_at=None, optimization=optimization)
+
+
+def test_batch_equals_single_calls(catalog):
+    singles = [generate_route_with_guides(dict(profile), catalog) for profile in PROFILES]
+    route_cache.clear()
+    batch = generate_routes_batch([dict(profile) for profile in PROFILES], catalog)
+
+    assert [_stable(route) for route in batch['routes']] == [_stable(route) for route in singles]
+    assert batch['stats']['unique'] == 3
+    assert batch['stats']['computed'] == 3
+
+
+def test_batch_uses_deadline_buckets_and_shares_cache_with_single(catalog):
+    batch = generate_routes_batch([dict(profile) for profile in PROFILES], catalog)
+    # 画像中的 70ms 取到 50ms 档位，未指定时使用部署默认的 30ms（25ms 档位）
+    assert [route['optimization']['deadline_ms'] for route in batch['routes']] == [25, 50, 25, 25]
+
+    cached = len(route_cache)
+    single = generate_route_with_guides(dict(PROFILES[1]), catalog)
+    assert len(route_cache) == cached
+    assert single['route'] == batch['routes'][1]['route']
+
+
+def test_batch_returns_fresh_copies_with_guides(catalog):
+    first = generate_routes_batch([dict(PROFILES[0])], catalog)['routes'][0]
+    second = generate_routes_batch([dict(PROFILES[0])], catalog)['routes'][0]
+
+    assert second is not first
+    assert second['generated_at'] >= first['generated_at']
+    assert all(stop['guide_text'] for stop in second['route'])
+    # 附加讲解词不修改缓存中的共享路线
+    assert 'guide_text' not in generate_route_cached(dict(PROFILES[0]), catalog)['route'][0]
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""展品与布局批量导入：不合格行的拒绝、strict / dry-run 与写入失败时的整体回滚"""
+
+import io
+import json
+
+import pytest
+
+from backend.models import Exhibit, MemorialLayout
+from backend.route_planning import route_planning_import
+from backend.route_planning.route_planning_catalog import catalog_store
+from backend.route_planning.route_planning_import import import_catalog
+
+CSV_HEADER = 'id,name,description,location_x,location_y,importance,visit_duration,category,period\n'
+
+
+def _csv(*rows):
+    return io.StringIO(CSV_HEADER + ''.join(row + '\n' for row in rows))
+
+
+def _layout(name='主展厅'):
+    return {'name': name, 'entrance': [0, 0], 'exit': [100, 0], 'halls': [], 'corridors': []}
+
+
+def test_invalid_rows_are_rejected_with_position(app):
+    """不合格的行记录行号和原因后跳过，其余行照常写入"""
+    report = import_catalog(_csv(
+        'e1,展品一,,10,20,3,15,history,',
+        'e2,,,10,20,3,15,history,',
+        'e3,展品三,,abc,20,3,15,history,',
+        'e4,展品四,,10,20,9,15,history,',
+        'e1,重复,,10,20,3,15,history,'
+    ), 'csv')
+
+    assert report['committed']
+    assert report['received'] == 5
+    assert report['exhibits'] == {'inserted': 1, 'updated': 0}
+    assert report['rejected_count'] == 4
+    # 表头为第1行
+    assert [(rejection['row'], rejection['id']) for rejection in report['rejected']] == [
+        ('第3行', 'e2'), ('第4行', 'e3'), ('第5行', 'e4'), ('第6行', 'e1')
+    ]
+    assert all(rejection['error'] for rejection in report['rejected'])
+    assert [exhibit.id for exhibit in Exhibit.query] == ['e1']
+
+
+def test_strict_mode_writes_nothing_when_any_row_is_invalid(app):
+    version = catalog_store.get().version
+    report = import_catalog(_csv('e1,展品一,,10,20,3,15,,', 'e2,,,10,20,3,15,,'), 'csv', strict=True)
+
+    assert not report['committed']
+    assert report['rejected_count'] == 1
+    assert Exhibit.query.count() == 0
+    assert catalog_store.version == version
+
+
+def test_dry_run_only_validates(app):
+    report = import_catalog(_csv('e1,展品一,,10,20,3,15,,'), 'csv', dry_run=True)
+    assert report['dry_run'] and not report['committed']
+    assert Exhibit.query.count() == 0
+
+
+def test_write_failure_rolls_back_everything(app, monkeypatch):
+    """展品已写入、布局写入失败时整体回滚，目录快照不重建"""
+    import_catalog(io.StringIO(json.dumps({'exhibits': [
+        {'id': 'e1', 'name': '原名', 'location': [1, 1]}
+    ]})), 'json')
+    version = catalog_store.version
+
+    def fail(rows, report):
+        raise RuntimeError('layout write failed')
+
+    monkeypatch.setattr(route_planning_import, '_upsert_layouts', fail)
+    document = json.dumps({
+        'exhibits': [{'id': 'e1', 'name': '新名', 'location': [2, 2]},
+                     {'id': 'e2', 'name': '展品二', 'location': [3, 3]}],
+        'layouts': [_layout()]
+    })
+    with pytest.raises(RuntimeError):
+        import_catalog(io.StringIO(document), 'json')
+
+    assert [(exhibit.id, exhibit.name) for exhibit in Exhibit.query] == [('e1', '原名')]
+    assert MemorialLayout.query.count() == 0
+    assert catalog_store.version == version
+
+
+def test_successful_import_refreshes_catalog_once(app):
+    version = catalog_store.version
+    document = json.dumps({
+        'exhibits': [{'id': f'e{index}', 'name': f'展品{index}', 'location': [index, index]}
+                     for index in range(5)],
+        'layouts': [_layout()]
+    })
+    report = import_catalog(io.StringIO(document), 'json')
+
+    assert report['exhibits'] == {'inserted': 5, 'updated': 0}
+    assert report['layouts'] == {'inserted': 1, 'updated': 0}
+    assert report['catalog_version'] == version + 1 == catalog_store.version
+    assert len(catalog_store.get().exhibits) == 5
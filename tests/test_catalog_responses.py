@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""目录类接口的预序列化响应：ETag / If-None-Match 304、按 Accept-Encoding 选择gzip"""
+
+import gzip
+import json
+
+import pytest
+
+from backend.route_planning.route_planning_database import RoutePlanningDatabase
+from backend.route_planning.route_planning_responses import (
+    CATALOG_CACHE_CONTROL, DEFAULT_GZIP_MIN_BYTES, catalog_response_cache
+)
+
+URL = '/api/route-planning/exhibits'
+
+
+@pytest.fixture
+def catalog(app):
+    for index in range(20):
+        RoutePlanningDatabase.create_exhibit(f'e{index}', f'展品{index}', '一段足够长的展品说明，使响应超过压缩阈值。' * 2,
+                                             index * 5, 10, category='history')
+    yield app
+    catalog_response_cache.configure(gzip_min_bytes=DEFAULT_GZIP_MIN_BYTES)
+
+
+def test_matching_etag_returns_304_for_either_encoding(catalog, client):
+    plain = client.get(URL)
+    zipped = client.get(URL, headers={'Accept-Encoding': 'gzip'})
+    assert plain.status_code == zipped.status_code == 200
+    assert plain.headers['Cache-Control'] == CATALOG_CACHE_CONTROL
+    assert zipped.headers['ETag'] == plain.headers['ETag'][:-1] + '-gz"'
+
+    for etag in (plain.headers['ETag'], zipped.headers['ETag'], f'"other", W/{plain.headers["ETag"]}'):
+        response = client.get(URL, headers={'If-None-Match': etag})
+        assert response.status_code == 304
+        assert response.data == b''
+        assert response.headers['ETag'] == plain.headers['ETag']
+    assert client.get(URL, headers={'If-None-Match': '"other"'}).status_code == 200
+
+
+def test_etag_changes_with_catalog(catalog, client):
+    etag = client.get(URL).headers['ETag']
+    RoutePlanningDatabase.create_exhibit('new', '新展品', 'history', 1, 1)
+
+    response = client.get(URL, headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def test_gzip_is_chosen_from_accept_encoding(catalog, client):
+    plain = client.get(URL)
+    assert 'Content-Encoding' not in plain.headers
+    assert 'Accept-Encoding' in plain.headers['Vary']
+
+    zipped = client.get(URL, headers={'Accept-Encoding': 'br;q=1.0, gzip;q=0.5'})
+    assert zipped.headers['Content-Encoding'] == 'gzip'
+    assert len(zipped.data) < len(plain.data)
+    assert gzip.decompress(zipped.data) == plain.data
+    assert json.loads(plain.data)['success'] is True
+
+    refused = client.get(URL, headers={'Accept-Encoding': 'gzip;q=0'})
+    assert 'Content-Encoding' not in refused.headers
+
+
+def test_small_bodies_are_not_compressed(catalog, client):
+    catalog_response_cache.configure(gzip_min_bytes=len(client.get(URL).data) + 1)
+
+    response = client.get(URL, headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+    assert not response.headers['ETag'].endswith('-gz"')
@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+"""目录快照：写入后的刷新通知（多进程服务据此让其他工作进程重载目录）"""
+
+from backend.route_planning.route_planning_catalog import catalog_store
+from backend.route_planning.route_planning_database import RoutePlanningDatabase
+
+
+def test_write_listeners_fire_only_on_explicit_refresh(app):
+    versions = []
+    catalog_store.subscribe_writes(lambda snapshot: versions.append(snapshot.version))
+    try:
+        # 首次加载不是写入
+        first = catalog_store.get().version
+        assert versions == []
+
+        RoutePlanningDatabase.create_exhibit('e1', '展品1', 'history', 10, 10)
+        assert versions == [first + 1] == [catalog_store.version]
+
+        # 已有快照时按需加载不再通知
+        catalog_store.get()
+        assert versions == [first + 1]
+    finally:
+        catalog_store._write_listeners.clear()
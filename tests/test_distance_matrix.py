@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""数组化计算：展品表的向量化兴趣匹配，以及大目录下按行计算的距离矩阵与稠密矩阵一致"""
+
+import pickle
+
+import numpy as np
+import pytest
+
+from backend.route_planning import route_planning_graph
+from backend.route_planning.route_planning_arrays import ExhibitTable, path_length
+from backend.route_planning.route_planning_core import Exhibit
+from backend.route_planning.route_planning_graph import (
+    OnDemandDistanceMatrix, WalkwayGraph, collect_points
+)
+from backend.route_planning.route_planning_synthetic import SyntheticVenueGenerator
+
+
+@pytest.fixture(scope='module')
+def venue():
+    exhibits, layout = SyntheticVenueGenerator(7).generate(120)
+    graph = WalkwayGraph(layout['walkways'], layout['connectors'])
+    return graph, collect_points(exhibits, layout)
+
+
+@pytest.fixture
+def lazy(venue, monkeypatch):
+    """同一场馆按行计算的距离矩阵"""
+    graph, points = venue
+    monkeypatch.setattr(route_planning_graph, 'DENSE_MAX_POINTS', 10)
+    return graph.compile(points).matrix
+
+
+def test_interest_scores_count_matched_tags():
+    table = ExhibitTable([
+        Exhibit('a', '甲', '革命历史文物', (0, 0), 3, 10, '文物', ''),
+        Exhibit('b', '乙', '现代科技', (1, 0), 3, 10, '多媒体', ''),
+        Exhibit('c', '丙', '历史照片', (2, 0), 3, 10, '照片', '')
+    ])
+    assert table.interest_scores(['历史', '文物']).tolist() == [2, 0, 1]
+    assert table.interest_scores([]).tolist() == [0, 0, 0]
+
+
+def test_path_length_sums_consecutive_edges():
+    matrix = np.arange(16, dtype=np.float64).reshape(4, 4)
+    assert path_length(matrix, [0, 2, 3, 1]) == matrix[0, 2] + matrix[2, 3] + matrix[3, 1]
+    assert path_length(matrix, [2]) == 0.0
+
+
+def test_only_large_catalogs_use_on_demand_rows(venue, monkeypatch):
+    graph, points = venue
+    assert isinstance(graph.compile(points).matrix, np.ndarray)
+    monkeypatch.setattr(route_planning_graph, 'DENSE_MAX_POINTS', 10)
+    lazy = graph.compile(points).matrix
+    assert isinstance(lazy, OnDemandDistanceMatrix)
+    assert lazy.shape == (len(points), len(points))
+
+
+def test_on_demand_matches_dense_for_every_index_form(venue, lazy):
+    """整数、逐对数组和 np.ix_ 三种下标形式的取值都与稠密矩阵相同"""
+    graph, points = venue
+    dense = graph.compile(points).matrix
+    rows = np.array([3, 9, 3, 40])
+    cols = np.array([7, 9, 11, 3])
+    assert lazy[4, 17] == dense[4, 17]
+    assert lazy[9, 9] == 0.0
+    np.testing.assert_allclose(lazy[rows, cols], dense[rows, cols])
+    np.testing.assert_allclose(lazy[5, rows], dense[5, rows])
+    block = np.ix_([1, 2, 2, 50], [0, 2, 7])
+    np.testing.assert_allclose(lazy[block], dense[block])
+
+
+def test_row_cache_is_bounded_and_survives_pickling(venue, lazy):
+    graph, points = venue
+    dense = graph.compile(points).matrix
+    lazy.cache_rows = 4
+    for row in range(10):
+        lazy[row, 0]
+    assert len(lazy._rows) == 4
+
+    restored = pickle.loads(pickle.dumps(lazy))
+    assert len(restored._rows) == 0
+    np.testing.assert_allclose(restored[np.ix_([0, 5], [1, 2])], dense[np.ix_([0, 5], [1, 2])])
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""停留时间统计：Welford 观测汇总、合并与移除的往返一致性"""
+
+import statistics
+
+import pytest
+
+from backend.models import db, ExhibitDwellStat
+from backend.route_planning.route_planning_database import RoutePlanningDatabase
+from backend.route_planning.route_planning_dwell import (
+    ALL_AUDIENCES, DwellObservations, apply_dwell, rebuild_dwell_stats
+)
+
+
+def _observations(values, exhibit_id='e1', audience='adult'):
+    observations = DwellObservations()
+    for minutes in values:
+        observations.add(exhibit_id, audience, minutes)
+    return observations
+
+
+def _table():
+    """统计表内容：(展品, 受众) -> (次数, 均值, m2)"""
+    return {(stat.exhibit_id, stat.audience): (stat.count, stat.mean, stat.m2)
+            for stat in ExhibitDwellStat.query}
+
+
+def _assert_stats_equal(actual, expected):
+    assert actual.keys() == expected.keys()
+    for key, (count, mean, m2) in expected.items():
+        assert actual[key][0] == count
+        assert actual[key][1] == pytest.approx(mean)
+        assert actual[key][2] == pytest.approx(m2, abs=1e-9)
+
+
+def test_observations_match_sample_mean_and_variance():
+    values = [4.0, 7.5, 12.0, 3.0, 9.25]
+    count, mean, m2 = _observations(values).stats[('e1', 'adult')]
+    assert count == len(values)
+    assert mean == pytest.approx(statistics.fmean(values))
+    assert m2 / (count - 1) == pytest.approx(statistics.variance(values))
+    # 同时计入全部受众
+    assert _observations(values).stats[('e1', ALL_AUDIENCES)] == [count, mean, m2]
+
+
+def test_merge_equals_single_batch(app):
+    """分两次合并的统计与一次写入全部观测相同"""
+    first, second = [5.0, 8.0, 11.0], [2.0, 20.0]
+    apply_dwell(_observations(first))
+    apply_dwell(_observations(second))
+    db.session.commit()
+    merged = _table()
+
+    db.session.query(ExhibitDwellStat).delete()
+    apply_dwell(_observations(first + second))
+    db.session.commit()
+    _assert_stats_equal(merged, _table())
+
+
+def test_remove_restores_previous_stats(app):
+    """移除刚合并的观测后回到合并前的统计，全部移除后清零"""
+    first, second = [5.0, 8.0, 11.0], [2.0, 20.0]
+    apply_dwell(_observations(first))
+    db.session.commit()
+    before = _table()
+
+    apply_dwell(_observations(second))
+    apply_dwell(_observations(second), remove=True)
+    db.session.commit()
+    _assert_stats_equal(_table(), before)
+
+    apply_dwell(_observations(first), remove=True)
+    db.session.commit()
+    for count, mean, m2 in _table().values():
+        assert (count, mean, m2) == (0, 0.0, 0.0)
+
+
+def test_feedback_updates_match_rebuild(app, user):
+    """多次修改反馈用时后的增量统计与由全部历史重建的结果一致"""
+    RoutePlanningDatabase.create_exhibit('e1', '展品一', '', 10, 10, visit_duration=10)
+    RoutePlanningDatabase.create_exhibit('e2', '展品二', '', 30, 10, visit_duration=30)
+    route = {'route': [{'id': 'e1'}, {'id': 'e2'}], 'summary': {'estimated_time': 45, 'walking_time': 5}}
+    first = RoutePlanningDatabase.save_route_history(user.id, 'a', route, {'age_group': 'adult'}, 45)
+    second = RoutePlanningDatabase.save_route_history(user.id, 'b', route, {'age_group': 'senior'}, 45)
+
+    for route_id, duration in ((first['route_id'], 45), (second['route_id'], 65),
+                               (first['route_id'], 85), (second['route_id'], 25)):
+        assert RoutePlanningDatabase.update_route_feedback(route_id, actual_duration=duration)['success']
+    incremental = _table()
+
+    assert rebuild_dwell_stats() == 2
+    db.session.commit()
+    _assert_stats_equal(incremental, _table())
+    # 全部受众：两条路线各一次观测
+    assert incremental[('e1', ALL_AUDIENCES)][0] == 2
+
+
+def test_feedback_for_unknown_route_is_rejected(app):
+    result = RoutePlanningDatabase.update_route_feedback(12345, actual_duration=30)
+    assert result == {'success': False, 'message': '路线记录不存在'}
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""讲解词客户端的HTTP响应读取：chunked 编码、Content-Length 校验"""
+
+import asyncio
+import json
+
+import pytest
+
+from backend.route_planning.route_planning_llm import EnrichmentCache, LLMEnrichmentClient
+
+BODY = json.dumps({'text': '这件展品讲述了一段历史。'}, ensure_ascii=False).encode('utf-8')
+
+
+def _chunked(body: bytes, size: int = 7) -> bytes:
+    chunks = [body[i:i + size] for i in range(0, len(body), size)]
+    encoded = b''.join(b'%x;ext=1\r\n%s\r\n' % (len(chunk), chunk) for chunk in chunks)
+    return encoded + b'0\r\nX-Trailer: 1\r\n\r\n'
+
+
+def _post(response: bytes):
+    """启动只返回给定字节的本地服务，用客户端发送一次请求"""
+    async def run():
+        requests = []
+
+        async def handle(reader, writer):
+            requests.append(await reader.readuntil(b'\r\n\r\n'))
+            writer.write(response)
+            await writer.drain()
+            writer.close()
+
+        server = await asyncio.start_server(handle, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        client = LLMEnrichmentClient(f'http://127.0.0.1:{port}/describe?model=guide', cache=EnrichmentCache())
+        try:
+            return await client._post_json({'exhibit': {'id': 'e1'}}), requests
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    return asyncio.run(run())
+
+
+def test_chunked_body_is_decoded():
+    result, requests = _post(b'HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n'
+                             b'Content-Type: application/json\r\n\r\n' + _chunked(BODY))
+    assert result == json.loads(BODY)
+    assert requests[0].startswith(b'POST /describe?model=guide HTTP/1.1\r\n')
+
+
+def test_content_length_body_is_read_exactly():
+    result, _ = _post(b'HTTP/1.1 200 OK\r\nContent-Length: %d\r\n\r\n%s' % (len(BODY), BODY))
+    assert result == json.loads(BODY)
+
+
+def test_body_without_length_is_read_until_close():
+    result, _ = _post(b'HTTP/1.1 200 OK\r\n\r\n' + BODY)
+    assert result == json.loads(BODY)
+
+
+@pytest.mark.parametrize('response', [
+    b'HTTP/1.1 200 OK\r\nContent-Length: %d\r\n\r\n%s' % (len(BODY) + 10, BODY),
+    b'HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n' + _chunked(BODY)[:20],
+    b'HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\nzz\r\n',
+    b'garbage\r\n\r\n',
+    b'HTTP/1.1 502 Bad Gateway\r\nContent-Length: 0\r\n\r\n'
+])
+def test_truncated_or_invalid_responses_raise(response):
+    with pytest.raises(RuntimeError):
+        _post(response)
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""展品选择：精确DP与穷举一致，贪心插入与移除保持时间预算，全目录候选用满剩余时间"""
+
+import itertools
+
+import numpy as np
+import pytest
+
+from backend.route_planning.route_planning_core import (
+    INTEREST_PRIZE_WEIGHT, TIME_BUFFER_RATIO, MockDataGenerator, RouteOptimizer, UserProfile
+)
+from backend.route_planning.route_planning_selection import OrienteeringSelector
+
+
+def _instance(seed, size, budget):
+    """随机实例：节点0为起点、1为终点，其余为候选展品"""
+    rng = np.random.default_rng(seed)
+    points = rng.uniform(0, 300, size=(size + 2, 2))
+    matrix = np.hypot(*(points[:, None, :] - points[None, :, :]).transpose(2, 0, 1))
+    return OrienteeringSelector(
+        matrix, np.arange(2, size + 2), rng.integers(1, 6, size), rng.uniform(2, 15, size),
+        budget=budget, walking_speed=1.0
+    )
+
+
+def _brute_force_prize(selector, start, end):
+    """枚举全部子集和顺序，返回预算内的最高收益"""
+    best = 0.0
+    size = len(selector.nodes)
+    for count in range(1, size + 1):
+        for subset in itertools.combinations(range(size), count):
+            prize = float(selector.prizes[list(subset)].sum())
+            if prize <= best:
+                continue
+            if any(selector.path_time(start, list(order), end) <= selector.budget + 1e-9
+                   for order in itertools.permutations(subset)):
+                best = prize
+    return best
+
+
+def _user(interests, minutes):
+    return UserProfile('adult', interests, minutes, 'medium', 'individual', 'education')
+
+
+@pytest.mark.parametrize('seed', range(6))
+def test_exact_dp_matches_brute_force(seed):
+    selector = _instance(seed, 6, budget=35)
+    order = selector.solve_exact(0, 1)
+
+    assert len(set(order)) == len(order)
+    assert selector.path_time(0, order, 1) <= selector.budget + 1e-9
+    assert float(selector.prizes[order].sum()) == pytest.approx(_brute_force_prize(selector, 0, 1))
+
+
+def test_exact_returns_empty_when_entrance_to_exit_exceeds_budget():
+    selector = _instance(0, 4, budget=0.001)
+    assert selector.solve_exact(0, 1) == []
+
+
+@pytest.mark.parametrize('seed', range(6))
+def test_greedy_insert_stays_within_budget(seed):
+    selector = _instance(seed, 40, budget=60)
+    order = selector.insert_greedy(0, [], 1)
+
+    assert order and len(set(order)) == len(order)
+    assert selector.path_time(0, order, 1) <= selector.budget + 1e-9
+    # 已满的路线上再插入不会加入任何展品
+    assert selector.insert_greedy(0, order, 1) == order
+
+
+@pytest.mark.parametrize('seed', range(6))
+def test_drop_greedy_restores_budget(seed):
+    selector = _instance(seed, 30, budget=50)
+    overfull = list(range(len(selector.nodes)))
+    assert selector.path_time(0, overfull, 1) > selector.budget
+
+    kept = selector.drop_greedy(0, overfull, 1)
+    assert kept
+    assert selector.path_time(0, kept, 1) <= selector.budget + 1e-9
+    # 剩余展品保持原有的相对顺序
+    assert kept == sorted(kept)
+
+
+def test_route_uses_remaining_time_beyond_interest_matches():
+    """兴趣匹配的展品优先入选，剩余时间继续用于其他展品"""
+    optimizer = RouteOptimizer(MockDataGenerator.generate_exhibits(), MockDataGenerator.generate_layout())
+    user = _user(['历史'], 90)
+    route = optimizer.optimize_route(user)
+
+    matched = {optimizer.table.ids[row] for row in np.flatnonzero(optimizer.table.interest_scores(['历史']))}
+    chosen = {stop['id'] for stop in route['route']}
+    assert matched <= chosen
+    assert chosen - matched
+    budget = user.available_time * (1 - TIME_BUFFER_RATIO)
+    assert route['optimization']['final_minutes'] >= 0.9 * budget
+
+
+def test_interest_matches_outrank_equal_importance():
+    optimizer = RouteOptimizer(MockDataGenerator.generate_exhibits(), MockDataGenerator.generate_layout())
+    rows = optimizer._selection_rows()
+    selector = optimizer._build_selector(rows, _user(['照片'], 60))
+    photo = optimizer.table.row['005']
+    assert selector.prizes[photo] == optimizer.table.importance[photo] + INTEREST_PRIZE_WEIGHT
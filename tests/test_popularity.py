@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""展品热度计数：反馈重复提交不重复计数、今日/近7天窗口"""
+
+from datetime import datetime, timedelta
+
+from backend.models import db
+from backend.route_planning.route_planning_database import RoutePlanningDatabase
+from backend.route_planning.route_planning_popularity import (
+    WINDOW_ALL, WINDOW_TODAY, WINDOW_WEEK, PopularityDelta, apply_popularity, top_exhibit_counters
+)
+
+STOPS = ['e1', 'e2']
+
+
+def _counters(window=WINDOW_ALL):
+    return {row['exhibit_id']: row for row in top_exhibit_counters(limit=10, window=window)}
+
+
+def _apply(delta):
+    apply_popularity(delta)
+    db.session.commit()
+
+
+def test_resubmitted_feedback_only_applies_the_difference(app):
+    RoutePlanningDatabase.create_exhibit('e1', '展品1', 'history', 10, 10, visit_duration=10)
+    RoutePlanningDatabase.create_exhibit('e2', '展品2', 'history', 20, 10, visit_duration=30)
+
+    first = PopularityDelta()
+    first.add_feedback(STOPS, None, 4, None, 40.0)
+    _apply(first)
+    # 同一路线再次提交：评分 4 → 5，用时 40 → 40（不变）
+    again = PopularityDelta()
+    again.add_feedback(STOPS, 4, 5, 40.0, 40.0)
+    assert again.totals['e1']['rating_sum'] == 1
+    assert again.totals['e1']['rating_count'] == again.totals['e1']['dwell_count'] == 0
+    _apply(again)
+    # 原样重复提交不产生增量
+    unchanged = PopularityDelta()
+    unchanged.add_feedback(STOPS, 5, 5, 40.0, 40.0)
+    assert not unchanged
+
+    counters = _counters()
+    assert counters['e1']['rating_count'] == counters['e2']['rating_count'] == 1
+    assert counters['e1']['avg_rating'] == 5
+    # 停留时间按建议时长 10:30 分摊
+    assert counters['e1']['avg_dwell_minutes'] == 10.0
+    assert counters['e2']['avg_dwell_minutes'] == 30.0
+
+
+def test_repeated_stops_count_one_visit():
+    delta = PopularityDelta()
+    delta.add_visits(['e1', 'e2', 'e1'])
+    assert delta.totals['e1']['visits'] == delta.totals['e2']['visits'] == 1
+
+
+def test_today_and_week_windows_only_read_their_days(app):
+    now = datetime.utcnow()
+    delta = PopularityDelta()
+    delta.add_visits(['e1'], now)
+    delta.add_visits(['e2'], now - timedelta(days=3))
+    delta.add_visits(['e2'], now - timedelta(days=6))
+    delta.add_visits(['e3'], now - timedelta(days=7))
+    _apply(delta)
+
+    assert {key: row['visits'] for key, row in _counters(WINDOW_TODAY).items()} == {'e1': 1}
+    assert {key: row['visits'] for key, row in _counters(WINDOW_WEEK).items()} == {'e1': 1, 'e2': 2}
+    assert {key: row['visits'] for key, row in _counters(WINDOW_ALL).items()} == {'e1': 1, 'e2': 2, 'e3': 1}
+    # 按访问次数排序
+    assert [row['exhibit_id'] for row in top_exhibit_counters(window=WINDOW_ALL)] == ['e2', 'e1', 'e3']
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""馆内增量重规划：去掉已参观展品，时间够时保留原路线，时间不够时移除展品回到预算内"""
+
+import pytest
+
+from backend.route_planning.route_planning_core import TIME_BUFFER_RATIO, RouteOptimizer, UserProfile
+from backend.route_planning.route_planning_database import RoutePlanningDatabase
+from backend.route_planning.route_planning_synthetic import SyntheticVenueGenerator
+
+
+@pytest.fixture(scope='module')
+def optimizer():
+    exhibits, layout = SyntheticVenueGenerator(11).generate(150)
+    return RouteOptimizer(exhibits, layout)
+
+
+def _user(minutes):
+    return UserProfile('adult', [], minutes, 'medium', 'individual', 'education')
+
+
+@pytest.fixture(scope='module')
+def original(optimizer):
+    """120分钟的原路线"""
+    return [stop['id'] for stop in optimizer.optimize_route(_user(120))['route']]
+
+
+def _spent(route):
+    """路线的参观时间 + 步行时间（分钟）"""
+    return route['summary']['visit_time'] + route['summary']['walking_time']
+
+
+def test_visited_stops_are_removed_and_the_rest_kept(optimizer, original):
+    visited = original[:3]
+    position = optimizer.exhibits[optimizer.table.row[visited[-1]]].location
+    route = optimizer.replan_route(_user(120), position, original, visited)
+
+    ids = [stop['id'] for stop in route['route']]
+    assert not set(ids) & set(visited)
+    # 时间充足时原路线剩余展品全部保留
+    assert set(original[3:]) <= set(ids)
+    assert route['replan']['visited'] == 3
+    assert route['replan']['kept'] == len(original) - 3
+    assert route['replan']['dropped'] == []
+
+
+def test_short_time_drops_stops_to_fit(optimizer, original):
+    user = _user(25)
+    position = optimizer.exhibits[optimizer.table.row[original[0]]].location
+    route = optimizer.replan_route(user, position, original, original[:1])
+
+    ids = [stop['id'] for stop in route['route']]
+    assert route['replan']['dropped']
+    assert not set(ids) & set(route['replan']['dropped'])
+    assert _spent(route) <= user.available_time * (1 - TIME_BUFFER_RATIO) + 0.1
+    assert len(ids) == len(set(ids))
+
+
+def test_unknown_and_duplicate_ids_are_ignored(optimizer, original):
+    route = optimizer.replan_route(_user(120), (0, 0), ['missing'] + original + original[:2], [])
+    ids = [stop['id'] for stop in route['route']]
+    assert 'missing' not in ids
+    assert len(ids) == len(set(ids))
+
+
+def test_replan_endpoint_validates_and_returns_route(client):
+    RoutePlanningDatabase.create_exhibit('e1', '展品一', '', 10, 10)
+    RoutePlanningDatabase.create_exhibit('e2', '展品二', '', 40, 10)
+
+    response = client.post('/api/route-planning/replan', json={
+        'remaining_time': 60, 'route_ids': ['e1', 'e2'], 'visited_ids': ['e1']
+    })
+    assert response.status_code == 200
+    data = response.get_json()['data']
+    assert [stop['id'] for stop in data['route']] == ['e2']
+    assert data['replan']['visited'] == 1
+
+    assert client.post('/api/route-planning/replan', json={'remaining_time': 0}).status_code == 400
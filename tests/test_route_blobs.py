@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""路线内容存储：易变字段不影响哈希、压缩往返、写入去重"""
+
+from backend.models import db, RouteBlob
+from backend.route_planning.route_planning_blobs import (
+    ENCODING_JSON, ENCODING_ZLIB, RouteBlobStore, is_route_hash, route_blob_store, route_content_hash,
+    stable_route
+)
+
+
+def _route(stops=3, **volatile):
+    return {
+        'route': [dict({'id': f'e{index}', 'name': f'展品{index}', 'visit_duration': 5}, **volatile.get('stop', {}))
+                  for index in range(stops)],
+        'summary': {'estimated_time': 5 * stops},
+        'optimization': dict({'engine': 'exact'}, **volatile.get('optimization', {})),
+        **volatile.get('route', {})
+    }
+
+
+def test_volatile_fields_do_not_change_hash():
+    plain = _route()
+    noisy = _route(route={'generated_at': '2024-01-01T00:00:00'},
+                   optimization={'elapsed_ms': 12.5},
+                   stop={'guide_text': '讲解', 'guide_source': 'llm'})
+
+    assert route_content_hash(plain) == route_content_hash(noisy)
+    assert is_route_hash(route_content_hash(plain))
+    # 不修改传入的路线
+    assert noisy['route'][0]['guide_text'] == '讲解'
+    assert stable_route(noisy) == plain
+
+
+def test_stable_fields_change_hash():
+    changed = _route()
+    changed['route'][0]['visit_duration'] = 6
+    assert route_content_hash(changed) != route_content_hash(_route())
+
+
+def test_large_routes_round_trip_through_zlib():
+    store = RouteBlobStore(compress_min_bytes=64)
+    route = _route(stops=40)
+    row = store.encode(route)
+
+    assert row['encoding'] == ENCODING_ZLIB
+    assert len(row['data']) < row['size']
+    assert row['hash'] == route_content_hash(route)
+    assert store.decode(row['encoding'], row['data']) == route
+
+    uncompressed = RouteBlobStore(compress_min_bytes=None).encode(route)
+    assert uncompressed['encoding'] == ENCODING_JSON
+    assert uncompressed['hash'] == row['hash']
+
+
+def test_identical_routes_are_stored_once(app):
+    noisy = _route(route={'generated_at': 'now'})
+    hashes = route_blob_store.store_many([_route(), noisy, _route(stops=2)])
+    db.session.commit()
+    route_blob_store.committed(hashes)
+
+    assert hashes[0] == hashes[1] != hashes[2]
+    assert RouteBlob.query.count() == 2
+    assert route_blob_store.get(hashes[0]) == _route()
+    assert route_blob_store.get('0' * 64) is None
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""路线结果缓存：并发请求合并、过期与目录变化时的失效"""
+
+import threading
+import time
+
+import pytest
+
+from backend.route_planning.route_planning_cache import CoalescingLRUCache, route_cache, route_cache_key
+from backend.route_planning.route_planning_catalog import catalog_store
+from backend.route_planning.route_planning_database import RoutePlanningDatabase
+from backend.route_planning.route_planning_service import deadline_bucket, generate_route_cached
+
+
+def _run_concurrently(count, target):
+    results = [None] * count
+    errors = [None] * count
+
+    def run(index):
+        try:
+            results[index] = target()
+        except Exception as e:
+            errors[index] = e
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+    return results, errors
+
+
+def test_concurrent_misses_compute_once():
+    """并发的相同请求只计算一次，其余请求得到同一个结果"""
+    cache = CoalescingLRUCache()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.05)
+        return {'route': []}
+
+    results, errors = _run_concurrently(8, lambda: cache.get_or_compute('key', compute))
+
+    assert len(calls) == 1
+    assert errors == [None] * 8
+    assert all(result is results[0] for result in results)
+    stats = cache.stats()
+    assert stats['misses'] == 1
+    assert stats['hits'] + stats['coalesced'] == 7
+
+
+def test_compute_error_reaches_waiters_and_is_not_cached():
+    """计算失败时等待者收到同一个异常，失败结果不写入缓存"""
+    cache = CoalescingLRUCache()
+    release = threading.Event()
+
+    def compute():
+        release.wait(1)
+        raise RuntimeError('boom')
+
+    timer = threading.Timer(0.05, release.set)
+    timer.start()
+    results, errors = _run_concurrently(4, lambda: cache.get_or_compute('key', compute))
+    timer.join()
+
+    assert all(isinstance(error, RuntimeError) for error in errors)
+    assert len(cache) == 0
+    assert cache.get_or_compute('key', lambda: 'ok') == 'ok'
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    """超过过期时间的缓存项视为未命中"""
+    cache = CoalescingLRUCache(ttl_seconds=10)
+    now = [1000.0]
+    monkeypatch.setattr(time, 'monotonic', lambda: now[0])
+    cache.put('key', 'value')
+    assert cache.get('key') == 'value'
+
+    now[0] += 11
+    assert cache.get('key') is None
+    assert cache.stats()['expirations'] == 1
+
+
+def test_lru_evicts_least_recently_used():
+    cache = CoalescingLRUCache(max_size=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+
+
+def test_cache_key_includes_versions_and_deadline_bucket():
+    preferences = {'age_group': 'adult', 'interests': []}
+    key = route_cache_key(preferences, 1, 0, deadline_bucket(70))
+    assert key == route_cache_key(preferences, 1, 0, deadline_bucket(99))
+    assert key != route_cache_key(preferences, 2, 0, deadline_bucket(70))
+    assert key != route_cache_key(preferences, 1, 1, deadline_bucket(70))
+    assert key != route_cache_key(preferences, 1, 0, deadline_bucket(100))
+    assert deadline_bucket(None) is None
+
+
+def test_catalog_refresh_invalidates_route_cache(app):
+    """展品变化后目录快照重建，缓存的路线整体失效"""
+    RoutePlanningDatabase.create_exhibit('e1', '展品一', '', 10, 10)
+    first = generate_route_cached({'age_group': 'adult'}, app.config)
+    assert len(route_cache) == 1
+
+    # 再次请求命中缓存（路线内容为同一个对象，仅生成时间不同）
+    again = generate_route_cached({'age_group': 'adult'}, app.config)
+    assert again['route'] is first['route']
+
+    version = catalog_store.version
+    RoutePlanningDatabase.create_exhibit('e2', '展品二', '', 20, 20)
+    assert catalog_store.version == version + 1
+    assert len(route_cache) == 0
+
+    refreshed = generate_route_cached({'age_group': 'adult'}, app.config)
+    assert refreshed['route'] is not first['route']
+
+
+@pytest.mark.parametrize('deadline_ms, bucket', [(0, 0), (30, 25), (250, 250), (999, 500), (10 ** 6, 5000)])
+def test_deadline_bucket_rounds_down(deadline_ms, bucket):
+    assert deadline_bucket(deadline_ms) == bucket
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""路线历史后写队列：同步写入、flush 与队列满时的背压"""
+
+import json
+from datetime import datetime
+
+from backend.models import RouteBlob, RouteHistory, RouteStop
+from backend.route_planning.route_planning_history import HISTORY_ROWS, route_history_writer
+
+
+def _row(user_id, name, stop_ids=('e1', 'e2')):
+    now = datetime.utcnow()
+    return {
+        'user_id': user_id,
+        'route_name': name,
+        'route': {'route': [{'id': exhibit_id} for exhibit_id in stop_ids], 'summary': {'estimated_time': 30}},
+        'user_preferences': json.dumps({'age_group': 'adult'}),
+        'estimated_duration': 30,
+        'visit_date': now,
+        'created_at': now,
+        'stop_ids': list(stop_ids)
+    }
+
+
+def test_synchronous_submit_writes_immediately(app, user):
+    """同步模式下提交即写入路线历史、站点和路线内容"""
+    route_history_writer.configure(synchronous=True)
+
+    route_history_writer.submit(_row(user.id, 'a'))
+
+    history = RouteHistory.query.one()
+    assert history.route_name == 'a'
+    assert history.route_hash and history.route_data is None
+    assert [stop.exhibit_id for stop in RouteStop.query.order_by(RouteStop.seq)] == ['e1', 'e2']
+    assert RouteBlob.query.count() == 1
+    assert route_history_writer.pending() == 0
+
+
+def test_flush_writes_queued_rows(app, user):
+    """后写模式下记录先进入队列，flush 后全部写入"""
+    route_history_writer.configure(synchronous=False, batch_size=100, flush_interval=0.2)
+
+    for index in range(5):
+        route_history_writer.submit(_row(user.id, f'r{index}'))
+    route_history_writer.flush()
+
+    assert route_history_writer.pending() == 0
+    assert RouteHistory.query.count() == 5
+    # 相同内容的路线只存储一份
+    assert RouteBlob.query.count() == 1
+
+
+def test_full_queue_applies_backpressure(app, user, monkeypatch):
+    """队列满且等待超时时，提交方自己写出已排队的记录后再入队"""
+    route_history_writer.configure(synchronous=False, max_pending=2, enqueue_timeout=0.01)
+    # 不启动后台线程，队列只会被背压或 flush 清空
+    monkeypatch.setattr(route_history_writer, '_ensure_thread', lambda: None)
+    before = HISTORY_ROWS.value('backpressure')
+
+    route_history_writer.submit(_row(user.id, 'r0'))
+    route_history_writer.submit(_row(user.id, 'r1'))
+    assert route_history_writer.pending() == 2
+    assert RouteHistory.query.count() == 0
+
+    route_history_writer.submit(_row(user.id, 'r2'))
+
+    assert HISTORY_ROWS.value('backpressure') == before + 1
+    assert RouteHistory.query.count() == 2
+    assert route_history_writer.pending() == 1
+
+    route_history_writer.flush()
+    assert sorted(history.route_name for history in RouteHistory.query) == ['r0', 'r1', 'r2']
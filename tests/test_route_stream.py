@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""流式生成：NDJSON 与 SSE 的事件分帧和顺序"""
+
+import json
+
+import pytest
+
+from backend.route_planning.route_planning_database import RoutePlanningDatabase
+from backend.route_planning.route_planning_stream import NDJSON_CONTENT_TYPE, SSE_CONTENT_TYPE
+
+PREFERENCES = {'age_group': 'adult', 'interests': ['history'], 'available_time': 60}
+
+
+@pytest.fixture
+def catalog(app):
+    for index in range(4):
+        RoutePlanningDatabase.create_exhibit(f'e{index}', f'展品{index}', 'history', 10 + index * 20, 10,
+                                             visit_duration=5)
+    return app
+
+
+def _check_events(events):
+    """route → recommendations → 每站一条 guide → done"""
+    names = [name for name, _ in events]
+    route = events[0][1]
+    stops = route['pending_guides']
+    assert stops == len(route['route']) > 0
+    assert names == ['route', 'recommendations'] + ['guide'] * stops + ['done']
+    assert 'recommendations' not in route
+    guides = sorted(data['index'] for name, data in events if name == 'guide')
+    assert guides == list(range(stops))
+
+
+def test_ndjson_frames_one_event_per_line(catalog, client):
+    response = client.post('/api/route-planning/generate/stream', json=PREFERENCES)
+
+    assert response.status_code == 200
+    assert response.content_type == NDJSON_CONTENT_TYPE
+    text = response.get_data(as_text=True)
+    assert text.endswith('\n')
+    lines = text[:-1].split('\n')
+    events = [(item['event'], item['data']) for item in map(json.loads, lines)]
+    _check_events(events)
+
+
+@pytest.mark.parametrize('query, headers', [('?format=sse', {}), ('', {'Accept': 'text/event-stream'})])
+def test_sse_frames_event_and_data_lines(catalog, client, query, headers):
+    response = client.post('/api/route-planning/generate/stream' + query, json=PREFERENCES, headers=headers)
+
+    assert response.status_code == 200
+    assert response.content_type == SSE_CONTENT_TYPE
+    text = response.get_data(as_text=True)
+    assert text.endswith('\n\n')
+    events = []
+    for message in text[:-2].split('\n\n'):
+        event, data = message.split('\n')
+        assert event.startswith('event: ') and data.startswith('data: ')
+        events.append((event[len('event: '):], json.loads(data[len('data: '):])))
+    _check_events(events)
+
+
+def test_invalid_preferences_return_plain_json_error(catalog, client):
+    response = client.post('/api/route-planning/generate/stream', json={'deadline_ms': -1})
+
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""访问顺序引擎：Held-Karp 与穷举一致，局部搜索不劣于最近邻构造"""
+
+import itertools
+import random
+
+import numpy as np
+import pytest
+
+from backend.route_planning.route_planning_tour import EXACT_MAX_STOPS, TourOrderingEngine
+
+
+def _random_matrix(seed, size):
+    """随机平面点的欧几里得距离矩阵"""
+    rng = np.random.default_rng(seed)
+    points = rng.uniform(0, 100, size=(size, 2))
+    return np.hypot(*(points[:, None, :] - points[None, :, :]).transpose(2, 0, 1))
+
+
+def _length(matrix, start, order, end):
+    path = [start] + list(order) + [end]
+    return float(matrix[path[:-1], path[1:]].sum())
+
+
+@pytest.mark.parametrize('seed', range(8))
+def test_held_karp_matches_brute_force(seed):
+    matrix = _random_matrix(seed, 9)
+    start, end, stops = 0, 8, list(range(1, 8))
+    order = TourOrderingEngine(matrix, engine='exact').order(start, stops, end)
+
+    assert sorted(order) == stops
+    best = min(_length(matrix, start, permutation, end) for permutation in itertools.permutations(stops))
+    assert _length(matrix, start, order, end) == pytest.approx(best)
+
+
+@pytest.mark.parametrize('seed', range(8))
+def test_local_search_never_worse_than_nearest_neighbor(seed):
+    matrix = _random_matrix(seed, 60)
+    start, end, stops = 0, 59, list(range(1, 59))
+    greedy = TourOrderingEngine(matrix, engine='nearest_neighbor').order(start, stops, end)
+    improved = TourOrderingEngine(matrix, engine='local_search').order(start, stops, end)
+
+    assert sorted(improved) == stops
+    assert _length(matrix, start, improved, end) <= _length(matrix, start, greedy, end) + 1e-9
+
+
+def test_improve_keeps_stops_and_does_not_lengthen_warm_start():
+    matrix = _random_matrix(3, 40)
+    stops = list(range(1, 39))
+    random.Random(3).shuffle(stops)
+    improved = TourOrderingEngine(matrix, engine='local_search').improve(0, stops, 39)
+
+    assert sorted(improved) == sorted(stops)
+    assert _length(matrix, 0, improved, 39) <= _length(matrix, 0, stops, 39) + 1e-9
+
+
+def test_exact_falls_back_to_local_search_above_limit():
+    matrix = _random_matrix(5, EXACT_MAX_STOPS + 8)
+    stops = list(range(1, EXACT_MAX_STOPS + 7))
+    engine = TourOrderingEngine(matrix, engine='exact')
+    assert engine._resolve_engine(len(stops)) == 'local_search'
+    assert sorted(engine.order(0, stops, len(matrix) - 1)) == stops
+
+
+def test_zero_budget_returns_a_complete_order():
+    matrix = _random_matrix(1, 200)
+    stops = list(range(1, 199))
+    order = TourOrderingEngine(matrix, engine='local_search', budget_ms=0).order(0, stops, 199)
+    assert sorted(order) == stops
+
+
+def test_unknown_engine_is_rejected():
+    with pytest.raises(ValueError):
+        TourOrderingEngine(np.zeros((2, 2)), engine='genetic')
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""场馆数据包：重建时哈希稳定、ETag 304、未知哈希返回当前数据包"""
+
+import pytest
+
+from backend.route_planning.route_planning_bundle import (
+    IMMUTABLE_CACHE_CONTROL, VenueBundleStore, venue_bundle_store
+)
+from backend.route_planning.route_planning_database import RoutePlanningDatabase
+
+
+@pytest.fixture
+def bundle(app):
+    for index in range(3):
+        RoutePlanningDatabase.create_exhibit(f'e{index}', f'展品{index}', 'history', 10 + index, 20)
+    venue_bundle_store.configure()
+    yield venue_bundle_store
+    venue_bundle_store._by_digest.clear()
+    venue_bundle_store._current = None
+
+
+def test_digest_is_stable_across_rebuilds(bundle):
+    first = bundle.current()
+    bundle.invalidate()
+    assert bundle.current() is first
+
+    # 其他进程对相同数据得到相同哈希
+    assert VenueBundleStore().current().digest == first.digest
+
+
+def test_digest_changes_with_catalog(bundle):
+    first = bundle.current().digest
+    RoutePlanningDatabase.create_exhibit('e9', '新展品', 'history', 50, 50)
+    second = bundle.current().digest
+    assert second != first
+    # 旧地址仍可读取
+    assert bundle.get(first) is not None
+
+
+def test_matching_etag_returns_304(bundle, client):
+    response = client.get('/api/route-planning/bundle')
+    assert response.status_code == 200
+    location = response.headers['Content-Location']
+    assert location.endswith('/' + bundle.current().digest)
+
+    revalidated = client.get('/api/route-planning/bundle', headers={'If-None-Match': response.headers['ETag']})
+    assert revalidated.status_code == 304
+    assert revalidated.data == b''
+
+    immutable = client.get(location)
+    assert immutable.status_code == 200
+    assert immutable.headers['Cache-Control'] == IMMUTABLE_CACHE_CONTROL
+    assert immutable.data == response.data
+    assert client.get(location, headers={'If-None-Match': immutable.headers['ETag']}).status_code == 304
+
+
+def test_unknown_digest_returns_current_bundle_without_redirect(bundle, client):
+    current = bundle.current()
+    response = client.get('/api/route-planning/bundle/' + '0' * 32)
+
+    assert response.status_code == 200
+    assert response.data == current.body
+    assert response.headers['Content-Location'].endswith('/' + current.digest)
+    assert response.headers['Cache-Control'] != IMMUTABLE_CACHE_CONTROL
+    assert client.get('/api/route-planning/bundle/not-a-digest').status_code == 404
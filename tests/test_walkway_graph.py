@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""通道网络：拐点间最短路、兴趣点吸附与沿通道的步行距离"""
+
+import itertools
+import random
+
+import numpy as np
+import pytest
+
+from backend.route_planning.route_planning_graph import (
+    WalkwayGraph, collect_points, exhibit_key, get_distance_matrix
+)
+from backend.route_planning.route_planning_core import MockDataGenerator
+
+
+def _dijkstra(graph, source):
+    """逐点扩展的最短路，作为 Floyd-Warshall 的对照"""
+    size = len(graph.nodes)
+    edges = {i: [] for i in range(size)}
+    for a, b, length in zip(graph.seg_a.tolist(), graph.seg_b.tolist(), graph.seg_len.tolist()):
+        edges[a].append((b, length))
+        edges[b].append((a, length))
+    dist = [float('inf')] * size
+    dist[source] = 0.0
+    done = set()
+    while len(done) < size:
+        node = min((i for i in range(size) if i not in done), key=dist.__getitem__)
+        done.add(node)
+        for neighbor, length in edges[node]:
+            dist[neighbor] = min(dist[neighbor], dist[node] + length)
+    return dist
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_vertex_distances_match_dijkstra(seed):
+    rng = random.Random(seed)
+    points = [(rng.randint(0, 20), rng.randint(0, 20)) for _ in range(12)]
+    walkways = [rng.sample(points, rng.randint(2, 4)) for _ in range(6)]
+    graph = WalkwayGraph(walkways, connectors=[(points[0], points[1], 3.5)])
+
+    for source in range(len(graph.nodes)):
+        np.testing.assert_allclose(graph.vertex_distances[source], _dijkstra(graph, source))
+
+
+def test_points_snap_to_walkways_and_follow_them():
+    """L形通道上的两点按通道绕行，而不是走直线"""
+    graph = WalkwayGraph([[(0, 0), (10, 0), (10, 10)]])
+    matrix = graph.compile({'a': (2, 1), 'b': (9, 8), 'c': (5, 0)})
+
+    # a 吸附到 (2, 0)，b 吸附到 (10, 8)：1 + 8 + 8 + 1
+    assert matrix.distance('a', 'b') == pytest.approx(18.0)
+    assert matrix.distance('a', 'c') == pytest.approx(4.0)
+    assert matrix.distance('b', 'a') == matrix.distance('a', 'b')
+    assert matrix.distance('a', 'a') == 0.0
+    assert matrix.path_length(['a', 'c', 'b']) == pytest.approx(4.0 + 13.0 + 1.0)
+
+
+def test_connectors_join_floors_without_snapping():
+    graph = WalkwayGraph([[(0, 0), (10, 0)], [(100, 0), (110, 0)]],
+                         connectors=[((10, 0), (100, 0), 30.0)])
+    matrix = graph.compile({'ground': (0, 0), 'upper': (110, 0), 'stairs': (55, 0)})
+    assert matrix.distance('ground', 'upper') == pytest.approx(10 + 30 + 10)
+    # 连接通道中点附近的兴趣点吸附到最近的普通通道端点
+    assert matrix.distance('ground', 'stairs') == pytest.approx(10 + 45)
+
+
+def test_disconnected_walkways_fall_back_to_straight_line():
+    graph = WalkwayGraph([[(0, 0), (1, 0)], [(10, 0), (11, 0)]])
+    matrix = graph.compile({'a': (0, 0), 'b': (11, 0)})
+    assert matrix.distance('a', 'b') == pytest.approx(11.0)
+
+
+def test_distance_matrix_is_triangle_consistent_and_cached():
+    exhibits, layout = MockDataGenerator.generate_exhibits(), MockDataGenerator.generate_layout()
+    matrix = get_distance_matrix(exhibits, layout)
+    assert get_distance_matrix(exhibits, layout) is matrix
+
+    keys = list(collect_points(exhibits, layout))
+    assert exhibit_key('001') in keys
+    dense = matrix.matrix
+    np.testing.assert_allclose(dense, dense.T)
+    for i, j, k in itertools.permutations(range(len(keys)), 3):
+        assert dense[i, j] <= dense[i, k] + dense[k, j] + 1e-9